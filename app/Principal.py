@@ -1,6 +1,5 @@
 """Main workspace landing page and system status cards."""
 
-import subprocess
 import sys
 import textwrap
 from pathlib import Path
@@ -14,13 +13,204 @@ from datetime import datetime, timezone
 
 import requests
 import streamlit as st
-from openai import OpenAI
 
 from app.components.sidebar import DEFAULT_MODULES, render_sidebar
 from src.bot.engine import load_env_once, load_settings
+from src.bot.webhook_client import webhook_metrics
 from src.utils.db_init import DB_PATH, ensure_db
+from src.utils.health import check_health, clear_health
+from src.utils.instrumentation import chatwoot_call
 from src.utils.timezone import TZ
 
+HEALTH_POLL_SECONDS = 1.0
+
+
+def _probe_database():
+    """Check the workspace SQLite database."""
+    try:
+        ensure_db()
+        db_exists = DB_PATH.exists()
+        return ("ok", f"DB OK em {DB_PATH}" if db_exists else "DB criado em memória")
+    except Exception as e:
+        return ("error", f"Erro: {e}")
+
+
+def _probe_chatwoot(cw_url: str, cw_account: str, cw_token: str):
+    """Check the Chatwoot account and count online users."""
+    try:
+        account_url = f"{cw_url}/api/v1/accounts/{cw_account}"
+        with chatwoot_call("GET", account_url) as call:
+            resp = requests.get(account_url, headers={"api_access_token": cw_token}, timeout=5)
+            call["status"] = resp.status_code
+        if resp.status_code >= 400:
+            return ("warn", f"Chatwoot respondeu {resp.status_code}")
+        online_msg = ""
+        try:
+            online_count = 0
+            # 1) Tenta endpoint de usuários
+            users_url = f"{cw_url}/api/v1/accounts/{cw_account}/users"
+            with chatwoot_call("GET", users_url) as call:
+                users_resp = requests.get(
+                    users_url,
+                    headers={"api_access_token": cw_token},
+                    params={"page": 1, "per_page": 200},
+                    timeout=5,
+                )
+                call["status"] = users_resp.status_code
+            users_data = users_resp.json() if users_resp.status_code < 400 else {}
+            users_list = []
+            if isinstance(users_data, dict):
+                users_list = users_data.get("data") or users_data.get("payload") or users_data.get("users") or []
+            elif isinstance(users_data, list):
+                users_list = users_data
+            # 2) Se vazio, tenta endpoint de agentes
+            if not users_list:
+                agents_url = f"{cw_url}/api/v1/accounts/{cw_account}/agents"
+                with chatwoot_call("GET", agents_url) as call:
+                    agents_resp = requests.get(
+                        agents_url,
+                        headers={"api_access_token": cw_token},
+                        params={"page": 1, "per_page": 200},
+                        timeout=5,
+                    )
+                    call["status"] = agents_resp.status_code
+                agents_data = agents_resp.json() if agents_resp.status_code < 400 else {}
+                if isinstance(agents_data, dict):
+                    users_list = agents_data.get("data") or agents_data.get("payload") or agents_data.get("agents") or []
+                elif isinstance(agents_data, list):
+                    users_list = agents_data
+
+            for u in users_list:
+                status = (
+                    (u.get("availability_status") or u.get("status") or u.get("availability") or "")
+                    if isinstance(u, dict)
+                    else ""
+                )
+                status_l = str(status).lower()
+                if status_l in ("online", "busy", "available"):
+                    online_count += 1
+            online_msg = f"<br/><span style='font-size:13px;'>Usuários online: {online_count}</span>"
+        except Exception:
+            online_msg = ""
+        return ("ok", f"Chatwoot conectado{online_msg}")
+    except Exception as e:
+        return ("warn", f"Chatwoot erro: {e}")
+
+
+def _probe_chatwoot_version(cw_url: str, cw_token: str):
+    """Return the (version, time) statuses reported by the Chatwoot API."""
+    try:
+        with chatwoot_call("GET", f"{cw_url}/api") as call:
+            resp = requests.get(
+                f"{cw_url}/api",
+                headers={"api_access_token": cw_token},
+                timeout=5,
+            )
+            call["status"] = resp.status_code
+        if resp.status_code >= 400:
+            return (
+                ("warn", f"Chatwoot respondeu {resp.status_code} ao buscar versão"),
+                ("warn", f"Chatwoot respondeu {resp.status_code} ao buscar hora"),
+            )
+        data = resp.json() or {}
+        version = data.get("version") or data.get("chatwoot_version")
+        if version:
+            cw_version_status = ("ok", f"Versão {version} • host: {cw_url}")
+        else:
+            cw_version_status = ("warn", "Versão não disponível no retorno da API")
+        timestamp = data.get("timestamp")
+        cw_time_status = ("warn", "Hora não disponível no retorno da API")
+        if timestamp:
+            try:
+                if isinstance(timestamp, (int, float)):
+                    cw_dt = datetime.fromtimestamp(timestamp, tz=timezone.utc)
+                elif isinstance(timestamp, str):
+                    try:
+                        cw_dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+                        if cw_dt.tzinfo is None:
+                            cw_dt = cw_dt.replace(tzinfo=timezone.utc)
+                    except ValueError:
+                        cw_dt = datetime.fromtimestamp(float(timestamp), tz=timezone.utc)
+                else:
+                    cw_dt = None
+            except Exception:
+                cw_dt = None
+            if cw_dt:
+                cw_dt_local = cw_dt.astimezone(TZ)
+                cw_time_status = (
+                    "ok",
+                    "Hora: "
+                    f"{cw_dt_local.strftime('%H:%M:%S')} • Time zone: {TZ.key}"
+                    f"<br/><span style='font-size:13px;'>UTC: {cw_dt.strftime('%H:%M:%S')}</span>",
+                )
+        return cw_version_status, cw_time_status
+    except Exception as e:
+        return ("warn", f"Erro ao buscar versão: {e}"), ("warn", f"Erro ao buscar hora: {e}")
+
+
+def _probe_openai(api_key: str, model_to_test: str):
+    """Run a tiny completion to check the OpenAI key and model."""
+    masked = api_key[:4] + "..." + api_key[-4:] if len(api_key) > 8 else "***"
+    try:
+        from openai import OpenAI  # carregado na checagem em segundo plano, não na abertura da página
+
+        client = OpenAI(api_key=api_key)
+        client.responses.create(
+            model=model_to_test,
+            input="Teste rápido: responda 'ok'.",
+            max_output_tokens=16,
+        )
+        return (
+            "ok",
+            "Conexão OpenAI - OK"
+            f"<br/>Chave API Carregada - OK ({masked})"
+            f"<br/>Modelo Configurado - {model_to_test}",
+        )
+    except Exception as e:
+        msg = str(e)
+        if "proxies" in msg.lower():
+            return ("ok", f"OPENAI_API_KEY carregada ({masked}); teste de modelo ignorado por incompatibilidade de proxy/cliente.")
+        return ("warn", f"Chave carregada ({masked}), falha ao testar modelo {model_to_test}: {msg}")
+
+
+def _format_age(seconds) -> str:
+    """Compact age such as 45s, 12min or 3h05."""
+    seconds = int(seconds or 0)
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}min"
+    return f"{seconds // 3600}h{(seconds % 3600) // 60:02d}"
+
+
+def _probe_webhook():
+    """Query the webhook service metrics (`/metrics`)."""
+    metrics = webhook_metrics()
+    if metrics is None:
+        return ("warn", "Webhook inativo")
+    last_event = metrics.get("last_event_age_s")
+    handle_p95 = metrics.get("handle_p95_s")
+    details = [
+        f"ativo há {_format_age(metrics.get('uptime_s'))}",
+        f"em andamento: {metrics.get('in_flight', 0)}",
+        f"fila: {metrics.get('queue_depth', 0)}",
+        f"último evento: {'há ' + _format_age(last_event) if last_event is not None else 'nenhum'}",
+    ]
+    if handle_p95 is not None:
+        details.append(f"p95 resposta: {handle_p95:.1f}s")
+    detail_html = f"<br/><span style='font-size:13px;'>{' • '.join(details)}</span>"
+    if metrics.get("status") != "ok":
+        stuck = _format_age(metrics.get("oldest_task_age_s"))
+        return ("warn", f"Webhook lento: tarefa em andamento há {stuck}{detail_html}")
+    return ("ok", f"Webhook em execução (uvicorn){detail_html}")
+
+
+@st.fragment(run_every=HEALTH_POLL_SECONDS)
+def _health_poll(probes):
+    """Rerun the page once the probes still running have finished."""
+    if not any(item["pending"] for item in check_health(probes, deadline=0).values()):
+        st.rerun()
+
 
 def main():
     """Render the main workspace page and system status overview."""
@@ -51,165 +241,47 @@ def main():
             """
         ).strip()
 
-    def is_webhook_running() -> bool:
-        try:
-            result = subprocess.run(
-                ["pgrep", "-f", "uvicorn app.modules.bot.bot_start:app"],
-                stdout=subprocess.DEVNULL,
-                stderr=subprocess.DEVNULL,
-                check=False,
-            )
-            return result.returncode == 0
-        except FileNotFoundError:
-            return False
-
-    # Status DB
-    try:
-        ensure_db()
-        db_exists = DB_PATH.exists()
-        db_status = ("ok", f"DB OK em {DB_PATH}" if db_exists else "DB criado em memória")
-    except Exception as e:
-        db_status = ("error", f"Erro: {e}")
-
-    # Status Chatwoot
+    # As verificações rodam em paralelo, com cache e atualização em segundo plano
+    # (src.utils.health); a página mostra o último status conhecido.
     settings = load_settings() or {}
     cw_url = (settings.get("chatwoot_url") or "").rstrip("/")
     cw_token = settings.get("chatwoot_api_token") or ""
     cw_account = settings.get("chatwoot_account_id") or ""
-    if cw_url and cw_token and cw_account:
-        try:
-            resp = requests.get(
-                f"{cw_url}/api/v1/accounts/{cw_account}",
-                headers={"api_access_token": cw_token},
-                timeout=5,
-            )
-            if resp.status_code < 400:
-                online_msg = ""
-                try:
-                    online_count = 0
-                    # 1) Tenta endpoint de usuários
-                    users_resp = requests.get(
-                        f"{cw_url}/api/v1/accounts/{cw_account}/users",
-                        headers={"api_access_token": cw_token},
-                        params={"page": 1, "per_page": 200},
-                        timeout=5,
-                    )
-                    users_data = users_resp.json() if users_resp.status_code < 400 else {}
-                    users_list = []
-                    if isinstance(users_data, dict):
-                        users_list = users_data.get("data") or users_data.get("payload") or users_data.get("users") or []
-                    elif isinstance(users_data, list):
-                        users_list = users_data
-                    # 2) Se vazio, tenta endpoint de agentes
-                    if not users_list:
-                        agents_resp = requests.get(
-                            f"{cw_url}/api/v1/accounts/{cw_account}/agents",
-                            headers={"api_access_token": cw_token},
-                            params={"page": 1, "per_page": 200},
-                            timeout=5,
-                        )
-                        agents_data = agents_resp.json() if agents_resp.status_code < 400 else {}
-                        if isinstance(agents_data, dict):
-                            users_list = agents_data.get("data") or agents_data.get("payload") or agents_data.get("agents") or []
-                        elif isinstance(agents_data, list):
-                            users_list = agents_data
-
-                    for u in users_list:
-                        status = (
-                            (u.get("availability_status") or u.get("status") or u.get("availability") or "")
-                            if isinstance(u, dict)
-                            else ""
-                        )
-                        status_l = str(status).lower()
-                        if status_l in ("online", "busy", "available"):
-                            online_count += 1
-                    online_msg = f"<br/><span style='font-size:13px;'>Usuários online: {online_count}</span>"
-                except Exception:
-                    online_msg = ""
-                cw_status = ("ok", f"Chatwoot conectado{online_msg}")
-            else:
-                cw_status = ("warn", f"Chatwoot respondeu {resp.status_code}")
-        except Exception as e:
-            cw_status = ("warn", f"Chatwoot erro: {e}")
-    else:
-        cw_status = ("warn", "Credenciais Chatwoot ausentes")
+    api_key = os.getenv("OPENAI_API_KEY")
+    model_to_test = settings.get("model") or "gpt-4.1-mini"
+    cw_configured = bool(cw_url and cw_token and cw_account)
 
-    # Versão e hora do Chatwoot
-    if cw_url and cw_token and cw_account:
-        try:
-            resp = requests.get(
-                f"{cw_url}/api",
-                headers={"api_access_token": cw_token},
-                timeout=5,
-            )
-            if resp.status_code < 400:
-                data = resp.json() or {}
-                version = data.get("version") or data.get("chatwoot_version")
-                if version:
-                    cw_version_status = ("ok", f"Versão {version} • host: {cw_url}")
-                else:
-                    cw_version_status = ("warn", "Versão não disponível no retorno da API")
-                timestamp = data.get("timestamp")
-                cw_time_status = ("warn", "Hora não disponível no retorno da API")
-                if timestamp:
-                    try:
-                        if isinstance(timestamp, (int, float)):
-                            cw_dt = datetime.fromtimestamp(timestamp, tz=timezone.utc)
-                        elif isinstance(timestamp, str):
-                            try:
-                                cw_dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
-                                if cw_dt.tzinfo is None:
-                                    cw_dt = cw_dt.replace(tzinfo=timezone.utc)
-                            except ValueError:
-                                cw_dt = datetime.fromtimestamp(float(timestamp), tz=timezone.utc)
-                        else:
-                            cw_dt = None
-                    except Exception:
-                        cw_dt = None
-                    if cw_dt:
-                        cw_dt_local = cw_dt.astimezone(TZ)
-                        cw_time_status = (
-                            "ok",
-                            "Hora: "
-                            f"{cw_dt_local.strftime('%H:%M:%S')} • Time zone: {TZ.key}"
-                            f"<br/><span style='font-size:13px;'>UTC: {cw_dt.strftime('%H:%M:%S')}</span>",
-                        )
-            else:
-                cw_version_status = ("warn", f"Chatwoot respondeu {resp.status_code} ao buscar versão")
-                cw_time_status = ("warn", f"Chatwoot respondeu {resp.status_code} ao buscar hora")
-        except Exception as e:
-            cw_version_status = ("warn", f"Erro ao buscar versão: {e}")
-            cw_time_status = ("warn", f"Erro ao buscar hora: {e}")
+    probes = {
+        "database": (str(DB_PATH), _probe_database),
+        "webhook": (None, _probe_webhook),
+    }
+    if cw_configured:
+        probes["chatwoot"] = ((cw_url, cw_account, cw_token), lambda: _probe_chatwoot(cw_url, cw_account, cw_token))
+        probes["chatwoot_version"] = ((cw_url, cw_token), lambda: _probe_chatwoot_version(cw_url, cw_token))
+    if api_key:
+        probes["openai"] = ((api_key, model_to_test), lambda: _probe_openai(api_key, model_to_test))
+
+    if st.button("Verificar novamente", type="secondary"):
+        clear_health()
+    health = check_health(probes)
+    checking = ("warn", "Verificando...")
+
+    def probe_value(name, default=checking):
+        return health[name]["value"] or default
+
+    db_status = probe_value("database")
+    if cw_configured:
+        cw_status = probe_value("chatwoot")
+        cw_version_status, cw_time_status = probe_value("chatwoot_version", (checking, checking))
     else:
+        cw_status = ("warn", "Credenciais Chatwoot ausentes")
         cw_version_status = ("warn", "Credenciais Chatwoot ausentes")
         cw_time_status = ("warn", "Credenciais Chatwoot ausentes")
-
-    # Status OpenAI
-    api_key = os.getenv("OPENAI_API_KEY")
     if api_key:
-        masked = api_key[:4] + "..." + api_key[-4:] if len(api_key) > 8 else "***"
-        model_to_test = settings.get("model") or "gpt-4.1-mini"
-        try:
-            client = OpenAI(api_key=api_key)
-            resp = client.responses.create(
-                model=model_to_test,
-                input="Teste rápido: responda 'ok'.",
-                max_output_tokens=16,
-            )
-            oa_status = (
-                "ok",
-                "Conexão OpenAI - OK"
-                f"<br/>Chave API Carregada - OK ({masked})"
-                f"<br/>Modelo Configurado - {model_to_test}",
-            )
-        except Exception as e:
-            msg = str(e)
-            if "proxies" in msg.lower():
-                oa_status = ("ok", f"OPENAI_API_KEY carregada ({masked}); teste de modelo ignorado por incompatibilidade de proxy/cliente.")
-            else:
-                oa_status = ("warn", f"Chave carregada ({masked}), falha ao testar modelo {model_to_test}: {msg}")
+        oa_status = probe_value("openai")
     else:
         oa_status = ("error", "OPENAI_API_KEY não encontrada (.env)")
+    webhook_status = probe_value("webhook")
 
     st.markdown("### Status do sistema")
     style_html = textwrap.dedent(
@@ -267,8 +339,6 @@ def main():
 
     workspace_now = datetime.now(TZ)
     workspace_time_status = ("ok", f"Hora: {workspace_now.strftime('%H:%M:%S')} • Time zone: {TZ.key}")
-    webhook_running = is_webhook_running()
-    webhook_status = ("ok", "Webhook em execução (uvicorn)") if webhook_running else ("warn", "Webhook inativo")
     bot_enabled = bool(settings.get("bot_enabled", True))
     bot_status = ("ok", "Bot ativado") if bot_enabled else ("warn", "Bot desativado")
 
@@ -287,6 +357,12 @@ def main():
         ]
     )
     st.markdown(status_grid_html, unsafe_allow_html=True)
+    checked = [item["checked_at"] for item in health.values() if item["checked_at"]]
+    if checked:
+        oldest = datetime.fromtimestamp(min(checked), TZ).strftime("%H:%M:%S")
+        st.caption(f"Status verificado a partir de {oldest}; atualizado automaticamente em segundo plano.")
+    if any(item["pending"] for item in health.values()):
+        _health_poll(probes)
 
     st.markdown("### Como navegar")
     st.info(
@@ -0,0 +1,66 @@
+"""On-demand download button backed by the chunked file exporter."""
+
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+from src.reports.export import EXPORT_FORMATS, export_to_tempfile
+
+_FORMAT_LABELS = {"csv": "CSV", "csv.gz": "CSV (gzip)", "parquet": "Parquet"}
+
+
+def _signature(df: pd.DataFrame, fmt: str) -> tuple:
+    """Identify the table contents and format, to know whether a prepared file is still current."""
+    try:
+        content = int(pd.util.hash_pandas_object(df, index=False).sum())
+    except TypeError:
+        content = None  # células não hasheáveis (listas, dicts): compara só forma e colunas
+    return fmt, df.shape, tuple(map(str, df.columns)), content
+
+
+def export_download(df: pd.DataFrame, file_stem: str, key: str, label: str = "Exportar"):
+    """Render a format picker, a "Preparar exportação" button and, once ready, a download button.
+
+    Nothing is written on a normal rerun: the file is generated in chunks
+    only when the user asks for it, and kept in the session while the table
+    and format stay the same. The chunked writer avoids building the whole
+    CSV as one string, but `st.download_button` still reads the finished file
+    into memory to serve it, so the download itself is not streamed.
+    """
+    state_key = f"{key}_prepared"
+    col_fmt, col_btn = st.columns([1, 2])
+    with col_fmt:
+        fmt = st.selectbox(
+            "Formato",
+            options=list(_FORMAT_LABELS),
+            format_func=_FORMAT_LABELS.get,
+            key=f"{key}_format",
+            label_visibility="collapsed",
+        )
+    suffix, mime = EXPORT_FORMATS[fmt]
+    prepared = st.session_state.get(state_key)
+    if prepared and not Path(prepared["path"]).exists():
+        prepared = None
+    signature = _signature(df, fmt) if prepared else None
+    with col_btn:
+        if not prepared or prepared["signature"] != signature:
+            slot = st.empty()
+            if not slot.button(f"Preparar exportação {_FORMAT_LABELS[fmt]}", key=f"{key}_prepare"):
+                return
+            slot.empty()
+            with st.spinner("Gerando arquivo..."):
+                path = export_to_tempfile(df, fmt=fmt, stem=file_stem)
+            prepared = {"path": str(path), "signature": signature or _signature(df, fmt)}
+            st.session_state[state_key] = prepared
+        with open(prepared["path"], "rb") as handle:
+            st.download_button(
+                f"{label} {_FORMAT_LABELS[fmt]}",
+                data=handle,
+                file_name=f"{file_stem}{suffix}",
+                mime=mime,
+                key=key,
+            )
+
+
+__all__ = ["export_download"]
@@ -0,0 +1,46 @@
+"""Progress display for background jobs (`src.utils.jobs`)."""
+
+from typing import Dict, Optional
+
+import streamlit as st
+
+from src.utils.jobs import ACTIVE_STATUSES, get_job, load_result
+
+JOB_POLL_SECONDS = 1.0
+
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def _job_progress(job_id: str, label: str):
+    job = get_job(job_id)
+    if job is None or job["status"] not in ACTIVE_STATUSES:
+        st.rerun()
+    total = job["total"] or 0
+    fraction = min(job["done"] / total, 1.0) if total else 0.0
+    detail = job["message"] or ("Na fila..." if job["status"] == "queued" else "Processando...")
+    if total:
+        detail = f"{detail} ({job['done']}/{total})"
+    st.progress(fraction, text=f"{label}: {detail}")
+
+
+def job_result(job_id: Optional[str], label: str = "Processando"):
+    """Render the progress of `job_id` and return its result once finished.
+
+    While the job runs, a fragment polls its state and reruns the page when it
+    ends; until then (and when the job failed or expired) None is returned.
+    """
+    job: Optional[Dict] = get_job(job_id)
+    if job is None:
+        return None
+    if job["status"] in ACTIVE_STATUSES:
+        _job_progress(job_id, label)
+        return None
+    if job["status"] == "failed":
+        st.error(f"{label}: falhou. {job['error'] or ''}".strip())
+        return None
+    result = load_result(job_id)
+    if result is None:
+        st.warning("O resultado deste processamento expirou. Gere novamente.")
+    return result
+
+
+__all__ = ["job_result"]
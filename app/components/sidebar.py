@@ -1,11 +1,11 @@
 """Sidebar navigation helpers and defaults for the Streamlit app."""
 
-import subprocess
 from typing import Dict, List
 
 import streamlit as st
 
 from src.bot.engine import set_bot_enabled
+from src.bot.webhook_client import stop_webhook
 
 
 DEFAULT_MODULES = ["Principal", "Bot Studio", "Configurações", "Dashboards", "Gestão", "Análises", "Ajuda"]
@@ -18,15 +18,7 @@ def _bootstrap_bot_state():
     if _BOOTSTRAPPED:
         return
     set_bot_enabled(False)
-    try:
-        subprocess.run(
-            ["pkill", "-f", "uvicorn app.modules.bot.bot_start:app"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
-        )
-    except FileNotFoundError:
-        pass
+    stop_webhook()
     _BOOTSTRAPPED = True
 
 
@@ -6,85 +6,75 @@ and renders Streamlit tabs for conversation listings and analysis metrics.
 
 import os
 import sys
-import json
-import re
 import time as time_module
 import random
+from collections import Counter
 from concurrent.futures import ThreadPoolExecutor, as_completed
-from datetime import date, datetime, time, timedelta, timezone
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Dict, List, Optional
 
 import pandas as pd
 import requests
 import streamlit as st
-from openai import OpenAI
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from app.components.export import export_download
+from app.components.jobs import job_result
+from src.analytics.conversation_analysis import (
+    ANALYSIS_MESSAGE_COLUMNS,
+    bot_sender_config,
+    build_conversation_analysis,
+    build_conversation_meta,
+    collect_conversation_rows,
+    filter_conversations,
+    summarize_message_frame,
+)
+from src.analytics.message_frame import build_message_frame, concat_message_frames
+from src.analytics.insights_mapreduce import MAP_CHUNK_CHARS, map_reduce, partition_messages
+from src.analytics.insights_sampling import (
+    DEFAULT_TOKEN_BUDGET,
+    conversation_order,
+    count_tokens,
+    length_bucket,
+    sample_is_sufficient,
+    stratified_sample,
+)
+from src.analytics.insights_store import context_signature, data_version, get_context, put_context
+from src.analytics.message_store import account_key, sync_messages
+from src.analytics.message_types import chatwoot_page_fetcher
+from src.analytics.metrics import fetch_chatwoot_inboxes
 from src.bot.engine import load_env_once, load_settings
 from src.bot.rules import extrair_texto_resposta
 from src.utils.database import get_conn
+from src.utils.http_cache import cached_get
+from src.utils.jobs import submit_job
+from src.utils.timestamps import to_local
 from src.utils.timezone import TZ
 
+INSIGHTS_MODES = {
+    "sample": "Amostra (rápida)",
+    "day": "Completa, por dia",
+    "conversation": "Completa, por conversa",
+}
+SAMPLE_CRAWL_BATCH = 24
+INSIGHTS_USAGE_KEYS = ("chunks", "calls", "cached_calls", "input_tokens", "output_tokens", "cost_usd")
+
 
 def _cw_headers(token: str) -> Dict[str, str]:
     """Build default headers for Chatwoot API requests."""
     return {"api_access_token": token, "Content-Type": "application/json"}
 
 
-def _parse_ts(value) -> Optional[datetime]:
-    """Parse timestamps from numeric or string values into UTC-aware datetimes."""
-    if value is None:
-        return None
-    try:
-        if isinstance(value, (int, float)):
-            return datetime.fromtimestamp(value, tz=timezone.utc)
-        if isinstance(value, str):
-            try:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except Exception:
-                return datetime.fromtimestamp(float(value), tz=timezone.utc)
-    except Exception:
-        return None
-    return None
-
-
 def _format_datetime_value(value) -> str:
     """Format a timestamp value into local timezone string."""
-    dt = _parse_ts(value)
+    dt = to_local(value)
     if not dt:
         return value
-    return dt.astimezone(TZ).strftime("%d/%m/%Y %H:%M:%S")
-
-
-def _format_duration(start_dt: Optional[datetime], end_dt: Optional[datetime]) -> str:
-    """Return a HH:MM:SS duration string for a time delta."""
-    if not start_dt or not end_dt:
-        return ""
-    delta = end_dt - start_dt
-    total_seconds = int(delta.total_seconds())
-    if total_seconds < 0:
-        return ""
-    hours, rem = divmod(total_seconds, 3600)
-    minutes, seconds = divmod(rem, 60)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
-
-
-def _match_partial(text: str, pattern: str) -> bool:
-    """Match a partial pattern against text with optional wildcard support."""
-    if not pattern:
-        return True
-    text = text or ""
-    pattern = pattern.strip()
-    if not pattern:
-        return True
-    if "*" in pattern:
-        regex = re.escape(pattern).replace("\\*", ".*")
-        return re.search(regex, text, re.IGNORECASE) is not None
-    return pattern.lower() in text.lower()
+    return dt.strftime("%d/%m/%Y %H:%M:%S")
 
 
 def _request_with_retry(url: str, params: Dict, headers: Dict, timeout: int, retries: int = 1):
@@ -93,7 +83,7 @@ def _request_with_retry(url: str, params: Dict, headers: Dict, timeout: int, ret
     current_timeout = timeout
     for attempt in range(retries + 1):
         try:
-            return requests.get(url, params=params, headers=headers, timeout=current_timeout)
+            return cached_get(url, params=params, headers=headers, timeout=current_timeout)
         except requests.exceptions.ReadTimeout as exc:
             last_exc = exc
             if attempt < retries:
@@ -139,42 +129,6 @@ def _request_with_rate_limit(
     return last_resp
 
 
-def _fetch_inboxes(base_url: str, account_id: str, token: str, max_pages: int = 5, per_page: int = 100) -> List[Dict]:
-    """Fetch inboxes from Chatwoot with pagination."""
-    inboxes = []
-    page = 1
-    while page <= max_pages:
-        url = f"{base_url}/api/v1/accounts/{account_id}/inboxes"
-        resp = requests.get(
-            url,
-            params={"page": page, "per_page": per_page},
-            headers=_cw_headers(token),
-            timeout=15,
-        )
-        if resp.status_code >= 400:
-            break
-        data = resp.json() or {}
-        payload = []
-        if isinstance(data, dict):
-            payload = data.get("data") or data.get("payload") or data.get("inboxes") or []
-        elif isinstance(data, list):
-            payload = data
-        if not payload:
-            break
-        for inbox in payload:
-            if isinstance(inbox, dict):
-                inboxes.append(
-                    {
-                        "id": inbox.get("id"),
-                        "name": inbox.get("name") or inbox.get("channel_type") or str(inbox.get("id")),
-                    }
-                )
-        if len(payload) < per_page:
-            break
-        page += 1
-    return inboxes
-
-
 def _fetch_agents(base_url: str, account_id: str, token: str, max_pages: int = 5, per_page: int = 100) -> List[Dict]:
     """Fetch agents/users from Chatwoot, trying multiple endpoints."""
     agents = []
@@ -183,7 +137,7 @@ def _fetch_agents(base_url: str, account_id: str, token: str, max_pages: int = 5
         page = 1
         while page <= max_pages:
             url = f"{base_url}/api/v1/accounts/{account_id}{endpoint}"
-            resp = requests.get(
+            resp = cached_get(
                 url,
                 params={"page": page, "per_page": per_page},
                 headers=_cw_headers(token),
@@ -219,7 +173,7 @@ def _fetch_teams(base_url: str, account_id: str, token: str, max_pages: int = 5,
     page = 1
     while page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/teams"
-        resp = requests.get(
+        resp = cached_get(
             url,
             params={"page": page, "per_page": per_page},
             headers=_cw_headers(token),
@@ -272,8 +226,8 @@ def _fetch_conversations(base_url: str, account_id: str, token: str, start_dt: d
         conversations.extend(payload)
         last = payload[-1]
         last_ts_raw = last.get("last_activity_at") or last.get("updated_at") or last.get("created_at")
-        last_dt = _parse_ts(last_ts_raw)
-        if last_dt and last_dt.astimezone(TZ) < start_dt:
+        last_dt = to_local(last_ts_raw)
+        if last_dt and last_dt < start_dt:
             break
         page += 1
     return conversations
@@ -288,62 +242,26 @@ def _fetch_messages(
     start_dt: Optional[datetime] = None,
     max_batches: int = 200,
 ) -> List[Dict]:
-    """Fetch conversation messages using the `before` cursor for pagination."""
-    messages = []
-    before_id = None
-    batches = 0
-    while batches < max_batches:
-        url = f"{base_url}/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages"
-        params = {}
-        if before_id:
-            params["before"] = before_id
+    """Fetch conversation messages, downloading only pages missing from the local store."""
+    chatwoot_page = chatwoot_page_fetcher(base_url, account_id, token, conversation_id, timeout=25)
+
+    def fetch_page(before_id=None, after_id=None):
         try:
-            resp = _request_with_rate_limit(
-                url,
-                params=params,
-                headers=_cw_headers(token),
-                timeout=25,
-                retries=2,
-            )
+            return chatwoot_page(before_id, after_id)
         except requests.exceptions.ReadTimeout as exc:
             raise RuntimeError(
                 "Tempo limite ao buscar mensagens no Chatwoot. Tente reduzir o período ou aplicar mais filtros."
             ) from exc
         except requests.exceptions.RequestException as exc:
             raise RuntimeError(f"Erro ao buscar mensagens no Chatwoot: {exc}") from exc
-        if resp.status_code >= 400:
-            raise RuntimeError(f"Chatwoot respondeu {resp.status_code} ao buscar mensagens: {resp.text[:200]}")
-        data = resp.json() or {}
-        payload = data.get("data", []) or data.get("payload") or []
-        if not payload:
-            break
-        messages.extend(payload)
-
-        oldest = payload[0]
-        next_before = oldest.get("id")
-        if not next_before or next_before == before_id:
-            break
-        before_id = next_before
-
-        if start_dt:
-            oldest_dt = _parse_ts(oldest.get("created_at") or oldest.get("timestamp"))
-            if oldest_dt and oldest_dt.astimezone(TZ) < start_dt:
-                break
-        if len(payload) < 20:
-            break
-        batches += 1
-    return messages
 
-
-def _normalize_conversation(conv: Dict) -> Dict:
-    """Normalize conversation payload by serializing nested values."""
-    clean = {}
-    for k, v in conv.items():
-        if isinstance(v, (dict, list)):
-            clean[k] = json.dumps(v, ensure_ascii=False)
-        else:
-            clean[k] = v
-    return clean
+    return sync_messages(
+        account_key(base_url, account_id),
+        conversation_id,
+        fetch_page,
+        start_ts=start_dt.timestamp() if start_dt else None,
+        max_batches=max_batches,
+    )
 
 
 def _build_state_key(prefix: str, suffix: str) -> str:
@@ -366,7 +284,7 @@ def _normalize_message_statuses(key: str, options: List[str]) -> None:
 
 def _load_insight_prompts() -> List[Dict]:
     """Load insight prompts from the local workspace database."""
-    with get_conn() as conn:
+    with get_conn("load_insight_prompts") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -394,7 +312,7 @@ def _load_insight_prompts() -> List[Dict]:
 def _get_insight_prompt(prompt_id: Optional[int]) -> Optional[Dict]:
     if prompt_id is None:
         return None
-    with get_conn() as conn:
+    with get_conn("get_insight_prompt") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -417,12 +335,14 @@ def _get_insight_prompt(prompt_id: Optional[int]) -> Optional[Dict]:
     }
 
 
-def _run_insights_prompt(prompt_text: str, context_text: str, model: str) -> str:
-    """Execute the selected insight prompt via OpenAI and return the output."""
+def _complete_insights(prompt_text: str, context_text: str, model: str):
+    """Execute an insight prompt via OpenAI and return (output, input_tokens, output_tokens)."""
     load_env_once()
     api_key = os.getenv("OPENAI_API_KEY", "")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY não definida no ambiente.")
+    from openai import OpenAI  # só ao gerar insights; evita ~0,6 s na abertura da página
+
     client = OpenAI(api_key=api_key)
     payload = {
         "model": model,
@@ -437,83 +357,39 @@ def _run_insights_prompt(prompt_text: str, context_text: str, model: str) -> str
     output = extrair_texto_resposta(response)
     if not output:
         raise RuntimeError("Resposta vazia do modelo.")
-    return output
+    usage = getattr(response, "usage", None)
+    return output, getattr(usage, "input_tokens", None), getattr(usage, "output_tokens", None)
 
 
-def _build_insights_context(
-    conversations: List[Dict],
-    filters: Dict,
-    inbox_id_to_name: Dict[int, str],
-    start_dt: datetime,
-    end_dt: datetime,
+def _run_insights_prompt(prompt_text: str, context_text: str, model: str) -> str:
+    """Execute the selected insight prompt via OpenAI and return the output."""
+    return _complete_insights(prompt_text, context_text, model)[0]
+
+
+def _crawl_message_frames(
+    conv_ids: List,
     cw_url: str,
     cw_account: str,
     cw_token: str,
-    max_messages: int = 160,
-    max_chars: int = 12000,
+    start_dt: datetime,
+    on_error=None,
+    on_progress=None,
 ):
-    """Build a compact context string from filtered conversations/messages."""
-    rows, conv_api_ids = _collect_conversation_rows(
-        conversations,
-        filters,
-        inbox_id_to_name,
-        start_dt,
-        end_dt,
-        enforce_created_range=True,
-    )
-    _, message_conv_ids = _collect_conversation_rows(
-        conversations,
-        filters,
-        inbox_id_to_name,
-        start_dt,
-        end_dt,
-        enforce_created_range=False,
-    )
-
-    total_recebidas = 0
-    total_enviadas = 0
-    total_privadas = 0
-    conversas_privadas = set()
-    total_mensagens = 0
-    message_rows = []
-    allowed_conv_ids = set()
-    conversation_type = filters.get("conversation_type") or "Todos"
-    selected_message_statuses = filters.get("message_statuses") or ["Todos"]
-    if "Todos" in selected_message_statuses:
-        selected_message_statuses = []
-
-    conv_meta = {}
-    for conv in conversations:
-        conv_id = conv.get("id") or conv.get("display_id")
-        if conv_id is None or conv_id not in message_conv_ids:
-            continue
-        created_raw = conv.get("created_at")
-        created_dt = _parse_ts(created_raw)
-        created_local = created_dt.astimezone(TZ) if created_dt else None
-        first_reply_raw = conv.get("first_reply_created_at")
-        first_reply_dt = None
-        if first_reply_raw not in (None, "", 0, "0", 0.0, "0.0"):
-            first_reply_dt = _parse_ts(first_reply_raw)
-            if first_reply_dt:
-                first_reply_dt = first_reply_dt.astimezone(TZ)
-        meta = conv.get("meta", {}) or {}
-        sender = meta.get("sender") or conv.get("contact") or {}
-        contact_name_val = sender.get("name") or sender.get("identifier") or ""
-        contact_phone_val = sender.get("phone_number") or sender.get("phone") or sender.get("identifier") or ""
-        conv_meta[conv_id] = {
-            "created_dt": created_local,
-            "created_str": created_local.strftime("%d/%m/%Y %H:%M:%S") if created_local else "",
-            "inbox_name": inbox_id_to_name.get(conv.get("inbox_id"), conv.get("inbox_id")),
-            "first_reply_delta": _format_duration(created_local, first_reply_dt),
-            "contact_name": contact_name_val,
-            "contact_phone": contact_phone_val,
-        }
-
-    max_workers = min(3, max(1, len(message_conv_ids)))
+    """Fetch messages for each conversation and normalize them into one frame.
+
+    Returns the combined message frame and the list of conversation ids whose
+    messages were fetched successfully. `on_progress(done, total)` is called
+    after each conversation.
+    """
+    bot_config = bot_sender_config()
+    frames = []
+    fetched_ids = []
+    done = 0
+    max_workers = min(3, max(1, len(conv_ids)))
     batch_size = max_workers * 2
     batch_pause = 0.4
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for batch in _chunk_list(message_conv_ids, batch_size):
+        for batch in _chunk_list(conv_ids, batch_size):
             future_map = {
                 executor.submit(
                     _fetch_messages,
@@ -527,82 +403,31 @@ def _build_insights_context(
             }
             for future in as_completed(future_map):
                 conv_id = future_map[future]
-                conv_info = conv_meta.get(conv_id) or {}
+                done += 1
+                if on_progress:
+                    on_progress(done, len(conv_ids))
                 try:
                     msgs = future.result()
-                except Exception:
+                except Exception as exc:
+                    if on_error:
+                        on_error(conv_id, exc)
                     continue
-                has_bot_outgoing = False
-                has_agent_outgoing = False
-                conv_received = 0
-                conv_sent = 0
-                conv_priv = 0
-                conv_rows = []
-                conv_msg_count = 0
-                for msg in msgs:
-                    msg_dt_raw = msg.get("created_at") or msg.get("timestamp")
-                    msg_dt = _parse_ts(msg_dt_raw)
-                    msg_local = None
-                    if msg_dt:
-                        msg_local = msg_dt.astimezone(TZ)
-                        if msg_local < start_dt or msg_local > end_dt:
-                            continue
-                    status_val = msg.get("status") or msg.get("delivery_status") or msg.get("message_status") or msg.get("state")
-                    if selected_message_statuses and str(status_val) not in selected_message_statuses:
-                        continue
-                    direction = _message_direction(msg)
-                    if direction == "outgoing":
-                        if _is_bot_sender(msg):
-                            has_bot_outgoing = True
-                        elif _is_agent_sender(msg):
-                            has_agent_outgoing = True
-                    if not _include_message_for_type(msg, conversation_type):
-                        continue
-                    is_private = msg.get("private")
-                    if isinstance(is_private, str):
-                        is_private = is_private.strip().lower() in ("true", "1", "yes", "sim")
-                    if is_private:
-                        conv_priv += 1
-                    if direction == "incoming":
-                        conv_received += 1
-                    elif direction == "outgoing":
-                        conv_sent += 1
-                    content = msg.get("content")
-                    if content is None:
-                        content = msg.get("processed_message_content") or ""
-                    conv_rows.append(
-                        {
-                            "id_conversa": conv_id,
-                            "autor": _message_sender_label(msg),
-                            "nome do contato": conv_info.get("contact_name", ""),
-                            "numero do contato": conv_info.get("contact_phone", ""),
-                            "data hora de início da conversa": conv_info.get("created_str", ""),
-                            "caixa de entrada": conv_info.get("inbox_name", ""),
-                            "tempo para a primeira resposta": conv_info.get("first_reply_delta", ""),
-                            "status da mensagem": status_val,
-                            "mensagem": content,
-                            "data hora da mensagem": msg_local.strftime("%d/%m/%Y %H:%M:%S") if msg_local else "",
-                            "_sort_conv_dt": conv_info.get("created_dt"),
-                            "_sort_msg_dt": msg_local if msg_dt else None,
-                        }
+                fetched_ids.append(conv_id)
+                frames.append(
+                    build_message_frame(
+                        msgs,
+                        conversation_id=conv_id,
+                        bot_names=bot_config["names"],
+                        bot_ids=bot_config["ids"],
                     )
-                    conv_msg_count += 1
-                if conversation_type == "Bot" and not has_bot_outgoing:
-                    continue
-                if conversation_type == "Agente" and not has_agent_outgoing:
-                    continue
-                allowed_conv_ids.add(conv_id)
-                total_recebidas += conv_received
-                total_enviadas += conv_sent
-                total_privadas += conv_priv
-                total_mensagens += conv_msg_count
-                if conv_priv:
-                    conversas_privadas.add(conv_id)
-                if conv_rows:
-                    message_rows.extend(conv_rows)
-            if len(message_conv_ids) > batch_size:
+                )
+            if len(conv_ids) > batch_size:
                 time_module.sleep(batch_pause + random.uniform(0, 0.2))
+    return concat_message_frames(frames), fetched_ids
 
+
+def _insights_stats(rows: List[Dict], message_stats: Dict, allowed_conv_ids: set, conversation_type: str) -> Dict:
+    """Combine conversation rows and message totals into the insights stats."""
     if conversation_type != "Todos":
         rows = [row for row in rows if row.get("conversation_id") in allowed_conv_ids]
 
@@ -614,28 +439,19 @@ def _build_insights_context(
         if contact_key:
             unique_clients.add(contact_key)
 
-    message_rows.sort(
-        key=lambda row: (
-            row.get("_sort_conv_dt") or datetime.min.replace(tzinfo=TZ),
-            str(row.get("id_conversa")),
-            row.get("_sort_msg_dt") or datetime.min.replace(tzinfo=TZ),
-        )
-    )
-    for row in message_rows:
-        row.pop("_sort_conv_dt", None)
-        row.pop("_sort_msg_dt", None)
-
-    stats = {
+    return {
         "total_conversas": len(rows),
-        "total_conversas_privadas": len(conversas_privadas),
-        "total_recebidas": total_recebidas,
-        "total_enviadas": total_enviadas,
-        "total_privadas": total_privadas,
-        "total_mensagens": total_mensagens,
+        "total_conversas_privadas": message_stats["total_conversas_privadas"],
+        "total_recebidas": message_stats["total_recebidas"],
+        "total_enviadas": message_stats["total_enviadas"],
+        "total_privadas": message_stats["total_privadas"],
+        "total_mensagens": message_stats["total_mensagens"],
         "total_clientes_unicos": len(unique_clients),
     }
 
-    lines = []
+
+def _insights_filter_lines(filters: Dict, inbox_id_to_name: Dict[int, str], start_dt: datetime, end_dt: datetime) -> List[str]:
+    """Describe the applied filters, one line each, for the insights context."""
     filter_lines = []
     filter_lines.append(f"Período: {start_dt.strftime('%d/%m/%Y')} a {end_dt.strftime('%d/%m/%Y')}")
     if filters.get("contact_name"):
@@ -667,13 +483,63 @@ def _build_insights_context(
             filter_lines.append(f"Caixas de entrada: {', '.join(inbox_names_sorted)}")
     else:
         filter_lines.append("Caixas de entrada: Todas")
-    filter_lines.append(f"Limites: {max_messages} mensagens, {max_chars} caracteres")
+    return filter_lines
 
-    lines.append("Filtros aplicados")
+
+def _insights_data(
+    conversations: List[Dict],
+    filters: Dict,
+    inbox_id_to_name: Dict[int, str],
+    start_dt: datetime,
+    end_dt: datetime,
+    cw_url: str,
+    cw_account: str,
+    cw_token: str,
+    on_error=None,
+    on_progress=None,
+):
+    """Filter conversations, crawl their messages and return (stats, filter_lines, message_rows)."""
+    filtered = filter_conversations(conversations, filters, inbox_id_to_name, start_dt, end_dt)
+    rows = filtered["rows"]
+    message_conv_ids = filtered["scope_ids"]
+
+    conversation_type = filters.get("conversation_type") or "Todos"
+    conv_meta = build_conversation_meta(filtered["records"])
+    message_frame, fetched_ids = _crawl_message_frames(
+        message_conv_ids,
+        cw_url,
+        cw_account,
+        cw_token,
+        start_dt,
+        on_error=on_error,
+        on_progress=on_progress,
+    )
+    message_stats, allowed_conv_ids, message_rows = summarize_message_frame(
+        message_frame,
+        fetched_ids,
+        conv_meta,
+        filters,
+        start_dt,
+        end_dt,
+    )
+
+    stats = _insights_stats(rows, message_stats, allowed_conv_ids, conversation_type)
+    filter_lines = _insights_filter_lines(filters, inbox_id_to_name, start_dt, end_dt)
+    return stats, filter_lines, message_rows
+
+
+def _insights_filter_header(filter_lines: List[str]) -> List[str]:
+    """Applied filters section of an insights context."""
+    lines = ["Filtros aplicados"]
     for item in filter_lines:
         lines.append(f"- {item}")
     lines.append("")
-    lines.append("Resumo")
+    return lines
+
+
+def _insights_totals_lines(stats: Dict) -> List[str]:
+    """Period totals section of an insights context."""
+    lines = ["Resumo"]
     lines.append(f"- Total de conversas: {stats['total_conversas']}")
     lines.append(f"- Total de conversas privadas: {stats['total_conversas_privadas']}")
     lines.append(f"- Total de mensagens recebidas: {stats['total_recebidas']}")
@@ -682,28 +548,151 @@ def _build_insights_context(
     lines.append(f"- Total de mensagens: {stats['total_mensagens']}")
     lines.append(f"- Total de clientes únicos: {stats['total_clientes_unicos']}")
     lines.append("")
-    lines.append("Mensagens (amostra):")
+    return lines
 
-    total_chars = 0
-    count = 0
-    for row in message_rows:
-        if count >= max_messages or total_chars >= max_chars:
-            break
-        content = (row.get("mensagem") or "").replace("\n", " ").strip()
-        if len(content) > 240:
-            content = content[:240] + "..."
-        line = (
-            f"- [{row.get('status da mensagem')}] conv {row.get('id_conversa')} | "
-            f"{row.get('autor')} | {row.get('data hora da mensagem')} | {content}"
+
+def _insights_summary_lines(stats: Dict, filter_lines: List[str]) -> List[str]:
+    """Header shared by every insights context: applied filters plus totals."""
+    return _insights_filter_header(filter_lines) + _insights_totals_lines(stats)
+
+
+def _insight_message_line(row: Dict) -> str:
+    """Format one message row for an insights context."""
+    content = (row.get("mensagem") or "").replace("\n", " ").strip()
+    if len(content) > 240:
+        content = content[:240] + "..."
+    return (
+        f"- [{row.get('status da mensagem')}] conv {row.get('id_conversa')} | "
+        f"{row.get('autor')} | {row.get('data hora da mensagem')} | {content}"
+    )
+
+
+def _message_day(row: Dict) -> str:
+    """ISO day of a message row ("data hora da mensagem" is dd/mm/aaaa hh:mm:ss)."""
+    value = row.get("data hora da mensagem") or ""
+    return f"{value[6:10]}-{value[3:5]}-{value[:2]}" if len(value) >= 10 else "sem data"
+
+
+def _message_stratum(row: Dict, conversation_sizes: Dict) -> tuple:
+    """Sampling stratum of a message row: day, inbox, direction and conversation length."""
+    author = row.get("autor")
+    direction = author if author in ("Cliente", "Bot") else "Agente"
+    return (
+        _message_day(row),
+        row.get("caixa de entrada"),
+        direction,
+        length_bucket(conversation_sizes.get(row.get("id_conversa"), 0)),
+    )
+
+
+def _message_sort_key(row: Dict, conv_meta: Dict) -> tuple:
+    """Sort message rows like `summarize_message_frame` (conversation start, id, message time)."""
+    created = (conv_meta.get(row.get("id_conversa")) or {}).get("created_dt")
+    message_dt = row.get("data hora da mensagem") or ""
+    return (
+        created is not None,
+        created.timestamp() if created else 0.0,
+        str(row.get("id_conversa")),
+        _message_day(row),
+        message_dt[11:],
+    )
+
+
+def _build_insights_context(
+    conversations: List[Dict],
+    filters: Dict,
+    inbox_id_to_name: Dict[int, str],
+    start_dt: datetime,
+    end_dt: datetime,
+    cw_url: str,
+    cw_account: str,
+    cw_token: str,
+    max_messages: int = 160,
+    max_tokens: int = DEFAULT_TOKEN_BUDGET,
+    model: Optional[str] = None,
+    on_error=None,
+    on_progress=None,
+):
+    """Build a compact context string from a stratified sample of the filtered messages.
+
+    Conversations are crawled in stratified order and crawling stops as soon as
+    the messages read support the sample (see `src.analytics.insights_sampling`);
+    message totals are then extrapolated and flagged as estimates. The Bot and
+    Agente conversation types always crawl everything, since their conversation
+    count depends on the messages of every conversation. `max_tokens` bounds
+    the sampled message lines, counted with the tokenizer of `model`.
+    """
+    filtered = filter_conversations(conversations, filters, inbox_id_to_name, start_dt, end_dt)
+    conversation_type = filters.get("conversation_type") or "Todos"
+    conv_meta = build_conversation_meta(filtered["records"])
+    conv_strata = {
+        conv_id: (meta["created_dt"].date().isoformat() if meta["created_dt"] else "", meta["inbox_name"])
+        for conv_id, meta in conv_meta.items()
+    }
+    crawl_order = conversation_order((conv_id, conv_strata[conv_id]) for conv_id in filtered["scope_ids"])
+    strata_count = len(set(conv_strata.values()))
+
+    message_stats = dict.fromkeys(
+        ("total_conversas_privadas", "total_recebidas", "total_enviadas", "total_privadas", "total_mensagens"), 0
+    )
+    allowed_conv_ids = set()
+    pool = []
+    pool_tokens = 0
+    crawled = 0
+    for batch in _chunk_list(crawl_order, SAMPLE_CRAWL_BATCH):
+        frame, fetched_ids = _crawl_message_frames(
+            batch,
+            cw_url,
+            cw_account,
+            cw_token,
+            start_dt,
+            on_error=on_error,
+            on_progress=(lambda done, total, offset=crawled: on_progress(offset + done, len(crawl_order))) if on_progress else None,
         )
-        lines.append(line)
-        count += 1
-        total_chars += len(line)
-    if count < len(message_rows):
-        lines.append(f"... ({len(message_rows) - count} mensagens omitidas)")
+        crawled += len(batch)
+        batch_stats, batch_allowed, batch_rows = summarize_message_frame(frame, fetched_ids, conv_meta, filters, start_dt, end_dt)
+        for key, value in batch_stats.items():
+            message_stats[key] += value
+        allowed_conv_ids |= batch_allowed
+        for row in batch_rows:
+            line = _insight_message_line(row)
+            tokens = count_tokens(line, model)
+            pool.append((row, line, tokens))
+            pool_tokens += tokens
+        if conversation_type == "Todos" and sample_is_sufficient(
+            pool_tokens, len(pool), crawled, strata_count, max_tokens, max_messages
+        ):
+            break
+
+    estimated = crawled < len(crawl_order)
+    if estimated:
+        factor = len(crawl_order) / crawled
+        message_stats = {key: round(value * factor) for key, value in message_stats.items()}
+    stats = _insights_stats(filtered["rows"], message_stats, allowed_conv_ids, conversation_type)
+    stats["estimado"] = estimated
+
+    filter_lines = _insights_filter_lines(filters, inbox_id_to_name, start_dt, end_dt)
+    filter_lines.append(f"Limites: {max_messages} mensagens, {max_tokens} tokens")
+    if estimated:
+        filter_lines.append(f"Totais de mensagens estimados a partir de {crawled} de {len(crawl_order)} conversas")
+    lines = _insights_summary_lines(stats, filter_lines)
+    lines.append("Mensagens (amostra estratificada por dia, caixa de entrada, autor e tamanho da conversa):")
+
+    conversation_sizes = Counter(row.get("id_conversa") for row, _, _ in pool)
+    picked = stratified_sample(
+        [(_message_stratum(row, conversation_sizes), tokens) for row, _, tokens in pool],
+        max_tokens,
+        max_items=max_messages,
+    )
+    selected = sorted((pool[index] for index in picked), key=lambda item: _message_sort_key(item[0], conv_meta))
+    lines.extend(line for _, line, _ in selected)
+    omitted = stats["total_mensagens"] - len(selected)
+    if omitted > 0:
+        lines.append(f"... ({'cerca de ' if estimated else ''}{omitted} mensagens omitidas)")
 
     return stats, "\n".join(lines), filter_lines
 
+
 def _chunk_list(values: List, size: int):
     """Yield fixed-size chunks from a list."""
     for idx in range(0, len(values), size):
@@ -711,7 +700,10 @@ def _chunk_list(values: List, size: int):
 
 
 def _insights_filters_signature(filters: Dict) -> tuple:
-    """Return a hashable signature for the current insights filters."""
+    """Return a hashable signature for the data selected by the insights filters.
+
+    The prompt is left out on purpose: switching prompt keeps the context.
+    """
     selected_inboxes = tuple(sorted(filters.get("selected_inbox_ids") or []))
     message_statuses = tuple(sorted(filters.get("message_statuses") or []))
     return (
@@ -727,7 +719,6 @@ def _insights_filters_signature(filters: Dict) -> tuple:
         filters.get("selected_team_id") or "",
         filters.get("conversation_type") or "",
         message_statuses,
-        filters.get("selected_prompt_id"),
     )
 
 
@@ -771,8 +762,8 @@ def _render_conversation_filters(
         defaults[_build_state_key(prefix, "insight_max_messages")] = int(
             insight_limit_defaults.get("max_messages", 160)
         )
-        defaults[_build_state_key(prefix, "insight_max_chars")] = int(
-            insight_limit_defaults.get("max_chars", 12000)
+        defaults[_build_state_key(prefix, "insight_max_tokens")] = int(
+            insight_limit_defaults.get("max_tokens", DEFAULT_TOKEN_BUDGET)
         )
     clear_key = _build_state_key(prefix, "clear_filters")
     if st.session_state.get(clear_key):
@@ -878,7 +869,7 @@ def _render_conversation_filters(
         selected_prompt_id = insight_prompt_options.get(selected_prompt_label)
 
     max_messages = None
-    max_chars = None
+    max_tokens = None
     if insight_limit_defaults is not None:
         col_lim1, col_lim2 = st.columns(2)
         with col_lim1:
@@ -890,12 +881,12 @@ def _render_conversation_filters(
                 key=_build_state_key(prefix, "insight_max_messages"),
             )
         with col_lim2:
-            max_chars = st.number_input(
-                "Limite de caracteres do contexto",
-                min_value=2000,
-                max_value=80000,
-                step=1000,
-                key=_build_state_key(prefix, "insight_max_chars"),
+            max_tokens = st.number_input(
+                "Limite de tokens das mensagens",
+                min_value=500,
+                max_value=20000,
+                step=500,
+                key=_build_state_key(prefix, "insight_max_tokens"),
             )
 
     col_btn1, col_btn2 = st.columns(2)
@@ -934,217 +925,11 @@ def _render_conversation_filters(
         "message_statuses": message_statuses,
         "selected_prompt_id": selected_prompt_id,
         "insight_max_messages": int(max_messages) if max_messages is not None else None,
-        "insight_max_chars": int(max_chars) if max_chars is not None else None,
+        "insight_max_tokens": int(max_tokens) if max_tokens is not None else None,
         "gerar": gerar,
     }
 
 
-def _collect_conversation_rows(conversations: List[Dict], filters: Dict, inbox_id_to_name: Dict[int, str], start_dt: datetime, end_dt: datetime, enforce_created_range: bool = True):
-    """Filter conversations and build row data plus conversation IDs."""
-    rows = []
-    conversation_api_ids = []
-    for conv in conversations:
-        api_id = conv.get("id")
-        conv_id = api_id or conv.get("display_id")
-        if conv_id is None:
-            continue
-        if filters["conversation_id_filter"] and str(conv_id) != filters["conversation_id_filter"].strip():
-            continue
-
-        inbox_id = conv.get("inbox_id")
-        if filters["selected_inbox_ids"] and inbox_id not in filters["selected_inbox_ids"]:
-            continue
-        inbox_name = inbox_id_to_name.get(inbox_id, inbox_id)
-
-        meta = conv.get("meta", {}) or {}
-        sender = meta.get("sender") or conv.get("contact") or {}
-        contact_name_val = sender.get("name") or sender.get("identifier") or ""
-        contact_phone_val = sender.get("phone_number") or sender.get("phone") or sender.get("identifier") or ""
-
-        if filters["contact_name"] and not _match_partial(contact_name_val, filters["contact_name"]):
-            continue
-        if filters["contact_number"] and not _match_partial(contact_phone_val, filters["contact_number"]):
-            continue
-
-        assignee = meta.get("assignee") or conv.get("assignee") or {}
-        assignee_id = assignee.get("id") if isinstance(assignee, dict) else None
-        assignee_name = assignee.get("name") or assignee.get("email") if isinstance(assignee, dict) else ""
-
-        if filters["selected_agent_id"] and str(assignee_id) != str(filters["selected_agent_id"]):
-            continue
-        if filters["assigned_filter"] == "Sim" and not assignee_id:
-            continue
-        if filters["assigned_filter"] == "Não" and assignee_id:
-            continue
-
-        status_val = conv.get("status") or meta.get("status")
-        if filters["status_filter"] != "Todos" and str(status_val) != filters["status_filter"]:
-            continue
-
-        team_id = conv.get("team_id")
-        if not team_id:
-            team_data = conv.get("team") or meta.get("team") or {}
-            if isinstance(team_data, dict):
-                team_id = team_data.get("id")
-            else:
-                team_id = team_data
-        if filters.get("selected_team_id") and str(team_id) != str(filters["selected_team_id"]):
-            continue
-
-        if enforce_created_range:
-            created_raw = conv.get("created_at")
-            created_dt = _parse_ts(created_raw)
-            if not created_dt:
-                continue
-            created_local = created_dt.astimezone(TZ)
-            if created_local < start_dt or created_local > end_dt:
-                continue
-
-        row = _normalize_conversation(conv)
-        row.update(
-            {
-                "conversation_id": conv_id,
-                "contact_name": contact_name_val,
-                "contact_phone": contact_phone_val,
-                "assignee_id": assignee_id,
-                "assignee_name": assignee_name,
-                "inbox_name": inbox_name,
-            }
-        )
-        rows.append(row)
-        if api_id is not None:
-            conversation_api_ids.append(api_id)
-    return rows, conversation_api_ids
-
-
-def _message_direction(msg: Dict) -> Optional[str]:
-    """Infer message direction (incoming/outgoing) from payload."""
-    msg_type = msg.get("message_type")
-    if isinstance(msg_type, int):
-        if msg_type == 0:
-            return "incoming"
-        if msg_type == 1:
-            return "outgoing"
-        return None
-    msg_type_str = str(msg_type).lower()
-    if msg_type_str.isdigit():
-        try:
-            msg_type_int = int(msg_type_str)
-        except ValueError:
-            msg_type_int = None
-        if msg_type_int == 0:
-            return "incoming"
-        if msg_type_int == 1:
-            return "outgoing"
-        return None
-    if msg_type_str in ("incoming", "outgoing"):
-        return msg_type_str
-    return None
-
-
-def _message_sender_type(msg: Dict) -> str:
-    """Extract sender type from message payload."""
-    sender_type = msg.get("sender_type")
-    if not sender_type:
-        sender = msg.get("sender") or {}
-        if isinstance(sender, dict):
-            sender_type = sender.get("type") or sender.get("sender_type")
-    if not sender_type:
-        sender_info = msg.get("sender_info") or {}
-        if isinstance(sender_info, dict):
-            sender_type = sender_info.get("type") or sender_info.get("sender_type")
-    if not sender_type:
-        return ""
-    return str(sender_type).strip().lower()
-
-
-def _parse_env_list(value: str) -> List[str]:
-    return [item.strip() for item in re.split(r"[;,]", value or "") if item.strip()]
-
-
-def _bot_sender_config() -> Dict[str, set]:
-    """Load bot sender identifiers from environment."""
-    load_env_once()
-    names = {name.lower() for name in _parse_env_list(os.getenv("BOT_SENDER_NAMES", ""))}
-    ids = {sid for sid in _parse_env_list(os.getenv("BOT_SENDER_IDS", ""))}
-    return {"names": names, "ids": ids}
-
-
-def _sender_identity(msg: Dict) -> Dict[str, str]:
-    sender = msg.get("sender") or msg.get("sender_info") or {}
-    sender_id = ""
-    sender_name = ""
-    if isinstance(sender, dict):
-        sender_id = str(sender.get("id") or "").strip()
-        sender_name = str(sender.get("name") or sender.get("email") or sender.get("identifier") or "").strip()
-    return {"id": sender_id, "name": sender_name}
-
-
-def _is_bot_sender(msg: Dict) -> bool:
-    """Return True if the message was sent by a bot."""
-    sender_type = _message_sender_type(msg)
-    if sender_type in ("agentbot", "bot"):
-        return True
-    config = _bot_sender_config()
-    if not config["names"] and not config["ids"]:
-        return False
-    identity = _sender_identity(msg)
-    if identity["id"] and identity["id"] in config["ids"]:
-        return True
-    if identity["name"] and identity["name"].lower() in config["names"]:
-        return True
-    return False
-
-
-def _is_agent_sender(msg: Dict) -> bool:
-    """Return True if the message was sent by a human agent."""
-    sender_type = _message_sender_type(msg)
-    if _is_bot_sender(msg):
-        return False
-    return sender_type in ("user", "agent")
-
-
-def _include_message_for_type(msg: Dict, conversation_type: str) -> bool:
-    """Filter messages by conversation type (Bot/Agente/Todos)."""
-    if conversation_type == "Todos":
-        return True
-    direction = _message_direction(msg)
-    if direction == "incoming":
-        return True
-    if direction == "outgoing":
-        if conversation_type == "Bot":
-            return _is_bot_sender(msg)
-        if conversation_type == "Agente":
-            return _is_agent_sender(msg) and not _is_bot_sender(msg)
-    return False
-
-
-def _message_sender_label(msg: Dict) -> str:
-    """Return a label for who sent the message (agent/bot/client)."""
-    direction = _message_direction(msg)
-    if direction == "incoming":
-        return "Cliente"
-    if _is_bot_sender(msg):
-        return "Bot"
-    if _is_agent_sender(msg):
-        identity = _sender_identity(msg)
-        if identity["name"]:
-            return identity["name"]
-        for key in ("sender_name", "sender_email", "agent_name", "user_name"):
-            value = msg.get(key)
-            if value:
-                return str(value)
-        return "Agente (tipo não informado)"
-    for key in ("sender_name", "sender_email", "agent_name", "user_name"):
-        value = msg.get(key)
-        if value:
-            return str(value)
-    sender_type = _message_sender_type(msg)
-    if not sender_type:
-        return "Agente (tipo não informado)"
-    return "Agente"
-
-
 def render_conversations_tab():
     """Render the Conversations tab with filters, table, and CSV export."""
     st.subheader("Conversas")
@@ -1165,7 +950,7 @@ def render_conversations_tab():
     if inbox_cache is None:
         with st.spinner("Carregando caixas de entrada..."):
             try:
-                inbox_cache = _fetch_inboxes(cw_url, cw_account, cw_token)
+                inbox_cache = fetch_chatwoot_inboxes(cw_url, cw_account, cw_token)
             except Exception as e:
                 inbox_cache = []
                 st.warning(f"Não foi possível carregar caixas de entrada: {e}")
@@ -1218,7 +1003,7 @@ def render_conversations_tab():
                 st.error(f"Falha ao buscar conversas: {e}")
                 return
 
-        rows, _ = _collect_conversation_rows(conversations, filters, inbox_id_to_name, start_dt, end_dt, enforce_created_range=True)
+        rows, _ = collect_conversation_rows(conversations, filters, inbox_id_to_name, start_dt, end_dt, enforce_created_range=True)
         st.session_state["conv_results"] = rows
 
     results = st.session_state.get("conv_results") or []
@@ -1247,17 +1032,150 @@ def render_conversations_tab():
             return
         df_display = df.reindex(columns=columns_selected)
         st.dataframe(df_display, use_container_width=True)
-        csv_data = df_display.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "Exportar CSV",
-            data=csv_data,
-            file_name="conversas_chatwoot.csv",
-            mime="text/csv",
-        )
+        export_download(df_display, "conversas_chatwoot", key="conversations_export")
     elif filters["gerar"]:
         st.info("Nenhuma conversa encontrada para os filtros.")
 
 
+def _job_filters(filters: Dict) -> Dict:
+    """Return the filters as JSON-friendly job parameters (dates as ISO, sets as lists)."""
+    params = {key: value for key, value in filters.items() if key not in ("gerar", "selected_prompt_id")}
+    params["start_date"] = filters["start_date"].isoformat()
+    params["end_date"] = filters["end_date"].isoformat()
+    params["selected_inbox_ids"] = sorted(filters.get("selected_inbox_ids") or [])
+    params["message_statuses"] = sorted(filters.get("message_statuses") or [])
+    return params
+
+
+def _job_context(params: Dict):
+    """Rebuild credentials, filters, period, inbox names and conversations inside a job."""
+    settings = load_settings() or {}
+    cw_url = params["chatwoot_url"]
+    cw_account = params["chatwoot_account"]
+    cw_token = settings.get("chatwoot_api_token") or ""
+    filters = dict(params["filters"])
+    filters["start_date"] = date.fromisoformat(filters["start_date"])
+    filters["end_date"] = date.fromisoformat(filters["end_date"])
+    filters["selected_inbox_ids"] = set(filters["selected_inbox_ids"])
+    start_dt = datetime.combine(filters["start_date"], time.min, tzinfo=TZ)
+    end_dt = datetime.combine(filters["end_date"], time.max, tzinfo=TZ)
+    try:
+        inboxes = fetch_chatwoot_inboxes(cw_url, cw_account, cw_token)
+    except Exception:
+        inboxes = []
+    inbox_id_to_name = {i["id"]: i["name"] for i in inboxes if i.get("id")}
+    conversations = _fetch_conversations(
+        cw_url,
+        cw_account,
+        cw_token,
+        start_dt,
+        status=filters["status_filter"] if filters["status_filter"] != "Todos" else "all",
+    )
+    return (cw_url, cw_account, cw_token), filters, start_dt, end_dt, inbox_id_to_name, conversations
+
+
+def _analysis_job(params: Dict, progress: Callable) -> Dict:
+    """Conversation Analysis crawl, run in the background (see `src.utils.jobs`)."""
+    progress(0, 0, "Buscando conversas no Chatwoot")
+    credentials, filters, start_dt, end_dt, inbox_id_to_name, conversations = _job_context(params)
+    failed = []
+    stats, message_rows = build_conversation_analysis(
+        conversations,
+        filters,
+        inbox_id_to_name,
+        start_dt,
+        end_dt,
+        lambda conv_ids: _crawl_message_frames(
+            conv_ids,
+            *credentials,
+            start_dt,
+            on_error=lambda conv_id, exc: failed.append((conv_id, str(exc))),
+            on_progress=lambda done, total: progress(done, total, "Contando mensagens das conversas"),
+        ),
+    )
+    return {"stats": stats, "messages": message_rows, "failed": failed}
+
+
+def _insights_context_job(params: Dict, progress: Callable) -> Dict:
+    """Insights context build, run in the background (see `src.utils.jobs`).
+
+    Contexts are reused from `src.analytics.insights_store` while the
+    conversations in scope have no new activity.
+    """
+    progress(0, 0, "Buscando conversas no Chatwoot")
+    credentials, filters, start_dt, end_dt, inbox_id_to_name, conversations = _job_context(params)
+    scope = filter_conversations(conversations, filters, inbox_id_to_name, start_dt, end_dt)["scope_records"]
+    signature = context_signature(params)
+    version = data_version(record["_raw"] for record in scope)
+    stored = get_context(signature, version)
+    if stored:
+        return stored
+    failed = []
+    stats, context_text, filter_lines = _build_insights_context(
+        conversations,
+        filters,
+        inbox_id_to_name,
+        start_dt,
+        end_dt,
+        *credentials,
+        max_messages=params["max_messages"],
+        max_tokens=params["max_tokens"],
+        model=params.get("model"),
+        on_error=lambda conv_id, exc: failed.append((conv_id, str(exc))),
+        on_progress=lambda done, total: progress(done, total, "Buscando mensagens para insights"),
+    )
+    result = {"stats": stats, "context": context_text, "filter_lines": filter_lines, "failed": failed}
+    if not failed:
+        put_context(signature, version, result)
+    return result
+
+
+def _insights_mapreduce_job(params: Dict, progress: Callable) -> Dict:
+    """Map-reduce insights over every message in scope (see `src.analytics.insights_mapreduce`)."""
+    prompt_data = _get_insight_prompt(params["prompt_id"])
+    if not prompt_data:
+        raise RuntimeError("Não encontrei o prompt selecionado.")
+    progress(0, 0, "Buscando conversas no Chatwoot")
+    credentials, filters, start_dt, end_dt, inbox_id_to_name, conversations = _job_context(params)
+    failed = []
+    stats, filter_lines, message_rows = _insights_data(
+        conversations,
+        filters,
+        inbox_id_to_name,
+        start_dt,
+        end_dt,
+        *credentials,
+        on_error=lambda conv_id, exc: failed.append((conv_id, str(exc))),
+        on_progress=lambda done, total: progress(done, total, "Buscando mensagens para insights"),
+    )
+    if params["partition"] == "day":
+        items = sorted(((_message_day(row), _insight_message_line(row)) for row in message_rows), key=lambda item: item[0])
+    else:
+        items = ((f"conv {row.get('id_conversa')}", _insight_message_line(row)) for row in message_rows)
+    chunks = partition_messages(items, MAP_CHUNK_CHARS)
+    if not chunks:
+        raise RuntimeError("Nenhuma mensagem encontrada para os filtros.")
+    result = map_reduce(
+        prompt_data.get("prompt_text") or "",
+        "\n".join(_insights_filter_header(filter_lines)),
+        chunks,
+        params["model"],
+        _complete_insights,
+        summary="\n".join(_insights_totals_lines(stats)),
+        on_progress=lambda done, total: progress(done, total, "Analisando trechos"),
+    )
+    result["prompt_name"] = prompt_data.get("name") or f"Prompt #{prompt_data.get('id')}"
+    result["failed"] = failed
+    return result
+
+
+def _warn_failed_conversations(failed: List) -> None:
+    for conv_id, error in failed[:10]:
+        st.warning(f"Falha ao buscar mensagens da conversa {conv_id}: {error}")
+    if len(failed) > 10:
+        st.warning(f"... e mais {len(failed) - 10} conversa(s) com falha.")
+
+
 def render_conversations_analysis_tab():
     """Render the Conversations Analysis tab with metrics and message table."""
     st.subheader("Análise de Conversas")
@@ -1278,7 +1196,7 @@ def render_conversations_analysis_tab():
     if inbox_cache is None:
         with st.spinner("Carregando caixas de entrada..."):
             try:
-                inbox_cache = _fetch_inboxes(cw_url, cw_account, cw_token)
+                inbox_cache = fetch_chatwoot_inboxes(cw_url, cw_account, cw_token)
             except Exception as e:
                 inbox_cache = []
                 st.warning(f"Não foi possível carregar caixas de entrada: {e}")
@@ -1314,7 +1232,7 @@ def render_conversations_analysis_tab():
         agent_options,
         default_start,
         default_end,
-        result_keys=["conv_analysis_stats", "conv_analysis_messages"],
+        result_keys=["conv_analysis_stats", "conv_analysis_messages", "conv_analysis_job"],
         team_options=team_options,
         conversation_type_options=["Agente", "Bot", "Todos"],
         message_status_options=["Todos", "sent", "delivered", "read", "failed", "pending"],
@@ -1324,187 +1242,22 @@ def render_conversations_analysis_tab():
         if filters["start_date"] > filters["end_date"]:
             st.error("Período inválido: data inicial maior que a final.")
             return
-        start_dt = datetime.combine(filters["start_date"], time.min, tzinfo=TZ)
-        end_dt = datetime.combine(filters["end_date"], time.max, tzinfo=TZ)
-
-        with st.spinner("Buscando conversas no Chatwoot..."):
-            try:
-                conversations = _fetch_conversations(
-                    cw_url,
-                    cw_account,
-                    cw_token,
-                    start_dt,
-                    status=filters["status_filter"] if filters["status_filter"] != "Todos" else "all",
-                )
-            except Exception as e:
-                st.error(f"Falha ao buscar conversas: {e}")
-                return
-
-        rows, conv_api_ids = _collect_conversation_rows(conversations, filters, inbox_id_to_name, start_dt, end_dt, enforce_created_range=True)
-        message_scope_rows, message_conv_ids = _collect_conversation_rows(
-            conversations,
-            filters,
-            inbox_id_to_name,
-            start_dt,
-            end_dt,
-            enforce_created_range=False,
-        )
-        if not rows:
-            st.session_state["conv_analysis_stats"] = None
-            st.session_state["conv_analysis_messages"] = []
-        else:
-            total_recebidas = 0
-            total_enviadas = 0
-            total_privadas = 0
-            conversas_privadas = set()
-            message_rows = []
-            message_conv_set = set(message_conv_ids)
-            table_conv_set = set(conv_api_ids)
-            allowed_conv_ids = set()
-            conversation_type = filters.get("conversation_type") or "Todos"
-            selected_message_statuses = filters.get("message_statuses") or ["Todos"]
-            if "Todos" in selected_message_statuses:
-                selected_message_statuses = []
-            conv_meta = {}
-            for conv in conversations:
-                conv_id = conv.get("id") or conv.get("display_id")
-                if conv_id is None or conv_id not in message_conv_set:
-                    continue
-                created_raw = conv.get("created_at")
-                created_dt = _parse_ts(created_raw)
-                created_local = created_dt.astimezone(TZ) if created_dt else None
-                first_reply_raw = conv.get("first_reply_created_at")
-                first_reply_dt = None
-                if first_reply_raw not in (None, "", 0, "0", 0.0, "0.0"):
-                    first_reply_dt = _parse_ts(first_reply_raw)
-                    if first_reply_dt:
-                        first_reply_dt = first_reply_dt.astimezone(TZ)
-                meta = conv.get("meta", {}) or {}
-                sender = meta.get("sender") or conv.get("contact") or {}
-                contact_name_val = sender.get("name") or sender.get("identifier") or ""
-                contact_phone_val = sender.get("phone_number") or sender.get("phone") or sender.get("identifier") or ""
-                conv_meta[conv_id] = {
-                    "created_dt": created_local,
-                    "created_str": created_local.strftime("%d/%m/%Y %H:%M:%S") if created_local else "",
-                    "inbox_name": inbox_id_to_name.get(conv.get("inbox_id"), conv.get("inbox_id")),
-                    "first_reply_delta": _format_duration(created_local, first_reply_dt),
-                    "contact_name": contact_name_val,
-                    "contact_phone": contact_phone_val,
-                }
-            with st.spinner("Contando mensagens das conversas..."):
-                max_workers = min(3, max(1, len(message_conv_ids)))
-                batch_size = max_workers * 2
-                batch_pause = 0.4
-                with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                    for batch in _chunk_list(message_conv_ids, batch_size):
-                        future_map = {
-                            executor.submit(
-                                _fetch_messages,
-                                cw_url,
-                                cw_account,
-                                cw_token,
-                                conv_id,
-                                start_dt=start_dt,
-                            ): conv_id
-                            for conv_id in batch
-                        }
-                        for future in as_completed(future_map):
-                            conv_id = future_map[future]
-                            conv_info = conv_meta.get(conv_id) or {}
-                            try:
-                                msgs = future.result()
-                            except Exception as e:
-                                st.warning(f"Falha ao buscar mensagens da conversa {conv_id}: {e}")
-                                continue
-                            has_bot_outgoing = False
-                            has_agent_outgoing = False
-                            conv_received = 0
-                            conv_sent = 0
-                            conv_priv = 0
-                            conv_rows = []
-                            should_add_rows = conv_id in table_conv_set
-                            for msg in msgs:
-                                msg_dt_raw = msg.get("created_at") or msg.get("timestamp")
-                                msg_dt = _parse_ts(msg_dt_raw)
-                                msg_local = None
-                                if msg_dt:
-                                    msg_local = msg_dt.astimezone(TZ)
-                                    if msg_local < start_dt or msg_local > end_dt:
-                                        continue
-                                status_val = msg.get("status") or msg.get("delivery_status") or msg.get("message_status") or msg.get("state")
-                                if selected_message_statuses and str(status_val) not in selected_message_statuses:
-                                    continue
-                                direction = _message_direction(msg)
-                                if direction == "outgoing":
-                                    if _is_bot_sender(msg):
-                                        has_bot_outgoing = True
-                                    elif _is_agent_sender(msg):
-                                        has_agent_outgoing = True
-                                if not _include_message_for_type(msg, conversation_type):
-                                    continue
-                                is_private = msg.get("private")
-                                if isinstance(is_private, str):
-                                    is_private = is_private.strip().lower() in ("true", "1", "yes", "sim")
-                                if is_private:
-                                    conv_priv += 1
-                                if direction == "incoming":
-                                    conv_received += 1
-                                elif direction == "outgoing":
-                                    conv_sent += 1
-                                if not should_add_rows:
-                                    continue
-                                content = msg.get("content")
-                                if content is None:
-                                    content = msg.get("processed_message_content") or ""
-                                conv_rows.append(
-                                    {
-                                        "id_conversa": conv_id,
-                                        "autor": _message_sender_label(msg),
-                                        "nome do contato": conv_info.get("contact_name", ""),
-                                        "numero do contato": conv_info.get("contact_phone", ""),
-                                        "data hora de início da conversa": conv_info.get("created_str", ""),
-                                        "caixa de entrada": conv_info.get("inbox_name", ""),
-                                        "tempo para a primeira resposta": conv_info.get("first_reply_delta", ""),
-                                        "status da mensagem": status_val,
-                                        "mensagem": content,
-                                        "_sort_conv_dt": conv_info.get("created_dt"),
-                                        "_sort_msg_dt": msg_local if msg_dt else None,
-                                    }
-                                )
-                            if conversation_type == "Bot" and not has_bot_outgoing:
-                                continue
-                            if conversation_type == "Agente" and not has_agent_outgoing:
-                                continue
-                            allowed_conv_ids.add(conv_id)
-                            total_recebidas += conv_received
-                            total_enviadas += conv_sent
-                            total_privadas += conv_priv
-                            if conv_priv:
-                                conversas_privadas.add(conv_id)
-                            if conv_rows:
-                                message_rows.extend(conv_rows)
-                        if len(message_conv_ids) > batch_size:
-                            time_module.sleep(batch_pause + random.uniform(0, 0.2))
-            if conversation_type != "Todos":
-                rows = [row for row in rows if row.get("conversation_id") in allowed_conv_ids]
-            message_rows.sort(
-                key=lambda row: (
-                    row.get("_sort_conv_dt") or datetime.min.replace(tzinfo=TZ),
-                    str(row.get("id_conversa")),
-                    row.get("_sort_msg_dt") or datetime.min.replace(tzinfo=TZ),
-                )
-            )
-            for row in message_rows:
-                row.pop("_sort_conv_dt", None)
-                row.pop("_sort_msg_dt", None)
-            st.session_state["conv_analysis_stats"] = {
-                "total_conversas": len(rows),
-                "total_conversas_privadas": len(conversas_privadas),
-                "total_recebidas": total_recebidas,
-                "total_enviadas": total_enviadas,
-                "total_privadas": total_privadas,
-            }
-            st.session_state["conv_analysis_messages"] = message_rows
+        params = {"chatwoot_url": cw_url, "chatwoot_account": str(cw_account), "filters": _job_filters(filters)}
+        st.session_state["conv_analysis_job"] = submit_job("analise_conversas", params, _analysis_job)
+        st.session_state.pop("conv_analysis_stats", None)
+        st.session_state.pop("conv_analysis_messages", None)
+
+    job_id = st.session_state.get("conv_analysis_job")
+    if job_id and "conv_analysis_stats" not in st.session_state:
+        result = job_result(job_id, "Análise de conversas")
+        if result is None:
+            return
+        _warn_failed_conversations(result["failed"])
+        st.session_state["conv_analysis_stats"] = result["stats"]
+        st.session_state["conv_analysis_messages"] = result["messages"]
+        if not result["stats"]:
+            st.info("Nenhuma conversa encontrada para os filtros.")
+            return
 
     stats = st.session_state.get("conv_analysis_stats")
     if stats:
@@ -1516,32 +1269,11 @@ def render_conversations_analysis_tab():
         col5.metric("Total de mensagens privadas", stats["total_privadas"])
         messages_table = st.session_state.get("conv_analysis_messages") or []
         if messages_table:
-            df_messages = pd.DataFrame(messages_table)
-            display_cols = [
-                "id_conversa",
-                "autor",
-                "nome do contato",
-                "numero do contato",
-                "data hora de início da conversa",
-                "caixa de entrada",
-                "tempo para a primeira resposta",
-                "status da mensagem",
-                "mensagem",
-            ]
-            df_messages = df_messages.reindex(columns=display_cols)
+            df_messages = pd.DataFrame(messages_table).reindex(columns=ANALYSIS_MESSAGE_COLUMNS)
             st.dataframe(df_messages, use_container_width=True)
-            csv_data = df_messages.to_csv(index=False).encode("utf-8")
-            st.download_button(
-                "Exportar CSV",
-                data=csv_data,
-                file_name="analise_conversas_mensagens.csv",
-                mime="text/csv",
-                key="conv_analysis_messages_csv",
-            )
-        elif filters["gerar"]:
+            export_download(df_messages, "analise_conversas_mensagens", key="conv_analysis_messages_csv")
+        else:
             st.info("Nenhuma mensagem encontrada para o período selecionado.")
-    elif filters["gerar"]:
-        st.info("Nenhuma conversa encontrada para os filtros.")
 
 
 def render_conversations_insights_tab():
@@ -1564,7 +1296,7 @@ def render_conversations_insights_tab():
     if inbox_cache is None:
         with st.spinner("Carregando caixas de entrada..."):
             try:
-                inbox_cache = _fetch_inboxes(cw_url, cw_account, cw_token)
+                inbox_cache = fetch_chatwoot_inboxes(cw_url, cw_account, cw_token)
             except Exception as e:
                 inbox_cache = []
                 st.warning(f"Não foi possível carregar caixas de entrada: {e}")
@@ -1609,7 +1341,13 @@ def render_conversations_insights_tab():
         agent_options,
         default_start,
         default_end,
-        result_keys=["conv_insights_output", "conv_insights_prompt_name"],
+        result_keys=[
+            "conv_insights_output",
+            "conv_insights_prompt_name",
+            "conv_insights_usage",
+            "conv_insights_context_job",
+            "conv_insights_mr_job",
+        ],
         team_options=team_options,
         conversation_type_options=["Agente", "Bot", "Todos"],
         message_status_options=["Todos", "sent", "delivered", "read", "failed", "pending"],
@@ -1626,7 +1364,10 @@ def render_conversations_insights_tab():
         for key in (
             "conv_insights_summary",
             "conv_insights_context",
+            "conv_insights_context_job",
+            "conv_insights_mr_job",
             "conv_insights_output",
+            "conv_insights_usage",
             "conv_insights_prompt_id",
             "conv_insights_prompt_name",
         ):
@@ -1649,41 +1390,51 @@ def render_conversations_insights_tab():
         if not prompt_data:
             st.error("Não encontrei o prompt selecionado.")
             return
-        start_dt = datetime.combine(filters["start_date"], time.min, tzinfo=TZ)
-        end_dt = datetime.combine(filters["end_date"], time.max, tzinfo=TZ)
-
-        with st.spinner("Buscando dados para insights..."):
-            try:
-                conversations = _fetch_conversations(
-                    cw_url,
-                    cw_account,
-                    cw_token,
-                    start_dt,
-                    status=filters["status_filter"] if filters["status_filter"] != "Todos" else "all",
-                )
-            except Exception as e:
-                st.error(f"Falha ao buscar conversas: {e}")
-                return
-
-            stats, context_text, filter_lines = _build_insights_context(
-                conversations,
-                filters,
-                inbox_id_to_name,
-                start_dt,
-                end_dt,
-                cw_url,
-                cw_account,
-                cw_token,
-                max_messages=160,
-                max_chars=12000,
-            )
-
-        st.session_state["conv_insights_summary"] = {"filters": filter_lines, "stats": stats}
-        st.session_state["conv_insights_context"] = context_text
-        st.session_state["conv_insights_prompt_id"] = selected_prompt_id
+    reuse_context = (
+        filters["gerar"]
+        and "conv_insights_context" in st.session_state
+        and st.session_state.get("conv_insights_prompt_id") != filters.get("selected_prompt_id")
+    )
+    if reuse_context:
+        # Mesmos dados, outro prompt: o contexto já carregado é reaproveitado.
+        st.session_state["conv_insights_prompt_id"] = filters.get("selected_prompt_id")
+        st.session_state["conv_insights_pending"] = True
+        for key in ("conv_insights_mr_job", "conv_insights_output", "conv_insights_usage", "conv_insights_prompt_name"):
+            st.session_state.pop(key, None)
+    elif filters["gerar"]:
+        params = {
+            "chatwoot_url": cw_url,
+            "chatwoot_account": str(cw_account),
+            "filters": _job_filters(filters),
+            "max_messages": 160,
+            "max_tokens": DEFAULT_TOKEN_BUDGET,
+            "model": settings.get("model", "gpt-4.1-mini"),
+        }
+        st.session_state["conv_insights_context_job"] = submit_job("insights_contexto", params, _insights_context_job)
+        st.session_state["conv_insights_prompt_id"] = filters.get("selected_prompt_id")
         st.session_state["conv_insights_pending"] = True
-        st.session_state.pop("conv_insights_output", None)
-        st.session_state.pop("conv_insights_prompt_name", None)
+        for key in (
+            "conv_insights_summary",
+            "conv_insights_context",
+            "conv_insights_mr_job",
+            "conv_insights_output",
+            "conv_insights_usage",
+            "conv_insights_prompt_name",
+        ):
+            st.session_state.pop(key, None)
+
+    context_job = st.session_state.get("conv_insights_context_job")
+    if context_job and "conv_insights_summary" not in st.session_state:
+        result = job_result(context_job, "Dados para insights")
+        if result is None:
+            return
+        _warn_failed_conversations(result["failed"])
+        st.session_state["conv_insights_summary"] = {
+            "filters": result["filter_lines"],
+            "stats": result["stats"],
+            "cached_at": result.get("cached_at"),
+        }
+        st.session_state["conv_insights_context"] = result["context"]
 
     summary = st.session_state.get("conv_insights_summary")
     if summary:
@@ -1693,15 +1444,46 @@ def render_conversations_insights_tab():
             st.caption(f"Filtros selecionados: {filters_text}")
         else:
             st.caption("Filtros selecionados: nenhum filtro adicional.")
+        if summary.get("cached_at"):
+            cached_at = datetime.fromtimestamp(summary["cached_at"], TZ).strftime("%d/%m/%Y %H:%M")
+            st.caption(f"Dados reaproveitados da consulta de {cached_at} (sem nova atividade nas conversas desde então).")
         stats = summary.get("stats") or {}
         st.write(f"Total de conversas: {stats.get('total_conversas', 0)}")
-        st.write(f"Total de mensagens: {stats.get('total_mensagens', 0)}")
+        estimate = " (estimativa)" if stats.get("estimado") else ""
+        st.write(f"Total de mensagens: {stats.get('total_mensagens', 0)}{estimate}")
         st.write(f"Total de clientes únicos: {stats.get('total_clientes_unicos', 0)}")
 
         if st.session_state.get("conv_insights_pending"):
             st.write("Deseja realizar a análise em busca de insights relevantes aos dados filtrados?")
+            mode = st.radio(
+                "Abrangência da análise",
+                options=list(INSIGHTS_MODES),
+                format_func=INSIGHTS_MODES.get,
+                horizontal=True,
+                key="conv_insights_mode",
+                help="A amostra seleciona mensagens de todos os dias, caixas, autores e tamanhos de conversa dentro "
+                "do limite de tokens; a análise completa percorre todas "
+                "as mensagens em trechos (por dia ou por conversa) e consolida os resultados.",
+            )
             col_yes, col_no = st.columns(2)
-            if col_yes.button("Sim", key="conv_insights_confirm"):
+            confirm = col_yes.button("Sim", key="conv_insights_confirm")
+            if confirm and mode != "sample":
+                provider = settings.get("provider", "openai")
+                if provider != "openai":
+                    st.error("Provedor não suportado para insights. Ajuste para openai nas configurações.")
+                else:
+                    params = {
+                        "chatwoot_url": cw_url,
+                        "chatwoot_account": str(cw_account),
+                        "filters": _job_filters(filters),
+                        "prompt_id": st.session_state.get("conv_insights_prompt_id"),
+                        "model": settings.get("model", "gpt-4.1-mini"),
+                        "partition": mode,
+                    }
+                    st.session_state["conv_insights_mr_job"] = submit_job("insights_mapreduce", params, _insights_mapreduce_job)
+                    st.session_state["conv_insights_pending"] = False
+                    st.rerun()
+            elif confirm:
                 prompt_id = st.session_state.get("conv_insights_prompt_id")
                 prompt_data = _get_insight_prompt(prompt_id)
                 if not prompt_data:
@@ -1721,13 +1503,17 @@ def render_conversations_insights_tab():
                             else:
                                 st.session_state["conv_insights_output"] = output
                                 st.session_state["conv_insights_prompt_name"] = prompt_data.get("name") or f"Prompt #{prompt_data.get('id')}"
+                                st.session_state["conv_insights_usage"] = None
                                 st.session_state["conv_insights_pending"] = False
                                 st.rerun()
             if col_no.button("Não", key="conv_insights_cancel"):
                 for key in (
                     "conv_insights_summary",
                     "conv_insights_context",
+                    "conv_insights_context_job",
+                    "conv_insights_mr_job",
                     "conv_insights_output",
+                    "conv_insights_usage",
                     "conv_insights_prompt_id",
                     "conv_insights_prompt_name",
                     "conv_insights_last_signature",
@@ -1737,13 +1523,36 @@ def render_conversations_insights_tab():
                 st.session_state[clear_key] = True
                 st.rerun()
 
+    mr_job = st.session_state.get("conv_insights_mr_job")
+    if mr_job:
+        result = job_result(mr_job, "Análise completa")
+        if result is None:
+            return
+        _warn_failed_conversations(result["failed"])
+        st.session_state["conv_insights_output"] = result["output"]
+        st.session_state["conv_insights_prompt_name"] = result["prompt_name"]
+        st.session_state["conv_insights_usage"] = {key: result[key] for key in INSIGHTS_USAGE_KEYS}
+        st.session_state.pop("conv_insights_mr_job", None)
+
     output = st.session_state.get("conv_insights_output")
     if output:
         st.markdown("### Resultado")
         prompt_name = st.session_state.get("conv_insights_prompt_name") or ""
         if prompt_name:
             st.caption(f"Prompt: {prompt_name}")
+        usage = st.session_state.get("conv_insights_usage")
+        if usage:
+            cost = f", custo estimado US$ {usage['cost_usd']:.4f}" if usage.get("cost_usd") is not None else ""
+            st.caption(
+                f"Análise completa: {usage['chunks']} trechos, {usage['calls']} chamadas ao modelo "
+                f"({usage['cached_calls']} reaproveitadas do cache), {usage['input_tokens']} tokens de entrada, "
+                f"{usage['output_tokens']} tokens de saída{cost}."
+            )
         st.markdown(output)
 
 
-__all__ = ["render_conversations_tab", "render_conversations_analysis_tab", "render_conversations_insights_tab"]
+__all__ = [
+    "render_conversations_tab",
+    "render_conversations_analysis_tab",
+    "render_conversations_insights_tab",
+]
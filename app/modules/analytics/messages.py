@@ -5,21 +5,24 @@ filters, and renders the Messages tab with table and CSV export.
 """
 
 import sys
-import json
-import re
-from datetime import date, datetime, time, timedelta, timezone
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
 
-import pandas as pd
-import requests
 import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from app.components.export import export_download
+from src.analytics.message_rows import collect_message_rows, messages_table
+from src.analytics.message_store import account_key, sync_messages
+from src.analytics.message_types import chatwoot_page_fetcher
+from src.analytics.metrics import fetch_chatwoot_inboxes
 from src.bot.engine import load_settings
+from src.utils.http_cache import cached_get
+from src.utils.timestamps import to_local
 from src.utils.timezone import TZ
 
 
@@ -28,92 +31,13 @@ def _cw_headers(token: str) -> Dict[str, str]:
     return {"api_access_token": token, "Content-Type": "application/json"}
 
 
-def _parse_ts(value) -> Optional[datetime]:
-    """Parse timestamps from numeric or string values into UTC-aware datetimes."""
-    if value is None:
-        return None
-    try:
-        if isinstance(value, (int, float)):
-            return datetime.fromtimestamp(value, tz=timezone.utc)
-        if isinstance(value, str):
-            try:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except Exception:
-                return datetime.fromtimestamp(float(value), tz=timezone.utc)
-    except Exception:
-        return None
-    return None
-
-
-def _format_datetime_value(value, with_ms: bool = False) -> str:
-    """Format a timestamp value in local timezone, optionally with milliseconds."""
-    dt = _parse_ts(value)
-    if not dt:
-        return value
-    dt_local = dt.astimezone(TZ)
-    if with_ms:
-        ms = int(dt_local.microsecond / 1000)
-        return f"{dt_local:%d/%m/%Y %H:%M:%S}.{ms:03d}"
-    return dt_local.strftime("%d/%m/%Y %H:%M:%S")
-
-
-def _match_pattern(text: str, pattern: str) -> bool:
-    """Match text against a pattern that may include '*' wildcards."""
-    if not pattern:
-        return True
-    text = text or ""
-    pattern = pattern.strip()
-    if not pattern:
-        return True
-    if "*" in pattern:
-        regex = re.escape(pattern).replace("\\*", ".*")
-        return re.search(regex, text, re.IGNORECASE) is not None
-    return pattern.lower() in text.lower()
-
-
-def _fetch_inboxes(base_url: str, account_id: str, token: str, max_pages: int = 5, per_page: int = 100) -> List[Dict]:
-    """Fetch inboxes from Chatwoot with pagination."""
-    inboxes = []
-    page = 1
-    while page <= max_pages:
-        url = f"{base_url}/api/v1/accounts/{account_id}/inboxes"
-        resp = requests.get(
-            url,
-            params={"page": page, "per_page": per_page},
-            headers=_cw_headers(token),
-            timeout=15,
-        )
-        if resp.status_code >= 400:
-            break
-        data = resp.json() or {}
-        payload = []
-        if isinstance(data, dict):
-            payload = data.get("data") or data.get("payload") or data.get("inboxes") or []
-        elif isinstance(data, list):
-            payload = data
-        if not payload:
-            break
-        for inbox in payload:
-            if isinstance(inbox, dict):
-                inboxes.append(
-                    {
-                        "id": inbox.get("id"),
-                        "name": inbox.get("name") or inbox.get("channel_type") or str(inbox.get("id")),
-                    }
-                )
-        if len(payload) < per_page:
-            break
-        page += 1
-    return inboxes
-
-
 def _fetch_conversations(base_url: str, account_id: str, token: str, start_dt: datetime, max_pages: int = 50, per_page: int = 50) -> List[Dict]:
     """Fetch conversations from Chatwoot, stopping when past the start date."""
     conversations = []
     page = 1
     while page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/conversations"
-        resp = requests.get(
+        resp = cached_get(
             url,
             params={"page": page, "per_page": per_page, "sort": "last_activity_at"},
             headers=_cw_headers(token),
@@ -128,8 +52,8 @@ def _fetch_conversations(base_url: str, account_id: str, token: str, start_dt: d
         conversations.extend(payload)
         last = payload[-1]
         last_ts_raw = last.get("last_activity_at") or last.get("updated_at") or last.get("created_at")
-        last_dt = _parse_ts(last_ts_raw)
-        if last_dt and last_dt.astimezone(TZ) < start_dt:
+        last_dt = to_local(last_ts_raw)
+        if last_dt and last_dt < start_dt:
             break
         page += 1
     return conversations
@@ -143,84 +67,14 @@ def _fetch_messages(
     start_dt: Optional[datetime] = None,
     max_batches: int = 200,
 ) -> List[Dict]:
-    """Fetch conversation messages using the `before` cursor for pagination."""
-    messages = []
-    before_id = None
-    batches = 0
-    while batches < max_batches:
-        url = f"{base_url}/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages"
-        params = {}
-        if before_id:
-            params["before"] = before_id
-        resp = requests.get(
-            url,
-            params=params,
-            headers=_cw_headers(token),
-            timeout=20,
-        )
-        if resp.status_code >= 400:
-            raise RuntimeError(f"Chatwoot respondeu {resp.status_code} ao buscar mensagens: {resp.text[:200]}")
-        data = resp.json() or {}
-        payload = data.get("data", []) or data.get("payload") or []
-        if not payload:
-            break
-        messages.extend(payload)
-
-        oldest = payload[0]
-        next_before = oldest.get("id")
-        if not next_before or next_before == before_id:
-            break
-        before_id = next_before
-
-        if start_dt:
-            oldest_dt = _parse_ts(oldest.get("created_at") or oldest.get("timestamp"))
-            if oldest_dt and oldest_dt.astimezone(TZ) < start_dt:
-                break
-        if len(payload) < 20:
-            break
-        batches += 1
-    return messages
-
-
-def _normalize_message(msg: Dict) -> Dict:
-    """Normalize message payload by serializing nested values."""
-    clean = {}
-    for k, v in msg.items():
-        if isinstance(v, (dict, list)):
-            clean[k] = json.dumps(v, ensure_ascii=False)
-        else:
-            clean[k] = v
-    return clean
-
-
-def _extract_transcription(payload) -> Optional[str]:
-    """Extract an audio transcription from nested payload fields."""
-    # Apenas lê transcrições já presentes no payload da API do Chatwoot (sem chamadas externas).
-    keys = {
-        "transcription",
-        "transcript",
-        "transcribed_text",
-        "transcription_text",
-        "speech_to_text",
-    }
-
-    def _search(obj):
-        if isinstance(obj, dict):
-            for k, v in obj.items():
-                if k in keys and isinstance(v, str) and v.strip():
-                    return v.strip()
-                if isinstance(v, (dict, list)):
-                    found = _search(v)
-                    if found:
-                        return found
-        elif isinstance(obj, list):
-            for item in obj:
-                found = _search(item)
-                if found:
-                    return found
-        return None
-
-    return _search(payload)
+    """Fetch conversation messages, downloading only pages missing from the local store."""
+    return sync_messages(
+        account_key(base_url, account_id),
+        conversation_id,
+        chatwoot_page_fetcher(base_url, account_id, token, conversation_id),
+        start_ts=start_dt.timestamp() if start_dt else None,
+        max_batches=max_batches,
+    )
 
 
 def render_messages_tab():
@@ -243,7 +97,7 @@ def render_messages_tab():
     if inbox_cache is None:
         with st.spinner("Carregando caixas de entrada..."):
             try:
-                inbox_cache = _fetch_inboxes(cw_url, cw_account, cw_token)
+                inbox_cache = fetch_chatwoot_inboxes(cw_url, cw_account, cw_token)
             except Exception as e:
                 inbox_cache = []
                 st.warning(f"Não foi possível carregar caixas de entrada: {e}")
@@ -335,92 +189,28 @@ def render_messages_tab():
                 st.error(f"Falha ao listar conversas: {e}")
                 return
 
-            rows = []
-            for conv in conversations:
-                conv_id = conv.get("id")
-                if conv_id is None:
-                    continue
-                if conversation_id_filter and str(conv_id) != conversation_id_filter.strip():
-                    continue
-                inbox_id = conv.get("inbox_id")
-                inbox_label = inbox_id_to_name.get(inbox_id, inbox_id)
-                if selected_inbox_ids and inbox_id not in selected_inbox_ids:
-                    continue
-
-                meta = conv.get("meta", {}) or {}
-                sender = meta.get("sender") or conv.get("contact") or {}
-                contact_name_val = sender.get("name") or sender.get("identifier") or ""
-                contact_phone_val = (
-                    sender.get("phone_number")
-                    or sender.get("phone")
-                    or sender.get("identifier")
-                    or ""
-                )
-
-                if contact_name and not _match_pattern(contact_name_val, contact_name):
-                    continue
-                if contact_number and not _match_pattern(contact_phone_val, contact_number):
-                    continue
-
-                try:
-                    msgs = _fetch_messages(cw_url, cw_account, cw_token, conv_id, start_dt=start_dt)
-                except Exception as e:
-                    st.warning(f"Falha ao buscar mensagens da conversa {conv_id}: {e}")
-                    continue
-
-                for msg in msgs:
-                    msg_dt_raw = msg.get("created_at") or msg.get("timestamp")
-                    msg_dt = _parse_ts(msg_dt_raw)
-                    if not msg_dt:
-                        continue
-                    msg_dt_local = msg_dt.astimezone(TZ)
-                    if msg_dt_local < start_dt or msg_dt_local > end_dt:
-                        continue
-
-                    status_val = msg.get("status") or msg.get("delivery_status") or msg.get("message_status") or msg.get("state")
-                    if message_status != "Todos" and str(status_val) != message_status:
-                        continue
-
-                    attachments = msg.get("attachments") or []
-                    has_audio = any(
-                        isinstance(att, dict) and att.get("file_type") == "audio" for att in attachments
-                    )
-                    if audio_filter == "Sim" and not has_audio:
-                        continue
-                    if audio_filter == "Não" and has_audio:
-                        continue
-
-                    row = _normalize_message(msg)
-                    if has_audio:
-                        transcript = (
-                            _extract_transcription(attachments)
-                            or _extract_transcription(msg.get("content_attributes") or {})
-                            or _extract_transcription(msg.get("data") or {})
-                        )
-                        if transcript:
-                            existing_content = row.get("content") or ""
-                            prefix = "\n" if existing_content else ""
-                            row["content"] = f"{existing_content}{prefix}[transc.]: {transcript}"
-                    row.update(
-                        {
-                            "conversation_id": conv_id,
-                            "contact_name": contact_name_val,
-                            "contact_phone": contact_phone_val,
-                            "inbox_id": inbox_label,
-                            "midia": "audio" if has_audio else "",
-                        }
-                    )
-                    rows.append(row)
+            rows = collect_message_rows(
+                conversations,
+                {
+                    "conversation_id": conversation_id_filter,
+                    "inbox_ids": selected_inbox_ids,
+                    "contact_name": contact_name,
+                    "contact_number": contact_number,
+                    "message_status": message_status,
+                    "audio_filter": audio_filter,
+                },
+                inbox_id_to_name,
+                start_dt,
+                end_dt,
+                lambda conv_id: _fetch_messages(cw_url, cw_account, cw_token, conv_id, start_dt=start_dt),
+                on_error=lambda conv_id, exc: st.warning(f"Falha ao buscar mensagens da conversa {conv_id}: {exc}"),
+            )
 
             st.session_state["msg_results"] = rows
 
     results = st.session_state.get("msg_results") or []
     if results:
-        df = pd.DataFrame(results)
-        for col in ["created_at", "updated_at", "timestamp", "waiting_since", "agent_last_seen_at"]:
-            if col in df.columns:
-                use_ms = col == "created_at"
-                df[col] = df[col].apply(lambda v: _format_datetime_value(v, with_ms=use_ms))
+        df = messages_table(results)
         columns_selected = st.multiselect(
             "Colunas para visualizar",
             options=list(df.columns),
@@ -432,13 +222,7 @@ def render_messages_tab():
             return
         df_display = df.reindex(columns=columns_selected)
         st.dataframe(df_display, use_container_width=True)
-        csv_data = df_display.to_csv(index=False).encode("utf-8")
-        st.download_button(
-            "Exportar CSV",
-            data=csv_data,
-            file_name="mensagens_chatwoot.csv",
-            mime="text/csv",
-        )
+        export_download(df_display, "mensagens_chatwoot", key="messages_export")
     elif gerar:
         st.info("Nenhuma mensagem encontrada para os filtros.")
 
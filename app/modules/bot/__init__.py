@@ -1,7 +1,15 @@
 """Bot module package for Streamlit views and webhook runtime."""
 
 # Módulos do bot (Streamlit e webhook).
-# Módulos do bot (Streamlit e webhook).
-from app.modules.bot.config_app import render_config_module
+# Importação sob demanda: o webhook (bot_start) não deve carregar o Streamlit.
+
+
+def __getattr__(name):
+    if name == "render_config_module":
+        from app.modules.bot.config_app import render_config_module
+
+        return render_config_module
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["render_config_module"]
@@ -1,23 +1,22 @@
 """Bot runtime service for handling Chatwoot messages via FastAPI."""
 
 import json
+import logging
 import os
 import sys
-import traceback
+from contextlib import ExitStack, contextmanager
 from datetime import datetime
 from pathlib import Path
 
-import pytz
 import requests
-import uvicorn
 from fastapi import BackgroundTasks, FastAPI, Request
-from openai import OpenAI
-from openai.types.responses import FileSearchToolParam
+from fastapi.responses import PlainTextResponse
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from src.bot import runtime_metrics, tracing
 from src.bot.engine import (
     load_env_once,
     load_settings,
@@ -33,8 +32,9 @@ from src.bot.rules import (
     fora_do_horario_comercial,
     is_audio_attachment,
     moderar_mensagem,
-    FUSO_HORARIO,
 )
+from src.utils.instrumentation import chatwoot_call, inc, render_prometheus, timer
+from src.utils.structured_logging import configure_logging, log_context
 
 # --- CONFIGURAÇÕES ---
 ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
@@ -47,6 +47,9 @@ DEFAULT_SYSTEM_PROMPT = (
 )
 ALLOWED_INBOX_ID_DEFAULT = "89317"
 
+configure_logging()
+logger = logging.getLogger("bot.webhook")
+
 app = FastAPI()
 client = None  # inicializado após carregar config
 historico_conversas = {}  # conversation_id -> lista de mensagens (reinicia a cada deploy)
@@ -75,26 +78,35 @@ def get_allowed_inbox_id() -> str:
     return os.getenv("ALLOWED_INBOX_ID") or ALLOWED_INBOX_ID_DEFAULT
 
 
-def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=None):
-    """Process an incoming message and respond through the configured LLM."""
+def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=None, trace=None):
+    """Process an incoming message and respond through the configured LLM.
+
+    Stage timings and the outcome are recorded in `trace` (see `src.bot.tracing`).
+    """
     load_env_local()
-    config = load_settings()
+    trace = trace if trace is not None else tracing.start_trace()
+    with _etapa("settings", trace):
+        config = load_settings()
     if not config:
-        print("❌ Configurações não encontradas. Use o painel para salvar.")
+        logger.error("Configurações não encontradas. Use o painel para salvar.")
         return
     if not config.get("bot_enabled", True):
-        print("ℹ️ Bot desligado via configuração.")
+        logger.info("Bot desligado via configuração.")
         return
 
     if config.get("provider", "openai") != "openai":
-        print("❌ Provedor não suportado ainda. Ajuste para openai.")
+        logger.error("Provedor não suportado ainda. Ajuste para openai.", extra={"provider": config.get("provider")})
         return
     global client
     if client is None:
         api_key = os.getenv("OPENAI_API_KEY", "")
         if not api_key:
-            print("❌ OPENAI_API_KEY não definida no ambiente.")
+            logger.error("OPENAI_API_KEY não definida no ambiente.")
             return
+        # Importado só na primeira resposta: o SDK leva quase 1 s para carregar e
+        # atrasaria cada reinício do serviço (/healthz, /webhook).
+        from openai import OpenAI
+
         client = OpenAI(api_key=api_key)
 
     chatwoot_url = config.get("chatwoot_url", "")
@@ -102,12 +114,13 @@ def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=Non
     chatwoot_account = config.get("chatwoot_account_id", "")
 
     if not all([chatwoot_url, chatwoot_token, chatwoot_account]):
-        print("❌ CHATWOOT_URL/TOKEN/ACCOUNT_ID ausentes na configuração.")
+        logger.error("CHATWOOT_URL/TOKEN/ACCOUNT_ID ausentes na configuração.")
         return
 
     vector_store_id = config.get("vector_store_id")
     profile_data = get_prompt_profile(config.get("prompt_profile_id")) or get_fallback_profile()
     profile_name = profile_data.get("name") if profile_data else None
+    trace["profile_name"] = profile_name
     system_prompt = (
         (profile_data.get("prompt_text") if profile_data else None)
         or config.get("system_prompt")
@@ -121,16 +134,19 @@ def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=Non
     try:
         url_conv = f"{chatwoot_url}/api/v1/accounts/{chatwoot_account}/conversations/{conversation_id}"
         headers = {"api_access_token": chatwoot_token}
-        resp_conv = requests.get(url_conv, headers=headers)
+        with _etapa("status_check", trace), chatwoot_call("GET", url_conv) as call:
+            resp_conv = requests.get(url_conv, headers=headers)
+            call["status"] = resp_conv.status_code
 
         if resp_conv.status_code == 200:
             conv_data = resp_conv.json()
             status = conv_data.get("status")
             if status not in ("open", "pending"):
-                print(f"🛑 Conversa {conversation_id} bloqueada (status: {status}).")
+                logger.info("Conversa bloqueada para o bot.", extra={"conversation_status": status})
+                trace["outcome"] = "blocked"
                 return
     except Exception as e:
-        print(f"Erro no check de Handoff: {e}")
+        logger.warning("Erro no check de handoff: %s", e)
 
     try:
         mensagens = historico_conversas.setdefault(
@@ -148,48 +164,60 @@ def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=Non
             if custom_hit:
                 moderation_info = {"flagged": True, "custom_term": termo, "source": "custom_terms"}
             else:
-                moderation_info = moderar_mensagem(client, user_message or "")
+                with _etapa("moderation", trace):
+                    moderation_info = moderar_mensagem(client, user_message or "")
 
-            log_conversation(
-                conversation_id,
-                primeiro_nome,
-                "user",
-                mensagem_cliente,
-                inbox_id=inbox_id,
-                profile_name=profile_name,
-                moderation_applied=True,
-                moderation_details=str(moderation_info),
-            )
-            if moderation_info.get("flagged"):
-                aviso = (
-                    f"Olá, {primeiro_nome}. Detectei conteúdo sensível na mensagem. "
-                    "Por favor, reformule ou aguarde para falar com um humano."
-                )
+            with _etapa("log_write", trace):
                 log_conversation(
                     conversation_id,
                     primeiro_nome,
-                    "assistant",
-                    aviso,
+                    "user",
+                    mensagem_cliente,
                     inbox_id=inbox_id,
                     profile_name=profile_name,
                     moderation_applied=True,
                     moderation_details=str(moderation_info),
                 )
+            if moderation_info.get("flagged"):
+                aviso = (
+                    f"Olá, {primeiro_nome}. Detectei conteúdo sensível na mensagem. "
+                    "Por favor, reformule ou aguarde para falar com um humano."
+                )
+                trace["outcome"] = "moderated"
+                with _etapa("log_write", trace):
+                    trace["log_id"] = log_conversation(
+                        conversation_id,
+                        primeiro_nome,
+                        "assistant",
+                        aviso,
+                        inbox_id=inbox_id,
+                        profile_name=profile_name,
+                        moderation_applied=True,
+                        moderation_details=str(moderation_info),
+                    )
                 url_msg = f"{chatwoot_url}/api/v1/accounts/{chatwoot_account}/conversations/{conversation_id}/messages"
                 data_out = {"content": aviso, "message_type": "outgoing"}
-                resp_out = requests.post(url_msg, json=data_out, headers=headers)
+                with _etapa("chatwoot_post", trace), chatwoot_call("POST", url_msg) as call:
+                    resp_out = requests.post(url_msg, json=data_out, headers=headers)
+                    call["status"] = resp_out.status_code
                 if 200 <= resp_out.status_code < 300:
-                    print("✅ Aviso de moderação enviado.")
+                    logger.info("Aviso de moderação enviado.")
                 else:
-                    print(f"❌ Falha ao enviar aviso de moderação: {resp_out.status_code} {resp_out.text[:200]}")
+                    logger.error(
+                        "Falha ao enviar aviso de moderação.",
+                        extra={"http_status": resp_out.status_code, "body": resp_out.text[:200]},
+                    )
                 return
         else:
-            log_conversation(conversation_id, primeiro_nome, "user", mensagem_cliente, inbox_id=inbox_id, profile_name=profile_name)
+            with _etapa("log_write", trace):
+                log_conversation(conversation_id, primeiro_nome, "user", mensagem_cliente, inbox_id=inbox_id, profile_name=profile_name)
 
         mensagens.append({"role": "user", "content": mensagem_cliente})
 
         tools = []
         if vector_store_id:
+            from openai.types.responses import FileSearchToolParam
+
             tools.append(
                 FileSearchToolParam(type="file_search", vector_store_ids=[vector_store_id])
             )
@@ -199,15 +227,18 @@ def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=Non
             "input": mensagens,
             "tools": tools or None,
         }
+        trace["model"] = completion_kwargs["model"]
         modelo_atual = str(completion_kwargs["model"]).lower()
         if not modelo_atual.startswith("gpt-5"):
             completion_kwargs["temperature"] = 0.3
 
-        completion = client.responses.create(**completion_kwargs)
+        with _etapa("llm", trace):
+            completion = client.responses.create(**completion_kwargs)
 
         resposta_final = extrair_texto_resposta(completion)
         if not resposta_final:
-            print("❌ Sem resposta do modelo.")
+            logger.warning("Sem resposta do modelo.", extra={"model": completion_kwargs["model"]})
+            trace["outcome"] = "empty"
             return
 
         mensagens.append({"role": "assistant", "content": resposta_final})
@@ -217,57 +248,121 @@ def responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id=Non
         tot_toks = getattr(usage, "total_tokens", None) if usage else None
         custo = estimar_custo_tokens(completion_kwargs["model"], in_toks, out_toks)
 
-        log_conversation(
-            conversation_id,
-            primeiro_nome,
-            "assistant",
-            resposta_final,
-            prompt_tokens=in_toks,
-            completion_tokens=out_toks,
-            total_tokens=tot_toks,
-            cost_estimated_usd=custo,
-            inbox_id=inbox_id,
-            profile_name=profile_name,
-            moderation_applied=bool(moderation_info),
-            moderation_details=str(moderation_info) if moderation_info else None,
-        )
+        with _etapa("log_write", trace):
+            trace["log_id"] = log_conversation(
+                conversation_id,
+                primeiro_nome,
+                "assistant",
+                resposta_final,
+                prompt_tokens=in_toks,
+                completion_tokens=out_toks,
+                total_tokens=tot_toks,
+                cost_estimated_usd=custo,
+                inbox_id=inbox_id,
+                profile_name=profile_name,
+                moderation_applied=bool(moderation_info),
+                moderation_details=str(moderation_info) if moderation_info else None,
+            )
 
         url_msg = f"{chatwoot_url}/api/v1/accounts/{chatwoot_account}/conversations/{conversation_id}/messages"
         data = {"content": resposta_final, "message_type": "outgoing"}
 
-        resp_out = requests.post(url_msg, json=data, headers=headers)
-        try:
-            resp_json = resp_out.json()
-        except Exception:
-            resp_json = resp_out.text[:200]
+        with _etapa("chatwoot_post", trace), chatwoot_call("POST", url_msg) as call:
+            resp_out = requests.post(url_msg, json=data, headers=headers)
+            call["status"] = resp_out.status_code
+        trace["outcome"] = "answered" if 200 <= resp_out.status_code < 300 else "post_failed"
         if 200 <= resp_out.status_code < 300:
-            print(f"✅ Respondido. Chatwoot status={resp_out.status_code} body={resp_json}")
+            logger.info("Resposta enviada ao Chatwoot.", extra={"http_status": resp_out.status_code})
+            logger.debug("Corpo da resposta do Chatwoot.", extra={"body": resp_out.text[:500]})
         else:
-            print(f"❌ Falha ao enviar para Chatwoot: {resp_out.status_code} {resp_json}")
+            logger.error(
+                "Falha ao enviar para o Chatwoot.",
+                extra={"http_status": resp_out.status_code, "body": resp_out.text[:200]},
+            )
+
+    except Exception:
+        trace["outcome"] = "error"
+        logger.exception("Erro ao processar IA.")
+
+
+@contextmanager
+def _etapa(stage: str, trace=None):
+    """Time one stage of `responder_cliente` (histogram `bot_stage_seconds` and `trace`).
+
+    The `llm` and `moderation` stages also feed the latency summary of `/metrics?format=json`.
+    """
+    with ExitStack() as stack:
+        stack.enter_context(timer("bot_stage_seconds", stage=stage))
+        if trace is not None:
+            stack.enter_context(tracing.span(trace, stage))
+        yield
 
-    except Exception as e:
-        print(f"❌ Erro ao processar IA: {e}")
-        traceback.print_exc()
+
+def _responder_monitorado(conversation_id, primeiro_nome, user_message, inbox_id=None, trace=None):
+    """Run `responder_cliente` as a tracked background task and save its trace.
+
+    See `src.bot.runtime_metrics` and `src.bot.tracing`.
+    """
+    trace = trace if trace is not None else tracing.start_trace()
+    tracing.mark(trace, "queue")
+    with log_context(conversation_id=conversation_id, message_id=trace.get("message_id")):
+        try:
+            with runtime_metrics.track_task():
+                responder_cliente(conversation_id, primeiro_nome, user_message, inbox_id, trace=trace)
+        finally:
+            try:
+                tracing.save_trace(trace, conversation_id)
+            except Exception:
+                logger.exception("Erro ao salvar trace.")
+
+
+@app.get("/healthz")
+async def healthz():
+    # async: responde pelo event loop mesmo com o pool de tarefas ocupado.
+    data = runtime_metrics.snapshot()
+    return {"status": data["status"], "pid": os.getpid(), "uptime_s": data["uptime_s"]}
+
+
+@app.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    data = runtime_metrics.snapshot()
+    if format == "json":
+        return {"pid": os.getpid(), **data}
+    gauges = {
+        "webhook_uptime_seconds": ("Tempo desde o início do serviço.", data["uptime_s"]),
+        "webhook_in_flight_tasks": ("Respostas em processamento.", data["in_flight"]),
+        "webhook_queue_depth": ("Respostas aguardando processamento.", data["queue_depth"]),
+        "webhook_last_event_age_seconds": ("Tempo desde o último evento recebido.", data["last_event_age_s"]),
+    }
+    return PlainTextResponse(render_prometheus(gauges), media_type="text/plain; version=0.0.4")
 
 
 @app.post("/webhook")
 async def chatwoot_webhook(request: Request, background_tasks: BackgroundTasks):
+    with timer("webhook_request_seconds"):
+        return await _processar_webhook(request, background_tasks)
+
+
+async def _processar_webhook(request: Request, background_tasks: BackgroundTasks):
+    trace = tracing.start_trace()
     try:
         data = await request.json()
         event = data.get("event")
-        print(f"🔔 Evento: {event}")
+        runtime_metrics.record_event()
+        inc("webhook_requests_total", event=event or "desconhecido")
+        logger.debug("Evento recebido.", extra={"event": event})
         load_env_local()
 
         if event == "message_created":
             config = load_settings()
             if not config or not config.get("bot_enabled", True):
-                print("ℹ️ Bot desligado ou sem configuração; ignorando mensagem.")
+                logger.info("Bot desligado ou sem configuração; ignorando mensagem.")
                 return {"status": "ok"}
             chatwoot_url = config.get("chatwoot_url", "")
             chatwoot_token = config.get("chatwoot_api_token", "")
             chatwoot_account = config.get("chatwoot_account_id", "")
             if not all([chatwoot_url, chatwoot_token, chatwoot_account]):
-                print("❌ CHATWOOT_URL/TOKEN/ACCOUNT_ID ausentes; ignorei mensagem.")
+                logger.error("CHATWOOT_URL/TOKEN/ACCOUNT_ID ausentes; ignorei mensagem.")
                 return {"status": "ok"}
 
             content = data.get("content")
@@ -290,27 +385,35 @@ async def chatwoot_webhook(request: Request, background_tasks: BackgroundTasks):
                 conversation_id = nested.get("conversation_id")
                 inbox_id = inbox_id or nested.get("inbox_id")
 
+            ids = {"conversation_id": conversation_id, "message_id": message_id}
+            trace["message_id"] = message_id
             allowed_inbox_id = get_allowed_inbox_id()
             if inbox_id and str(inbox_id) != str(allowed_inbox_id):
-                print(f"⛔ Mensagem ignorada: inbox {inbox_id} diferente do permitido {allowed_inbox_id}.")
+                logger.debug(
+                    "Mensagem ignorada: inbox diferente do permitido.",
+                    extra={**ids, "inbox_id": inbox_id, "allowed_inbox_id": allowed_inbox_id},
+                )
                 return {"status": "ok"}
 
             if message_id:
                 if message_id in mensagens_processadas:
-                    print(f"⏩ Já tratei a mensagem {message_id}; ignorando duplicata.")
+                    logger.info("Mensagem já tratada; ignorando duplicata.", extra=ids)
                     return {"status": "ok"}
                 mensagens_processadas.add(message_id)
 
             eh_msg_cliente = (msg_type == 0 or msg_type == "incoming")
 
             if eh_msg_cliente and is_private is False and conversation_id:
-                print(f"ℹ️ Payload recebido: msg_type={msg_type}, private={is_private}, attachments={len(attachments)}, conversation_id={conversation_id}, message_id={message_id}")
+                logger.debug(
+                    "Payload recebido.",
+                    extra={**ids, "msg_type": msg_type, "private": is_private, "attachments": len(attachments)},
+                )
                 primeiro_nome = extrair_primeiro_nome(data)
                 mensagem_cliente = content or ""
                 audio_detectado = any(is_audio_attachment(att) for att in attachments)
 
                 if audio_detectado and not mensagem_cliente:
-                    print("ℹ️ Áudio recebido; enviando aviso de texto.")
+                    logger.info("Áudio recebido; enviando aviso de texto.", extra=ids)
                     url_msg = f"{chatwoot_url}/api/v1/accounts/{chatwoot_account}/conversations/{conversation_id}/messages"
                     headers = {"api_access_token": chatwoot_token}
                     aviso = (
@@ -319,31 +422,44 @@ async def chatwoot_webhook(request: Request, background_tasks: BackgroundTasks):
                         "Poderia, por gentileza, enviar sua mensagem por texto?"
                     )
                     data_out = {"content": aviso, "message_type": "outgoing"}
-                    resp = requests.post(url_msg, json=data_out, headers=headers)
+                    with chatwoot_call("POST", url_msg) as call:
+                        resp = requests.post(url_msg, json=data_out, headers=headers)
+                        call["status"] = resp.status_code
                     if resp.status_code == 200:
-                        print("✅ Aviso de áudio enviado.")
+                        logger.info("Aviso de áudio enviado.", extra=ids)
                     else:
-                        print(f"❌ Erro ao enviar aviso de áudio: {resp.status_code} {resp.text[:200]}")
+                        logger.error(
+                            "Erro ao enviar aviso de áudio.",
+                            extra={**ids, "http_status": resp.status_code, "body": resp.text[:200]},
+                        )
                     return
 
                 if not mensagem_cliente:
-                    print("⛔ Sem mensagem de texto; nada a enviar ao assistente.")
+                    logger.info("Sem mensagem de texto; nada a enviar ao assistente.", extra=ids)
                     return
 
                 if fora_do_horario_comercial(config):
-                    print(f"🌙 Fora do horário. Respondendo {primeiro_nome} (ID {conversation_id})")
-                    background_tasks.add_task(responder_cliente, conversation_id, primeiro_nome, mensagem_cliente, inbox_id)
+                    logger.info("Fora do horário; resposta enfileirada.", extra=ids)
+                    tracing.mark(trace, "webhook")
+                    runtime_metrics.task_queued()
+                    background_tasks.add_task(
+                        _responder_monitorado, conversation_id, primeiro_nome, mensagem_cliente, inbox_id, trace
+                    )
                 else:
-                    print(f"☀️ Dentro do horário configurado. Bot não responderá automaticamente.")
+                    logger.debug("Dentro do horário configurado; bot não responde.", extra=ids)
             else:
-                print(f"⛔ Mensagem ignorada (critérios não atendidos). msg_type={msg_type}, private={is_private}, conversation_id={conversation_id}, message_id={message_id}")
+                logger.debug(
+                    "Mensagem ignorada (critérios não atendidos).",
+                    extra={**ids, "msg_type": msg_type, "private": is_private},
+                )
 
-    except Exception as e:
-        print(f"❌ ERRO NO WEBHOOK: {e}")
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Erro no webhook.")
 
     return {"status": "ok"}
 
 
 if __name__ == "__main__":
+    import uvicorn
+
     uvicorn.run(app, host="0.0.0.0", port=8000)
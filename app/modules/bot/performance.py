@@ -0,0 +1,141 @@
+"""Performance tab: response traces, webhook and app metrics."""
+
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+import streamlit as st
+
+ROOT = Path(__file__).resolve().parents[2]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.bot.tracing import TRACE_SPANS, latency_percentiles, load_traces
+from src.bot.webhook_client import WEBHOOK_URL, webhook_metrics, webhook_prometheus
+from src.utils.instrumentation import local_samples, parse_prometheus, summarize
+
+TRACE_GROUPS = {"Modelo": "model", "Perfil": "profile_name", "Hora do dia": "hour"}
+TRACE_OUTCOMES = {
+    "answered": "Respondida",
+    "moderated": "Moderada",
+    "post_failed": "Falha ao enviar",
+    "empty": "Sem resposta do modelo",
+    "blocked": "Conversa bloqueada",
+    "error": "Erro",
+    "skipped": "Ignorada",
+}
+TRACE_PERIODS = {1: "Últimas 24h", 7: "Últimos 7 dias", 30: "Últimos 30 dias"}
+
+
+def _labels_text(labels: Dict) -> str:
+    return ", ".join(f"{key}={value}" for key, value in sorted(labels.items()))
+
+
+def _ms(value) -> float:
+    return round(value * 1000, 1) if value is not None else None
+
+
+def _render_samples(samples: List[Dict]) -> None:
+    """Render histogram summaries and counters of parsed Prometheus samples."""
+    histograms, others = summarize(samples)
+    if not histograms and not others:
+        st.info("Nenhuma métrica registrada ainda.")
+        return
+    if histograms:
+        st.markdown("**Latências**")
+        st.dataframe(
+            pd.DataFrame(
+                [
+                    {
+                        "métrica": row["name"],
+                        "rótulos": _labels_text(row["labels"]),
+                        "chamadas": row["count"],
+                        "média (ms)": _ms(row["mean"]),
+                        "p50 (ms)": _ms(row["p50"]),
+                        "p95 (ms)": _ms(row["p95"]),
+                        "total (s)": round(row["sum"], 2),
+                    }
+                    for row in histograms
+                ]
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+    if others:
+        st.markdown("**Contadores**")
+        st.dataframe(
+            pd.DataFrame(
+                [{"métrica": s["name"], "rótulos": _labels_text(s["labels"]), "valor": s["value"]} for s in others]
+            ),
+            use_container_width=True,
+            hide_index=True,
+        )
+    st.caption("p50/p95 estimados a partir dos buckets dos histogramas.")
+
+
+def _render_traces() -> None:
+    """Latency percentiles of the stored response traces (`src.bot.tracing`)."""
+    st.subheader("Tempo de resposta")
+    col1, col2, col3 = st.columns(3)
+    days = col1.selectbox("Período", list(TRACE_PERIODS), index=1, format_func=TRACE_PERIODS.get, key="trace_days")
+    group_label = col2.selectbox("Agrupar por", list(TRACE_GROUPS), key="trace_group")
+    outcomes = col3.multiselect(
+        "Resultado",
+        list(TRACE_OUTCOMES),
+        default=["answered"],
+        format_func=TRACE_OUTCOMES.get,
+        key="trace_outcomes",
+    )
+    traces = load_traces(days, outcomes)
+    if not traces:
+        st.info("Nenhuma resposta registrada no período.")
+        return
+
+    group_by = TRACE_GROUPS[group_label]
+    spans = ("total", "queue", "llm", "chatwoot_post")
+    columns = {group_by: group_label, "count": "respostas"}
+    for name in spans:
+        columns[f"{name}_p50_ms"] = f"{name} p50 (ms)"
+        columns[f"{name}_p95_ms"] = f"{name} p95 (ms)"
+    df = pd.DataFrame(latency_percentiles(traces, group_by, spans=spans)).rename(columns=columns)
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+    medians = pd.DataFrame(traces)[[f"{name}_ms" for name in TRACE_SPANS]].median()
+    st.markdown("**Mediana por etapa (ms)**")
+    st.bar_chart(medians.rename(lambda col: col[: -len("_ms")]).dropna())
+    st.caption(
+        "total: do recebimento do webhook ao fim do envio ao Chatwoot; "
+        "queue: espera na fila de tarefas; llm: chamada ao modelo."
+    )
+
+
+def render_performance():
+    """Render response latencies, webhook metrics (from `/metrics`) and this app's own metrics."""
+    st.header("Desempenho")
+    st.button("Atualizar", key="performance_refresh")
+
+    _render_traces()
+
+    st.subheader("Webhook")
+    summary = webhook_metrics()
+    exported = webhook_prometheus() if summary is not None else None
+    if summary is None:
+        st.info(f"Webhook inativo ou sem resposta em {WEBHOOK_URL}.")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Ativo há (min)", round((summary.get("uptime_s") or 0) / 60, 1))
+        col2.metric("Em andamento", summary.get("in_flight", 0))
+        col3.metric("Na fila", summary.get("queue_depth", 0))
+        last_event = summary.get("last_event_age_s")
+        col4.metric("Último evento (s)", "—" if last_event is None else round(last_event))
+        if summary.get("status") != "ok":
+            st.warning(f"Há uma resposta em processamento há {summary.get('oldest_task_age_s')}s.")
+        _render_samples(parse_prometheus(exported or ""))
+
+    st.subheader("Este app (Streamlit)")
+    st.caption("Chamadas ao Chatwoot e operações SQLite feitas por este processo desde que ele iniciou.")
+    _render_samples(local_samples())
+
+
+__all__ = ["render_performance"]
@@ -1,24 +1,80 @@
 """Streamlit dashboard for Chatwoot attendance reports."""
 
 import sys
-from datetime import date, datetime, time, timedelta, timezone
+from datetime import date, datetime, time, timedelta
 from pathlib import Path
+from typing import Callable, Dict
 
-import pandas as pd
 import streamlit as st
 
 ROOT = Path(__file__).resolve().parents[2]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
+from app.components.export import export_download
+from app.components.jobs import job_result
 from src.analytics.metrics import (
     TZ,
     build_hourly_df,
     fetch_chatwoot_agents,
     fetch_chatwoot_conversations,
-    fetch_chatwoot_messages,
+    hourly_df_from_rollup,
 )
+from src.analytics.attendance import (
+    REPORT_COLUMNS,
+    attendance_frame,
+    conversation_meta,
+    conversation_summary,
+    display_frame,
+    filter_messages,
+    select_conversations,
+)
+from src.analytics.message_frame import append_messages, frame_from_buffer, new_message_buffer
+from src.analytics.message_store import account_key, query_message_rollup
+from src.analytics.message_types import conversation_messages
 from src.bot.engine import load_env_once, load_settings
+from src.utils.jobs import get_job, submit_job
+
+
+def _attendance_job(params: Dict, progress: Callable) -> Dict:
+    """Fetch and build the attendance table in the background (see `src.utils.jobs`)."""
+    settings = load_settings() or {}
+    chatwoot_url = params["chatwoot_url"]
+    chatwoot_account = params["chatwoot_account"]
+    chatwoot_token = settings.get("chatwoot_api_token") or ""
+    start_date = date.fromisoformat(params["start_date"])
+    end_date = date.fromisoformat(params["end_date"])
+    start_dt = datetime.combine(start_date, time.min, tzinfo=TZ)
+    end_dt = datetime.combine(end_date, time(23, 59, 59), tzinfo=TZ)
+
+    progress(0, 0, "Buscando conversas no Chatwoot")
+    conversations = fetch_chatwoot_conversations(chatwoot_url, chatwoot_account, chatwoot_token, start_dt, status=params["status"])
+    if not conversations:
+        return {"conversations": 0, "agents": [], "failed": [], "df": None}
+
+    conv_meta = conversation_meta(conversations)
+    selected_convs = select_conversations(conversations, conv_meta, params["conversation_id"], params["agents"])
+
+    buffer = new_message_buffer()
+    failed = []
+    total_conv = len(selected_convs)
+    for processed, (cid, msgs, error) in enumerate(
+        conversation_messages(chatwoot_url, chatwoot_account, chatwoot_token, selected_convs, start_dt.timestamp()),
+        start=1,
+    ):
+        if error is not None:
+            failed.append(str(cid))
+        else:
+            append_messages(buffer, msgs, conversation_id=cid)
+        progress(processed, total_conv, "Mensagens das conversas")
+
+    msg_df, direction = filter_messages(frame_from_buffer(buffer), start_dt, end_dt, set(params["hours"]), params["msg_type"])
+    return {
+        "conversations": len(conversations),
+        "agents": sorted({meta["agent"] for meta in conv_meta.values()}),
+        "failed": failed,
+        "df": attendance_frame(msg_df, direction, conv_meta),
+    }
 
 
 def render_atendimentos_dashboard():
@@ -91,117 +147,59 @@ def render_atendimentos_dashboard():
         st.caption("As colunas disponíveis serão carregadas após buscar dados no Chatwoot.")
         gerar = st.form_submit_button("Gerar relatório", type="primary", disabled=not agent_options)
 
-    if not gerar:
+    if gerar:
+        if start_date > end_date:
+            st.error("Período inválido: a data inicial é maior que a final.")
+            return
+        if not selected_hours:
+            st.error("Selecione ao menos uma hora para filtrar os atendimentos.")
+            return
+        params = {
+            "chatwoot_url": chatwoot_url,
+            "chatwoot_account": str(chatwoot_account),
+            "start_date": start_date.isoformat(),
+            "end_date": end_date.isoformat(),
+            "hours": sorted(h.hour for h in selected_hours),
+            "status": status_choice,
+            "agents": sorted(agent_selected),
+            "conversation_id": conv_filter.strip(),
+            "msg_type": msg_type,
+        }
+        st.session_state["atendimentos_job"] = submit_job("atendimentos", params, _attendance_job)
+
+    job_id = st.session_state.get("atendimentos_job")
+    if not job_id:
         if not agent_options:
             st.warning("Carregue os agentes do Chatwoot antes de gerar o relatório.")
         else:
             st.info("Ajuste os filtros e clique em 'Gerar relatório' para montar o dashboard.")
         return
 
-    if start_date > end_date:
-        st.error("Período inválido: a data inicial é maior que a final.")
+    result = job_result(job_id, "Relatório de atendimentos")
+    if result is None:
         return
-    if not selected_hours:
-        st.error("Selecione ao menos uma hora para filtrar os atendimentos.")
-        return
-
-    selected_hours_sorted = sorted(selected_hours, key=lambda t: t.hour)
-    hours_selected = {h.hour for h in selected_hours_sorted}
-    start_dt = datetime.combine(start_date, time.min, tzinfo=TZ)
-    end_dt = datetime.combine(end_date, time(23, 59, 59), tzinfo=TZ)
-
-    with st.spinner("Buscando conversas no Chatwoot..."):
-        try:
-            conversations = fetch_chatwoot_conversations(chatwoot_url, chatwoot_account, chatwoot_token, start_dt, status=status_choice, max_pages=10)
-        except Exception as e:
-            st.error(f"Falha ao buscar conversas no Chatwoot: {e}")
-            return
-
-    if not conversations:
+    params = get_job(job_id)["params"]
+    if not result["conversations"]:
         st.warning("Nenhuma conversa encontrada no período/status informado.")
         return
-
-    conv_meta = {}
-    agent_set = set()
-    for conv in conversations:
-        cid = conv.get("id") or conv.get("display_id")
-        if cid is None:
-            continue
-        meta = conv.get("meta", {}) or {}
-        assignee = meta.get("assignee") or conv.get("assignee") or {}
-        sender = meta.get("sender") or conv.get("contact") or {}
-        agent_name = assignee.get("name") or "Não atribuído"
-        agent_set.add(agent_name)
-        conv_meta[cid] = {
-            "agent": agent_name,
-            "status": conv.get("status") or "desconhecido",
-            "client_name": sender.get("name") or sender.get("identifier") or "Cliente",
-            "inbox_id": conv.get("inbox_id"),
-        }
-    st.session_state["cw_agents_cache"] = sorted(agent_set)
-
-    rows = []
-    progress = st.progress(0, text="Buscando mensagens...")
-    total_conv = len(conv_meta)
-    processed = 0
-    for cid, meta in list(conv_meta.items()):
-        processed += 1
-        progress.progress(min(processed / total_conv, 1.0), text=f"Mensagens da conversa {cid} ({processed}/{total_conv})")
-        if conv_filter.strip() and str(cid) != conv_filter.strip():
-            continue
-        if agent_selected and meta["agent"] not in agent_selected:
-            continue
-        try:
-            msgs = fetch_chatwoot_messages(chatwoot_url, chatwoot_account, chatwoot_token, cid)
-        except Exception as e:
-            st.warning(f"Falha ao buscar mensagens da conversa {cid}: {e}")
-            continue
-        for msg in msgs:
-            msg_ts_raw = msg.get("created_at") or msg.get("timestamp")
-            msg_dt = _parse_ts(msg_ts_raw)
-            if not msg_dt:
-                continue
-            msg_dt_local = msg_dt.astimezone(TZ)
-            if msg_dt_local < start_dt or msg_dt_local > end_dt:
-                continue
-            if hours_selected and msg_dt_local.hour not in hours_selected:
-                continue
-            direction = "cliente" if (msg.get("message_type") == "incoming" or (msg.get("sender_type") or "").lower() in ["contact", "contact::inbox"]) else "bot"
-            if msg_type == "Apenas clientes" and direction != "cliente":
-                continue
-            if msg_type == "Apenas bot" and direction != "bot":
-                continue
-            content = msg.get("content") or ""
-            if not content:
-                content = (msg.get("content_attributes") or {}).get("body") or ""
-            rows.append(
-                {
-                    "conversation_id": str(cid),
-                    "client_name": meta.get("client_name"),
-                    "agent": meta.get("agent"),
-                    "status": meta.get("status"),
-                    "inbox_id": meta.get("inbox_id"),
-                    "message": content,
-                    "created_at": msg_dt_local.strftime("%Y-%m-%d %H:%M:%S"),
-                    "created_dt": msg_dt_local,
-                    "direction": direction,
-                    "message_type": msg.get("message_type"),
-                    "sender_type": msg.get("sender_type"),
-                }
-            )
-    progress.empty()
-
-    if not rows:
+    if result["agents"]:
+        st.session_state["cw_agents_cache"] = result["agents"]
+    failed = result["failed"]
+    if failed:
+        st.warning(f"Falha ao buscar mensagens de {len(failed)} conversa(s): {', '.join(failed[:10])}")
+    df = result["df"]
+    if df.empty:
         st.warning("Nenhum resultado para os filtros informados.")
         return
 
-    df = pd.DataFrame(rows)
-    df["created_at_data"] = df["created_dt"].dt.strftime("%d/%m/%Y")
-    df["created_at_time"] = df["created_dt"].dt.strftime("%H:%M:%S")
-    df["created_dt_data"] = df["created_dt"].dt.strftime("%d/%m/%Y")
-    df["created_dt_time"] = df["created_dt"].dt.strftime("%H:%M:%S")
+    start_date = date.fromisoformat(params["start_date"])
+    end_date = date.fromisoformat(params["end_date"])
+    hours_selected = set(params["hours"])
+    agent_selected = params["agents"]
+    msg_type = params["msg_type"]
+    conv_filter = params["conversation_id"]
 
-    column_options = list(df.columns)
+    column_options = list(REPORT_COLUMNS)
     columns_selected = st.multiselect(
         "Colunas para visualizar/exportar",
         options=column_options,
@@ -212,22 +210,15 @@ def render_atendimentos_dashboard():
         st.error("Selecione ao menos uma coluna para visualizar/exportar.")
         return
 
-    conv_summary = df.groupby("conversation_id").agg(
-        primeira_mensagem=("created_dt", "min"),
-        agente=("agent", lambda x: x.dropna().iloc[0] if not x.dropna().empty else "Não atribuído"),
-        cliente=("client_name", lambda x: x.dropna().iloc[0] if not x.dropna().empty else "N/A"),
-        status=("status", lambda x: x.dropna().iloc[0] if not x.dropna().empty else "Sem status"),
-    ).reset_index()
-    conv_summary["dia"] = conv_summary["primeira_mensagem"].dt.date
-    conv_summary["hora"] = conv_summary["primeira_mensagem"].dt.strftime("%H:%M")
+    conv_summary = conversation_summary(df)
 
-    hours_label = "Todas (00:00-23:00)" if len(hours_selected) == len(hour_options) else ", ".join(h.strftime("%H:%M") for h in selected_hours_sorted)
+    hours_label = "Todas (00:00-23:00)" if len(hours_selected) == len(hour_options) else ", ".join(f"{h:02d}:00" for h in sorted(hours_selected))
     filter_lines = [
         f"Período: {start_date.strftime('%d/%m/%Y')} até {end_date.strftime('%d/%m/%Y')}",
         f"Horas: {hours_label}",
         f"Agentes: {', '.join(agent_selected) if agent_selected else 'Todos'}",
         f"Tipo de mensagem: {msg_type}",
-        f"Conversation ID: {conv_filter.strip() or 'Todos'}",
+        f"Conversation ID: {conv_filter or 'Todos'}",
     ]
     st.success("\n".join(filter_lines))
 
@@ -241,7 +232,16 @@ def render_atendimentos_dashboard():
 
     st.markdown("### Mensagens por hora")
     st.caption(f"Período selecionado: de {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}")
-    hour_df = build_hourly_df(df)
+    if agent_selected or conv_filter or params["status"] != "all":
+        # O rollup não guarda agente, status nem conversa: com esses filtros, conta as mensagens carregadas.
+        hour_df = build_hourly_df(df)
+    else:
+        rollup = query_message_rollup(
+            account_key(params["chatwoot_url"], params["chatwoot_account"]),
+            datetime.combine(start_date, time.min, tzinfo=TZ).timestamp(),
+            datetime.combine(end_date, time(23, 59, 59), tzinfo=TZ).timestamp(),
+        )
+        hour_df = hourly_df_from_rollup(rollup, hours_selected, msg_type)
     hour_styled = (
         hour_df.style.set_properties(
             subset=hour_df.columns,
@@ -256,33 +256,10 @@ def render_atendimentos_dashboard():
     display_cols = columns_selected
     if "status" not in display_cols:
         display_cols = display_cols + ["status"]
-    df_display = df.reindex(columns=display_cols)
+    df_display = display_frame(df, display_cols)
     st.dataframe(df_display, use_container_width=True)
 
-    csv_data = df_display.to_csv(index=False).encode("utf-8")
-    st.download_button(
-        "Exportar CSV",
-        data=csv_data,
-        file_name="relatorio_atendimentos.csv",
-        mime="text/csv",
-    )
-
-
-def _parse_ts(value):
-    """Parse timestamps from numeric or string values into UTC-aware datetimes."""
-    if value is None:
-        return None
-    try:
-        if isinstance(value, (int, float)):
-            return datetime.fromtimestamp(value, tz=timezone.utc)
-        if isinstance(value, str):
-            try:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except Exception:
-                return datetime.fromtimestamp(float(value), tz=timezone.utc)
-    except Exception:
-        return None
-    return None
+    export_download(df_display, "relatorio_atendimentos", key="atendimentos_export")
 
 
 __all__ = ["render_atendimentos_dashboard"]
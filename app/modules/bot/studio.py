@@ -14,8 +14,10 @@ if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
 from app.modules.bot.monitoring import render_logs
+from app.modules.bot.performance import render_performance
 from app.modules.bot.profiles import render_profiles_tab
 from src.bot.engine import load_settings, set_bot_enabled
+from src.bot.webhook_client import is_webhook_running, record_webhook_pid, stop_webhook
 
 UVICORN_BIN = shutil.which("uvicorn")
 if UVICORN_BIN:
@@ -40,26 +42,13 @@ else:
     ]
 
 
-def _is_webhook_running() -> bool:
-    try:
-        result = subprocess.run(
-            ["pgrep", "-f", "uvicorn app.modules.bot.bot_start:app"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
-        )
-        return result.returncode == 0
-    except FileNotFoundError:
-        return False
-
-
 def _start_webhook() -> bool:
-    if _is_webhook_running():
+    if is_webhook_running():
         return False
     try:
         env = os.environ.copy()
         env["PYTHONPATH"] = f"{WORKSPACE_ROOT}{os.pathsep}{env.get('PYTHONPATH', '')}".rstrip(os.pathsep)
-        subprocess.Popen(
+        process = subprocess.Popen(
             WEBHOOK_COMMAND,
             cwd=str(WORKSPACE_ROOT),
             env=env,
@@ -67,26 +56,12 @@ def _start_webhook() -> bool:
             stderr=None,
             start_new_session=True,
         )
+        record_webhook_pid(process.pid)
         return True
     except FileNotFoundError:
         return False
 
 
-def _stop_webhook() -> bool:
-    if not _is_webhook_running():
-        return False
-    try:
-        result = subprocess.run(
-            ["pkill", "-f", "uvicorn app.modules.bot.bot_start:app"],
-            stdout=subprocess.DEVNULL,
-            stderr=subprocess.DEVNULL,
-            check=False,
-        )
-        return result.returncode == 0
-    except FileNotFoundError:
-        return False
-
-
 def _render_activation():
     """Render bot activation toggle and persist changes."""
     current = load_settings() or {}
@@ -101,31 +76,31 @@ def _render_activation():
         if started:
             st.success("Bot ativado e webhook iniciado.")
         else:
-            if _is_webhook_running():
+            if is_webhook_running():
                 st.info("Bot ativado. Webhook já está em execução.")
             else:
                 st.error("Bot ativado, mas não foi possível iniciar o webhook.")
     if col_off.button("Desativar bot", disabled=not enabled):
         set_bot_enabled(False)
-        stopped = _stop_webhook()
+        stopped = stop_webhook()
         if stopped:
             st.success("Bot desativado e webhook interrompido.")
         else:
-            if _is_webhook_running():
+            if is_webhook_running():
                 st.warning("Bot desativado, mas não foi possível interromper o webhook.")
             else:
                 st.info("Bot desativado. Webhook já estava parado.")
 
 
 def render_bot_studio_module():
-    """Render the Bot Studio tabs (profiles, logs, monitoring, activation)."""
-    tabs = st.tabs(["Perfil Bot", "Logs", "Monitoramento", "Ativação BOT"])
+    """Render the Bot Studio tabs (profiles, logs, performance, activation)."""
+    tabs = st.tabs(["Perfil Bot", "Logs", "Desempenho", "Ativação BOT"])
     with tabs[0]:
         render_profiles_tab()
     with tabs[1]:
         render_logs(limit=200)
     with tabs[2]:
-        st.info("Monitoramento em construção.")
+        render_performance()
     with tabs[3]:
         _render_activation()
 
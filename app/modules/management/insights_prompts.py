@@ -13,7 +13,7 @@ from src.utils.database import get_conn
 
 
 def _load_insight_prompts():
-    with get_conn() as conn:
+    with get_conn("load_insight_prompts") as conn:
         conn.row_factory = None
         cur = conn.cursor()
         cur.execute(
@@ -42,7 +42,7 @@ def _load_insight_prompts():
 def _get_insight_prompt(prompt_id: int):
     if prompt_id is None:
         return None
-    with get_conn() as conn:
+    with get_conn("get_insight_prompt") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -66,7 +66,7 @@ def _get_insight_prompt(prompt_id: int):
 
 
 def _save_insight_prompt(name: str, description: str, prompt_text: str, prompt_id: int = None) -> int:
-    with get_conn() as conn:
+    with get_conn("save_insight_prompt") as conn:
         cur = conn.cursor()
         if prompt_id is None:
             cur.execute(
@@ -93,7 +93,7 @@ def _save_insight_prompt(name: str, description: str, prompt_text: str, prompt_i
 def _delete_insight_prompt(prompt_id: int) -> None:
     if prompt_id is None:
         return
-    with get_conn() as conn:
+    with get_conn("delete_insight_prompt") as conn:
         cur = conn.cursor()
         cur.execute("DELETE FROM insight_prompts WHERE id = ?", (prompt_id,))
         conn.commit()
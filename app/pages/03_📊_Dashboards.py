@@ -1,7 +1,7 @@
 """Streamlit page for dashboards."""
 
 import sys
-from datetime import datetime, time, timedelta, timezone
+from datetime import datetime, time, timedelta
 from pathlib import Path
 from typing import Dict, List
 
@@ -12,11 +12,16 @@ if str(ROOT) not in sys.path:
 import altair as alt
 import pandas as pd
 import streamlit as st
-import requests
 
 from app.components.sidebar import render_sidebar
 from app.modules.bot.report import render_atendimentos_dashboard
+from src.analytics.message_store import account_key, query_conversation_rollup, record_conversations
+from src.analytics.message_types import count_message_types
+from src.analytics.metrics import fetch_chatwoot_conversations
+from src.analytics.rollups import rollup_by
 from src.bot.engine import load_prompt_profiles, load_settings
+from src.utils.http_cache import cached_get
+from src.utils.timestamps import to_local
 from src.utils.timezone import TZ
 
 
@@ -24,26 +29,10 @@ def _cw_headers(token: str) -> Dict[str, str]:
     return {"api_access_token": token, "Content-Type": "application/json"}
 
 
-def _parse_ts(value):
-    if value is None:
-        return None
-    try:
-        if isinstance(value, (int, float)):
-            return datetime.fromtimestamp(value, tz=timezone.utc)
-        if isinstance(value, str):
-            try:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except Exception:
-                return datetime.fromtimestamp(float(value), tz=timezone.utc)
-    except Exception:
-        return None
-    return None
-
-
 @st.cache_data(ttl=120, show_spinner=False)
 def _fetch_live_conversation_metrics(base_url: str, account_id: str, token: str) -> Dict:
     url = f"{base_url}/api/v2/accounts/{account_id}/live_reports/conversation_metrics"
-    resp = requests.get(url, headers=_cw_headers(token), timeout=15)
+    resp = cached_get(url, headers=_cw_headers(token), timeout=15)
     if resp.status_code >= 400:
         raise RuntimeError(f"Chatwoot respondeu {resp.status_code}: {resp.text[:200]}")
     return resp.json() or {}
@@ -52,62 +41,13 @@ def _fetch_live_conversation_metrics(base_url: str, account_id: str, token: str)
 @st.cache_data(ttl=300, show_spinner=False)
 def _fetch_grouped_conversation_metrics(base_url: str, account_id: str, token: str, group_by: str) -> List[Dict]:
     url = f"{base_url}/api/v2/accounts/{account_id}/live_reports/grouped_conversation_metrics"
-    resp = requests.get(url, params={"group_by": group_by}, headers=_cw_headers(token), timeout=15)
+    resp = cached_get(url, params={"group_by": group_by}, headers=_cw_headers(token), timeout=15)
     if resp.status_code >= 400:
         raise RuntimeError(f"Chatwoot respondeu {resp.status_code}: {resp.text[:200]}")
     data = resp.json() or []
     return data if isinstance(data, list) else []
 
 
-@st.cache_data(ttl=300, show_spinner=False)
-def _fetch_conversation_reports(
-    base_url: str,
-    account_id: str,
-    token: str,
-    since_ts: int,
-    until_ts: int,
-    timezone_offset: float,
-    report_type: str = "account",
-    report_id: int | None = None,
-    group_by: str = "day",
-) -> List[Dict]:
-    url = f"{base_url}/api/v2/accounts/{account_id}/reports"
-    params = {
-        "metric": "conversations_count",
-        "since": since_ts,
-        "until": until_ts,
-        "type": report_type,
-        "group_by": group_by,
-        "timezone_offset": timezone_offset,
-    }
-    if report_id is not None:
-        params["id"] = report_id
-    resp = requests.get(
-        url,
-        params=params,
-        headers=_cw_headers(token),
-        timeout=20,
-    )
-    if resp.status_code >= 400:
-        raise RuntimeError(f"Chatwoot respondeu {resp.status_code}: {resp.text[:200]}")
-    data = resp.json() or []
-    return data if isinstance(data, list) else []
-
-
-def _merge_report_rows(rows_list: List[List[Dict]]) -> List[Dict]:
-    merged = {}
-    for rows in rows_list:
-        for row in rows:
-            if not isinstance(row, dict):
-                continue
-            ts = row.get("timestamp")
-            if ts is None:
-                continue
-            merged.setdefault(ts, 0)
-            merged[ts] += float(row.get("value") or 0)
-    return [{"timestamp": ts, "value": merged[ts]} for ts in sorted(merged.keys())]
-
-
 def _build_date_range(start_date, end_date):
     current = start_date
     dates = []
@@ -117,20 +57,13 @@ def _build_date_range(start_date, end_date):
     return dates
 
 
-def _get_timezone_offset_hours() -> float:
-    offset = datetime.now(TZ).utcoffset()
-    if offset is None:
-        return 0.0
-    return offset.total_seconds() / 3600
-
-
 @st.cache_data(ttl=300, show_spinner=False)
 def _fetch_inboxes(base_url: str, account_id: str, token: str, max_pages: int = 5, per_page: int = 100) -> List[Dict]:
     inboxes = []
     page = 1
     while page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/inboxes"
-        resp = requests.get(
+        resp = cached_get(
             url,
             params={"page": page, "per_page": per_page},
             headers=_cw_headers(token),
@@ -155,6 +88,13 @@ def _fetch_inboxes(base_url: str, account_id: str, token: str, max_pages: int =
     return inboxes
 
 
+@st.cache_data(ttl=300, show_spinner=False)
+def _record_period_conversations(base_url: str, account_id: str, token: str, start_dt) -> int:
+    # Lista as conversas com atividade no período e as soma ao rollup (cada id conta uma vez).
+    conversations = fetch_chatwoot_conversations(base_url, account_id, token, start_dt)
+    return record_conversations(account_key(base_url, account_id), conversations)
+
+
 @st.cache_data(ttl=300, show_spinner=False)
 def _fetch_conversations_for_messages(
     base_url: str,
@@ -172,7 +112,7 @@ def _fetch_conversations_for_messages(
         params = {"page": page, "per_page": per_page, "sort": "last_activity_at", "status": "all"}
         if inbox_id is not None:
             params["inbox_id"] = inbox_id
-        resp = requests.get(
+        resp = cached_get(
             url,
             params=params,
             headers=_cw_headers(token),
@@ -187,8 +127,8 @@ def _fetch_conversations_for_messages(
         conversations.extend(payload)
         last = payload[-1]
         last_ts_raw = last.get("last_activity_at") or last.get("updated_at") or last.get("timestamp") or last.get("created_at")
-        last_dt = _parse_ts(last_ts_raw)
-        if last_dt and last_dt.astimezone(TZ) < start_dt:
+        last_dt = to_local(last_ts_raw)
+        if last_dt and last_dt < start_dt:
             break
         if len(payload) < per_page:
             break
@@ -196,36 +136,6 @@ def _fetch_conversations_for_messages(
     return conversations
 
 
-@st.cache_data(ttl=300, show_spinner=False)
-def _fetch_conversation_messages(
-    base_url: str,
-    account_id: str,
-    token: str,
-    conversation_id,
-    max_pages: int = 4,
-    per_page: int = 50,
-) -> List[Dict]:
-    messages = []
-    page = 1
-    while page <= max_pages:
-        url = f"{base_url}/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages"
-        resp = requests.get(
-            url,
-            params={"page": page, "per_page": per_page},
-            headers=_cw_headers(token),
-            timeout=15,
-        )
-        if resp.status_code >= 400:
-            raise RuntimeError(f"Chatwoot respondeu {resp.status_code} ao buscar mensagens: {resp.text[:200]}")
-        data = resp.json() or {}
-        payload = data.get("data", []) or data.get("payload") or []
-        if not payload:
-            break
-        messages.extend(payload)
-        page += 1
-    return messages
-
-
 @st.cache_data(ttl=300, show_spinner=False)
 def _fetch_chatwoot_users(base_url: str, account_id: str, token: str, max_pages: int = 5, per_page: int = 100) -> List[Dict]:
     endpoints = ["/users", "/agents"]
@@ -234,7 +144,7 @@ def _fetch_chatwoot_users(base_url: str, account_id: str, token: str, max_pages:
         page = 1
         while page <= max_pages:
             url = f"{base_url}/api/v1/accounts/{account_id}{endpoint}"
-            resp = requests.get(
+            resp = cached_get(
                 url,
                 params={"page": page, "per_page": per_page},
                 headers=_cw_headers(token),
@@ -267,7 +177,7 @@ def _fetch_teams(base_url: str, account_id: str, token: str, max_pages: int = 5,
     page = 1
     while page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/teams"
-        resp = requests.get(
+        resp = cached_get(
             url,
             params={"page": page, "per_page": per_page},
             headers=_cw_headers(token),
@@ -547,57 +457,21 @@ def main():
                 else:
                     start_dt = datetime.combine(start_date, time.min, tzinfo=TZ)
                     end_dt = datetime.combine(end_date, time(23, 59, 59), tzinfo=TZ)
-                    since_ts = int(start_dt.timestamp())
-                    until_ts = int(end_dt.timestamp())
-                    timezone_offset = _get_timezone_offset_hours()
+                    inbox_ids = [item.get("id") for item in (inbox_selected or []) if item.get("id")]
+                    all_inboxes = not inbox_ids or len(inbox_ids) == len(inbox_options)
                     with st.spinner("Carregando conversas por data..."):
                         try:
-                            inbox_ids = [item.get("id") for item in (inbox_selected or []) if item.get("id")]
-                            if not inbox_ids or len(inbox_ids) == len(inbox_options):
-                                report_rows = _fetch_conversation_reports(
-                                    chatwoot_url,
-                                    chatwoot_account,
-                                    chatwoot_token,
-                                    since_ts,
-                                    until_ts,
-                                    timezone_offset,
-                                    report_type="account",
-                                    report_id=None,
-                                    group_by="day",
-                                )
-                            else:
-                                report_rows = _merge_report_rows(
-                                    [
-                                        _fetch_conversation_reports(
-                                            chatwoot_url,
-                                            chatwoot_account,
-                                            chatwoot_token,
-                                            since_ts,
-                                            until_ts,
-                                            timezone_offset,
-                                            report_type="inbox",
-                                            report_id=inbox_id,
-                                            group_by="day",
-                                        )
-                                        for inbox_id in inbox_ids
-                                    ]
-                                )
+                            _record_period_conversations(chatwoot_url, chatwoot_account, chatwoot_token, start_dt)
                         except Exception as exc:
-                            st.error(f"Falha ao buscar conversas para o gráfico: {exc}")
-                            report_rows = []
-
-                    counts = {}
-                    for row in report_rows:
-                        if not isinstance(row, dict):
-                            continue
-                        ts_val = row.get("timestamp")
-                        if ts_val is None:
-                            continue
-                        try:
-                            day = datetime.fromtimestamp(float(ts_val), tz=TZ).date()
-                        except Exception:
-                            continue
-                        counts[day] = int(row.get("value") or 0)
+                            st.error(f"Falha ao atualizar conversas do período: {exc}; usando dados salvos.")
+                    # Diário, por dia da semana e por hora saem do mesmo recorte do rollup.
+                    conversation_slice = query_conversation_rollup(
+                        account_key(chatwoot_url, chatwoot_account),
+                        start_dt.timestamp(),
+                        end_dt.timestamp(),
+                        inbox_ids=None if all_inboxes else inbox_ids,
+                    )
+                    counts = rollup_by(conversation_slice, "day", value="conversations")["conversations"].to_dict()
 
                     date_range_list = _build_date_range(start_date, end_date)
                     weekday_names = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
@@ -640,13 +514,11 @@ def main():
                         )
                     ).properties(height=280)
                     st.altair_chart(chart, use_container_width=True)
-                    if not report_rows:
+                    if conversation_slice.empty:
                         st.info("Nenhuma conversa encontrada no período selecionado.")
 
                     st.subheader("Conversas por dia")
-                    weekday_totals = {name: 0 for name in weekday_names}
-                    for day in date_range_list:
-                        weekday_totals[weekday_names[day.weekday()]] += counts.get(day, 0)
+                    weekday_totals = rollup_by(conversation_slice, "weekday", value="conversations")["conversations"].to_dict()
                     weekday_rows = [
                         {"dia_semana": name, "conversas": weekday_totals[name]}
                         for name in weekday_names
@@ -686,54 +558,7 @@ def main():
                     st.altair_chart(weekday_chart, use_container_width=True)
 
                     st.subheader("Conversas por Hora")
-                    with st.spinner("Carregando conversas por hora..."):
-                        try:
-                            inbox_ids = [item.get("id") for item in (inbox_selected or []) if item.get("id")]
-                            if not inbox_ids or len(inbox_ids) == len(inbox_options):
-                                hourly_rows = _fetch_conversation_reports(
-                                    chatwoot_url,
-                                    chatwoot_account,
-                                    chatwoot_token,
-                                    since_ts,
-                                    until_ts,
-                                    timezone_offset,
-                                    report_type="account",
-                                    report_id=None,
-                                    group_by="hour",
-                                )
-                            else:
-                                hourly_rows = _merge_report_rows(
-                                    [
-                                        _fetch_conversation_reports(
-                                            chatwoot_url,
-                                            chatwoot_account,
-                                            chatwoot_token,
-                                            since_ts,
-                                            until_ts,
-                                            timezone_offset,
-                                            report_type="inbox",
-                                            report_id=inbox_id,
-                                            group_by="hour",
-                                        )
-                                        for inbox_id in inbox_ids
-                                    ]
-                                )
-                        except Exception as exc:
-                            st.error(f"Falha ao buscar conversas por hora: {exc}")
-                            hourly_rows = []
-
-                    hourly_counts = {h: 0 for h in range(24)}
-                    for row in hourly_rows:
-                        if not isinstance(row, dict):
-                            continue
-                        ts_val = row.get("timestamp")
-                        if ts_val is None:
-                            continue
-                        try:
-                            hour = datetime.fromtimestamp(float(ts_val), tz=TZ).hour
-                        except Exception:
-                            continue
-                        hourly_counts[hour] += int(row.get("value") or 0)
+                    hourly_counts = rollup_by(conversation_slice, "hour", value="conversations")["conversations"].to_dict()
 
                     total_conversas_hora = sum(hourly_counts.values())
                     days_in_range = max(len(date_range_list), 1)
@@ -867,7 +692,7 @@ def main():
                     col_left_avg, col_mid_avg, col_right_avg = st.columns([1, 2, 1])
                     with col_mid_avg:
                         st.dataframe(avg_styler, use_container_width=True, hide_index=True)
-                    if not hourly_rows:
+                    if conversation_slice.empty:
                         st.info("Nenhuma conversa encontrada por hora no período selecionado.")
 
             st.markdown(
@@ -940,43 +765,24 @@ def main():
                         if not convs:
                             st.info("Nenhuma conversa encontrada para o período selecionado.")
                         else:
-                            total_text = 0
-                            total_audio = 0
                             progress = st.progress(0, text="Contando mensagens de texto e áudio...")
-                            total_convs = len(convs)
-                            for idx, conv in enumerate(convs, start=1):
-                                conv_id = conv.get("id") or conv.get("display_id")
-                                if conv_id is None:
-                                    continue
-                                try:
-                                    messages = _fetch_conversation_messages(
-                                        chatwoot_url,
-                                        chatwoot_account,
-                                        chatwoot_token,
-                                        conv_id,
-                                    )
-                                except Exception:
-                                    continue
-                                for msg in messages:
-                                    msg_ts_raw = msg.get("created_at") or msg.get("timestamp")
-                                    msg_dt = _parse_ts(msg_ts_raw)
-                                    if not msg_dt:
-                                        continue
-                                    msg_dt_local = msg_dt.astimezone(TZ)
-                                    if msg_dt_local < start_dt_msg or msg_dt_local > end_dt_msg:
-                                        continue
-                                    attachments = msg.get("attachments") or []
-                                    has_audio = any(
-                                        isinstance(att, dict) and att.get("file_type") == "audio"
-                                        for att in attachments
-                                    )
-                                    if has_audio:
-                                        total_audio += 1
-                                    else:
-                                        total_text += 1
-                                progress.progress(min(idx / total_convs, 1.0), text=f"Contando mensagens... ({idx}/{total_convs})")
+                            media = count_message_types(
+                                chatwoot_url,
+                                chatwoot_account,
+                                chatwoot_token,
+                                convs,
+                                start_dt_msg,
+                                end_dt_msg,
+                                on_progress=lambda done, total: progress.progress(
+                                    min(done / total, 1.0), text=f"Atualizando mensagens... ({done}/{total})"
+                                ),
+                                inbox_ids=inbox_ids_msg if 0 < len(inbox_ids_msg) < len(inbox_options) else None,
+                            )
                             progress.empty()
-
+                            if media["failed"]:
+                                st.warning(f"Não foi possível atualizar {media['failed']} conversa(s); usando dados salvos.")
+                            total_text = media["text"]
+                            total_audio = media["audio"]
                             total_messages = total_text + total_audio
                             if total_messages == 0:
                                 st.info("Nenhuma mensagem encontrada no período selecionado.")
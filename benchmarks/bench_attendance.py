@@ -0,0 +1,122 @@
+"""Benchmark: historical Atendimentos table/summary vs `src.analytics.attendance`.
+
+Run with `python -m benchmarks.bench_attendance [n_rows]` (default 1M).
+"""
+
+import random
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.analytics.attendance import REPORT_COLUMNS, attendance_frame, conversation_summary, display_frame
+from src.utils.timestamps import to_local_series
+
+
+def synthetic_inputs(n: int, n_conversations: int = 20_000, seed: int = 42):
+    """Build a message frame (as produced by `build_message_frame`) plus conversation metadata."""
+    rnd = np.random.default_rng(seed)
+    conv_ids = rnd.integers(1, n_conversations + 1, size=n)
+    created = 1_767_225_600 + rnd.integers(0, 90 * 86400, size=n)
+    msg_df = pd.DataFrame(
+        {
+            "conversation_id": conv_ids.astype(object),
+            "created_dt": to_local_series(created),
+            "message_type": rnd.integers(0, 2, size=n).astype(object),
+            "sender_type": pd.Categorical(rnd.choice(["contact", "user", "agentbot"], size=n)),
+            "content": np.where(rnd.random(n) < 0.9, "mensagem", None).astype(object),
+            "content_body": np.full(n, "", dtype=object),
+        }
+    )
+    direction = pd.Series(np.where(msg_df["message_type"] == 0, "cliente", "bot"), index=msg_df.index)
+    names = random.Random(seed)
+    conv_meta = {
+        cid: {
+            "agent": names.choice(["Ana", "Bruno", "Carla", "Não atribuído"]),
+            "status": names.choice(["open", "resolved", "pending"]),
+            "client_name": f"Cliente {cid}",
+            "inbox_id": names.randint(1, 5),
+        }
+        for cid in range(1, n_conversations + 1)
+    }
+    return msg_df, direction, conv_meta
+
+
+def legacy_table(msg_df, direction, conv_meta):
+    """Baseline: the report's original per-row lookups, lambdas and `strftime` calls."""
+    conv_ids = msg_df["conversation_id"]
+    content = msg_df["content"].fillna("")
+    df = pd.DataFrame(
+        {
+            "conversation_id": conv_ids.astype(str),
+            "client_name": conv_ids.map(lambda cid: conv_meta[cid]["client_name"]),
+            "agent": conv_ids.map(lambda cid: conv_meta[cid]["agent"]),
+            "status": conv_ids.map(lambda cid: conv_meta[cid]["status"]),
+            "inbox_id": conv_ids.map(lambda cid: conv_meta[cid]["inbox_id"]),
+            "message": content.where(content != "", msg_df["content_body"]),
+            "created_at": msg_df["created_dt"].dt.strftime("%Y-%m-%d %H:%M:%S"),
+            "created_dt": msg_df["created_dt"],
+            "direction": direction,
+            "message_type": msg_df["message_type"],
+            "sender_type": msg_df["sender_type"].astype(object),
+        }
+    ).reset_index(drop=True)
+    df["created_at_data"] = df["created_dt"].dt.strftime("%d/%m/%Y")
+    df["created_at_time"] = df["created_dt"].dt.strftime("%H:%M:%S")
+    df["created_dt_data"] = df["created_dt"].dt.strftime("%d/%m/%Y")
+    df["created_dt_time"] = df["created_dt"].dt.strftime("%H:%M:%S")
+    summary = df.groupby("conversation_id").agg(
+        primeira_mensagem=("created_dt", "min"),
+        agente=("agent", lambda x: x.dropna().iloc[0] if not x.dropna().empty else "Não atribuído"),
+        cliente=("client_name", lambda x: x.dropna().iloc[0] if not x.dropna().empty else "N/A"),
+        status=("status", lambda x: x.dropna().iloc[0] if not x.dropna().empty else "Sem status"),
+    ).reset_index()
+    summary["dia"] = summary["primeira_mensagem"].dt.date
+    summary["hora"] = summary["primeira_mensagem"].dt.strftime("%H:%M")
+    return df, summary
+
+
+def vectorized_table(msg_df, direction, conv_meta):
+    """Categorical metadata, native aggregations and on-demand formatting."""
+    df = attendance_frame(msg_df, direction, conv_meta)
+    summary = conversation_summary(df)
+    return display_frame(df, REPORT_COLUMNS), summary
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(n: int = 1_000_000):
+    msg_df, direction, conv_meta = synthetic_inputs(n)
+
+    (legacy_df, legacy_summary), legacy_elapsed = _timed(legacy_table, msg_df, direction, conv_meta)
+    (new_df, new_summary), new_elapsed = _timed(vectorized_table, msg_df, direction, conv_meta)
+    df = attendance_frame(msg_df, direction, conv_meta)
+    _, summary_elapsed = _timed(conversation_summary, df)
+    _, shown_elapsed = _timed(display_frame, df.head(1000), REPORT_COLUMNS)
+
+    pd.testing.assert_frame_equal(
+        new_df.astype(str), legacy_df[REPORT_COLUMNS].astype(str), check_dtype=False
+    )
+    pd.testing.assert_frame_equal(
+        new_summary.sort_values("conversation_id").reset_index(drop=True).astype(str),
+        legacy_summary.sort_values("conversation_id").reset_index(drop=True).astype(str),
+    )
+    print(f"linhas: {n} ({len(conv_meta)} conversas)")
+    print(f"legado (tabela + resumo):     {legacy_elapsed:.2f}s")
+    print(f"vetorizado (tabela + resumo): {new_elapsed:.2f}s ({legacy_elapsed / new_elapsed:.1f}x)")
+    print(f"só resumo por conversa:       {summary_elapsed:.2f}s")
+    print(f"formatação de 1000 linhas:    {shown_elapsed * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,180 @@
+"""Benchmark: the app's Chatwoot fetches against the fake Chatwoot (`benchmarks.fake_chatwoot`).
+
+Lists conversations, crawls their messages and fetches report series over a
+synthetic account, twice: cold (empty HTTP cache and message store) and warm
+(what a dashboard reload costs). Reports time, requests per endpoint, cache
+results, 429s and retries. Stores live in a temporary directory.
+
+Run with `python -m benchmarks.bench_chatwoot_fetch [--conversations N] [--latency S] [--rate-limit F]`.
+"""
+
+import argparse
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.chatwoot_data import generate_dataset
+from benchmarks.fake_chatwoot import start_fake_chatwoot
+from benchmarks.stub_servers import stop
+from src.utils import instrumentation
+from src.utils.timezone import TZ
+
+ACCOUNT_ID = "1"
+TOKEN = "fake"
+
+
+def use_temp_stores(tmp_dir: Path) -> None:
+    """Point the database, HTTP cache and message store at `tmp_dir`."""
+    from src.analytics import message_store
+    from src.utils import database, db_init, http_cache
+
+    db_init.DATA_DIR = tmp_dir
+    db_init.DB_PATH = database.DB_PATH = tmp_dir / "bot_config.db"
+    http_cache.CACHE_PATH = tmp_dir / "http_cache.db"
+    message_store.STORE_PATH = tmp_dir / "message_store.db"
+
+
+def _counters() -> Dict[str, Counter]:
+    """Cache results and retries recorded by this process since the last reset."""
+    cache, retries = Counter(), 0
+    for sample in instrumentation.local_samples():
+        if sample["name"] == "chatwoot_cache_total":
+            cache[sample["labels"].get("result")] += int(sample["value"])
+        elif sample["name"] == "chatwoot_retries_total":
+            retries += int(sample["value"])
+    return {"cache": cache, "retries": retries}
+
+
+def run_pass(url: str, state: Dict, days: int, workers: int, end_ts: float) -> Dict:
+    """One conversations + messages + reports pass; returns timings and request counts."""
+    from src.analytics.chatwoot_reports import fetch_reports, report_spec
+    from src.analytics.metrics import fetch_chatwoot_conversations
+    from src.analytics.message_types import conversation_messages
+
+    instrumentation.reset()
+    before = Counter(state["requests"])
+    throttled_before = state["throttled"]
+    start_dt = datetime.fromtimestamp(end_ts, TZ) - timedelta(days=days)
+    timings = {}
+
+    started = time.perf_counter()
+    conversations = fetch_chatwoot_conversations(url, ACCOUNT_ID, TOKEN, start_dt)
+    timings["conversations_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    messages = errors = 0
+    for _, rows, error in conversation_messages(
+        url, ACCOUNT_ID, TOKEN, conversations, start_ts=start_dt.timestamp(), max_workers=workers
+    ):
+        messages += len(rows)
+        errors += error is not None
+    timings["messages_s"] = time.perf_counter() - started
+
+    offset = datetime.fromtimestamp(end_ts, TZ).utcoffset().total_seconds() / 3600
+    inbox_ids = sorted({conv.get("inbox_id") for conv in conversations if conv.get("inbox_id")})
+    specs = [report_spec(start_dt.timestamp(), end_ts, offset)] + [
+        report_spec(start_dt.timestamp(), end_ts, offset, "inbox", inbox_id) for inbox_id in inbox_ids
+    ]
+    started = time.perf_counter()
+    try:
+        fetch_reports(url, ACCOUNT_ID, TOKEN, specs)
+    except RuntimeError:
+        # Os relatórios não passam por `call_with_backoff`: um 429 aqui é erro.
+        errors += 1
+    timings["reports_s"] = time.perf_counter() - started
+
+    requests_made = Counter(state["requests"])
+    requests_made.subtract(before)
+    return {
+        **{key: round(value, 3) for key, value in timings.items()},
+        "conversations": len(conversations),
+        "messages": messages,
+        "errors": errors,
+        "requests": +requests_made,
+        "throttled": state["throttled"] - throttled_before,
+        **_counters(),
+    }
+
+
+def bench(
+    conversations: int = 2000,
+    messages_per_conversation: int = 12,
+    days: int = 30,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    rate_limit: float = 0.0,
+    max_rps: Optional[float] = None,
+    retry_after: float = 0.2,
+    workers: int = 4,
+    seed: int = 42,
+) -> Dict:
+    """Cold and warm passes over a fresh fake account; returns both results."""
+    dataset = generate_dataset(conversations, messages_per_conversation, days=max(days, 1) * 2, seed=seed)
+    server, url, state = start_fake_chatwoot(dataset, latency, jitter, rate_limit, max_rps, retry_after, seed=seed)
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            use_temp_stores(Path(tmp))
+            cold = run_pass(url, state, days, workers, dataset["end_ts"])
+            warm = run_pass(url, state, days, workers, dataset["end_ts"])
+    finally:
+        stop(server)
+    return {"cold": cold, "warm": warm}
+
+
+def _print_pass(name: str, result: Dict) -> None:
+    total = result["conversations_s"] + result["messages_s"] + result["reports_s"]
+    print(f"{name}: {total:.2f}s")
+    print(
+        f"  conversas: {result['conversations']} em {result['conversations_s']}s  "
+        f"mensagens: {result['messages']} em {result['messages_s']}s  relatórios: {result['reports_s']}s"
+    )
+    print(
+        f"  requisições: {sum(result['requests'].values())}  429: {result['throttled']}  "
+        f"novas tentativas: {result['retries']}  erros: {result['errors']}"
+    )
+    print("  cache: " + "  ".join(f"{key}={value}" for key, value in sorted(result["cache"].items())))
+    for endpoint, count in result["requests"].most_common():
+        print(f"    {count:>7}  {endpoint}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede as buscas ao Chatwoot contra o Chatwoot falso.")
+    parser.add_argument("--conversations", type=int, default=2000, help="Conversas na conta sintética.")
+    parser.add_argument("--messages", type=int, default=12, help="Média de mensagens por conversa.")
+    parser.add_argument("--days", type=int, default=30, help="Período consultado, em dias.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência por resposta (s).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação aleatória somada à latência (s).")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fração de respostas 429.")
+    parser.add_argument("--max-rps", type=float, help="Responde 429 acima deste número de requisições por segundo.")
+    parser.add_argument("--retry-after", type=float, default=0.2, help="Retry-After enviado com os 429 (s).")
+    parser.add_argument("--workers", type=int, default=4, help="Conversas sincronizadas em paralelo.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    result = bench(
+        args.conversations,
+        args.messages,
+        args.days,
+        args.latency,
+        args.jitter,
+        args.rate_limit,
+        args.max_rps,
+        args.retry_after,
+        args.workers,
+        args.seed,
+    )
+    _print_pass("frio (cache e armazenamento vazios)", result["cold"])
+    _print_pass("quente (segunda leitura)", result["warm"])
+    return result
+
+
+if __name__ == "__main__":
+    main()
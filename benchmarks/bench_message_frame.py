@@ -0,0 +1,123 @@
+"""Benchmark: per-message loop vs columnar frame aggregation.
+
+Run with `python -m benchmarks.bench_message_frame [n_messages]` (default 1M).
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from src.analytics.message_frame import (
+    build_message_frame,
+    counts_by_hour,
+    counts_by_weekday,
+    media_counts,
+    message_totals,
+)
+from src.utils.timezone import TZ
+
+
+def synthetic_messages(n: int, seed: int = 42):
+    """Generate `n` Chatwoot-like message payloads."""
+    rnd = random.Random(seed)
+    base = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp())
+    messages = []
+    for idx in range(n):
+        created = base + rnd.randint(0, 90 * 86400)
+        msg = {
+            "id": idx,
+            "conversation_id": idx // 20,
+            "message_type": rnd.choice((0, 1, 1)),
+            "created_at": created if idx % 10 else datetime.fromtimestamp(created, tz=timezone.utc).isoformat(),
+            "status": rnd.choice(("sent", "delivered", "read")),
+            "private": rnd.random() < 0.05,
+            "content": "mensagem",
+            "sender": {"type": rnd.choice(("contact", "user", "agent_bot")), "id": rnd.randint(1, 30)},
+        }
+        if rnd.random() < 0.1:
+            msg["attachments"] = [{"file_type": "audio"}]
+        messages.append(msg)
+    return messages
+
+
+def _parse_ts(value):
+    """Copy of the historical per-value helper used by the loop baseline."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except Exception:
+                return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except Exception:
+        return None
+    return None
+
+
+def loop_aggregate(messages):
+    """Baseline: per-message Python loop with `_parse_ts` + `astimezone`."""
+    received = sent = private = audio = text = 0
+    per_hour = {h: [0, 0] for h in range(24)}
+    per_weekday = {d: [0, 0] for d in range(7)}
+    for msg in messages:
+        dt = _parse_ts(msg.get("created_at") or msg.get("timestamp"))
+        if not dt:
+            continue
+        local = dt.astimezone(TZ)
+        incoming = msg.get("message_type") in (0, "incoming")
+        received += incoming
+        sent += not incoming
+        private += bool(msg.get("private"))
+        has_audio = any(isinstance(a, dict) and a.get("file_type") == "audio" for a in msg.get("attachments") or [])
+        audio += has_audio
+        text += not has_audio
+        per_hour[local.hour][0 if incoming else 1] += 1
+        per_weekday[local.weekday()][0 if incoming else 1] += 1
+    return {"received": received, "sent": sent, "private": private, "audio": audio, "text": text}
+
+
+def frame_aggregate(messages=None, frame=None):
+    """Columnar: normalize once, then vectorized groupbys."""
+    if frame is None:
+        frame = build_message_frame(messages, details=False)
+    totals = message_totals(frame)
+    totals.update(media_counts(frame))
+    counts_by_hour(frame)
+    counts_by_weekday(frame)
+    return totals
+
+
+def main(n: int = 1_000_000):
+    messages = synthetic_messages(n)
+    start = time.perf_counter()
+    loop_result = loop_aggregate(messages)
+    loop_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = build_message_frame(messages, details=False)
+    build_elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    frame_result = frame_aggregate(frame=frame)
+    aggregate_elapsed = time.perf_counter() - start
+    frame_elapsed = build_elapsed + aggregate_elapsed
+
+    assert loop_result["received"] == frame_result["received"]
+    assert loop_result["audio"] == frame_result["audio"]
+    print(f"mensagens: {n}")
+    print(f"loop:   {loop_elapsed:.2f}s")
+    print(f"frame:  {frame_elapsed:.2f}s ({loop_elapsed / frame_elapsed:.1f}x)")
+    print(f"  normalizacao: {build_elapsed:.2f}s")
+    print(f"  agregacoes:   {aggregate_elapsed:.2f}s ({loop_elapsed / aggregate_elapsed:.1f}x sobre o frame pronto)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,166 @@
+"""Benchmark: import time of the webhook service and the Streamlit modules.
+
+Each target is imported in a fresh interpreter under `python -X importtime`;
+the report shows the wall time of the import, the heavy dependencies it
+pulled in and the modules with the largest cumulative import time. Targets
+over their budget, or importing a dependency they should load lazily, are
+flagged (exit status 1 with `--check`).
+
+Run with `python -m benchmarks.bench_startup [--repeat N] [--top N] [--check]`.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+
+HEAVY_MODULES = ("openai", "requests", "pandas", "numpy", "altair", "pytz", "fastapi", "uvicorn", "streamlit")
+# alvo -> (módulo, orçamento em ms, dependências que não deveriam ser importadas)
+TARGETS = {
+    "webhook": ("app.modules.bot.bot_start", 750, ("openai", "pandas", "numpy", "altair", "pytz")),
+    "engine": ("src.bot.engine", 60, ("openai", "requests", "pandas", "numpy")),
+    "rules": ("src.bot.rules", 60, ("openai", "requests", "pytz", "pandas", "numpy")),
+    "sidebar": ("app.components.sidebar", 400, ("openai", "requests", "pandas", "numpy", "altair")),
+    "bot_studio": ("app.modules.bot.studio", 1100, ("openai", "altair")),
+    "config": ("app.modules.bot.config_app", 400, ("openai", "requests", "pandas", "numpy", "altair")),
+    "management": ("app.modules.management.insights_prompts", 400, ("openai", "requests", "pandas", "numpy", "altair")),
+    "analytics": ("app.modules.analytics.conversations", 1300, ("openai", "altair")),
+    "metrics": ("src.analytics.metrics", 900, ("openai", "requests", "altair", "streamlit")),
+    "batch": ("src.reports.batch", 1000, ("openai", "altair", "streamlit")),
+}
+
+_CHILD = """
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+heavy = sorted(name for name in {heavy!r} if name in sys.modules)
+print(json.dumps({{"seconds": elapsed, "heavy": heavy}}))
+"""
+
+
+def _parse_importtime(stderr: str) -> Dict[str, Dict]:
+    """`{module: {"self_ms", "cumulative_ms", "depth"}}` from `-X importtime` output."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|", 2)
+        try:
+            self_ms, cumulative_ms = int(self_us) / 1000, int(cumulative_us) / 1000
+        except ValueError:
+            continue  # cabeçalho
+        stripped = name.lstrip()
+        modules[stripped.strip()] = {
+            "self_ms": self_ms,
+            "cumulative_ms": cumulative_ms,
+            "depth": (len(name) - len(stripped) - 1) // 2,
+        }
+    return modules
+
+
+def import_profile(module: str) -> Dict:
+    """Import `module` in a fresh interpreter; returns wall ms, heavy modules and the importtime breakdown."""
+    env = {**os.environ, "PYTHONPATH": str(ROOT) + os.pathsep + os.environ.get("PYTHONPATH", "")}
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", _CHILD.format(module=module, heavy=HEAVY_MODULES)],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    modules = _parse_importtime(proc.stderr)
+    if proc.returncode != 0:
+        error = [line for line in proc.stderr.splitlines() if not line.startswith("import time:")]
+        return {"module": module, "error": (error or ["falhou"])[-1], "modules": modules}
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    return {"module": module, "ms": result["seconds"] * 1000, "heavy": result["heavy"], "modules": modules}
+
+
+def audit(targets: Optional[List[str]] = None, repeat: int = 3) -> List[Dict]:
+    """Profile each target (best of `repeat` runs) and compare it with its budget."""
+    rows = []
+    for name in targets or list(TARGETS):
+        module, budget_ms, forbidden = TARGETS[name]
+        runs = [import_profile(module) for _ in range(max(1, repeat))]
+        ok_runs = [run for run in runs if "error" not in run]
+        if not ok_runs:
+            rows.append({"target": name, "module": module, "error": runs[-1]["error"], "budget_ms": budget_ms})
+            continue
+        best = min(ok_runs, key=lambda run: run["ms"])
+        unexpected = [dep for dep in best["heavy"] if dep in forbidden]
+        rows.append(
+            {
+                "target": name,
+                "module": module,
+                "ms": best["ms"],
+                "budget_ms": budget_ms,
+                "heavy": best["heavy"],
+                "unexpected": unexpected,
+                "over_budget": best["ms"] > budget_ms,
+                "modules": best["modules"],
+            }
+        )
+    return rows
+
+
+def _startup_modules() -> set:
+    """Modules the interpreter imports before running any code (site, encodings...)."""
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True, timeout=60)
+    return set(_parse_importtime(proc.stderr))
+
+
+def heaviest(modules: Dict[str, Dict], top: int = 8, exclude: Optional[set] = None) -> List[tuple]:
+    """Top-level packages by cumulative import time (excluding the project's own and `exclude`)."""
+    ranked = {}
+    for name, info in modules.items():
+        package = name.split(".", 1)[0]
+        if package in ("app", "src", "benchmarks") or name in (exclude or ()):
+            continue
+        ranked[package] = max(ranked.get(package, 0.0), info["cumulative_ms"])
+    return sorted(ranked.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede o tempo de importação do webhook e dos módulos do Streamlit.")
+    parser.add_argument("targets", nargs="*", help=f"Alvos entre {', '.join(TARGETS)} (padrão: todos).")
+    parser.add_argument("--repeat", type=int, default=3, help="Execuções por alvo; vale a melhor (padrão: 3).")
+    parser.add_argument("--top", type=int, default=6, help="Pacotes mais lentos mostrados por alvo.")
+    parser.add_argument("--check", action="store_true", help="Sai com status 1 se algum alvo estourar o orçamento.")
+    args = parser.parse_args(argv)
+    unknown = [name for name in args.targets if name not in TARGETS]
+    if unknown:
+        parser.error(f"alvo desconhecido: {', '.join(unknown)}")
+
+    rows = audit(args.targets or None, args.repeat)
+    startup = _startup_modules()
+    failed = False
+    for row in rows:
+        if "error" in row:
+            failed = True
+            print(f"{row['target']:<12} {row['module']}: erro ao importar ({row['error']})")
+            continue
+        flags = []
+        if row["over_budget"]:
+            flags.append("acima do orçamento")
+        if row["unexpected"]:
+            flags.append("importa " + ", ".join(row["unexpected"]))
+        failed = failed or bool(flags)
+        status = f"  <- {'; '.join(flags)}" if flags else ""
+        print(f"{row['target']:<12} {row['ms']:>7.0f} ms (orçamento {row['budget_ms']} ms)  {row['module']}{status}")
+        print(f"{'':<12} dependências pesadas: {', '.join(row['heavy']) or 'nenhuma'}")
+        slow = "  ".join(f"{package}={ms:.0f}ms" for package, ms in heaviest(row["modules"], args.top, startup))
+        print(f"{'':<12} mais lentos: {slow}")
+    if args.check and failed:
+        sys.exit(1)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
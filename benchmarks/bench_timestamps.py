@@ -0,0 +1,79 @@
+"""Benchmark: historical `_parse_ts` + `astimezone` vs `src.utils.timestamps`.
+
+Run with `python -m benchmarks.bench_timestamps [n_values]` (default 1M).
+"""
+
+import random
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.bench_message_frame import _parse_ts
+from src.utils.timestamps import local_field, to_local, to_local_series
+from src.utils.timezone import TZ
+
+
+def synthetic_timestamps(n: int, iso_ratio: float = 0.1, seed: int = 42):
+    """Generate `n` Chatwoot-like timestamps, mostly epoch seconds with some ISO strings."""
+    rnd = random.Random(seed)
+    base = int(datetime(2026, 1, 1, tzinfo=timezone.utc).timestamp())
+    values = []
+    for _ in range(n):
+        ts = base + rnd.randint(0, 90 * 86400)
+        if rnd.random() < iso_ratio:
+            values.append(datetime.fromtimestamp(ts, tz=timezone.utc).isoformat().replace("+00:00", "Z"))
+        else:
+            values.append(ts)
+    return values
+
+
+def legacy_hours(values):
+    """Baseline: per-value `_parse_ts` followed by `astimezone(TZ)`."""
+    hours = []
+    for value in values:
+        dt = _parse_ts(value)
+        hours.append(dt.astimezone(TZ).hour if dt else -1)
+    return hours
+
+
+def scalar_hours(values):
+    """Scalar fast path: `to_local` per value."""
+    hours = []
+    for value in values:
+        dt = to_local(value)
+        hours.append(dt.hour if dt else -1)
+    return hours
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main(n: int = 1_000_000):
+    values = synthetic_timestamps(n)
+    epochs = [v for v in values if isinstance(v, int)]
+
+    legacy, legacy_elapsed = _timed(legacy_hours, values)
+    scalar, scalar_elapsed = _timed(scalar_hours, values)
+    batch, batch_elapsed = _timed(local_field, values, "hour")
+    _, series_elapsed = _timed(to_local_series, values)
+    _, epoch_elapsed = _timed(local_field, epochs, "hour")
+
+    assert legacy == scalar == batch.tolist()
+    print(f"valores: {n} ({len(epochs)} epoch, {n - len(epochs)} ISO)")
+    print(f"_parse_ts + astimezone: {legacy_elapsed:.2f}s")
+    print(f"to_local (escalar):     {scalar_elapsed:.2f}s ({legacy_elapsed / scalar_elapsed:.1f}x)")
+    print(f"local_field (lote):     {batch_elapsed:.2f}s ({legacy_elapsed / batch_elapsed:.1f}x)")
+    print(f"to_local_series (lote): {series_elapsed:.2f}s")
+    print(f"local_field (só epoch): {epoch_elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,337 @@
+"""Benchmark: replay Chatwoot `message_created` events against the webhook.
+
+Runs `app.modules.bot.bot_start:app` under uvicorn on 127.0.0.1 with a
+throwaway database, Chatwoot and OpenAI replaced by the local stubs of
+`benchmarks.stub_servers`, and posts events at a fixed rate (open loop).
+Reports throughput, webhook ack and end-to-end reply latency percentiles,
+memory growth and duplicate replies. No network access is needed.
+
+Run with `python -m benchmarks.bench_webhook_replay [--events N] [--rate R] ...`;
+`--corpus events.jsonl` replays recorded payloads (one JSON object per line)
+instead of synthetic ones, and `--stub-client` swaps the OpenAI SDK for
+`benchmarks.stub_servers.StubOpenAIClient` (SDKs without the Responses API).
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import requests
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.stub_servers import StubOpenAIClient, chatwoot_stub, openai_stub, stop
+from src.bot.rules import is_audio_attachment
+from src.bot.runtime_metrics import percentile
+
+INBOX_ID = 89317
+ACCOUNT_ID = 1
+
+
+def synthetic_events(
+    n: int,
+    conversations: int = 200,
+    duplicate_ratio: float = 0.05,
+    nested_ratio: float = 0.3,
+    echo_ratio: float = 0.1,
+    seed: int = 42,
+) -> List[Dict]:
+    """`n` webhook payloads: client messages in flat or nested (`data`) shape.
+
+    A share of them are redeliveries of an earlier message (same id) and
+    echoes of outgoing agent messages, which the webhook must ignore.
+    """
+    rnd = random.Random(seed)
+    events: List[Dict] = []
+    for idx in range(n):
+        if events and rnd.random() < duplicate_ratio:
+            events.append(json.loads(json.dumps(rnd.choice(events))))
+            continue
+        conversation_id = rnd.randint(1, conversations)
+        message = {
+            "id": 1_000_000 + idx,
+            "content": f"Olá, preciso de ajuda com o pedido {rnd.randint(1000, 9999)}.",
+            "message_type": 1 if rnd.random() < echo_ratio else 0,
+            "private": False,
+            "attachments": [],
+            "sender": {"name": rnd.choice(["Ana Souza", "Bruno Lima", "Carla Dias", "Diego Alves"])},
+        }
+        if rnd.random() < nested_ratio:
+            events.append(
+                {
+                    "event": "message_created",
+                    "data": {**message, "conversation_id": conversation_id, "inbox_id": INBOX_ID},
+                }
+            )
+        else:
+            events.append(
+                {"event": "message_created", **message, "conversation": {"id": conversation_id, "inbox_id": INBOX_ID}}
+            )
+    return events
+
+
+def load_corpus(path: str) -> List[Dict]:
+    """Recorded webhook payloads, one JSON object per line."""
+    with open(path, encoding="utf-8") as handle:
+        return [json.loads(line) for line in handle if line.strip()]
+
+
+def event_fields(event: Dict) -> Dict:
+    """Fields the webhook reads from either payload shape (see `_processar_webhook`)."""
+    conversation = event.get("conversation") or {}
+    nested = event.get("data") or {}
+    source = event if conversation.get("id") else nested
+    return {
+        "message_id": event.get("id") or event.get("message_id") or nested.get("id") or nested.get("message_id"),
+        "conversation_id": conversation.get("id") or nested.get("conversation_id"),
+        "inbox_id": conversation.get("inbox_id") or nested.get("inbox_id"),
+        "message_type": source.get("message_type"),
+        "private": source.get("private"),
+        "content": source.get("content"),
+        "attachments": source.get("attachments") or [],
+    }
+
+
+def expects_reply(event: Dict) -> bool:
+    """Whether the bot should post something for this event (outside business hours)."""
+    fields = event_fields(event)
+    audio = any(is_audio_attachment(att) for att in fields["attachments"])
+    return (
+        event.get("event") == "message_created"
+        and fields["message_type"] in (0, "incoming")
+        and fields["private"] is False
+        and bool(fields["conversation_id"])
+        and bool(fields["content"] or audio)
+    )
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as handle:
+            return int(handle.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _prepare_app(tmp_dir: Path, chatwoot_url: str, openai_url: str, inbox_id, moderation: bool):
+    """Point the bot at a throwaway database and the stubs; returns the bot_start module."""
+    os.environ.update(
+        OPENAI_API_KEY="stub",
+        OPENAI_BASE_URL=openai_url,
+        ALLOWED_INBOX_ID=str(inbox_id),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+    )
+    from src.utils import database, db_init
+
+    db_init.DATA_DIR = tmp_dir
+    db_init.DB_PATH = database.DB_PATH = tmp_dir / "bot_config.db"
+
+    from app.modules.bot import bot_start
+    from src.bot.engine import save_settings
+
+    save_settings(
+        {
+            "system_prompt": "Você é um assistente de testes.",
+            "provider": "openai",
+            "model": "gpt-4.1-mini",
+            "vector_store_id": None,
+            "chatwoot_url": chatwoot_url,
+            "chatwoot_api_token": "stub",
+            "chatwoot_account_id": str(ACCOUNT_ID),
+            "horario_inicio": 8,
+            "horario_fim": 18,
+            "dias_funcionamento": [],
+            "bot_enabled": True,
+            # Nenhum dia habilitado: sempre "fora do horário", então o bot sempre responde.
+            "schedule": {str(day): {"enabled": False} for day in range(7)},
+            "providers": {},
+            "moderation_enabled": moderation,
+        }
+    )
+    return bot_start
+
+
+def _start_uvicorn(app):
+    import uvicorn
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, thread, f"http://127.0.0.1:{port}"
+
+
+def _percentiles_ms(values: List[float]) -> Dict:
+    return {f"p{pct}": round(percentile(values, pct) * 1000, 1) if values else None for pct in (50, 95, 99)}
+
+
+def replay(
+    events: List[Dict],
+    rate: float = 50.0,
+    workers: int = 16,
+    chatwoot_latency: float = 0.05,
+    openai_latency: float = 0.5,
+    jitter: float = 0.0,
+    moderation: bool = False,
+    settle_timeout: float = 30.0,
+    stub_client: bool = False,
+) -> Dict:
+    """Post `events` at `rate` per second (0 = as fast as possible) and wait for the replies.
+
+    With `stub_client` the bot calls the OpenAI stub through `StubOpenAIClient`
+    instead of the SDK.
+    """
+    chatwoot_server, chatwoot_url, chatwoot_state = chatwoot_stub(chatwoot_latency, jitter)
+    openai_server, openai_url = openai_stub(openai_latency, jitter)
+    inboxes = Counter(event_fields(event)["inbox_id"] for event in events)
+    inbox_id = inboxes.most_common(1)[0][0] if inboxes else INBOX_ID
+    tmp_dir = Path(tempfile.mkdtemp(prefix="webhook_replay_"))
+    bot_start = _prepare_app(tmp_dir, chatwoot_url, openai_url, inbox_id, moderation)
+    previous_client = bot_start.client
+    bot_start.client = StubOpenAIClient(openai_url) if stub_client else None
+    server, thread, webhook_url = _start_uvicorn(bot_start.app)
+
+    expected: Dict[str, List[float]] = defaultdict(list)  # conversa -> envios que pedem resposta
+    seen_ids = set()
+    acks: List[float] = []
+    errors = Counter()
+    lock = threading.Lock()
+    session = requests.Session()
+    session.mount("http://", requests.adapters.HTTPAdapter(pool_maxsize=workers))
+
+    def send(event: Dict) -> None:
+        fields = event_fields(event)
+        started = time.monotonic()
+        with lock:
+            if expects_reply(event) and fields["message_id"] not in seen_ids:
+                seen_ids.add(fields["message_id"])
+                expected[str(fields["conversation_id"])].append(started)
+        try:
+            resp = session.post(f"{webhook_url}/webhook", json=event, timeout=30)
+            key = None if resp.status_code == 200 else f"http_{resp.status_code}"
+        except requests.RequestException as exc:
+            key = type(exc).__name__
+        with lock:
+            acks.append(time.monotonic() - started)
+            if key:
+                errors[key] += 1
+
+    rss_before = _rss_mb()
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for index, event in enumerate(events):
+            if rate > 0:
+                delay = started + index / rate - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            pool.submit(send, event)
+    sent_elapsed = time.monotonic() - started
+
+    total_expected = sum(len(times) for times in expected.values())
+    deadline = time.monotonic() + settle_timeout
+    while len(chatwoot_state["replies"]) < total_expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    time.sleep(min(0.5, settle_timeout))  # respostas atrasadas/duplicadas
+    elapsed = max(reply[2] for reply in chatwoot_state["replies"]) - started if chatwoot_state["replies"] else sent_elapsed
+    rss_after = _rss_mb()
+
+    replies_by_conversation: Dict[str, List[float]] = defaultdict(list)
+    for conversation_id, _content, received in chatwoot_state["replies"]:
+        replies_by_conversation[conversation_id].append(received)
+    end_to_end = []
+    duplicates = missing = 0
+    for conversation_id in set(expected) | set(replies_by_conversation):
+        sends = sorted(expected.get(conversation_id, []))
+        replies = sorted(replies_by_conversation.get(conversation_id, []))
+        duplicates += max(0, len(replies) - len(sends))
+        missing += max(0, len(sends) - len(replies))
+        # Pareamento em ordem dentro da conversa: i-ésimo envio -> i-ésima resposta.
+        end_to_end += [reply - sent for sent, reply in zip(sends, replies)]
+
+    result = {
+        "events": len(events),
+        "expected_replies": total_expected,
+        "replies": len(chatwoot_state["replies"]),
+        "duplicate_replies": duplicates,
+        "missing_replies": missing,
+        "errors": dict(errors),
+        "send_seconds": round(sent_elapsed, 2),
+        "elapsed_seconds": round(elapsed, 2),
+        "events_per_second": round(len(events) / sent_elapsed, 1) if sent_elapsed else None,
+        "replies_per_second": round(len(chatwoot_state["replies"]) / elapsed, 1) if elapsed else None,
+        "ack_ms": _percentiles_ms(acks),
+        "reply_ms": _percentiles_ms(end_to_end),
+        "rss_growth_mb": round(rss_after - rss_before, 1),
+        "history_conversations": len(bot_start.historico_conversas),
+        "history_messages": sum(len(messages) for messages in bot_start.historico_conversas.values()),
+        "processed_ids": len(bot_start.mensagens_processadas),
+    }
+
+    server.should_exit = True
+    thread.join(timeout=5)
+    bot_start.client = previous_client  # o cliente da rodada aponta para o stub, já encerrado
+    stop(chatwoot_server)
+    stop(openai_server)
+    return result
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Reenvia eventos do Chatwoot ao webhook com stubs locais.")
+    parser.add_argument("--events", type=int, default=500, help="Eventos sintéticos (padrão: 500).")
+    parser.add_argument("--corpus", help="Arquivo JSONL com payloads gravados (substitui os sintéticos).")
+    parser.add_argument("--rate", type=float, default=50.0, help="Eventos por segundo; 0 = sem limite.")
+    parser.add_argument("--workers", type=int, default=16, help="Envios simultâneos.")
+    parser.add_argument("--conversations", type=int, default=200, help="Conversas distintas nos sintéticos.")
+    parser.add_argument("--duplicates", type=float, default=0.05, help="Fração de eventos reenviados.")
+    parser.add_argument("--chatwoot-latency", type=float, default=0.05, help="Latência do stub do Chatwoot (s).")
+    parser.add_argument("--openai-latency", type=float, default=0.5, help="Latência do stub da OpenAI (s).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação aleatória somada às latências (s).")
+    parser.add_argument("--moderation", action="store_true", help="Liga a moderação (uma chamada extra à OpenAI).")
+    parser.add_argument("--stub-client", action="store_true", help="Usa um cliente OpenAI mínimo no lugar do SDK.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    if args.corpus:
+        events = load_corpus(args.corpus)
+    else:
+        events = synthetic_events(args.events, args.conversations, args.duplicates, seed=args.seed)
+    result = replay(
+        events,
+        rate=args.rate,
+        workers=args.workers,
+        chatwoot_latency=args.chatwoot_latency,
+        openai_latency=args.openai_latency,
+        jitter=args.jitter,
+        moderation=args.moderation,
+        stub_client=args.stub_client,
+    )
+
+    print(f"eventos: {result['events']} em {result['send_seconds']}s ({result['events_per_second']}/s)")
+    print(f"respostas: {result['replies']} de {result['expected_replies']} esperadas ({result['replies_per_second']}/s)")
+    print(f"  duplicadas: {result['duplicate_replies']}  faltando: {result['missing_replies']}  erros: {result['errors']}")
+    print("ack do webhook (ms):   " + "  ".join(f"{k}={v}" for k, v in result["ack_ms"].items()))
+    print("resposta ponta a ponta (ms): " + "  ".join(f"{k}={v}" for k, v in result["reply_ms"].items()))
+    print(f"memória: +{result['rss_growth_mb']} MB RSS")
+    print(
+        f"  histórico em memória: {result['history_conversations']} conversas, "
+        f"{result['history_messages']} mensagens, {result['processed_ids']} ids processados"
+    )
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Time/memory budgets and run history for the performance tests.
+
+`measure` times a callable (best and median of a few rounds, after a warm-up
+call that also records its peak traced allocation). Each measurement is
+appended to a JSONL history (`PERF_HISTORY`, default
+`data/raw/perf_history.jsonl`) with the host name, so a run can be compared
+with the median of the previous runs on the same machine: `regression`
+returns a message when it is more than `tolerance` times slower.
+
+`python -m benchmarks.budgets` summarizes the history per measurement.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import time
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+HISTORY_PATH = Path(os.getenv("PERF_HISTORY") or ROOT / "data" / "raw" / "perf_history.jsonl")
+REGRESSION_TOLERANCE = float(os.getenv("PERF_REGRESSION_TOLERANCE", "1.5"))
+HISTORY_WINDOW = 10
+
+
+def budget_scale() -> float:
+    """Multiplier for every budget (`PERF_BUDGET_SCALE`), for slower machines."""
+    return float(os.getenv("PERF_BUDGET_SCALE", "1") or 1)
+
+
+def measure(fn: Callable[[], object], rounds: int = 3, memory: bool = True) -> Dict:
+    """Run `fn` once to warm up, then `rounds` times; returns seconds (best/median) and peak MB.
+
+    With `memory`, the warm-up call runs under `tracemalloc` (which slows it
+    down too much to be timed) and gives the peak.
+    """
+    result = {}
+    if memory:
+        tracemalloc.start()
+        try:
+            fn()
+            result["peak_mb"] = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        finally:
+            tracemalloc.stop()
+    else:
+        fn()
+    samples = []
+    for _ in range(max(1, rounds)):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    result.update(seconds=min(samples), median_seconds=statistics.median(samples), rounds=len(samples))
+    return result
+
+
+def load_history(path: Optional[Path] = None) -> List[Dict]:
+    """Every recorded measurement, oldest first; unreadable lines are skipped."""
+    path = Path(path or HISTORY_PATH)
+    if not path.exists():
+        return []
+    entries = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            continue
+    return entries
+
+
+def record(name: str, result: Dict, path: Optional[Path] = None) -> Dict:
+    """Append a measurement of `name` to the history; returns the stored entry."""
+    path = Path(path or HISTORY_PATH)
+    entry = {
+        "name": name,
+        "ts": datetime.now().astimezone().isoformat(timespec="seconds"),
+        "host": platform.node(),
+        "python": platform.python_version(),
+        "seconds": round(result["seconds"], 6),
+        "peak_mb": round(result["peak_mb"], 3) if result.get("peak_mb") is not None else None,
+    }
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("a", encoding="utf-8") as fh:
+        fh.write(json.dumps(entry) + "\n")
+    return entry
+
+
+def baseline(name: str, history: List[Dict], host: Optional[str] = None, window: int = HISTORY_WINDOW) -> Optional[float]:
+    """Median seconds of the last `window` runs of `name` on `host` (default: this machine)."""
+    host = host or platform.node()
+    previous = [e["seconds"] for e in history if e.get("name") == name and e.get("host") == host]
+    return statistics.median(previous[-window:]) if previous else None
+
+
+def regression(name: str, result: Dict, history: List[Dict], tolerance: float = REGRESSION_TOLERANCE) -> Optional[str]:
+    """Message when `result` is more than `tolerance` times slower than the history's baseline."""
+    reference = baseline(name, history)
+    if not reference or result["seconds"] <= reference * tolerance:
+        return None
+    return (
+        f"{name}: {result['seconds'] * 1000:.1f} ms, {result['seconds'] / reference:.1f}x "
+        f"a mediana das execuções anteriores ({reference * 1000:.1f} ms)"
+    )
+
+
+def summarize_history(history: List[Dict], host: Optional[str] = None) -> List[Dict]:
+    """Per measurement on `host`: runs, last/median/best seconds and last peak MB."""
+    host = host or platform.node()
+    names: Dict[str, List[Dict]] = {}
+    for entry in history:
+        if entry.get("host") == host:
+            names.setdefault(entry["name"], []).append(entry)
+    rows = []
+    for name in sorted(names):
+        entries = names[name]
+        seconds = [e["seconds"] for e in entries]
+        previous = seconds[:-1][-HISTORY_WINDOW:]
+        reference = statistics.median(previous) if previous else None
+        rows.append(
+            {
+                "name": name,
+                "runs": len(entries),
+                "last_ms": seconds[-1] * 1000,
+                "median_ms": statistics.median(seconds) * 1000,
+                "best_ms": min(seconds) * 1000,
+                "peak_mb": entries[-1].get("peak_mb"),
+                "regression": bool(reference and seconds[-1] > reference * REGRESSION_TOLERANCE),
+            }
+        )
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resume o histórico dos testes de desempenho.")
+    parser.add_argument("--history", default=str(HISTORY_PATH), help="Arquivo JSONL do histórico.")
+    parser.add_argument("--host", help="Máquina a resumir (padrão: esta).")
+    args = parser.parse_args(argv)
+
+    rows = summarize_history(load_history(Path(args.history)), args.host)
+    if not rows:
+        print(f"Nenhuma medição em {args.history}.")
+        return rows
+    print(f"{'medição':<32} {'execuções':>9} {'última':>10} {'mediana':>10} {'melhor':>10} {'pico MB':>8}")
+    for row in rows:
+        peak = f"{row['peak_mb']:.1f}" if row["peak_mb"] is not None else "—"
+        flag = "  <- regressão" if row["regression"] else ""
+        print(
+            f"{row['name']:<32} {row['runs']:>9} {row['last_ms']:>8.1f}ms {row['median_ms']:>8.1f}ms "
+            f"{row['best_ms']:>8.1f}ms {peak:>8}{flag}"
+        )
+    return rows
+
+
+if __name__ == "__main__":
+    main()
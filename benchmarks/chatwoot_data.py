@@ -0,0 +1,251 @@
+"""Seedable synthetic Chatwoot account: inboxes, agents, teams, conversations, messages.
+
+Payloads follow the Chatwoot 4.9.1 jbuilder views (see `code_chatwoot_4.9.1/app/views/api/v1`).
+Conversations are generated up front; their messages are generated on
+demand from the seed and the conversation id (`conversation_messages`), so
+accounts with millions of messages cost only what is actually requested.
+The same seed and volumes always produce the same data.
+"""
+
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from src.utils.timezone import TZ
+
+STATUS_WEIGHTS = {"resolved": 0.7, "open": 0.18, "pending": 0.08, "snoozed": 0.04}
+CHANNELS = ("Channel::Whatsapp", "Channel::Api", "Channel::WebWidget", "Channel::Email")
+FIRST_NAMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Fábio", "Gabriela", "Heitor", "Isabela", "João")
+LAST_NAMES = ("Souza", "Lima", "Dias", "Alves", "Costa", "Rocha", "Melo", "Pereira", "Gomes", "Ribeiro")
+LABELS = ("pedido", "troca", "financeiro", "entrega", "cadastro", "reclamacao")
+CLIENT_TEXTS = (
+    "Olá, preciso de ajuda com o pedido {n}.",
+    "Meu pedido {n} ainda não chegou, podem verificar?",
+    "Quero trocar o produto do pedido {n}.",
+    "Como faço para emitir a segunda via do boleto?",
+    "Obrigado!",
+    "Vocês abrem no sábado?",
+)
+AGENT_TEXTS = (
+    "Olá! Vou verificar o pedido {n} para você.",
+    "O pedido {n} foi enviado e deve chegar em até 3 dias úteis.",
+    "A troca foi aprovada; enviamos as instruções por e-mail.",
+    "Posso ajudar em algo mais?",
+    "A segunda via está disponível na área do cliente.",
+)
+ATTACHMENTS = (
+    {"file_type": "audio", "extension": "ogg"},
+    {"file_type": "image", "extension": "jpg"},
+    {"file_type": "file", "extension": "pdf"},
+)
+
+
+def _person(rnd: random.Random) -> str:
+    return f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+
+
+def generate_dataset(
+    conversations: int = 1000,
+    messages_per_conversation: int = 12,
+    inboxes: int = 3,
+    agents: int = 8,
+    teams: int = 2,
+    days: int = 90,
+    end_ts: Optional[float] = None,
+    account_id: int = 1,
+    seed: int = 42,
+) -> Dict:
+    """Build a synthetic account with `conversations` conversations over the last `days` days.
+
+    Message counts per conversation vary around `messages_per_conversation`.
+    Internal bookkeeping keys of each conversation start with `_` and are
+    stripped by `conversation_payload`.
+    """
+    rnd = random.Random(seed)
+    end_ts = int(end_ts if end_ts is not None else datetime.now(TZ).timestamp())
+    start_ts = end_ts - days * 86400
+    inbox_list = [
+        {"id": idx, "name": f"Caixa {idx}", "channel_type": CHANNELS[(idx - 1) % len(CHANNELS)], "account_id": account_id}
+        for idx in range(1, inboxes + 1)
+    ]
+    agent_list = []
+    for idx in range(1, agents + 1):
+        name = _person(rnd)
+        agent_list.append(
+            {
+                "id": idx,
+                "account_id": account_id,
+                "availability_status": rnd.choice(("online", "busy", "offline")),
+                "auto_offline": True,
+                "confirmed": True,
+                "email": f"agente{idx}@example.com",
+                "provider": "email",
+                "available_name": name,
+                "name": name,
+                "role": "administrator" if idx == 1 else "agent",
+                "thumbnail": "",
+            }
+        )
+    team_list = [
+        {"id": idx, "name": f"Equipe {idx}", "description": "", "allow_auto_assign": True, "account_id": account_id}
+        for idx in range(1, teams + 1)
+    ]
+
+    statuses, weights = zip(*STATUS_WEIGHTS.items())
+    conversation_list = []
+    next_message_id = 1
+    for display_id in range(1, conversations + 1):
+        created_at = rnd.randint(start_ts, end_ts - 60)
+        last_activity_at = min(end_ts, created_at + int(rnd.expovariate(1 / 7200)) + 60)
+        n_messages = max(1, int(rnd.gauss(messages_per_conversation, messages_per_conversation / 3)))
+        incoming = max(1, round(n_messages * rnd.uniform(0.4, 0.6)))
+        status = rnd.choices(statuses, weights)[0]
+        assignee = rnd.choice(agent_list) if agent_list and rnd.random() < 0.85 else None
+        team = rnd.choice(team_list) if team_list and rnd.random() < 0.5 else None
+        contact_id = rnd.randint(1, max(1, conversations // 2))
+        contact_rnd = random.Random(seed * 7919 + contact_id)
+        inbox = rnd.choice(inbox_list) if inbox_list else {}
+        conversation_list.append(
+            {
+                "id": display_id,
+                "account_id": account_id,
+                "uuid": str(uuid.UUID(int=rnd.getrandbits(128), version=4)),
+                "inbox_id": inbox.get("id"),
+                "status": status,
+                "created_at": created_at,
+                "updated_at": float(last_activity_at),
+                "timestamp": last_activity_at,
+                "last_activity_at": last_activity_at,
+                "first_reply_created_at": created_at + rnd.randint(30, 3600) if n_messages > incoming else 0,
+                "waiting_since": created_at if status == "open" else 0,
+                "agent_last_seen_at": last_activity_at,
+                "assignee_last_seen_at": last_activity_at if assignee else 0,
+                "contact_last_seen_at": last_activity_at,
+                "priority": rnd.choice((None, None, None, "low", "medium", "high")),
+                "labels": rnd.sample(LABELS, rnd.randint(0, 2)),
+                "unread_count": 0 if status == "resolved" else rnd.randint(0, 3),
+                "muted": False,
+                "can_reply": True,
+                "snoozed_until": None,
+                "sla_policy_id": None,
+                "additional_attributes": {},
+                "custom_attributes": {},
+                "meta": {
+                    "sender": {
+                        "id": contact_id,
+                        "name": _person(contact_rnd),
+                        "phone_number": f"+55119{contact_id:08d}",
+                        "email": None,
+                        "identifier": None,
+                        "thumbnail": "",
+                        "type": "contact",
+                    },
+                    "channel": inbox.get("channel_type"),
+                    "assignee": assignee,
+                    "assignee_type": "User" if assignee else None,
+                    "team": team,
+                    "hmac_verified": False,
+                },
+                "_first_message_id": next_message_id,
+                "_messages": n_messages,
+                "_incoming": incoming,
+            }
+        )
+        # Conversas resolvidas ganham uma mensagem de atividade no fim.
+        next_message_id += n_messages + (status == "resolved")
+    return {
+        "seed": seed,
+        "account": {"id": account_id, "name": "Conta de testes", "locale": "pt_BR", "status": "active"},
+        "inboxes": inbox_list,
+        "agents": agent_list,
+        "teams": team_list,
+        "conversations": conversation_list,
+        "end_ts": end_ts,
+    }
+
+
+def conversation_messages(dataset: Dict, conversation: Dict) -> List[Dict]:
+    """Messages of `conversation`, oldest first, in the `api/v1/models/_message` shape.
+
+    Ids are consecutive per conversation and increase with time, like in
+    Chatwoot; the first message is always the client's.
+    """
+    rnd = random.Random(dataset["seed"] * 1_000_003 + conversation["id"])
+    n_messages, incoming = conversation["_messages"], conversation["_incoming"]
+    kinds = [0] * (incoming - 1) + [1] * (n_messages - incoming)
+    rnd.shuffle(kinds)
+    kinds = [0] + kinds
+    start, end = conversation["created_at"], conversation["last_activity_at"]
+    contact = conversation["meta"]["sender"]
+    assignee = conversation["meta"]["assignee"]
+    order_number = rnd.randint(10000, 99999)
+    messages = []
+    for index, message_type in enumerate(kinds):
+        created_at = start + (end - start) * index // max(1, n_messages - 1)
+        private = message_type == 1 and rnd.random() < 0.05
+        if message_type == 0:
+            sender = {"id": contact["id"], "name": contact["name"], "type": "contact"}
+            content = rnd.choice(CLIENT_TEXTS).format(n=order_number)
+        elif assignee and rnd.random() < 0.8:
+            sender = {"id": assignee["id"], "name": assignee["name"], "available_name": assignee["name"], "type": "user"}
+            content = rnd.choice(AGENT_TEXTS).format(n=order_number)
+        else:
+            sender = {"id": 1, "name": "Galo Bot", "type": "agent_bot"}
+            content = rnd.choice(AGENT_TEXTS).format(n=order_number)
+        message = {
+            "id": conversation["_first_message_id"] + index,
+            "content": content,
+            "inbox_id": conversation["inbox_id"],
+            "conversation_id": conversation["id"],
+            "message_type": message_type,
+            "content_type": "text",
+            "status": "sent" if message_type == 0 else rnd.choice(("sent", "delivered", "read")),
+            "content_attributes": {},
+            "created_at": created_at,
+            "private": private,
+            "source_id": None,
+            "sender": sender,
+        }
+        if message_type == 0 and rnd.random() < 0.06:
+            attachment = rnd.choice(ATTACHMENTS)
+            message["content"] = None
+            message["attachments"] = [
+                {
+                    "id": message["id"],
+                    "message_id": message["id"],
+                    "file_type": attachment["file_type"],
+                    "account_id": conversation["account_id"],
+                    "extension": attachment["extension"],
+                    "data_url": f"https://chatwoot.example.com/anexo/{message['id']}.{attachment['extension']}",
+                    "thumb_url": "",
+                    "file_size": rnd.randint(10_000, 900_000),
+                }
+            ]
+        messages.append(message)
+    if conversation["status"] == "resolved":
+        messages.append(
+            {
+                "id": conversation["_first_message_id"] + n_messages,
+                "content": "Conversa foi marcada como resolvida",
+                "inbox_id": conversation["inbox_id"],
+                "conversation_id": conversation["id"],
+                "message_type": 2,
+                "content_type": "text",
+                "status": "sent",
+                "content_attributes": {},
+                "created_at": end,
+                "private": False,
+                "source_id": None,
+            }
+        )
+    return messages
+
+
+def conversation_payload(dataset: Dict, conversation: Dict) -> Dict:
+    """Conversation as listed by the API: public fields plus its last message."""
+    payload = {key: value for key, value in conversation.items() if not key.startswith("_")}
+    messages = conversation_messages(dataset, conversation)
+    payload["messages"] = messages[-1:]
+    payload["last_non_activity_message"] = next((m for m in reversed(messages) if m["message_type"] != 2), None)
+    return payload
@@ -0,0 +1,379 @@
+"""Fake Chatwoot API over a synthetic account (`benchmarks.chatwoot_data`).
+
+Implements the endpoints the app reads, with the paging and filters of
+Chatwoot 4.9.1 (`ConversationFinder`, `MessageFinder`, v2 reports and live
+reports): conversations come 25 per page whatever `per_page` says, messages
+20 at a time before `before`, and GET responses carry ETags. Latency,
+jitter and 429 responses (a random share and/or above a request rate) are
+configurable, so analytics code can be benchmarked and regression-tested
+offline.
+
+Run standalone with `python -m benchmarks.fake_chatwoot --port 3000` and point
+the app's Chatwoot URL at it (any token, account id 1).
+"""
+
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from benchmarks.chatwoot_data import conversation_messages, conversation_payload, generate_dataset
+from benchmarks.stub_servers import serve, stop
+from src.utils.instrumentation import endpoint_label
+
+PAGE_SIZE = 25
+MESSAGES_BEFORE_LIMIT = 20
+MESSAGES_AFTER_LIMIT = 100
+CURRENT_USER_ID = 1  # "mine" / assignee_type=me
+SORT_OPTIONS = {
+    "last_activity_at_asc": ("last_activity_at", False),
+    "last_activity_at_desc": ("last_activity_at", True),
+    "created_at_asc": ("created_at", False),
+    "created_at_desc": ("created_at", True),
+    "priority_asc": ("priority", False),
+    "priority_desc": ("priority", True),
+    "waiting_since_asc": ("waiting_since", False),
+    "waiting_since_desc": ("waiting_since", True),
+    "latest": ("last_activity_at", True),
+    "sort_on_created_at": ("created_at", False),
+    "sort_on_priority": ("priority", True),
+    "sort_on_waiting_since": ("waiting_since", False),
+}
+PRIORITY_RANK = {None: 0, "low": 1, "medium": 2, "high": 3, "urgent": 4}
+REPORT_METRICS = ("conversations_count", "incoming_messages_count", "outgoing_messages_count", "resolutions_count")
+
+
+def _first(query: Dict, name: str, default=None):
+    values = query.get(name)
+    return values[0] if values else default
+
+
+def _assignee_id(conv: Dict) -> Optional[int]:
+    return (conv["meta"].get("assignee") or {}).get("id")
+
+
+def _team_id(conv: Dict) -> Optional[int]:
+    return (conv["meta"].get("team") or {}).get("id")
+
+
+def _scope(conversations: List[Dict], query: Dict, status_default: Optional[str] = "open") -> List[Dict]:
+    """Status/inbox/team filters of `ConversationFinder` (before the assignee filter)."""
+    status = _first(query, "status", status_default)
+    inbox_id = _first(query, "inbox_id")
+    team_id = _first(query, "team_id")
+    result = conversations
+    if status and status != "all":
+        result = [c for c in result if c["status"] == status]
+    if inbox_id:
+        result = [c for c in result if str(c["inbox_id"]) == str(inbox_id)]
+    if team_id:
+        result = [c for c in result if str(_team_id(c)) == str(team_id)]
+    return result
+
+
+def _counts(scope: List[Dict]) -> Dict:
+    assigned = sum(1 for c in scope if _assignee_id(c))
+    return {
+        "mine_count": sum(1 for c in scope if _assignee_id(c) == CURRENT_USER_ID),
+        "assigned_count": assigned,
+        "unassigned_count": len(scope) - assigned,
+        "all_count": len(scope),
+    }
+
+
+def _bucket_start(ts: float, group_by: str, tz: timezone) -> int:
+    moment = datetime.fromtimestamp(ts, tz)
+    if group_by == "hour":
+        moment = moment.replace(minute=0, second=0, microsecond=0)
+    else:
+        moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        if group_by == "week":
+            moment -= timedelta(days=moment.weekday())
+        elif group_by == "month":
+            moment = moment.replace(day=1)
+        elif group_by == "year":
+            moment = moment.replace(month=1, day=1)
+    return int(moment.timestamp())
+
+
+def _report_series(conversations: List[Dict], query: Dict) -> List[Dict]:
+    """Count timeseries of `/api/v2/accounts/:id/reports`, zero-filled over [since, until].
+
+    Message counts are attributed to the conversation's creation time.
+    """
+    metric = _first(query, "metric", "conversations_count")
+    if metric not in REPORT_METRICS:
+        return []
+    since, until = int(float(_first(query, "since", 0))), int(float(_first(query, "until", time.time())))
+    group_by = _first(query, "group_by", "day")
+    tz = timezone(timedelta(hours=float(_first(query, "timezone_offset", 0))))
+    report_type, report_id = _first(query, "type", "account"), _first(query, "id")
+    if report_type == "inbox":
+        conversations = [c for c in conversations if str(c["inbox_id"]) == str(report_id)]
+    elif report_type == "agent":
+        conversations = [c for c in conversations if str(_assignee_id(c)) == str(report_id)]
+    elif report_type == "team":
+        conversations = [c for c in conversations if str(_team_id(c)) == str(report_id)]
+    elif report_type == "label":
+        conversations = [c for c in conversations if report_id in c["labels"]]
+
+    step = 3600 if group_by == "hour" else 86400
+    buckets = dict.fromkeys(sorted({_bucket_start(ts, group_by, tz) for ts in range(since, until + 1, step)}), 0)
+    for conv in conversations:
+        if metric == "resolutions_count":
+            if conv["status"] != "resolved":
+                continue
+            ts, amount = conv["last_activity_at"], 1
+        else:
+            ts = conv["created_at"]
+            amount = {
+                "conversations_count": 1,
+                "incoming_messages_count": conv["_incoming"],
+                "outgoing_messages_count": conv["_messages"] - conv["_incoming"],
+            }[metric]
+        if since <= ts <= until:
+            bucket = _bucket_start(ts, group_by, tz)
+            buckets[bucket] = buckets.get(bucket, 0) + amount
+    return [{"value": value, "timestamp": ts} for ts, value in sorted(buckets.items())]
+
+
+def _rate_gate(state: Dict, rate_limit: float, max_rps: Optional[float], retry_after: Optional[float], seed: int):
+    """Count every request and answer 429 for a random share and/or above `max_rps`."""
+    rnd = random.Random(seed)
+    window: List[float] = []
+
+    def gate(method: str, path: str):
+        now = time.monotonic()
+        with state["lock"]:
+            state["requests"][f"{method} {endpoint_label(path)}"] += 1
+            throttled = rate_limit > 0 and rnd.random() < rate_limit
+            if max_rps:
+                while window and now - window[0] >= 1.0:
+                    window.pop(0)
+                if len(window) >= max_rps:
+                    throttled = True
+                else:
+                    window.append(now)
+            if throttled:
+                state["throttled"] += 1
+        if not throttled:
+            return None
+        headers = {"Retry-After": retry_after} if retry_after is not None else {}
+        return 429, b"Retry later\n", headers
+
+    return gate
+
+
+def start_fake_chatwoot(
+    dataset: Optional[Dict] = None,
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    rate_limit: float = 0.0,
+    max_rps: Optional[float] = None,
+    retry_after: Optional[float] = 1.0,
+    page_size: int = PAGE_SIZE,
+    users_endpoint: bool = True,
+    port: int = 0,
+    seed: int = 42,
+) -> Tuple[object, str, Dict]:
+    """Serve `dataset` (default: `generate_dataset()`); returns (server, base URL, state).
+
+    `state["requests"]` counts requests per method and endpoint,
+    `state["throttled"]` the 429s sent and `state["posted"]` the messages
+    posted to conversations. `users_endpoint=False` reproduces 4.9.1, which
+    has no account-level `/users` (404), so callers fall back to `/agents`.
+    """
+    dataset = dataset or generate_dataset(seed=seed)
+    account_id = str(dataset["account"]["id"])
+    conversations = dataset["conversations"]
+    by_id = {conv["id"]: conv for conv in conversations}
+    state: Dict = {"requests": Counter(), "throttled": 0, "posted": [], "lock": threading.Lock()}
+    sorted_cache: Dict = {}
+
+    def account_routes(fn):
+        def route(match, query, body):
+            if match.group(1) != account_id:
+                return 404, {"error": "Resource could not be found"}
+            return fn(match, query, body)
+
+        return route
+
+    def sorted_scope(query: Dict) -> List[Dict]:
+        key = tuple(_first(query, name) for name in ("status", "inbox_id", "team_id", "assignee_type", "sort_by"))
+        if key not in sorted_cache:
+            scope = _scope(conversations, query)
+            assignee_type = _first(query, "assignee_type", "all")
+            if assignee_type == "me":
+                scope = [c for c in scope if _assignee_id(c) == CURRENT_USER_ID]
+            elif assignee_type == "unassigned":
+                scope = [c for c in scope if not _assignee_id(c)]
+            elif assignee_type == "assigned":
+                scope = [c for c in scope if _assignee_id(c)]
+            field, reverse = SORT_OPTIONS.get(_first(query, "sort_by"), SORT_OPTIONS["last_activity_at_desc"])
+            sort_key = (lambda c: PRIORITY_RANK.get(c["priority"], 0)) if field == "priority" else (lambda c: c[field])
+            sorted_cache[key] = (sorted(scope, key=sort_key, reverse=reverse), _counts(_scope(conversations, query)))
+        return sorted_cache[key]
+
+    def account(match, query, body):
+        return 200, dataset["account"]
+
+    def list_conversations(match, query, body):
+        ordered, counts = sorted_scope(query)
+        page = max(1, int(_first(query, "page", 1)))
+        chunk = ordered[(page - 1) * page_size : page * page_size]
+        return 200, {"data": {"meta": counts, "payload": [conversation_payload(dataset, c) for c in chunk]}}
+
+    def conversations_meta(match, query, body):
+        return 200, {"meta": _counts(_scope(conversations, query))}
+
+    def show_conversation(match, query, body):
+        conv = by_id.get(int(match.group(2)))
+        if conv is None:
+            return 404, {"error": "Resource could not be found"}
+        return 200, conversation_payload(dataset, conv)
+
+    def list_messages(match, query, body):
+        conv = by_id.get(int(match.group(2)))
+        if conv is None:
+            return 404, {"error": "Resource could not be found"}
+        messages = conversation_messages(dataset, conv)
+        before, after = _first(query, "before"), _first(query, "after")
+        if after and before:
+            page = [m for m in messages if int(after) <= m["id"] < int(before)][:1000]
+        elif before:
+            page = [m for m in messages if m["id"] < int(before)][-MESSAGES_BEFORE_LIMIT:]
+        elif after:
+            page = [m for m in messages if m["id"] > int(after)][:MESSAGES_AFTER_LIMIT]
+        else:
+            page = messages[-MESSAGES_BEFORE_LIMIT:]
+        meta = {
+            "labels": conv["labels"],
+            "additional_attributes": conv["additional_attributes"],
+            "contact": conv["meta"]["sender"],
+            "assignee": conv["meta"]["assignee"],
+            "agent_last_seen_at": conv["agent_last_seen_at"],
+            "assignee_last_seen_at": conv["assignee_last_seen_at"],
+        }
+        return 200, {"meta": meta, "payload": page}
+
+    def post_message(match, query, body):
+        conv_id = int(match.group(2))
+        if conv_id not in by_id:
+            return 404, {"error": "Resource could not be found"}
+        with state["lock"]:
+            state["posted"].append({"conversation_id": conv_id, **(body or {})})
+            message_id = -len(state["posted"])
+        return 200, {"id": message_id, "conversation_id": conv_id, "content": (body or {}).get("content"), "message_type": 1}
+
+    def inboxes(match, query, body):
+        return 200, {"payload": dataset["inboxes"]}
+
+    def agents(match, query, body):
+        return 200, dataset["agents"]
+
+    def users(match, query, body):
+        if not users_endpoint:
+            return 404, {"error": "Resource could not be found"}
+        return 200, dataset["agents"]
+
+    def teams(match, query, body):
+        return 200, dataset["teams"]
+
+    def reports(match, query, body):
+        return 200, _report_series(conversations, query)
+
+    def live_conversation_metrics(match, query, body):
+        scope = _scope(conversations, query, status_default=None)
+        open_scope = [c for c in scope if c["status"] == "open"]
+        return 200, {
+            "open": len(open_scope),
+            "unattended": sum(1 for c in open_scope if not c["first_reply_created_at"]),
+            "unassigned": sum(1 for c in open_scope if not _assignee_id(c)),
+            "pending": sum(1 for c in scope if c["status"] == "pending"),
+        }
+
+    def live_grouped_metrics(match, query, body):
+        group_by = _first(query, "group_by")
+        if group_by not in ("team_id", "assignee_id"):
+            return 422, {"error": "invalid group_by"}
+        key = _team_id if group_by == "team_id" else _assignee_id
+        groups: Dict = {}
+        for conv in _scope(conversations, query):
+            metric = groups.setdefault(key(conv), {"open": 0, "unattended": 0, "unassigned": 0, group_by: key(conv)})
+            metric["open"] += 1
+            metric["unattended"] += not conv["first_reply_created_at"]
+            metric["unassigned"] += not _assignee_id(conv)
+        return 200, list(groups.values())
+
+    v1 = r"/api/v1/accounts/(\d+)"
+    v2 = r"/api/v2/accounts/(\d+)"
+    routes = [
+        ("GET", v1, account),
+        ("GET", v1 + r"/conversations", list_conversations),
+        ("GET", v1 + r"/conversations/meta", conversations_meta),
+        ("GET", v1 + r"/conversations/(\d+)", show_conversation),
+        ("GET", v1 + r"/conversations/(\d+)/messages", list_messages),
+        ("POST", v1 + r"/conversations/(\d+)/messages", post_message),
+        ("GET", v1 + r"/inboxes", inboxes),
+        ("GET", v1 + r"/agents", agents),
+        ("GET", v1 + r"/users", users),
+        ("GET", v1 + r"/teams", teams),
+        ("GET", v2 + r"/reports", reports),
+        ("GET", v2 + r"/live_reports/conversation_metrics", live_conversation_metrics),
+        ("GET", v2 + r"/live_reports/grouped_conversation_metrics", live_grouped_metrics),
+    ]
+    server, url = serve(
+        [(method, pattern, account_routes(fn)) for method, pattern, fn in routes],
+        latency,
+        jitter,
+        etags=True,
+        gate=_rate_gate(state, rate_limit, max_rps, retry_after, seed),
+        port=port,
+    )
+    return server, url, state
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servidor falso do Chatwoot com dados sintéticos.")
+    parser.add_argument("--port", type=int, default=3000)
+    parser.add_argument("--conversations", type=int, default=2000, help="Conversas geradas (padrão: 2000).")
+    parser.add_argument("--messages", type=int, default=12, help="Média de mensagens por conversa.")
+    parser.add_argument("--inboxes", type=int, default=3)
+    parser.add_argument("--agents", type=int, default=8)
+    parser.add_argument("--teams", type=int, default=2)
+    parser.add_argument("--days", type=int, default=90, help="Período coberto pelas conversas.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Latência por resposta (s).")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Variação aleatória somada à latência (s).")
+    parser.add_argument("--rate-limit", type=float, default=0.0, help="Fração de respostas 429.")
+    parser.add_argument("--max-rps", type=float, help="Responde 429 acima deste número de requisições por segundo.")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args(argv)
+
+    dataset = generate_dataset(
+        args.conversations, args.messages, args.inboxes, args.agents, args.teams, args.days, seed=args.seed
+    )
+    server, url, state = start_fake_chatwoot(
+        dataset, args.latency, args.jitter, args.rate_limit, args.max_rps, port=args.port, seed=args.seed
+    )
+    print(f"Chatwoot falso em {url} (conta {dataset['account']['id']}, {len(dataset['conversations'])} conversas)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop(server)
+        print(f"requisições: {sum(state['requests'].values())} (429: {state['throttled']})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Local HTTP stubs standing in for Chatwoot and OpenAI in benchmarks.
+
+`serve` runs a `ThreadingHTTPServer` in a daemon thread and dispatches on
+(method, path regex); every response waits `latency` seconds (plus up to
+`jitter`) first, to mimic a remote API. Optionally GET responses carry an
+ETag and answer `If-None-Match` with 304, like Rails' `Rack::ETag`. Nothing
+here touches the network beyond 127.0.0.1.
+"""
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+from typing import Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import requests
+
+Route = Tuple[str, str, Callable]
+
+
+def serve(
+    routes: List[Route],
+    latency: float = 0.0,
+    jitter: float = 0.0,
+    etags: bool = False,
+    gate: Optional[Callable] = None,
+    port: int = 0,
+) -> Tuple[ThreadingHTTPServer, str]:
+    """Start a stub server; returns (server, base URL).
+
+    Each route is `(method, path_regex, fn)` where `fn(match, query, body)`
+    returns `(status, payload)` or `(status, payload, headers)`; dict/list
+    payloads are sent as JSON. `gate(method, path)` runs before the routes and
+    may answer instead of them (e.g. a 429) by returning such a tuple.
+    """
+    compiled = [(method, re.compile(pattern), fn) for method, pattern, fn in routes]
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _dispatch(self, method: str):
+            parts = urlsplit(self.path)
+            length = int(self.headers.get("Content-Length") or 0)
+            raw = self.rfile.read(length) if length else b""
+            try:
+                body = json.loads(raw) if raw else None
+            except ValueError:
+                body = None
+            if latency or jitter:
+                time.sleep(latency + random.random() * jitter)
+            result = gate(method, parts.path) if gate else None
+            if result is None:
+                result = (404, {"error": "not found"})
+                for route_method, pattern, fn in compiled:
+                    match = pattern.fullmatch(parts.path)
+                    if route_method == method and match:
+                        result = fn(match, parse_qs(parts.query), body)
+                        break
+            status, payload, headers = result if len(result) == 3 else (*result, {})
+            data = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+            if etags and method == "GET" and status == 200:
+                etag = f'W/"{hashlib.md5(data).hexdigest()}"'
+                headers = {**headers, "ETag": etag}
+                if self.headers.get("If-None-Match") == etag:
+                    status, data = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in headers.items():
+                self.send_header(name, str(value))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            self._dispatch("GET")
+
+        def do_POST(self):
+            self._dispatch("POST")
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def stop(server: ThreadingHTTPServer) -> None:
+    """Shut a stub server down."""
+    server.shutdown()
+    server.server_close()
+
+
+def chatwoot_stub(latency: float = 0.0, jitter: float = 0.0) -> Tuple[ThreadingHTTPServer, str, Dict]:
+    """Chatwoot endpoints used by the webhook; returns (server, base URL, state).
+
+    `state["replies"]` collects `(conversation_id, content, monotonic time)`
+    for every message the bot posts.
+    """
+    state: Dict = {"replies": [], "lock": threading.Lock()}
+
+    def conversation(match, query, body):
+        return 200, {"id": int(match.group(1)), "status": "open"}
+
+    def post_message(match, query, body):
+        with state["lock"]:
+            state["replies"].append((match.group(1), (body or {}).get("content"), time.monotonic()))
+            message_id = len(state["replies"])
+        return 200, {"id": message_id, "content": (body or {}).get("content"), "message_type": 1}
+
+    routes = [
+        ("GET", r"/api/v1/accounts/\d+/conversations/(\d+)", conversation),
+        ("POST", r"/api/v1/accounts/\d+/conversations/(\d+)/messages", post_message),
+    ]
+    server, url = serve(routes, latency, jitter)
+    return server, url, state
+
+
+def openai_stub(latency: float = 0.0, jitter: float = 0.0) -> Tuple[ThreadingHTTPServer, str]:
+    """OpenAI `/v1/responses` and `/v1/moderations`; returns (server, base URL ending in /v1)."""
+
+    def responses(match, query, body):
+        body = body or {}
+        prompt = json.dumps(body.get("input") or "")
+        input_tokens = max(1, len(prompt) // 4)
+        return 200, {
+            "id": f"resp_{random.getrandbits(32):08x}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": body.get("model", "gpt-4.1-mini"),
+            "status": "completed",
+            "output": [
+                {
+                    "type": "message",
+                    "id": "msg_stub",
+                    "status": "completed",
+                    "role": "assistant",
+                    "content": [{"type": "output_text", "text": "Resposta automática de teste.", "annotations": []}],
+                }
+            ],
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "usage": {"input_tokens": input_tokens, "output_tokens": 8, "total_tokens": input_tokens + 8},
+        }
+
+    def moderations(match, query, body):
+        return 200, {
+            "id": "modr_stub",
+            "model": "omni-moderation-latest",
+            "results": [{"flagged": False, "categories": {}, "category_scores": {}}],
+        }
+
+    server, url = serve([("POST", r"/v1/responses", responses), ("POST", r"/v1/moderations", moderations)], latency, jitter)
+    return server, f"{url}/v1"
+
+
+def _namespace(value):
+    if isinstance(value, dict):
+        return SimpleNamespace(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+class StubOpenAIClient:
+    """Minimal stand-in for `openai.OpenAI` that calls `openai_stub` over HTTP.
+
+    Covers only what the bot uses (`responses.create` with `output_text` and
+    `usage`, and `moderations.create`), so the webhook replay also runs with
+    SDK versions that predate the Responses API.
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip("/")
+        self.responses = SimpleNamespace(create=self._create_response)
+        self.moderations = SimpleNamespace(create=lambda **body: _namespace(self._post("/moderations", body)))
+
+    def _post(self, path: str, body: Dict) -> Dict:
+        resp = requests.post(f"{self.base_url}{path}", json=body, timeout=30)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _create_response(self, **body):
+        data = self._post("/responses", body)
+        data["output_text"] = "".join(
+            part.get("text", "")
+            for block in data.get("output") or []
+            for part in block.get("content") or []
+            if part.get("type") == "output_text"
+        )
+        return _namespace(data)
@@ -0,0 +1,237 @@
+"""Vectorized tables for the Atendimentos (attendance) report.
+
+Conversation metadata is attached through categorical codes instead of
+per-row lookups, the per-conversation summary uses native `first`/`min`
+aggregations, and the text date/time columns are only formatted for the
+columns that are actually shown or exported.
+"""
+
+from datetime import time as dt_time
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.message_frame import filter_period
+from src.utils.timestamps import to_local_wall
+
+META_DEFAULTS = {
+    "agent": "Não atribuído",
+    "client_name": "N/A",
+    "status": "Sem status",
+}
+# Colunas de texto derivadas de `created_dt`: (parte, formato) unidas por espaço.
+DERIVED_COLUMNS = {
+    "created_at": [("date", "%Y-%m-%d"), ("time", "%H:%M:%S")],
+    "created_at_data": [("date", "%d/%m/%Y")],
+    "created_at_time": [("time", "%H:%M:%S")],
+    "created_dt_data": [("date", "%d/%m/%Y")],
+    "created_dt_time": [("time", "%H:%M:%S")],
+}
+# Ordem das colunas oferecidas para visualizar/exportar.
+REPORT_COLUMNS = [
+    "conversation_id",
+    "client_name",
+    "agent",
+    "status",
+    "inbox_id",
+    "message",
+    "created_at",
+    "created_dt",
+    "direction",
+    "message_type",
+    "sender_type",
+    "created_at_data",
+    "created_at_time",
+    "created_dt_data",
+    "created_dt_time",
+]
+_NS_PER_SECOND = 1_000_000_000
+_NS_PER_DAY = 86_400 * _NS_PER_SECOND
+
+
+def _meta_column(codes: np.ndarray, values: List) -> pd.Categorical:
+    """Map per-row conversation codes to a categorical built from per-conversation values."""
+    values = pd.Series(values, dtype="object")
+    categories = pd.Index(pd.unique(values.dropna()))
+    lookup = categories.get_indexer(values)
+    row_codes = np.full(len(codes), -1, dtype=np.int64)
+    valid = codes >= 0
+    row_codes[valid] = lookup[codes[valid]]
+    return pd.Categorical.from_codes(row_codes, categories=categories)
+
+
+def conversation_meta(conversations: Iterable[Dict]) -> Dict:
+    """Return per-conversation agent/status/client/inbox metadata keyed by conversation id."""
+    meta_by_id = {}
+    for conv in conversations:
+        cid = conv.get("id") or conv.get("display_id")
+        if cid is None:
+            continue
+        meta = conv.get("meta", {}) or {}
+        assignee = meta.get("assignee") or conv.get("assignee") or {}
+        sender = meta.get("sender") or conv.get("contact") or {}
+        meta_by_id[cid] = {
+            "agent": assignee.get("name") or "Não atribuído",
+            "status": conv.get("status") or "desconhecido",
+            "client_name": sender.get("name") or sender.get("identifier") or "Cliente",
+            "inbox_id": conv.get("inbox_id"),
+        }
+    return meta_by_id
+
+
+def select_conversations(
+    conversations: Iterable[Dict],
+    conv_meta: Dict,
+    conversation_id: str = "",
+    agents: Optional[Iterable[str]] = None,
+) -> List[Dict]:
+    """Keep conversations matching the exact conversation id and the selected agents."""
+    conversation_id = (conversation_id or "").strip()
+    agents = set(agents or [])
+    selected = []
+    for conv in conversations:
+        cid = conv.get("id") or conv.get("display_id")
+        if cid not in conv_meta:
+            continue
+        if conversation_id and str(cid) != conversation_id:
+            continue
+        if agents and conv_meta[cid]["agent"] not in agents:
+            continue
+        selected.append(conv)
+    return selected
+
+
+def filter_messages(
+    msg_df: pd.DataFrame,
+    start_dt,
+    end_dt,
+    hours: Optional[Iterable[int]] = None,
+    msg_type: str = "Todas",
+):
+    """Apply the report's period/hour/message-type filters.
+
+    Returns the filtered message frame and the matching "cliente"/"bot" direction series.
+    """
+    msg_df = filter_period(msg_df, start_dt, end_dt)
+    if hours:
+        msg_df = msg_df[msg_df["created_dt"].dt.hour.isin(set(hours))]
+    is_client = (msg_df["direction"] == "incoming") | msg_df["sender_type"].astype(str).isin(["contact", "contact::inbox"])
+    direction = pd.Series(np.where(is_client, "cliente", "bot"), index=msg_df.index)
+    if msg_type == "Apenas clientes":
+        msg_df, direction = msg_df[is_client], direction[is_client]
+    elif msg_type == "Apenas bot":
+        msg_df, direction = msg_df[~is_client], direction[~is_client]
+    return msg_df, direction
+
+
+def attendance_frame(msg_df: pd.DataFrame, direction: pd.Series, conv_meta: Dict) -> pd.DataFrame:
+    """Build the report rows from a message frame and per-conversation metadata.
+
+    `conv_meta` maps conversation id to a dict with agent/status/client_name/inbox_id.
+    """
+    conv_ids = list(conv_meta)
+    codes = pd.Index(conv_ids).get_indexer(msg_df["conversation_id"])
+    content = msg_df["content"].fillna("")
+    return pd.DataFrame(
+        {
+            "conversation_id": pd.Categorical(msg_df["conversation_id"].astype(str)),
+            "client_name": _meta_column(codes, [conv_meta[cid].get("client_name") for cid in conv_ids]),
+            "agent": _meta_column(codes, [conv_meta[cid].get("agent") for cid in conv_ids]),
+            "status": _meta_column(codes, [conv_meta[cid].get("status") for cid in conv_ids]),
+            "inbox_id": _meta_column(codes, [conv_meta[cid].get("inbox_id") for cid in conv_ids]),
+            "message": content.where(content != "", msg_df["content_body"]).to_numpy(),
+            "created_dt": msg_df["created_dt"].array,
+            "direction": pd.Categorical(np.asarray(direction), categories=["cliente", "bot"]),
+            "message_type": msg_df["message_type"].to_numpy(),
+            "sender_type": msg_df["sender_type"].to_numpy(),
+        }
+    )
+
+
+def conversation_summary(df: pd.DataFrame) -> pd.DataFrame:
+    """Return first message time plus first non-null agent/client/status per conversation."""
+    grouped = df.groupby("conversation_id", observed=True, sort=True)
+    summary = pd.DataFrame(
+        {
+            "primeira_mensagem": grouped["created_dt"].min(),
+            "agente": grouped["agent"].first(),
+            "cliente": grouped["client_name"].first(),
+            "status": grouped["status"].first(),
+        }
+    )
+    for column, key in (("agente", "agent"), ("cliente", "client_name"), ("status", "status")):
+        summary[column] = summary[column].astype(object).fillna(META_DEFAULTS[key])
+    summary = summary.reset_index()
+    summary["conversation_id"] = summary["conversation_id"].astype(str)
+    summary["dia"] = summary["primeira_mensagem"].dt.date
+    summary["hora"] = format_datetimes(summary["primeira_mensagem"], [("time", "%H:%M")])
+    return summary
+
+
+def _wall_clock(values: pd.Series):
+    """Return (day, second of day, missing) arrays for the local wall-clock time of `values`."""
+    tz = getattr(values.dt, "tz", None)
+    wall = to_local_wall(values, tz) if tz is not None else values.to_numpy(dtype="datetime64[ns]")
+    missing = np.isnat(wall)
+    ints = wall.view(np.int64)
+    day = np.where(missing, 0, ints // _NS_PER_DAY)
+    second = np.where(missing, 0, (ints % _NS_PER_DAY) // _NS_PER_SECOND)
+    return day, second, missing
+
+
+def _format_parts(clock, parts: Iterable) -> np.ndarray:
+    day, second, missing = clock
+    text = None
+    for part, fmt in parts:
+        keys = day if part == "date" else second
+        uniques, inverse = np.unique(keys, return_inverse=True)
+        if part == "date":
+            labels = pd.to_datetime(uniques * _NS_PER_DAY).strftime(fmt)
+        else:
+            labels = [dt_time(s // 3600, s // 60 % 60, s % 60).strftime(fmt) for s in uniques.tolist()]
+        piece = np.asarray(labels, dtype=object)[inverse.reshape(-1)]
+        text = piece if text is None else text + " " + piece
+    return np.where(missing, "", text)
+
+
+def format_datetimes(values: pd.Series, parts: Iterable) -> pd.Series:
+    """Format datetimes by distinct day and distinct time of day, then join the parts.
+
+    `parts` is a list of ("date" | "time", strftime format). Each distinct day
+    (or second of the day) is formatted once, so the cost no longer grows
+    with `strftime` per row. NaT becomes an empty string.
+    """
+    return pd.Series(_format_parts(_wall_clock(values), parts), index=values.index, dtype="object")
+
+
+def display_frame(df: pd.DataFrame, columns: Iterable[str]) -> pd.DataFrame:
+    """Return `columns` of the report, formatting derived text columns on demand."""
+    out = {}
+    formatted = {}
+    clock = None
+    for column in columns:
+        if column in DERIVED_COLUMNS:
+            key = tuple(DERIVED_COLUMNS[column])
+            if key not in formatted:
+                clock = clock or _wall_clock(df["created_dt"])
+                formatted[key] = _format_parts(clock, key)
+            out[column] = formatted[key]
+        elif column in df.columns:
+            out[column] = df[column]
+        else:
+            out[column] = np.full(len(df), np.nan)
+    return pd.DataFrame(out, index=df.index)
+
+
+__all__ = [
+    "DERIVED_COLUMNS",
+    "REPORT_COLUMNS",
+    "attendance_frame",
+    "conversation_meta",
+    "conversation_summary",
+    "display_frame",
+    "filter_messages",
+    "format_datetimes",
+    "select_conversations",
+]
@@ -0,0 +1,90 @@
+"""Concurrent, deduplicated fetching of Chatwoot v2 report series."""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.utils.http_cache import cached_get
+
+# (metric, type, id, group_by, since, until, timezone_offset)
+ReportSpec = Tuple[str, str, Optional[int], str, int, int, float]
+
+
+def report_spec(
+    since_ts: int,
+    until_ts: int,
+    timezone_offset: float,
+    report_type: str = "account",
+    report_id: Optional[int] = None,
+    group_by: str = "day",
+    metric: str = "conversations_count",
+) -> ReportSpec:
+    """Build a hashable description of one report request."""
+    return (metric, report_type, report_id, group_by, int(since_ts), int(until_ts), float(timezone_offset))
+
+
+def fetch_report(base_url: str, account_id: str, token: str, spec: ReportSpec) -> List[Dict]:
+    """Fetch a single report series from the Chatwoot v2 reports API."""
+    metric, report_type, report_id, group_by, since_ts, until_ts, timezone_offset = spec
+    params = {
+        "metric": metric,
+        "since": since_ts,
+        "until": until_ts,
+        "type": report_type,
+        "group_by": group_by,
+        "timezone_offset": timezone_offset,
+    }
+    if report_id is not None:
+        params["id"] = report_id
+    resp = cached_get(
+        f"{base_url}/api/v2/accounts/{account_id}/reports",
+        params=params,
+        headers={"api_access_token": token, "Content-Type": "application/json"},
+        timeout=20,
+    )
+    if resp.status_code >= 400:
+        raise RuntimeError(f"Chatwoot respondeu {resp.status_code}: {resp.text[:200]}")
+    data = resp.json() or []
+    return data if isinstance(data, list) else []
+
+
+def fetch_reports(
+    base_url: str,
+    account_id: str,
+    token: str,
+    specs: Iterable[ReportSpec],
+    max_workers: int = 8,
+) -> Dict[ReportSpec, List[Dict]]:
+    """Fetch every distinct spec concurrently; identical specs are requested once.
+
+    The first failing request re-raises its exception after the pool drains.
+    """
+    unique = list(dict.fromkeys(specs))
+    if not unique:
+        return {}
+    if len(unique) == 1:
+        return {unique[0]: fetch_report(base_url, account_id, token, unique[0])}
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(unique))) as executor:
+        futures = {spec: executor.submit(fetch_report, base_url, account_id, token, spec) for spec in unique}
+    return {spec: future.result() for spec, future in futures.items()}
+
+
+def merge_report_rows(rows_list: Iterable[List[Dict]]) -> List[Dict]:
+    """Sum report series point by point (e.g. one series per inbox)."""
+    frames = [
+        pd.DataFrame([row for row in rows if isinstance(row, dict)], columns=["timestamp", "value"])
+        for rows in rows_list
+        if rows
+    ]
+    if not frames:
+        return []
+    frame = pd.concat(frames, ignore_index=True).dropna(subset=["timestamp"])
+    if frame.empty:
+        return []
+    frame["value"] = pd.to_numeric(frame["value"], errors="coerce").fillna(0.0)
+    merged = frame.groupby("timestamp", sort=True)["value"].sum()
+    return [{"timestamp": ts, "value": float(value)} for ts, value in merged.items()]
+
+
+__all__ = ["ReportSpec", "fetch_report", "fetch_reports", "merge_report_rows", "report_spec"]
@@ -0,0 +1,392 @@
+"""Conversation filtering and Análise de Conversas stats, shared by the UI and batch reports.
+
+The Streamlit tabs (`app.modules.analytics.conversations`) and the headless
+runner (`src.reports.batch`) filter conversations and summarize their
+messages through these functions, so both produce the same numbers.
+"""
+
+import json
+import os
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from src.analytics.message_frame import filter_period, message_totals, sender_labels
+from src.bot.engine import load_env_once
+from src.utils.timestamps import to_local
+
+ANALYSIS_MESSAGE_COLUMNS = [
+    "id_conversa",
+    "autor",
+    "nome do contato",
+    "numero do contato",
+    "data hora de início da conversa",
+    "caixa de entrada",
+    "tempo para a primeira resposta",
+    "status da mensagem",
+    "mensagem",
+]
+
+
+def _format_duration(start_dt: Optional[datetime], end_dt: Optional[datetime]) -> str:
+    """Return a HH:MM:SS duration string for a time delta."""
+    if not start_dt or not end_dt:
+        return ""
+    delta = end_dt - start_dt
+    total_seconds = int(delta.total_seconds())
+    if total_seconds < 0:
+        return ""
+    hours, rem = divmod(total_seconds, 3600)
+    minutes, seconds = divmod(rem, 60)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d}"
+
+
+def compile_partial_matcher(pattern: Optional[str]):
+    """Compile a partial pattern (with optional `*` wildcards) into a matcher.
+
+    Returns None when the pattern is empty, meaning "match everything".
+    """
+    pattern = (pattern or "").strip()
+    if not pattern:
+        return None
+    if "*" in pattern:
+        regex = re.compile(re.escape(pattern).replace("\\*", ".*"), re.IGNORECASE)
+        return lambda text: regex.search(text or "") is not None
+    needle = pattern.lower()
+    return lambda text: needle in (text or "").lower()
+
+
+def _normalize_conversation(conv: Dict) -> Dict:
+    """Normalize conversation payload by serializing nested values."""
+    clean = {}
+    for k, v in conv.items():
+        if isinstance(v, (dict, list)):
+            clean[k] = json.dumps(v, ensure_ascii=False)
+        else:
+            clean[k] = v
+    return clean
+
+
+def _parse_env_list(value: str) -> List[str]:
+    return [item.strip() for item in re.split(r"[;,]", value or "") if item.strip()]
+
+
+def bot_sender_config() -> Dict[str, set]:
+    """Load bot sender identifiers from environment."""
+    load_env_once()
+    names = {name.lower() for name in _parse_env_list(os.getenv("BOT_SENDER_NAMES", ""))}
+    ids = {sid for sid in _parse_env_list(os.getenv("BOT_SENDER_IDS", ""))}
+    return {"names": names, "ids": ids}
+
+
+def _compile_conversation_filter(filters: Dict) -> Dict:
+    """Pre-compile conversation filters so each pattern is parsed only once."""
+    return {
+        "conversation_id": (filters.get("conversation_id_filter") or "").strip(),
+        "inbox_ids": filters.get("selected_inbox_ids") or set(),
+        "contact_name": compile_partial_matcher(filters.get("contact_name")),
+        "contact_number": compile_partial_matcher(filters.get("contact_number")),
+        "agent_id": str(filters["selected_agent_id"]) if filters.get("selected_agent_id") else None,
+        "team_id": str(filters["selected_team_id"]) if filters.get("selected_team_id") else None,
+        "assigned": filters.get("assigned_filter") or "Todos",
+        "status": filters.get("status_filter") or "Todos",
+    }
+
+
+def _conversation_record(conv: Dict, inbox_id_to_name: Dict[int, str]) -> Optional[Dict]:
+    """Parse a conversation payload once into the compact record used by filters."""
+    api_id = conv.get("id")
+    conv_id = api_id or conv.get("display_id")
+    if conv_id is None:
+        return None
+    meta = conv.get("meta", {}) or {}
+    sender = meta.get("sender") or conv.get("contact") or {}
+    assignee = meta.get("assignee") or conv.get("assignee") or {}
+    team_id = conv.get("team_id")
+    if not team_id:
+        team_data = conv.get("team") or meta.get("team") or {}
+        if isinstance(team_data, dict):
+            team_id = team_data.get("id")
+        else:
+            team_id = team_data
+    inbox_id = conv.get("inbox_id")
+    return {
+        "api_id": api_id,
+        "conversation_id": conv_id,
+        "inbox_id": inbox_id,
+        "inbox_name": inbox_id_to_name.get(inbox_id, inbox_id),
+        "contact_name": sender.get("name") or sender.get("identifier") or "",
+        "contact_phone": sender.get("phone_number") or sender.get("phone") or sender.get("identifier") or "",
+        "assignee_id": assignee.get("id") if isinstance(assignee, dict) else None,
+        "assignee_name": assignee.get("name") or assignee.get("email") if isinstance(assignee, dict) else "",
+        "status": conv.get("status") or meta.get("status"),
+        "team_id": team_id,
+    }
+
+
+def _record_created_local(record: Dict, conv: Dict) -> Optional[datetime]:
+    """Return (and memoize on the record) the local creation datetime."""
+    if "created_local" not in record:
+        record["created_local"] = to_local(conv.get("created_at"))
+    return record["created_local"]
+
+
+def _record_matches(record: Dict, compiled: Dict) -> bool:
+    """Apply every non-date filter to a compact conversation record."""
+    if compiled["conversation_id"] and str(record["conversation_id"]) != compiled["conversation_id"]:
+        return False
+    if compiled["inbox_ids"] and record["inbox_id"] not in compiled["inbox_ids"]:
+        return False
+    if compiled["contact_name"] and not compiled["contact_name"](record["contact_name"]):
+        return False
+    if compiled["contact_number"] and not compiled["contact_number"](record["contact_phone"]):
+        return False
+    assignee_id = record["assignee_id"]
+    if compiled["agent_id"] and str(assignee_id) != compiled["agent_id"]:
+        return False
+    if compiled["assigned"] == "Sim" and not assignee_id:
+        return False
+    if compiled["assigned"] == "Não" and assignee_id:
+        return False
+    if compiled["status"] != "Todos" and str(record["status"]) != compiled["status"]:
+        return False
+    if compiled["team_id"] and str(record["team_id"]) != compiled["team_id"]:
+        return False
+    return True
+
+
+def filter_conversations(
+    conversations: List[Dict],
+    filters: Dict,
+    inbox_id_to_name: Dict[int, str],
+    start_dt: datetime,
+    end_dt: datetime,
+) -> Dict:
+    """Filter conversations in a single pass and return both result sets.
+
+    ``rows``/``conversation_ids`` honour the created-at range (table scope) while
+    ``scope_ids``/``scope_records`` ignore it (message scope). ``records`` maps each
+    scoped API id to its parsed record so callers can build per-conversation
+    metadata without re-reading the raw payload.
+    """
+    compiled = _compile_conversation_filter(filters)
+    rows = []
+    conversation_ids = []
+    scope_ids = []
+    scope_records = []
+    records = {}
+    for conv in conversations:
+        record = _conversation_record(conv, inbox_id_to_name)
+        if record is None or not _record_matches(record, compiled):
+            continue
+        record["_raw"] = conv
+        scope_records.append(record)
+        api_id = record["api_id"]
+        if api_id is not None:
+            scope_ids.append(api_id)
+            records[api_id] = record
+        created_local = _record_created_local(record, conv)
+        if not created_local or created_local < start_dt or created_local > end_dt:
+            continue
+        row = _normalize_conversation(conv)
+        row.update(
+            {
+                "conversation_id": record["conversation_id"],
+                "contact_name": record["contact_name"],
+                "contact_phone": record["contact_phone"],
+                "assignee_id": record["assignee_id"],
+                "assignee_name": record["assignee_name"],
+                "inbox_name": record["inbox_name"],
+            }
+        )
+        rows.append(row)
+        if api_id is not None:
+            conversation_ids.append(api_id)
+    return {
+        "rows": rows,
+        "conversation_ids": conversation_ids,
+        "scope_ids": scope_ids,
+        "scope_records": scope_records,
+        "records": records,
+    }
+
+
+def build_conversation_meta(records: Dict) -> Dict:
+    """Build per-conversation display metadata from filtered records."""
+    conv_meta = {}
+    for conv_id, record in records.items():
+        conv = record.get("_raw") or {}
+        created_local = _record_created_local(record, conv)
+        first_reply_raw = conv.get("first_reply_created_at")
+        first_reply_dt = None
+        if first_reply_raw not in (None, "", 0, "0", 0.0, "0.0"):
+            first_reply_dt = to_local(first_reply_raw)
+        conv_meta[conv_id] = {
+            "created_dt": created_local,
+            "created_str": created_local.strftime("%d/%m/%Y %H:%M:%S") if created_local else "",
+            "inbox_name": record["inbox_name"],
+            "first_reply_delta": _format_duration(created_local, first_reply_dt),
+            "contact_name": record["contact_name"],
+            "contact_phone": record["contact_phone"],
+        }
+    return conv_meta
+
+
+def collect_conversation_rows(conversations: List[Dict], filters: Dict, inbox_id_to_name: Dict[int, str], start_dt: datetime, end_dt: datetime, enforce_created_range: bool = True):
+    """Filter conversations and build row data plus conversation IDs."""
+    result = filter_conversations(conversations, filters, inbox_id_to_name, start_dt, end_dt)
+    if enforce_created_range:
+        return result["rows"], result["conversation_ids"]
+    rows = []
+    for record in result["scope_records"]:
+        row = _normalize_conversation(record["_raw"])
+        row.update(
+            {
+                "conversation_id": record["conversation_id"],
+                "contact_name": record["contact_name"],
+                "contact_phone": record["contact_phone"],
+                "assignee_id": record["assignee_id"],
+                "assignee_name": record["assignee_name"],
+                "inbox_name": record["inbox_name"],
+            }
+        )
+        rows.append(row)
+    return rows, result["scope_ids"]
+
+
+def summarize_message_frame(
+    frame: pd.DataFrame,
+    fetched_ids: List,
+    conv_meta: Dict,
+    filters: Dict,
+    start_dt: datetime,
+    end_dt: datetime,
+    table_conv_ids: Optional[List] = None,
+):
+    """Apply message filters and compute stats/rows with vectorized operations.
+
+    Returns (stats, allowed_conv_ids, message_rows). Message rows are limited to
+    `table_conv_ids` when given and sorted by conversation start, id and message time.
+    """
+    conversation_type = filters.get("conversation_type") or "Todos"
+    selected_message_statuses = filters.get("message_statuses") or ["Todos"]
+    if "Todos" in selected_message_statuses:
+        selected_message_statuses = []
+
+    frame = filter_period(frame, start_dt, end_dt, keep_missing=True)
+    if selected_message_statuses:
+        frame = frame[frame["status"].astype(str).isin(selected_message_statuses)]
+
+    incoming = frame["direction"] == "incoming"
+    outgoing = frame["direction"] == "outgoing"
+    if conversation_type == "Bot":
+        sender_mask = frame["is_bot"]
+    elif conversation_type == "Agente":
+        sender_mask = frame["is_agent"]
+    else:
+        sender_mask = None
+
+    if sender_mask is None:
+        allowed_conv_ids = set(fetched_ids)
+    else:
+        allowed_conv_ids = set(frame.loc[outgoing & sender_mask, "conversation_id"])
+        frame = frame[(incoming | (outgoing & sender_mask)) & frame["conversation_id"].isin(allowed_conv_ids)]
+
+    totals = message_totals(frame)
+    stats = {
+        "total_conversas_privadas": int(frame.loc[frame["private"], "conversation_id"].nunique()),
+        "total_recebidas": totals["received"],
+        "total_enviadas": totals["sent"],
+        "total_privadas": totals["private"],
+        "total_mensagens": int(len(frame)),
+    }
+
+    if table_conv_ids is not None:
+        frame = frame[frame["conversation_id"].isin(set(table_conv_ids))]
+    if frame.empty:
+        return stats, allowed_conv_ids, []
+
+    conv_ids = frame["conversation_id"]
+
+    def _meta(field: str) -> pd.Series:
+        return conv_ids.map(lambda cid: (conv_meta.get(cid) or {}).get(field, ""))
+
+    rows_df = pd.DataFrame(
+        {
+            "id_conversa": conv_ids,
+            "autor": sender_labels(frame),
+            "nome do contato": _meta("contact_name"),
+            "numero do contato": _meta("contact_phone"),
+            "data hora de início da conversa": _meta("created_str"),
+            "caixa de entrada": _meta("inbox_name"),
+            "tempo para a primeira resposta": _meta("first_reply_delta"),
+            "status da mensagem": frame["status"].astype(object).where(frame["status"].notna(), None),
+            "mensagem": frame["content"],
+            "data hora da mensagem": frame["created_dt"].dt.strftime("%d/%m/%Y %H:%M:%S").fillna(""),
+            "_sort_conv_dt": pd.to_datetime(conv_ids.map(lambda cid: (conv_meta.get(cid) or {}).get("created_dt")), utc=True),
+            "_sort_conv_id": conv_ids.astype(str),
+            "_sort_msg_dt": frame["created_dt"],
+        }
+    )
+    rows_df = rows_df.sort_values(
+        ["_sort_conv_dt", "_sort_conv_id", "_sort_msg_dt"],
+        na_position="first",
+        kind="mergesort",
+    )
+    rows_df = rows_df.drop(columns=["_sort_conv_dt", "_sort_conv_id", "_sort_msg_dt"])
+    return stats, allowed_conv_ids, rows_df.to_dict("records")
+
+
+def build_conversation_analysis(
+    conversations: List[Dict],
+    filters: Dict,
+    inbox_id_to_name: Dict[int, str],
+    start_dt: datetime,
+    end_dt: datetime,
+    crawl: Callable[[List], tuple],
+):
+    """Compute the Conversation Analysis stats and message rows.
+
+    `crawl(conversation_ids)` must return `(message_frame, fetched_ids)` as
+    `_crawl_message_frames` does. Returns `(None, [])` when no conversation matches.
+    """
+    filtered = filter_conversations(conversations, filters, inbox_id_to_name, start_dt, end_dt)
+    rows = filtered["rows"]
+    if not rows:
+        return None, []
+    conversation_type = filters.get("conversation_type") or "Todos"
+    conv_meta = build_conversation_meta(filtered["records"])
+    message_frame, fetched_ids = crawl(filtered["scope_ids"])
+    message_stats, allowed_conv_ids, message_rows = summarize_message_frame(
+        message_frame,
+        fetched_ids,
+        conv_meta,
+        filters,
+        start_dt,
+        end_dt,
+        table_conv_ids=filtered["conversation_ids"],
+    )
+    if conversation_type != "Todos":
+        rows = [row for row in rows if row.get("conversation_id") in allowed_conv_ids]
+    stats = {
+        "total_conversas": len(rows),
+        "total_conversas_privadas": message_stats["total_conversas_privadas"],
+        "total_recebidas": message_stats["total_recebidas"],
+        "total_enviadas": message_stats["total_enviadas"],
+        "total_privadas": message_stats["total_privadas"],
+    }
+    return stats, message_rows
+
+
+__all__ = [
+    "ANALYSIS_MESSAGE_COLUMNS",
+    "bot_sender_config",
+    "build_conversation_analysis",
+    "build_conversation_meta",
+    "collect_conversation_rows",
+    "compile_partial_matcher",
+    "filter_conversations",
+    "summarize_message_frame",
+]
@@ -0,0 +1,175 @@
+"""Map-reduce insights over every message in scope.
+
+Instead of a truncated sample, the formatted message lines are partitioned
+into one chunk per day or per conversation (split further only when a group
+does not fit one model call). The insight prompt runs on each chunk with
+bounded parallelism ("map") and the partial answers are consolidated into one
+("reduce"), hierarchically when they do not fit a single call. Map calls see
+only the filters and their own messages, never period totals, so chunk
+answers are cached by content and a re-run over a period that gained a few
+messages only pays for the groups that changed plus the final reduce.
+"""
+
+import hashlib
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from src.analytics.insights_store import get_chunk_result, put_chunk_result
+from src.bot.rules import estimar_custo_tokens
+
+MAP_CHUNK_CHARS = 12000
+REDUCE_MAX_CHARS = 24000
+MAP_WORKERS = int(os.getenv("INSIGHTS_MAP_WORKERS", "4"))
+PARTITIONS = ("day", "conversation")
+
+_totals_lock = threading.Lock()
+
+MAP_INSTRUCTIONS = (
+    "Você está analisando apenas um trecho das mensagens do período. Aplique as instruções acima "
+    "somente a este trecho e responda com achados objetivos, com contagens e exemplos; as respostas "
+    "de todos os trechos serão consolidadas depois."
+)
+REDUCE_INSTRUCTIONS = (
+    "Abaixo estão análises parciais feitas sobre trechos diferentes das mesmas mensagens. "
+    "Consolide-as em uma única resposta seguindo as instruções acima: some contagens, elimine "
+    "repetições e destaque os padrões que aparecem em vários trechos."
+)
+
+# complete(system_text, user_text, model) -> (texto, tokens de entrada, tokens de saída)
+Completion = Callable[[str, str, str], Tuple[str, Optional[int], Optional[int]]]
+
+
+def partition_messages(items: Iterable[Tuple[str, str]], max_chars: int = MAP_CHUNK_CHARS) -> List[Dict]:
+    """Split `(group_key, line)` pairs into one chunk per group key.
+
+    Groups keep their order of first appearance and are never packed
+    together, so a new message only changes the chunk of its own group. A
+    group larger than `max_chars` is split into consecutive parts labelled
+    "<key> (parte N)" from the second one on. Each chunk is
+    `{"label": str, "lines": [...]}`.
+    """
+    groups: Dict[str, List[str]] = {}
+    for key, line in items:
+        groups.setdefault(key, []).append(line)
+
+    chunks = []
+    for key, lines in groups.items():
+        parts: List[List[str]] = [[]]
+        size = 0
+        for line in lines:
+            if parts[-1] and size + len(line) + 1 > max_chars:
+                parts.append([])
+                size = 0
+            parts[-1].append(line)
+            size += len(line) + 1
+        for number, part in enumerate(parts, start=1):
+            chunks.append({"label": key if number == 1 else f"{key} (parte {number})", "lines": part})
+    return chunks
+
+
+def chunk_key(system_text: str, user_text: str, model: str) -> str:
+    """Cache key of one model call."""
+    material = "\x1f".join([model or "", system_text, user_text])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _chunk_text(header: str, chunk: Dict) -> str:
+    return f"{header}\nMensagens ({chunk['label']}):\n" + "\n".join(chunk["lines"])
+
+
+def _reduce_text(header: str, partials: List[Tuple[str, str]]) -> str:
+    parts = [f"### Trecho {label}\n{text}" for label, text in partials]
+    return f"{header}\nAnálises parciais:\n\n" + "\n\n".join(parts)
+
+
+def _call(complete: Completion, system_text: str, user_text: str, model: str, totals: Dict) -> str:
+    """Run one cached model call, accumulating token totals."""
+    key = chunk_key(system_text, user_text, model)
+    cached = get_chunk_result(key)
+    if cached is not None:
+        with _totals_lock:
+            totals["cached_calls"] += 1
+        return cached["output"]
+    output, input_tokens, output_tokens = complete(system_text, user_text, model)
+    put_chunk_result(key, output, input_tokens, output_tokens)
+    with _totals_lock:
+        totals["calls"] += 1
+        totals["input_tokens"] += input_tokens or 0
+        totals["output_tokens"] += output_tokens or 0
+    return output
+
+
+def map_reduce(
+    prompt_text: str,
+    header: str,
+    chunks: List[Dict],
+    model: str,
+    complete: Completion,
+    summary: str = "",
+    max_workers: int = MAP_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> Dict:
+    """Run `prompt_text` over every chunk and consolidate the answers.
+
+    `header` (the applied filters) is prepended to every call; `summary`
+    (period totals) only to the final reduce, which always runs, even for a
+    single chunk, so map answers stay cacheable and the output is never a raw
+    partial answer. Returns the final output plus counts of chunks, model
+    calls, cache hits, tokens and the estimated cost in USD.
+    """
+    if not chunks:
+        raise ValueError("Nenhuma mensagem para analisar.")
+    totals = {"calls": 0, "cached_calls": 0, "input_tokens": 0, "output_tokens": 0}
+    map_system = f"{prompt_text}\n\n{MAP_INSTRUCTIONS}"
+    partials: List[Optional[Tuple[str, str]]] = [None] * len(chunks)
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(chunks)))) as executor:
+        futures = {
+            executor.submit(_call, complete, map_system, _chunk_text(header, chunk), model, totals): index
+            for index, chunk in enumerate(chunks)
+        }
+        for done, future in enumerate(as_completed(futures), start=1):
+            index = futures[future]
+            try:
+                partials[index] = (chunks[index]["label"], future.result())
+            except Exception as exc:
+                errors.append(exc)
+            if on_progress:
+                on_progress(done, len(chunks))
+    if errors:
+        # As respostas já obtidas ficam no cache; uma nova execução refaz só as que faltaram.
+        raise RuntimeError(f"{len(errors)} de {len(chunks)} trechos falharam: {errors[0]}")
+
+    reduce_system = f"{prompt_text}\n\n{REDUCE_INSTRUCTIONS}"
+    while len(partials) > 1 and len(_reduce_text(header, partials)) > REDUCE_MAX_CHARS:
+        batches, batch, size = [], [], 0
+        for label, text in partials:
+            if batch and size + len(text) > REDUCE_MAX_CHARS:
+                batches.append(batch)
+                batch, size = [], 0
+            batch.append((label, text))
+            size += len(text)
+        batches.append(batch)
+        if len(batches) == len(partials):
+            break
+        partials = [
+            (
+                batch[0][0] if len(batch) == 1 else f"{batch[0][0].split(' a ')[0]} a {batch[-1][0].split(' a ')[-1]}",
+                _call(complete, reduce_system, _reduce_text(header, batch), model, totals),
+            )
+            for batch in batches
+        ]
+    final_header = f"{header}\n{summary}" if summary else header
+    output = _call(complete, reduce_system, _reduce_text(final_header, partials), model, totals)
+
+    return {
+        "output": output,
+        "chunks": len(chunks),
+        **totals,
+        "cost_usd": estimar_custo_tokens(model, totals["input_tokens"], totals["output_tokens"]),
+    }
+
+
+__all__ = ["MAP_CHUNK_CHARS", "PARTITIONS", "chunk_key", "map_reduce", "partition_messages"]
@@ -0,0 +1,164 @@
+"""Stratified sampling of messages for the Insights context.
+
+The sample mode of Insights fits a limited number of messages into one model
+call. Taking the first rows in sort order over-represents the oldest
+conversations, so messages are grouped into strata (day, inbox, direction and
+conversation length) and picked proportionally to each stratum's size while
+every stratum gets at least one message, until the token budget is spent.
+
+Conversations are crawled in a round-robin order across (day, inbox) strata,
+so any prefix of the crawl is itself stratified and fetching can stop as soon
+as the candidate pool is comfortably larger than what the sample can hold.
+"""
+
+import heapq
+import math
+import random
+from functools import lru_cache
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # dependência opcional: sem ela, tokens são estimados por caracteres
+    tiktoken = None
+
+DEFAULT_TOKEN_BUDGET = 3000
+CHARS_PER_TOKEN = 4
+FALLBACK_ENCODING = "o200k_base"
+OVERSAMPLE = 3
+MIN_CONVERSATIONS = 30
+LENGTH_BUCKETS = ((2, "1-2"), (9, "3-9"), (29, "10-29"))
+
+
+@lru_cache(maxsize=8)
+def _encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding(FALLBACK_ENCODING)
+    except Exception:
+        # Sem acesso aos arquivos de encoding (ex.: servidor offline): usa a estimativa.
+        return None
+
+
+def count_tokens(text: str, model: Optional[str] = None) -> int:
+    """Count the tokens of `text` with the model's tokenizer (tiktoken).
+
+    Falls back to one token per CHARS_PER_TOKEN characters when tiktoken or its
+    encoding files are unavailable.
+    """
+    if not text:
+        return 0
+    encoding = _encoding(model or "")
+    if encoding is None:
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def length_bucket(message_count: int) -> str:
+    """Label the size of a conversation by its number of messages."""
+    for limit, label in LENGTH_BUCKETS:
+        if message_count <= limit:
+            return label
+    return f"{LENGTH_BUCKETS[-1][0] + 1}+"
+
+
+def conversation_order(items: Iterable[Tuple[Hashable, Hashable]], seed: int = 0) -> List:
+    """Order `(conversation_id, stratum)` pairs round-robin across strata.
+
+    Conversations are shuffled (deterministically) inside each stratum and the
+    strata are visited in turn, so the first k ids cover min(k, strata) strata
+    and larger strata keep contributing proportionally more as k grows.
+    """
+    strata: Dict[Hashable, List] = {}
+    for conv_id, stratum in items:
+        strata.setdefault(stratum, []).append(conv_id)
+    rnd = random.Random(seed)
+    queues = []
+    for stratum in sorted(strata, key=str):
+        ids = strata[stratum]
+        rnd.shuffle(ids)
+        queues.append(ids)
+    order = []
+    position = 0
+    while queues:
+        queues = [ids for ids in queues if len(ids) > position]
+        order.extend(ids[position] for ids in queues)
+        position += 1
+    return order
+
+
+def stratified_sample(
+    items: Sequence[Tuple[Hashable, int]],
+    max_tokens: int,
+    max_items: Optional[int] = None,
+    seed: int = 0,
+) -> List[int]:
+    """Pick indexes of `(stratum, tokens)` items under the token budget.
+
+    The stratum with the smallest selected fraction is served next, so every
+    stratum gets one item before any gets a second and the final allocation is
+    proportional to stratum size. Items that no longer fit are skipped. Returns
+    the selected indexes in their original order.
+    """
+    strata: Dict[Hashable, List[int]] = {}
+    for index, (stratum, _) in enumerate(items):
+        strata.setdefault(stratum, []).append(index)
+    rnd = random.Random(seed)
+    heap = []
+    for order, stratum in enumerate(sorted(strata, key=str)):
+        rnd.shuffle(strata[stratum])
+        heap.append((0.0, rnd.random(), order, stratum))
+    heapq.heapify(heap)
+
+    position = {stratum: 0 for stratum in strata}
+    chosen: List[int] = []
+    used = 0
+    while heap and (max_items is None or len(chosen) < max_items):
+        _, _, order, stratum = heapq.heappop(heap)
+        indexes = strata[stratum]
+        pos = position[stratum]
+        while pos < len(indexes) and used + items[indexes[pos]][1] > max_tokens:
+            pos += 1
+        if pos >= len(indexes):
+            continue
+        chosen.append(indexes[pos])
+        used += items[indexes[pos]][1]
+        position[stratum] = pos + 1
+        if pos + 1 < len(indexes):
+            heapq.heappush(heap, ((pos + 1) / len(indexes), rnd.random(), order, stratum))
+    return sorted(chosen)
+
+
+def sample_is_sufficient(
+    pool_tokens: int,
+    pool_items: int,
+    crawled: int,
+    strata: int,
+    max_tokens: int,
+    max_items: Optional[int] = None,
+) -> bool:
+    """Whether the crawled messages already support a representative sample.
+
+    True once every conversation stratum was visited (see `conversation_order`),
+    at least MIN_CONVERSATIONS conversations were read and the candidate pool
+    holds OVERSAMPLE times what the sample can take.
+    """
+    if crawled < max(strata, MIN_CONVERSATIONS):
+        return False
+    if pool_tokens >= OVERSAMPLE * max_tokens:
+        return True
+    return max_items is not None and pool_items >= OVERSAMPLE * max_items
+
+
+__all__ = [
+    "DEFAULT_TOKEN_BUDGET",
+    "count_tokens",
+    "conversation_order",
+    "length_bucket",
+    "sample_is_sufficient",
+    "stratified_sample",
+]
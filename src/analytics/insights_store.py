@@ -0,0 +1,154 @@
+"""Persistent store for Insights contexts.
+
+Building an insights context crawls every conversation in scope. The result
+(stats, context text, filter lines) is stored under the filter signature plus
+a data version derived from the conversations in scope, so pressing "Gerar
+insights" again, or switching prompt over the same data, reuses the stored
+context while any new activity in scope invalidates it. Model answers of the
+map-reduce mode are cached here as well, keyed by their exact input.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, Optional
+
+from src.utils.db_init import DATA_DIR
+from src.utils.timestamps import parse_ts
+
+STORE_PATH = DATA_DIR / "insights_context.db"
+RETENTION = 7 * 24 * 3600
+CHUNK_RETENTION = 30 * 24 * 3600
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to the store, creating the schema once per path."""
+    path = STORE_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    if path not in _initialized_paths:
+        with _init_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS insights_context (
+                    signature TEXT PRIMARY KEY,
+                    data_version TEXT,
+                    payload TEXT,
+                    created_at REAL
+                )
+                """
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS insights_chunks (
+                    chunk_key TEXT PRIMARY KEY,
+                    output TEXT,
+                    input_tokens INTEGER,
+                    output_tokens INTEGER,
+                    created_at REAL
+                )
+                """
+            )
+            conn.commit()
+            _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _store_conn():
+    """Context manager that opens and always closes a store connection."""
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def context_signature(params: Dict) -> str:
+    """Hash the account, filters and limits that determine an insights context."""
+    material = json.dumps(params, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def data_version(conversations: Iterable[Dict]) -> str:
+    """Fingerprint the conversations in scope by id and last activity."""
+    items = []
+    for conv in conversations:
+        last = parse_ts(conv.get("last_activity_at") or conv.get("updated_at") or conv.get("created_at"))
+        items.append((str(conv.get("id") or conv.get("display_id")), last.timestamp() if last else 0))
+    items.sort()
+    return hashlib.sha256(json.dumps(items).encode("utf-8")).hexdigest()
+
+
+def get_context(signature: str, version: str) -> Optional[Dict]:
+    """Return the stored context for `signature` when it was built from `version`."""
+    with _store_conn() as conn:
+        row = conn.execute(
+            "SELECT payload, created_at FROM insights_context WHERE signature = ? AND data_version = ?",
+            (signature, version),
+        ).fetchone()
+    if row is None:
+        return None
+    payload = json.loads(row[0])
+    payload["cached_at"] = row[1]
+    return payload
+
+
+def put_context(signature: str, version: str, payload: Dict) -> None:
+    """Store (or replace) the context built for `signature` from `version`."""
+    now = time.time()
+    with _store_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO insights_context (signature, data_version, payload, created_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(signature) DO UPDATE SET
+                data_version = excluded.data_version,
+                payload = excluded.payload,
+                created_at = excluded.created_at
+            """,
+            (signature, version, json.dumps(payload, ensure_ascii=False, default=str), now),
+        )
+        conn.execute("DELETE FROM insights_context WHERE created_at < ?", (now - RETENTION,))
+        conn.commit()
+
+
+def get_chunk_result(chunk_key: str) -> Optional[Dict]:
+    """Return a cached map/reduce model answer by its key (see `insights_mapreduce.chunk_key`)."""
+    with _store_conn() as conn:
+        row = conn.execute(
+            "SELECT output, input_tokens, output_tokens FROM insights_chunks WHERE chunk_key = ?",
+            (chunk_key,),
+        ).fetchone()
+    if row is None:
+        return None
+    return {"output": row[0], "input_tokens": row[1], "output_tokens": row[2]}
+
+
+def put_chunk_result(chunk_key: str, output: str, input_tokens: Optional[int], output_tokens: Optional[int]) -> None:
+    """Cache one map/reduce model answer."""
+    now = time.time()
+    with _store_conn() as conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO insights_chunks VALUES (?, ?, ?, ?, ?)",
+            (chunk_key, output, input_tokens, output_tokens, now),
+        )
+        conn.execute("DELETE FROM insights_chunks WHERE created_at < ?", (now - CHUNK_RETENTION,))
+        conn.commit()
+
+
+__all__ = [
+    "context_signature",
+    "data_version",
+    "get_chunk_result",
+    "get_context",
+    "put_chunk_result",
+    "put_context",
+]
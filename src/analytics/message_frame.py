@@ -0,0 +1,350 @@
+"""Columnar normalization and vectorized aggregations for Chatwoot messages."""
+
+import gc
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from src.utils.timestamps import local_field, to_local_series
+
+DIRECTIONS = ["incoming", "outgoing"]
+WEEKDAY_NAMES = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+CORE_COLUMNS = [
+    "conversation_id",
+    "message_id",
+    "created_dt",
+    "direction",
+    "message_type",
+    "status",
+    "private",
+    "has_audio",
+]
+DETAIL_COLUMNS = [
+    "sender_type",
+    "sender_id",
+    "sender_name",
+    "fallback_name",
+    "content",
+    "content_body",
+    "is_bot",
+    "is_agent",
+]
+
+_DIRECTION_MAP = {
+    0: "incoming",
+    1: "outgoing",
+    "0": "incoming",
+    "1": "outgoing",
+    "incoming": "incoming",
+    "outgoing": "outgoing",
+}
+_TRUTHY = {"true", "1", "yes", "sim"}
+_FALLBACK_NAME_KEYS = ("sender_name", "sender_email", "agent_name", "user_name")
+
+
+@contextmanager
+def _gc_paused():
+    """Pause the cyclic GC while allocating many short-lived containers."""
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _direction_column(message_types: np.ndarray) -> pd.Categorical:
+    """Map raw `message_type` values (0/1 or incoming/outgoing) to directions."""
+    raw = pd.Series(message_types, dtype="object")
+    direction = raw.map(_DIRECTION_MAP)
+    missing = direction.isna() & raw.notna()
+    if missing.any():
+        direction[missing] = raw[missing].astype(str).str.strip().str.lower().map(_DIRECTION_MAP)
+    return pd.Categorical(direction, categories=DIRECTIONS)
+
+
+def _private_column(values: np.ndarray) -> np.ndarray:
+    """Coerce `private` flags (bools, ints or strings like "true"/"sim") to bool."""
+    if values.dtype == bool:
+        return values
+    values = np.asarray(values, dtype=object)
+    flags = values.astype(bool)
+    is_text = np.fromiter((isinstance(v, str) for v in values), dtype=bool, count=len(values))
+    if is_text.any():
+        flags[is_text] = [v.strip().lower() in _TRUTHY for v in values[is_text]]
+    return flags
+
+
+def _has_audio(attachments) -> bool:
+    return any(
+        isinstance(att, dict) and att.get("file_type") == "audio" for att in attachments
+    )
+
+
+def _sender_fields(msg: Dict) -> tuple:
+    """Return (sender_type, sender_id, sender_name, fallback_name) for a message."""
+    sender = msg.get("sender")
+    sender_info = msg.get("sender_info")
+    sender_type = msg.get("sender_type")
+    if not sender_type:
+        for source in (sender, sender_info):
+            if isinstance(source, dict):
+                sender_type = source.get("type") or source.get("sender_type")
+                if sender_type:
+                    break
+    identity = sender or sender_info
+    sender_id = ""
+    sender_name = ""
+    if isinstance(identity, dict):
+        sender_id = identity.get("id")
+        sender_id = str(sender_id).strip() if sender_id else ""
+        sender_name = identity.get("name") or identity.get("email") or identity.get("identifier")
+        sender_name = str(sender_name).strip() if sender_name else ""
+    fallback_name = ""
+    for key in _FALLBACK_NAME_KEYS:
+        value = msg.get(key)
+        if value:
+            fallback_name = str(value)
+            break
+    return str(sender_type or "").strip().lower(), sender_id, sender_name, fallback_name
+
+
+def _message_content(msg: Dict):
+    content = msg.get("content")
+    if content is None:
+        content = msg.get("processed_message_content") or ""
+    return content
+
+
+def _content_body(msg: Dict) -> str:
+    attributes = msg.get("content_attributes")
+    if isinstance(attributes, dict):
+        return attributes.get("body") or ""
+    return ""
+
+
+def empty_message_frame(details: bool = True) -> pd.DataFrame:
+    """Return an empty frame with the normalized message schema."""
+    return build_message_frame([], details=details)
+
+
+def _raw_columns(msgs: List[Dict], conversation_id, details: bool) -> Dict[str, list]:
+    """Extract plain Python column lists from message payloads."""
+    if conversation_id is None:
+        conv_ids = [msg.get("conversation_id") for msg in msgs]
+    else:
+        conv_ids = [conversation_id] * len(msgs)
+    raw = {
+        "conversation_id": conv_ids,
+        "message_id": [msg.get("id") for msg in msgs],
+        "created": [msg.get("created_at") or msg.get("timestamp") for msg in msgs],
+        "message_type": [msg.get("message_type") for msg in msgs],
+        "status": [
+            msg.get("status") or msg.get("delivery_status") or msg.get("message_status") or msg.get("state")
+            for msg in msgs
+        ],
+        "private": [msg.get("private") for msg in msgs],
+        "has_audio": [_has_audio(att) if att else False for att in [msg.get("attachments") for msg in msgs]],
+    }
+    if details:
+        senders = [_sender_fields(msg) for msg in msgs]
+        sender_columns = list(zip(*senders)) if senders else [(), (), (), ()]
+        raw["sender_type"] = list(sender_columns[0])
+        raw["sender_id"] = list(sender_columns[1])
+        raw["sender_name"] = list(sender_columns[2])
+        raw["fallback_name"] = list(sender_columns[3])
+        raw["content"] = [_message_content(msg) for msg in msgs]
+        raw["content_body"] = [_content_body(msg) for msg in msgs]
+    return raw
+
+
+def _frame_from_raw(
+    raw: Dict[str, list],
+    bot_names: Optional[Iterable[str]] = None,
+    bot_ids: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Turn raw column lists into the typed message frame."""
+    details = "content" in raw
+    message_types = np.array(raw["message_type"], dtype=object)
+    private_flags = np.array(raw["private"])
+    if private_flags.dtype != bool:
+        private_flags = np.array(raw["private"], dtype=object)
+    data = {
+        "conversation_id": np.array(raw["conversation_id"], dtype=object),
+        "message_id": np.array(raw["message_id"], dtype=object),
+        "created_dt": to_local_series(raw["created"]).array,
+        "direction": _direction_column(message_types),
+        "message_type": message_types,
+        "status": pd.Categorical(raw["status"]),
+        "private": _private_column(private_flags),
+        "has_audio": np.array(raw["has_audio"], dtype=bool),
+    }
+    if details:
+        data["sender_type"] = pd.Categorical(raw["sender_type"])
+        for col in ("sender_id", "sender_name", "fallback_name", "content", "content_body"):
+            data[col] = np.array(raw[col], dtype=object)
+    frame = pd.DataFrame(data)
+    if not details:
+        return frame
+
+    names = {str(name).lower() for name in (bot_names or [])}
+    ids = {str(sid) for sid in (bot_ids or [])}
+    is_bot = frame["sender_type"].isin(["agentbot", "bot"])
+    if ids:
+        is_bot |= (frame["sender_id"] != "") & frame["sender_id"].isin(ids)
+    if names:
+        is_bot |= (frame["sender_name"] != "") & frame["sender_name"].str.lower().isin(names)
+    frame["is_bot"] = is_bot.astype(bool)
+    frame["is_agent"] = (~frame["is_bot"] & frame["sender_type"].isin(["user", "agent"])).astype(bool)
+    return frame[CORE_COLUMNS + DETAIL_COLUMNS]
+
+
+def build_message_frame(
+    messages: Iterable[Dict],
+    conversation_id=None,
+    bot_names: Optional[Iterable[str]] = None,
+    bot_ids: Optional[Iterable[str]] = None,
+    details: bool = True,
+) -> pd.DataFrame:
+    """Normalize message payloads into a columnar frame.
+
+    Timestamps are parsed and converted to the workspace timezone in one
+    vectorized step, and direction/status/sender type are stored as categoricals.
+    `conversation_id` is used when the payloads do not carry it themselves.
+    With `details=False` only the columns needed for counting are extracted
+    (no sender/content columns), which is noticeably cheaper on large inputs.
+    `bot_names`/`bot_ids` extend the bot detection beyond the `agentbot` sender type.
+    """
+    msgs = [msg for msg in messages if isinstance(msg, dict)]
+    with _gc_paused():
+        raw = _raw_columns(msgs, conversation_id, details)
+        return _frame_from_raw(raw, bot_names=bot_names, bot_ids=bot_ids)
+
+
+def new_message_buffer(details: bool = True) -> Dict[str, list]:
+    """Return an empty columnar buffer to be filled with `append_messages`."""
+    return _raw_columns([], None, details)
+
+
+def append_messages(buffer: Dict[str, list], messages: Iterable[Dict], conversation_id=None) -> int:
+    """Append message payloads to a columnar buffer; returns how many were added.
+
+    Only plain column values are kept, so the payload dicts can be released
+    right away and the typed frame is built once by `frame_from_buffer`.
+    """
+    msgs = [msg for msg in messages if isinstance(msg, dict)]
+    with _gc_paused():
+        raw = _raw_columns(msgs, conversation_id, "content" in buffer)
+        for col, values in raw.items():
+            buffer[col].extend(values)
+    return len(msgs)
+
+
+def frame_from_buffer(
+    buffer: Dict[str, list],
+    bot_names: Optional[Iterable[str]] = None,
+    bot_ids: Optional[Iterable[str]] = None,
+) -> pd.DataFrame:
+    """Build the message frame from a buffer filled with `append_messages`."""
+    with _gc_paused():
+        return _frame_from_raw(buffer, bot_names=bot_names, bot_ids=bot_ids)
+
+
+def concat_message_frames(frames: List[pd.DataFrame], details: bool = True) -> pd.DataFrame:
+    """Concatenate per-conversation frames, keeping categorical dtypes."""
+    frames = [frame for frame in frames if frame is not None and not frame.empty]
+    if not frames:
+        return empty_message_frame(details=details)
+    combined = pd.concat(frames, ignore_index=True)
+    combined["direction"] = pd.Categorical(combined["direction"], categories=DIRECTIONS)
+    for col in ("status", "sender_type"):
+        if col in combined.columns:
+            combined[col] = combined[col].astype("category")
+    return combined
+
+
+def filter_period(frame: pd.DataFrame, start_dt, end_dt, keep_missing: bool = False) -> pd.DataFrame:
+    """Keep rows whose local timestamp falls within [start_dt, end_dt]."""
+    created = frame["created_dt"]
+    mask = (created >= start_dt) & (created <= end_dt)
+    if keep_missing:
+        mask |= created.isna()
+    return frame[mask]
+
+
+def message_totals(frame: pd.DataFrame) -> Dict[str, int]:
+    """Return received/sent/private totals for a message frame."""
+    direction_counts = frame["direction"].value_counts()
+    return {
+        "received": int(direction_counts.get("incoming", 0)),
+        "sent": int(direction_counts.get("outgoing", 0)),
+        "private": int(frame["private"].sum()),
+    }
+
+
+def _counts_by_field(frame: pd.DataFrame, field: str, size: int) -> np.ndarray:
+    """Return a (size x 2) matrix of incoming/outgoing counts per calendar field."""
+    keys = local_field(frame["created_dt"], field)
+    codes = np.asarray(frame["direction"].cat.codes, dtype=np.int64)
+    valid = (keys >= 0) & (codes >= 0)
+    counts = np.bincount(keys[valid] * len(DIRECTIONS) + codes[valid], minlength=size * len(DIRECTIONS))
+    return counts.reshape(size, len(DIRECTIONS))
+
+
+def counts_by_hour(frame: pd.DataFrame) -> pd.DataFrame:
+    """Return incoming/outgoing counts for each hour of the day (0-23)."""
+    counts = _counts_by_field(frame, "hour", 24)
+    return pd.DataFrame(counts, index=pd.RangeIndex(24, name="hora"), columns=DIRECTIONS).astype(int)
+
+
+def counts_by_weekday(frame: pd.DataFrame) -> pd.DataFrame:
+    """Return incoming/outgoing counts per weekday (Segunda..Domingo)."""
+    counts = _counts_by_field(frame, "weekday", 7)
+    return pd.DataFrame(counts, index=WEEKDAY_NAMES, columns=DIRECTIONS).astype(int)
+
+
+def media_counts(frame: pd.DataFrame) -> Dict[str, int]:
+    """Return the number of text and audio messages in a frame."""
+    audio = int(frame["has_audio"].sum())
+    return {"text": int(len(frame) - audio), "audio": audio}
+
+
+def sender_labels(frame: pd.DataFrame) -> pd.Series:
+    """Return a display label for who sent each message (Cliente/Bot/agent name)."""
+    unknown = "Agente (tipo não informado)"
+    fallback = frame["fallback_name"]
+    agent_label = frame["sender_name"].where(frame["sender_name"] != "", fallback)
+    agent_label = agent_label.where(agent_label != "", unknown)
+    other_label = fallback.where(
+        fallback != "",
+        np.where(frame["sender_type"].astype(str) == "", unknown, "Agente"),
+    )
+    labels = np.select(
+        [frame["direction"] == "incoming", frame["is_bot"], frame["is_agent"]],
+        ["Cliente", "Bot", agent_label],
+        default=other_label,
+    )
+    return pd.Series(labels, index=frame.index, dtype="object")
+
+
+__all__ = [
+    "CORE_COLUMNS",
+    "DETAIL_COLUMNS",
+    "DIRECTIONS",
+    "WEEKDAY_NAMES",
+    "append_messages",
+    "build_message_frame",
+    "concat_message_frames",
+    "counts_by_hour",
+    "counts_by_weekday",
+    "empty_message_frame",
+    "filter_period",
+    "frame_from_buffer",
+    "media_counts",
+    "message_totals",
+    "new_message_buffer",
+    "sender_labels",
+]
@@ -0,0 +1,193 @@
+"""Message rows for the Mensagens tab and the batch message report.
+
+Both apply the tab's filters to a conversation list and format the same
+table through these functions.
+"""
+
+import json
+import re
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd
+
+from src.utils.timestamps import to_local
+
+
+def _format_datetime_value(value, with_ms: bool = False) -> str:
+    """Format a timestamp value in local timezone, optionally with milliseconds."""
+    dt_local = to_local(value)
+    if not dt_local:
+        return value
+    if with_ms:
+        ms = int(dt_local.microsecond / 1000)
+        return f"{dt_local:%d/%m/%Y %H:%M:%S}.{ms:03d}"
+    return dt_local.strftime("%d/%m/%Y %H:%M:%S")
+
+
+def _match_pattern(text: str, pattern: str) -> bool:
+    """Match text against a pattern that may include '*' wildcards."""
+    if not pattern:
+        return True
+    text = text or ""
+    pattern = pattern.strip()
+    if not pattern:
+        return True
+    if "*" in pattern:
+        regex = re.escape(pattern).replace("\\*", ".*")
+        return re.search(regex, text, re.IGNORECASE) is not None
+    return pattern.lower() in text.lower()
+
+
+def _normalize_message(msg: Dict) -> Dict:
+    """Normalize message payload by serializing nested values."""
+    clean = {}
+    for k, v in msg.items():
+        if isinstance(v, (dict, list)):
+            clean[k] = json.dumps(v, ensure_ascii=False)
+        else:
+            clean[k] = v
+    return clean
+
+
+def _extract_transcription(payload) -> Optional[str]:
+    """Extract an audio transcription from nested payload fields."""
+    # Apenas lê transcrições já presentes no payload da API do Chatwoot (sem chamadas externas).
+    keys = {
+        "transcription",
+        "transcript",
+        "transcribed_text",
+        "transcription_text",
+        "speech_to_text",
+    }
+
+    def _search(obj):
+        if isinstance(obj, dict):
+            for k, v in obj.items():
+                if k in keys and isinstance(v, str) and v.strip():
+                    return v.strip()
+                if isinstance(v, (dict, list)):
+                    found = _search(v)
+                    if found:
+                        return found
+        elif isinstance(obj, list):
+            for item in obj:
+                found = _search(item)
+                if found:
+                    return found
+        return None
+
+    return _search(payload)
+
+
+def collect_message_rows(
+    conversations: List[Dict],
+    filters: Dict,
+    inbox_id_to_name: Dict,
+    start_dt: datetime,
+    end_dt: datetime,
+    messages_for: Callable[[object], List[Dict]],
+    on_error: Optional[Callable[[object, Exception], None]] = None,
+) -> List[Dict]:
+    """Apply the Messages tab filters and return one row per matching message.
+
+    `filters` holds conversation_id, inbox_ids, contact_name, contact_number,
+    message_status and audio_filter as chosen in the tab. `messages_for(conv_id)`
+    returns a conversation's messages; failures are passed to `on_error`.
+    """
+    conversation_id_filter = (filters.get("conversation_id") or "").strip()
+    selected_inbox_ids = filters.get("inbox_ids") or set()
+    contact_name = filters.get("contact_name") or ""
+    contact_number = filters.get("contact_number") or ""
+    message_status = filters.get("message_status") or "Todos"
+    audio_filter = filters.get("audio_filter") or "Todos"
+    rows = []
+    for conv in conversations:
+        conv_id = conv.get("id")
+        if conv_id is None:
+            continue
+        if conversation_id_filter and str(conv_id) != conversation_id_filter:
+            continue
+        inbox_id = conv.get("inbox_id")
+        inbox_label = inbox_id_to_name.get(inbox_id, inbox_id)
+        if selected_inbox_ids and inbox_id not in selected_inbox_ids:
+            continue
+
+        meta = conv.get("meta", {}) or {}
+        sender = meta.get("sender") or conv.get("contact") or {}
+        contact_name_val = sender.get("name") or sender.get("identifier") or ""
+        contact_phone_val = (
+            sender.get("phone_number")
+            or sender.get("phone")
+            or sender.get("identifier")
+            or ""
+        )
+
+        if contact_name and not _match_pattern(contact_name_val, contact_name):
+            continue
+        if contact_number and not _match_pattern(contact_phone_val, contact_number):
+            continue
+
+        try:
+            msgs = messages_for(conv_id)
+        except Exception as e:
+            if on_error:
+                on_error(conv_id, e)
+            continue
+
+        for msg in msgs:
+            msg_dt_raw = msg.get("created_at") or msg.get("timestamp")
+            msg_dt_local = to_local(msg_dt_raw)
+            if not msg_dt_local:
+                continue
+            if msg_dt_local < start_dt or msg_dt_local > end_dt:
+                continue
+
+            status_val = msg.get("status") or msg.get("delivery_status") or msg.get("message_status") or msg.get("state")
+            if message_status != "Todos" and str(status_val) != message_status:
+                continue
+
+            attachments = msg.get("attachments") or []
+            has_audio = any(
+                isinstance(att, dict) and att.get("file_type") == "audio" for att in attachments
+            )
+            if audio_filter == "Sim" and not has_audio:
+                continue
+            if audio_filter == "Não" and has_audio:
+                continue
+
+            row = _normalize_message(msg)
+            if has_audio:
+                transcript = (
+                    _extract_transcription(attachments)
+                    or _extract_transcription(msg.get("content_attributes") or {})
+                    or _extract_transcription(msg.get("data") or {})
+                )
+                if transcript:
+                    existing_content = row.get("content") or ""
+                    prefix = "\n" if existing_content else ""
+                    row["content"] = f"{existing_content}{prefix}[transc.]: {transcript}"
+            row.update(
+                {
+                    "conversation_id": conv_id,
+                    "contact_name": contact_name_val,
+                    "contact_phone": contact_phone_val,
+                    "inbox_id": inbox_label,
+                    "midia": "audio" if has_audio else "",
+                }
+            )
+            rows.append(row)
+    return rows
+
+
+def messages_table(rows: List[Dict]) -> pd.DataFrame:
+    """Turn collected message rows into the tab's table with formatted dates."""
+    df = pd.DataFrame(rows)
+    for col in ["created_at", "updated_at", "timestamp", "waiting_since", "agent_last_seen_at"]:
+        if col in df.columns:
+            use_ms = col == "created_at"
+            df[col] = df[col].apply(lambda v: _format_datetime_value(v, with_ms=use_ms))
+    return df
+
+
+__all__ = ["collect_message_rows", "messages_table"]
@@ -0,0 +1,404 @@
+"""Incremental per-conversation message store.
+
+The store remembers, per conversation, the contiguous range of message ids
+already downloaded. A refresh asks Chatwoot only for messages after the
+newest stored id (`after` cursor, 100 per page, oldest first), so it costs
+O(new messages / 100) requests instead of O(history). The `before` cursor
+(20 per page, newest first) is used for the first sync and to extend the
+range backwards when the requested period starts before it.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+from src.analytics.rollups import (
+    ROLLUP_SCHEMA,
+    conversation_rollup,
+    message_rollup,
+    record_conversation_rollup,
+    record_message_rollup,
+)
+from src.utils.db_init import DATA_DIR
+from src.utils.timestamps import parse_ts
+
+STORE_PATH = DATA_DIR / "message_store.db"
+PAGE_SIZE = 20  # mensagens por página com `before` (e na página mais recente)
+AFTER_PAGE_SIZE = 100  # mensagens por página com `after`
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to the store, creating the schema once per path."""
+    path = STORE_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    if path not in _initialized_paths:
+        with _init_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stored_messages (
+                    account TEXT,
+                    conversation_id TEXT,
+                    message_id INTEGER,
+                    created_ts REAL,
+                    payload TEXT,
+                    has_audio INTEGER DEFAULT 0,
+                    PRIMARY KEY (account, conversation_id, message_id)
+                )
+                """
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_stored_messages_created ON stored_messages(account, created_ts)"
+            )
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_sync (
+                    account TEXT,
+                    conversation_id TEXT,
+                    max_id INTEGER,
+                    min_id INTEGER,
+                    oldest_ts REAL,
+                    complete INTEGER DEFAULT 0,
+                    synced_at REAL,
+                    PRIMARY KEY (account, conversation_id)
+                )
+                """
+            )
+            for statement in ROLLUP_SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+            _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _store_conn():
+    """Context manager that opens and always closes a store connection."""
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _message_id(msg: Dict) -> Optional[int]:
+    try:
+        return int(msg.get("id"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _has_audio(msg: Dict) -> bool:
+    return any(isinstance(att, dict) and att.get("file_type") == "audio" for att in msg.get("attachments") or [])
+
+
+def _created_ts(msg: Dict) -> Optional[float]:
+    dt = parse_ts(msg.get("created_at") or msg.get("timestamp"))
+    return dt.timestamp() if dt else None
+
+
+def page_params(before_id: Optional[int] = None, after_id: Optional[int] = None) -> Dict:
+    """Query params for one page of a conversation's messages endpoint."""
+    if after_id:
+        return {"after": after_id}
+    if before_id:
+        return {"before": before_id}
+    return {}
+
+
+def _walk_forward(fetch_page: Callable[..., List[Dict]], after_id: int, max_batches: int) -> List[Dict]:
+    """Page forwards from `after_id` until a short page (the newest messages) is reached."""
+    messages = []
+    for _ in range(max_batches):
+        payload = fetch_page(after_id=after_id)
+        messages.extend(payload)
+        ids = [mid for mid in (_message_id(msg) for msg in payload) if mid is not None]
+        if len(payload) < AFTER_PAGE_SIZE or not ids or max(ids) <= after_id:
+            break
+        after_id = max(ids)
+    return messages
+
+
+def _walk_back(
+    fetch_page: Callable[..., List[Dict]],
+    before_id: Optional[int],
+    start_ts: Optional[float],
+    max_batches: int,
+) -> Dict:
+    """Walk pages backwards from `before_id` (the newest page when None).
+
+    Stops when the oldest message is older than `start_ts` or at the
+    beginning of the conversation.
+    """
+    messages = []
+    reached_start = False
+    batches = 0
+    while batches < max_batches:
+        payload = fetch_page(before_id=before_id)
+        if not payload:
+            reached_start = True
+            break
+        messages.extend(payload)
+        oldest = payload[0]
+        next_before = _message_id(oldest)
+        if not next_before or next_before == before_id:
+            break
+        before_id = next_before
+        if start_ts is not None:
+            oldest_ts = _created_ts(oldest)
+            if oldest_ts is not None and oldest_ts < start_ts:
+                break
+        if len(payload) < PAGE_SIZE:
+            reached_start = True
+            break
+        batches += 1
+    return {"messages": messages, "reached_start": reached_start}
+
+
+def _load_state(conn: sqlite3.Connection, account: str, conversation_id: str) -> Optional[Dict]:
+    row = conn.execute(
+        "SELECT max_id, min_id, oldest_ts, complete FROM conversation_sync WHERE account = ? AND conversation_id = ?",
+        (account, conversation_id),
+    ).fetchone()
+    if not row or row[0] is None:
+        return None
+    return {"max_id": row[0], "min_id": row[1], "oldest_ts": row[2], "complete": bool(row[3])}
+
+
+def _covers(state: Optional[Dict], start_ts: Optional[float]) -> bool:
+    """Return True when the stored range already reaches back to `start_ts`."""
+    if not state:
+        return False
+    if state["complete"]:
+        return True
+    return start_ts is not None and state["oldest_ts"] is not None and state["oldest_ts"] <= start_ts
+
+
+def _save(conn: sqlite3.Connection, account: str, conversation_id: str, messages: List[Dict], state: Dict) -> None:
+    # Trava a escrita antes de ler os ids conhecidos: duas sincronizações da mesma
+    # conversa (duas sessões, ou a interface e o batch) não contam a mesma mensagem.
+    conn.execute("BEGIN IMMEDIATE")
+    known = {
+        row[0]
+        for row in conn.execute(
+            "SELECT message_id FROM stored_messages WHERE account = ? AND conversation_id = ?",
+            (account, conversation_id),
+        )
+    }
+    rows = []
+    new_messages = []
+    for msg in messages:
+        mid = _message_id(msg)
+        if mid is not None:
+            if mid not in known:
+                known.add(mid)
+                new_messages.append(msg)
+            rows.append(
+                (
+                    account,
+                    conversation_id,
+                    mid,
+                    _created_ts(msg),
+                    json.dumps(msg, ensure_ascii=False),
+                    int(_has_audio(msg)),
+                )
+            )
+    conn.executemany(
+        """
+        INSERT OR REPLACE INTO stored_messages (account, conversation_id, message_id, created_ts, payload, has_audio)
+        VALUES (?, ?, ?, ?, ?, ?)
+        """,
+        rows,
+    )
+    record_message_rollup(conn, account, new_messages)
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO conversation_sync
+            (account, conversation_id, max_id, min_id, oldest_ts, complete, synced_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            account,
+            conversation_id,
+            state["max_id"],
+            state["min_id"],
+            state["oldest_ts"],
+            int(state["complete"]),
+            time.time(),
+        ),
+    )
+    conn.commit()
+
+
+def _range_state(messages: List[Dict], complete: bool) -> Optional[Dict]:
+    ids = [mid for mid in (_message_id(msg) for msg in messages) if mid is not None]
+    if not ids:
+        return None
+    stamps = [ts for ts in (_created_ts(msg) for msg in messages) if ts is not None]
+    return {"max_id": max(ids), "min_id": min(ids), "oldest_ts": min(stamps) if stamps else None, "complete": complete}
+
+
+def sync_messages(
+    account: str,
+    conversation_id,
+    fetch_page: Callable[..., List[Dict]],
+    start_ts: Optional[float] = None,
+    max_batches: int = 200,
+) -> List[Dict]:
+    """Bring a conversation up to date and return its stored messages.
+
+    `fetch_page(before_id=None, after_id=None)` must return one page of
+    messages, oldest first: those newer than `after_id`, older than
+    `before_id`, or the newest page when both are None (see `page_params`).
+    Only messages created at or after `start_ts` (plus those without a
+    timestamp) are returned, ordered by id.
+    """
+    conversation_id = str(conversation_id)
+    with _store_conn() as conn:
+        state = _load_state(conn, account, conversation_id)
+
+    if state:
+        fetched = _walk_forward(fetch_page, state["max_id"], max_batches)
+        newer = _range_state(fetched, False)
+        if newer:
+            state["max_id"] = max(state["max_id"], newer["max_id"])
+    else:
+        top = _walk_back(fetch_page, None, start_ts, max_batches)
+        fetched = top["messages"]
+        state = _range_state(fetched, top["reached_start"])
+
+    if not state:
+        # Conversa sem mensagens: registra a sincronização para não recontar.
+        state = {"max_id": None, "min_id": None, "oldest_ts": None, "complete": top["reached_start"]}
+        with _store_conn() as conn:
+            _save(conn, account, conversation_id, [], state)
+        return []
+
+    if not _covers(state, start_ts):
+        older = _walk_back(fetch_page, state["min_id"], start_ts, max_batches)
+        fetched.extend(older["messages"])
+        older_state = _range_state(older["messages"], older["reached_start"])
+        if older_state:
+            stamps = [ts for ts in (state["oldest_ts"], older_state["oldest_ts"]) if ts is not None]
+            state["min_id"] = min(state["min_id"], older_state["min_id"])
+            state["oldest_ts"] = min(stamps) if stamps else None
+        state["complete"] = state["complete"] or older["reached_start"]
+
+    with _store_conn() as conn:
+        _save(conn, account, conversation_id, fetched, state)
+        return stored_messages(account, conversation_id, start_ts=start_ts, min_id=state["min_id"], conn=conn)
+
+
+def stored_messages(
+    account: str,
+    conversation_id,
+    start_ts: Optional[float] = None,
+    min_id: Optional[int] = None,
+    conn: Optional[sqlite3.Connection] = None,
+) -> List[Dict]:
+    """Return stored messages for a conversation ordered by id."""
+    query = "SELECT payload FROM stored_messages WHERE account = ? AND conversation_id = ?"
+    params = [account, str(conversation_id)]
+    if min_id is not None:
+        query += " AND message_id >= ?"
+        params.append(min_id)
+    if start_ts is not None:
+        query += " AND (created_ts IS NULL OR created_ts >= ?)"
+        params.append(start_ts)
+    query += " ORDER BY message_id"
+    if conn is None:
+        with _store_conn() as own_conn:
+            rows = own_conn.execute(query, params).fetchall()
+    else:
+        rows = conn.execute(query, params).fetchall()
+    return [json.loads(row[0]) for row in rows]
+
+
+def conversations_needing_sync(
+    account: str,
+    last_activity: Dict,
+    start_ts: Optional[float] = None,
+) -> List:
+    """Return conversation ids whose stored messages are missing or stale.
+
+    `last_activity` maps conversation id to its `last_activity_at` epoch (or
+    None). A conversation is fresh when it was synced after its last activity
+    and the stored range reaches back to `start_ts`.
+    """
+    if not last_activity:
+        return []
+    with _store_conn() as conn:
+        rows = conn.execute(
+            "SELECT conversation_id, max_id, oldest_ts, complete, synced_at FROM conversation_sync WHERE account = ?",
+            (account,),
+        ).fetchall()
+    states = {
+        row[0]: {"max_id": row[1], "oldest_ts": row[2], "complete": bool(row[3]), "synced_at": row[4]}
+        for row in rows
+    }
+    stale = []
+    for conversation_id, activity_ts in last_activity.items():
+        state = states.get(str(conversation_id))
+        if not state or not _covers(state, start_ts):
+            stale.append(conversation_id)
+        elif activity_ts is None or activity_ts > (state["synced_at"] or 0):
+            stale.append(conversation_id)
+    return stale
+
+
+def record_conversations(account: str, conversations: Iterable[Dict]) -> int:
+    """Add conversations to the conversation rollup; returns how many were new."""
+    with _store_conn() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        added = record_conversation_rollup(conn, account, conversations)
+        conn.commit()
+    return added
+
+
+def query_message_rollup(
+    account: str,
+    start_ts: float,
+    end_ts: float,
+    inbox_ids: Optional[Iterable] = None,
+    weekdays: Optional[Iterable[int]] = None,
+):
+    """Slice the hourly message rollup; see `src.analytics.rollups.message_rollup`."""
+    with _store_conn() as conn:
+        return message_rollup(conn, account, start_ts, end_ts, inbox_ids=inbox_ids, weekdays=weekdays)
+
+
+def query_conversation_rollup(
+    account: str,
+    start_ts: float,
+    end_ts: float,
+    inbox_ids: Optional[Iterable] = None,
+    weekdays: Optional[Iterable[int]] = None,
+):
+    """Slice the hourly conversation rollup; see `src.analytics.rollups.conversation_rollup`."""
+    with _store_conn() as conn:
+        return conversation_rollup(conn, account, start_ts, end_ts, inbox_ids=inbox_ids, weekdays=weekdays)
+
+
+def account_key(base_url: str, account_id) -> str:
+    """Return the store key that identifies a Chatwoot account."""
+    return f"{(base_url or '').rstrip('/')}|{account_id}"
+
+
+__all__ = [
+    "STORE_PATH",
+    "account_key",
+    "conversations_needing_sync",
+    "page_params",
+    "query_conversation_rollup",
+    "query_message_rollup",
+    "record_conversations",
+    "stored_messages",
+    "sync_messages",
+]
@@ -0,0 +1,164 @@
+"""Concurrent message crawls backed by the local message store, and text/audio counts."""
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.analytics.message_store import (
+    account_key,
+    conversations_needing_sync,
+    page_params,
+    query_message_rollup,
+    record_conversations,
+    stored_messages,
+    sync_messages,
+)
+from src.utils.http_cache import cached_get
+from src.utils.rate_limit import call_with_backoff
+from src.utils.timestamps import parse_ts
+
+MAX_SYNC_WORKERS = 4
+
+
+def chatwoot_page_fetcher(base_url: str, account_id: str, token: str, conversation_id, timeout: float = 15) -> Callable:
+    """Return a `fetch_page(before_id, after_id)` callable for one conversation's messages.
+
+    This is the only page fetcher to hand to `sync_messages`: a cached `after`
+    or newest page could hide new messages from the store.
+    """
+    url = f"{base_url}/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages"
+    headers = {"api_access_token": token, "Content-Type": "application/json"}
+
+    def fetch_page(before_id=None, after_id=None):
+        params = page_params(before_id, after_id)
+        # Páginas novas (`after` e a mais recente) sempre vão à API; as antigas podem vir do cache em disco.
+        resp = call_with_backoff(
+            lambda: cached_get(url, params=params, headers=headers, timeout=timeout, ttl=None if before_id else 0)
+        )
+        if resp.status_code >= 400:
+            raise RuntimeError(f"Chatwoot respondeu {resp.status_code} ao buscar mensagens: {resp.text[:200]}")
+        data = resp.json() or {}
+        return data.get("data", []) or data.get("payload") or []
+
+    return fetch_page
+
+
+def _last_activity_ts(conv: Dict) -> Optional[float]:
+    dt = parse_ts(conv.get("last_activity_at") or conv.get("updated_at") or conv.get("timestamp"))
+    return dt.timestamp() if dt else None
+
+
+def crawl_messages(
+    base_url: str,
+    account_id: str,
+    token: str,
+    conversation_ids: Iterable,
+    start_ts: Optional[float] = None,
+    max_workers: int = MAX_SYNC_WORKERS,
+) -> Iterator[Tuple[object, List[Dict], Optional[Exception]]]:
+    """Sync conversations concurrently, yielding `(conversation_id, messages, error)` as each finishes.
+
+    Each conversation is brought up to date through the message store, so
+    only new pages are downloaded; 429 responses pause every worker (see
+    `src.utils.rate_limit`). Results are yielded in the calling thread, in
+    completion order, which lets callers stream progress and rows.
+    """
+    account = account_key(base_url, account_id)
+    conversation_ids = list(conversation_ids)
+    if not conversation_ids:
+        return
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(conversation_ids)))) as executor:
+        futures = {
+            executor.submit(
+                sync_messages,
+                account,
+                conv_id,
+                chatwoot_page_fetcher(base_url, account_id, token, conv_id),
+                start_ts,
+            ): conv_id
+            for conv_id in conversation_ids
+        }
+        for future in as_completed(futures):
+            error = future.exception()
+            yield futures[future], ([] if error else future.result()), error
+
+
+def conversation_messages(
+    base_url: str,
+    account_id: str,
+    token: str,
+    conversations: List[Dict],
+    start_ts: Optional[float] = None,
+    max_workers: int = MAX_SYNC_WORKERS,
+) -> Iterator[Tuple[object, List[Dict], Optional[Exception]]]:
+    """Yield `(conversation_id, messages, error)` for every conversation.
+
+    Conversations already up to date in the store are served from disk first;
+    the remaining ones are crawled through `crawl_messages`. The conversations
+    themselves are added to the conversation rollup.
+    """
+    account = account_key(base_url, account_id)
+    record_conversations(account, conversations)
+    last_activity = {}
+    for conv in conversations:
+        conv_id = conv.get("id") or conv.get("display_id")
+        if conv_id is not None:
+            last_activity[conv_id] = _last_activity_ts(conv)
+    stale = conversations_needing_sync(account, last_activity, start_ts=start_ts)
+    stale_ids = set(stale)
+    for conv_id in last_activity:
+        if conv_id not in stale_ids:
+            yield conv_id, stored_messages(account, conv_id, start_ts=start_ts), None
+    yield from crawl_messages(base_url, account_id, token, stale, start_ts, max_workers=max_workers)
+
+
+def count_message_types(
+    base_url: str,
+    account_id: str,
+    token: str,
+    conversations: List[Dict],
+    start_dt,
+    end_dt,
+    max_workers: int = MAX_SYNC_WORKERS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    inbox_ids: Optional[Iterable] = None,
+) -> Dict[str, int]:
+    """Count text and audio messages sent in [start_dt, end_dt] for `conversations`.
+
+    Only conversations missing from the store, or with activity after their
+    last sync, are crawled (with at most `max_workers` in flight); the counts
+    themselves are read from the hourly rollup, optionally limited to
+    `inbox_ids`. `on_progress(done, total)` is called from the calling thread
+    as crawls finish.
+    """
+    account = account_key(base_url, account_id)
+    start_ts = start_dt.timestamp()
+    last_activity = {}
+    for conv in conversations:
+        conv_id = conv.get("id") or conv.get("display_id")
+        if conv_id is not None:
+            last_activity[str(conv_id)] = _last_activity_ts(conv)
+
+    record_conversations(account, conversations)
+    stale = conversations_needing_sync(account, last_activity, start_ts=start_ts)
+    failed = 0
+    for done, (_, _, error) in enumerate(
+        crawl_messages(base_url, account_id, token, stale, start_ts, max_workers=max_workers), start=1
+    ):
+        if error is not None:
+            failed += 1
+        if on_progress:
+            on_progress(done, len(stale))
+
+    rollup = query_message_rollup(account, start_ts, end_dt.timestamp(), inbox_ids=inbox_ids)
+    total = int(rollup["messages"].sum())
+    audio = int(rollup["audio"].sum())
+    return {
+        "text": total - audio,
+        "audio": audio,
+        "synced": len(stale) - failed,
+        "failed": failed,
+        "cached": len(last_activity) - len(stale),
+    }
+
+
+__all__ = ["chatwoot_page_fetcher", "conversation_messages", "count_message_types", "crawl_messages"]
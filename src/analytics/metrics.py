@@ -1,47 +1,42 @@
 """Metrics helpers for Chatwoot analytics and reports."""
 
-from datetime import datetime, timezone, time
-from typing import List, Dict
+from typing import Dict, Iterable, List, Optional
 
+import numpy as np
 import pandas as pd
-import requests
 
+from src.utils.http_cache import cached_get
+from src.utils.rate_limit import call_with_backoff
+from src.utils.timestamps import to_local
 from src.utils.timezone import TZ
 
 
-def _parse_ts(value):
-    """Parse timestamps from numeric or string values into UTC-aware datetimes."""
-    if value is None:
-        return None
-    try:
-        if isinstance(value, (int, float)):
-            return datetime.fromtimestamp(value, tz=timezone.utc)
-        if isinstance(value, str):
-            try:
-                return datetime.fromisoformat(value.replace("Z", "+00:00"))
-            except Exception:
-                return datetime.fromtimestamp(float(value), tz=timezone.utc)
-    except Exception:
-        return None
-    return None
-
-
 def _chatwoot_headers(token: str):
     """Build default headers for Chatwoot API requests."""
     return {"api_access_token": token, "Content-Type": "application/json"}
 
 
-def fetch_chatwoot_conversations(base_url: str, account_id: str, token: str, start_dt, status: str = "all", max_pages: int = 10, per_page: int = 50):
-    """Fetch conversations from Chatwoot, stopping when past the start date."""
+def fetch_chatwoot_conversations(
+    base_url: str,
+    account_id: str,
+    token: str,
+    start_dt,
+    status: str = "all",
+    max_pages: Optional[int] = None,
+    per_page: int = 50,
+):
+    """Fetch conversations from Chatwoot, stopping when past the start date.
+
+    Pages are read until the list reaches conversations older than `start_dt`
+    (or `max_pages`, when given); 429 responses are retried with backoff.
+    """
     conversations = []
     page = 1
-    while page <= max_pages:
+    while max_pages is None or page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/conversations"
-        resp = requests.get(
-            url,
-            params={"status": status, "page": page, "per_page": per_page, "sort": "last_activity_at"},
-            headers=_chatwoot_headers(token),
-            timeout=20,
+        params = {"status": status, "page": page, "per_page": per_page, "sort": "last_activity_at"}
+        resp = call_with_backoff(
+            lambda: cached_get(url, params=params, headers=_chatwoot_headers(token), timeout=20)
         )
         if resp.status_code >= 400:
             raise RuntimeError(f"Chatwoot respondeu {resp.status_code}: {resp.text[:200]}")
@@ -52,8 +47,8 @@ def fetch_chatwoot_conversations(base_url: str, account_id: str, token: str, sta
         conversations.extend(payload)
         last = payload[-1]
         last_ts_raw = last.get("last_activity_at") or last.get("updated_at") or last.get("timestamp") or last.get("created_at")
-        last_dt = _parse_ts(last_ts_raw)
-        if last_dt and last_dt.astimezone(TZ) < start_dt:
+        last_dt = to_local(last_ts_raw)
+        if last_dt and last_dt < start_dt:
             break
         page += 1
     return conversations
@@ -65,7 +60,7 @@ def fetch_chatwoot_messages(base_url: str, account_id: str, token: str, conversa
     page = 1
     while page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/conversations/{conversation_id}/messages"
-        resp = requests.get(url, params={"page": page, "per_page": per_page}, headers=_chatwoot_headers(token), timeout=20)
+        resp = cached_get(url, params={"page": page, "per_page": per_page}, headers=_chatwoot_headers(token), timeout=20)
         if resp.status_code >= 400:
             raise RuntimeError(f"Chatwoot respondeu {resp.status_code} ao buscar mensagens da conversa {conversation_id}: {resp.text[:200]}")
         data = resp.json() or {}
@@ -83,7 +78,7 @@ def fetch_chatwoot_agents(base_url: str, account_id: str, token: str, max_pages:
     page = 1
     while page <= max_pages:
         url = f"{base_url}/api/v1/accounts/{account_id}/agents"
-        resp = requests.get(
+        resp = cached_get(
             url,
             params={"page": page, "per_page": per_page},
             headers=_chatwoot_headers(token),
@@ -106,40 +101,94 @@ def fetch_chatwoot_agents(base_url: str, account_id: str, token: str, max_pages:
     return sorted(set(agents))
 
 
-def build_hourly_df(df: pd.DataFrame):
-    """Build an hourly breakdown dataframe for incoming/outgoing messages."""
-    hour_counts_df = df.copy()
-    hour_counts_df["hora_num"] = hour_counts_df["created_dt"].dt.hour
-    grouped_hours = hour_counts_df.groupby(["hora_num", "direction"]).size().unstack(fill_value=0)
-    hour_rows = []
-    total_received = 0
-    total_sent = 0
-    for h in range(24):
-        received = int(grouped_hours.loc[h].get("cliente", 0)) if h in grouped_hours.index else 0
-        sent = int(grouped_hours.loc[h].get("bot", 0)) if h in grouped_hours.index else 0
-        total_received += received
-        total_sent += sent
-        hour_rows.append(
-            {
-                "Horário": f"{h:02d}:00",
-                "total de mensagens recebidas": received,
-                "total de mensagens enviadas": sent,
-            }
+def fetch_chatwoot_inboxes(base_url: str, account_id: str, token: str, max_pages: int = 5, per_page: int = 100) -> List[Dict]:
+    """Fetch inboxes from Chatwoot with pagination as `{"id", "name"}` dicts."""
+    inboxes = []
+    page = 1
+    while page <= max_pages:
+        url = f"{base_url}/api/v1/accounts/{account_id}/inboxes"
+        resp = cached_get(
+            url,
+            params={"page": page, "per_page": per_page},
+            headers=_chatwoot_headers(token),
+            timeout=15,
         )
-    hour_rows.append(
+        if resp.status_code >= 400:
+            break
+        data = resp.json() or {}
+        payload = []
+        if isinstance(data, dict):
+            payload = data.get("data") or data.get("payload") or data.get("inboxes") or []
+        elif isinstance(data, list):
+            payload = data
+        if not payload:
+            break
+        for inbox in payload:
+            if isinstance(inbox, dict):
+                inboxes.append(
+                    {
+                        "id": inbox.get("id"),
+                        "name": inbox.get("name") or inbox.get("channel_type") or str(inbox.get("id")),
+                    }
+                )
+        if len(payload) < per_page:
+            break
+        page += 1
+    return inboxes
+
+
+def _hourly_table(received, sent) -> pd.DataFrame:
+    """Format 24 received/sent hourly counts plus a TOTAL row."""
+    received = [int(value) for value in received]
+    sent = [int(value) for value in sent]
+    return pd.DataFrame(
         {
-            "Horário": "TOTAL",
-            "total de mensagens recebidas": total_received,
-            "total de mensagens enviadas": total_sent,
+            "Horário": [f"{h:02d}:00" for h in range(24)] + ["TOTAL"],
+            "total de mensagens recebidas": received + [sum(received)],
+            "total de mensagens enviadas": sent + [sum(sent)],
         }
     )
-    return pd.DataFrame(hour_rows)
+
+
+def build_hourly_df(df: pd.DataFrame):
+    """Build an hourly breakdown dataframe for incoming/outgoing messages."""
+    hours = df["created_dt"].dt.hour.to_numpy(dtype="float64", na_value=-1).astype(np.int64)
+    direction = df["direction"].to_numpy()
+    valid = hours >= 0
+    received = np.bincount(hours[valid & (direction == "cliente")], minlength=24)
+    sent = np.bincount(hours[valid & (direction == "bot")], minlength=24)
+    return _hourly_table(received, sent)
+
+
+def hourly_df_from_rollup(rollup: pd.DataFrame, hours: Optional[Iterable[int]] = None, msg_type: str = "Todas"):
+    """Build the `build_hourly_df` table from a `message_rollup` slice (see `src.analytics.rollups`).
+
+    Rows are split into cliente/bot and filtered by `hours`/`msg_type` the same
+    way as `src.analytics.attendance.filter_messages`.
+    """
+    hour = rollup["hour"].to_numpy(dtype=np.int64)
+    messages = rollup["messages"].to_numpy(dtype=np.int64)
+    is_client = (rollup["direction"] == "incoming") | rollup["sender_type"].isin(["contact", "contact::inbox"])
+    is_client = is_client.to_numpy()
+    received = np.bincount(hour[is_client], weights=messages[is_client], minlength=24)
+    sent = np.bincount(hour[~is_client], weights=messages[~is_client], minlength=24)
+    if hours:
+        skipped = ~np.isin(np.arange(24), list(hours))
+        received[skipped] = 0
+        sent[skipped] = 0
+    if msg_type == "Apenas clientes":
+        sent[:] = 0
+    elif msg_type == "Apenas bot":
+        received[:] = 0
+    return _hourly_table(received, sent)
 
 
 __all__ = [
     "fetch_chatwoot_agents",
     "fetch_chatwoot_conversations",
+    "fetch_chatwoot_inboxes",
     "fetch_chatwoot_messages",
     "TZ",
     "build_hourly_df",
+    "hourly_df_from_rollup",
 ]
@@ -0,0 +1,219 @@
+"""Hourly rollups of messages and conversations kept next to the message store.
+
+Counts are bucketed by UTC hour × inbox × direction × sender type and are
+updated only for messages seen for the first time, so re-syncing a page never
+double counts; conversations are counted once per id, by creation hour.
+Dashboards slice these small tables (by local day, hour or weekday) instead
+of scanning raw messages or asking Chatwoot for reports.
+"""
+
+import sqlite3
+from typing import Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from src.utils.timestamps import parse_ts, to_local_series
+
+ROLLUP_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS message_rollup (
+        account TEXT,
+        bucket_ts INTEGER,
+        inbox_id TEXT,
+        direction TEXT,
+        sender_type TEXT,
+        messages INTEGER DEFAULT 0,
+        audio INTEGER DEFAULT 0,
+        PRIMARY KEY (account, bucket_ts, inbox_id, direction, sender_type)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_index (
+        account TEXT,
+        conversation_id TEXT,
+        created_ts REAL,
+        inbox_id TEXT,
+        PRIMARY KEY (account, conversation_id)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS conversation_rollup (
+        account TEXT,
+        bucket_ts INTEGER,
+        inbox_id TEXT,
+        conversations INTEGER DEFAULT 0,
+        PRIMARY KEY (account, bucket_ts, inbox_id)
+    )
+    """,
+]
+ROLLUP_COLUMNS = ["bucket_ts", "inbox_id", "direction", "sender_type", "messages", "audio"]
+_DIRECTIONS = {0: "incoming", 1: "outgoing", "0": "incoming", "1": "outgoing", "incoming": "incoming", "outgoing": "outgoing"}
+_WEEKDAY_NAMES = ["Segunda", "Terça", "Quarta", "Quinta", "Sexta", "Sábado", "Domingo"]
+
+
+def _hour_bucket(value) -> Optional[int]:
+    dt = parse_ts(value)
+    if not dt:
+        return None
+    ts = int(dt.timestamp())
+    return ts - ts % 3600
+
+
+def _direction(msg: Dict) -> str:
+    raw = msg.get("message_type")
+    if isinstance(raw, str):
+        raw = raw.strip().lower()
+    return _DIRECTIONS.get(raw, "other")
+
+
+def _sender_type(msg: Dict) -> str:
+    sender_type = msg.get("sender_type")
+    if not sender_type:
+        for source in (msg.get("sender"), msg.get("sender_info")):
+            if isinstance(source, dict):
+                sender_type = source.get("type") or source.get("sender_type")
+                if sender_type:
+                    break
+    return str(sender_type or "").strip().lower()
+
+
+def _has_audio(msg: Dict) -> bool:
+    return any(isinstance(att, dict) and att.get("file_type") == "audio" for att in msg.get("attachments") or [])
+
+
+def record_message_rollup(conn: sqlite3.Connection, account: str, messages: Iterable[Dict], inbox_id=None) -> None:
+    """Add newly ingested messages to `message_rollup` (callers must skip already stored ids)."""
+    deltas = {}
+    for msg in messages:
+        bucket = _hour_bucket(msg.get("created_at") or msg.get("timestamp"))
+        if bucket is None:
+            continue
+        key = (bucket, str(msg.get("inbox_id") or inbox_id or ""), _direction(msg), _sender_type(msg))
+        counts = deltas.setdefault(key, [0, 0])
+        counts[0] += 1
+        counts[1] += int(_has_audio(msg))
+    if not deltas:
+        return
+    conn.executemany(
+        """
+        INSERT INTO message_rollup (account, bucket_ts, inbox_id, direction, sender_type, messages, audio)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (account, bucket_ts, inbox_id, direction, sender_type)
+        DO UPDATE SET messages = messages + excluded.messages, audio = audio + excluded.audio
+        """,
+        [(account, *key, counts[0], counts[1]) for key, counts in deltas.items()],
+    )
+
+
+def record_conversation_rollup(conn: sqlite3.Connection, account: str, conversations: Iterable[Dict]) -> int:
+    """Index conversations and count the new ones per creation hour/inbox; returns how many were new."""
+    deltas = {}
+    for conv in conversations:
+        conv_id = conv.get("id") or conv.get("display_id")
+        created = parse_ts(conv.get("created_at") or conv.get("timestamp"))
+        if conv_id is None or not created:
+            continue
+        created_ts = int(created.timestamp())
+        bucket = created_ts - created_ts % 3600
+        inbox_id = str(conv.get("inbox_id") or "")
+        cur = conn.execute(
+            "INSERT OR IGNORE INTO conversation_index (account, conversation_id, created_ts, inbox_id) VALUES (?, ?, ?, ?)",
+            (account, str(conv_id), created_ts, inbox_id),
+        )
+        if cur.rowcount:
+            deltas[(bucket, inbox_id)] = deltas.get((bucket, inbox_id), 0) + 1
+    conn.executemany(
+        """
+        INSERT INTO conversation_rollup (account, bucket_ts, inbox_id, conversations)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (account, bucket_ts, inbox_id) DO UPDATE SET conversations = conversations + excluded.conversations
+        """,
+        [(account, bucket, inbox_id, total) for (bucket, inbox_id), total in deltas.items()],
+    )
+    return sum(deltas.values())
+
+
+def _slice(
+    conn: sqlite3.Connection,
+    table: str,
+    columns: List[str],
+    account: str,
+    start_ts: float,
+    end_ts: float,
+    inbox_ids: Optional[Iterable] = None,
+) -> pd.DataFrame:
+    query = f"SELECT {', '.join(columns)} FROM {table} WHERE account = ? AND bucket_ts >= ? AND bucket_ts <= ?"
+    params: List = [account, int(start_ts) - int(start_ts) % 3600, int(end_ts)]
+    inbox_ids = [str(inbox_id) for inbox_id in (inbox_ids or [])]
+    if inbox_ids:
+        query += f" AND inbox_id IN ({', '.join('?' for _ in inbox_ids)})"
+        params.extend(inbox_ids)
+    frame = pd.read_sql_query(query, conn, params=params)
+    local = to_local_series(frame["bucket_ts"].astype("int64"), index=frame.index)
+    frame["local_dt"] = local
+    frame["day"] = local.dt.date
+    frame["hour"] = local.dt.hour
+    frame["weekday"] = local.dt.weekday
+    return frame
+
+
+def message_rollup(
+    conn: sqlite3.Connection,
+    account: str,
+    start_ts: float,
+    end_ts: float,
+    inbox_ids: Optional[Iterable] = None,
+    weekdays: Optional[Iterable[int]] = None,
+) -> pd.DataFrame:
+    """Return message rollup rows in [start_ts, end_ts] with local day/hour/weekday columns."""
+    frame = _slice(conn, "message_rollup", ROLLUP_COLUMNS, account, start_ts, end_ts, inbox_ids)
+    if weekdays is not None:
+        frame = frame[frame["weekday"].isin(list(weekdays))]
+    return frame
+
+
+def conversation_rollup(
+    conn: sqlite3.Connection,
+    account: str,
+    start_ts: float,
+    end_ts: float,
+    inbox_ids: Optional[Iterable] = None,
+    weekdays: Optional[Iterable[int]] = None,
+) -> pd.DataFrame:
+    """Return conversation rollup rows in [start_ts, end_ts] with local day/hour/weekday columns."""
+    frame = _slice(conn, "conversation_rollup", ["bucket_ts", "inbox_id", "conversations"], account, start_ts, end_ts, inbox_ids)
+    if weekdays is not None:
+        frame = frame[frame["weekday"].isin(list(weekdays))]
+    return frame
+
+
+def rollup_by(frame: pd.DataFrame, dimension: str, value: str = "messages") -> pd.DataFrame:
+    """Aggregate a rollup slice by `hour`, `day` or `weekday` (split by direction for messages)."""
+    if dimension == "hour":
+        index = pd.RangeIndex(24, name="hora")
+    elif dimension == "weekday":
+        index = pd.RangeIndex(7, name="dia")
+    else:
+        index = None
+    if "direction" in frame.columns and value == "messages":
+        grouped = frame.groupby([dimension, "direction"])[value].sum().unstack(fill_value=0)
+        grouped = grouped.reindex(columns=["incoming", "outgoing"], fill_value=0)
+    else:
+        grouped = frame.groupby(dimension)[[value]].sum()
+    if frame.empty:
+        grouped = grouped.iloc[0:0]
+    if index is not None:
+        grouped = grouped.reindex(index, fill_value=0)
+        if dimension == "weekday":
+            grouped.index = _WEEKDAY_NAMES
+    return grouped.astype(int)
+
+
+__all__ = [
+    "ROLLUP_SCHEMA",
+    "conversation_rollup",
+    "message_rollup",
+    "record_conversation_rollup",
+    "record_message_rollup",
+    "rollup_by",
+]
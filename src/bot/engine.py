@@ -6,12 +6,10 @@ from datetime import datetime
 from pathlib import Path
 from typing import Dict, List, Optional
 
-import requests
-from openai import OpenAI
-
 from src.utils.db_init import DB_PATH, ensure_db
 from src.utils.timezone import TZ
 from src.utils.database import get_conn
+from src.utils.instrumentation import chatwoot_call
 
 ENV_PATH = Path(__file__).resolve().parents[2] / ".env"
 ENV_LOADED = False
@@ -94,7 +92,7 @@ def build_prompt_from_blocks(blocks: Optional[Dict]) -> str:
 def load_settings() -> Optional[Dict]:
     """Load settings from the SQLite database into a dict."""
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("load_settings") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -140,7 +138,7 @@ def load_settings() -> Optional[Dict]:
 def save_settings(data: Dict):
     """Persist settings to the SQLite database."""
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("save_settings") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -197,7 +195,7 @@ def save_settings(data: Dict):
 def load_prompt_profiles() -> List[Dict]:
     """Return all prompt profiles ordered by name."""
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("load_prompt_profiles") as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT id, name, details, prompt_text FROM prompt_profiles ORDER BY name COLLATE NOCASE"
@@ -214,7 +212,7 @@ def get_prompt_profile(profile_id: Optional[int]) -> Optional[Dict]:
     if profile_id is None:
         return None
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("get_prompt_profile") as conn:
         cur = conn.cursor()
         cur.execute(
             "SELECT id, name, details, prompt_text FROM prompt_profiles WHERE id = ?",
@@ -229,7 +227,7 @@ def get_prompt_profile(profile_id: Optional[int]) -> Optional[Dict]:
 def save_prompt_profile(name: str, details: str, prompt_text: str, profile_id: Optional[int] = None) -> int:
     """Insert or update a prompt profile and return its id."""
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("save_prompt_profile") as conn:
         cur = conn.cursor()
         if profile_id:
             cur.execute(
@@ -259,7 +257,7 @@ def delete_prompt_profile(profile_id: Optional[int]):
     if profile_id is None:
         return
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("delete_prompt_profile") as conn:
         cur = conn.cursor()
         cur.execute("DELETE FROM prompt_profiles WHERE id = ?", (profile_id,))
         conn.commit()
@@ -268,7 +266,7 @@ def delete_prompt_profile(profile_id: Optional[int]):
 def get_fallback_profile() -> Optional[Dict]:
     """Return the latest profile when no selection exists."""
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("get_fallback_profile") as conn:
         cur = conn.cursor()
         cur.execute("SELECT id, name, prompt_text FROM prompt_profiles ORDER BY id DESC LIMIT 1")
         row = cur.fetchone()
@@ -280,7 +278,7 @@ def get_fallback_profile() -> Optional[Dict]:
 def load_logs(limit: int = 200) -> List[Dict]:
     """Load recent conversation logs from the database."""
     ensure_db()
-    with get_conn() as conn:
+    with get_conn("load_logs") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -356,10 +354,10 @@ def log_conversation(
     moderation_applied=False,
     moderation_details=None,
 ):
-    """Persist a conversation log entry to the database."""
+    """Persist a conversation log entry to the database; returns the row id."""
     ensure_db()
     ts = datetime.now(TZ).isoformat()
-    with get_conn() as conn:
+    with get_conn("log_conversation") as conn:
         cur = conn.cursor()
         cur.execute(
             """
@@ -397,6 +395,7 @@ def log_conversation(
             ),
         )
         conn.commit()
+        return cur.lastrowid
 
 
 def validate_settings(data: Dict):
@@ -418,6 +417,8 @@ def validate_settings(data: Dict):
         if not api_key:
             results.append(("Modelo LLM", "error", "OPENAI_API_KEY não encontrada (.env ou ambiente)."))
         else:
+            from openai import OpenAI  # pesado; só a validação usa
+
             try:
                 client = OpenAI(api_key=api_key)
                 client.models.retrieve(model)
@@ -445,9 +446,13 @@ def validate_settings(data: Dict):
     chatwoot_api_token = data.get("chatwoot_api_token") or ""
     chatwoot_account_id = data.get("chatwoot_account_id") or ""
     if chatwoot_url and chatwoot_api_token and chatwoot_account_id:
+        import requests
+
         try:
             endpoint = f"{chatwoot_url}/api/v1/accounts/{chatwoot_account_id}/conversations"
-            resp = requests.get(endpoint, headers={"api_access_token": chatwoot_api_token}, timeout=10)
+            with chatwoot_call("GET", endpoint) as call:
+                resp = requests.get(endpoint, headers={"api_access_token": chatwoot_api_token}, timeout=10)
+                call["status"] = resp.status_code
             if resp.status_code < 400:
                 results.append(("Chatwoot API", "success", f"Chatwoot respondeu {resp.status_code}."))
             else:
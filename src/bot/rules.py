@@ -2,14 +2,15 @@
 
 import traceback
 from datetime import datetime, timezone, timedelta
-from typing import Dict, Tuple
-
-import pytz
-from openai import OpenAI
+from typing import TYPE_CHECKING, Dict, Tuple
 
 from src.bot.engine import PRICING_PER_1K
+from src.utils.timezone import TZ
+
+if TYPE_CHECKING:
+    from openai import OpenAI
 
-FUSO_HORARIO = pytz.timezone("America/Sao_Paulo")
+FUSO_HORARIO = TZ
 
 
 def default_schedule():
@@ -44,7 +45,7 @@ def custom_moderation_hit(texto: str, termos):
     return False, None
 
 
-def moderar_mensagem(client: OpenAI, texto: str):
+def moderar_mensagem(client: "OpenAI", texto: str):
     """Call OpenAI moderation and return structured results."""
     try:
         resp = client.moderations.create(model="omni-moderation-latest", input=texto)
@@ -0,0 +1,108 @@
+"""In-process metrics of the webhook service (`app.modules.bot.bot_start`).
+
+The webhook records received events and queued/running response tasks.
+`snapshot` summarizes them for `/healthz` and `/metrics?format=json`, with
+p50/p95 latencies since startup estimated from the `src.utils.instrumentation`
+histograms that `/metrics` exports, so both views read the same samples.
+"""
+
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from src.utils.instrumentation import histogram_quantiles, observe
+
+STUCK_TASK_SECONDS = 120
+# tipo de latência no resumo JSON -> (histograma, rótulos filtrados)
+LATENCY_HISTOGRAMS = {
+    "handle": ("bot_task_seconds", {}),
+    "llm": ("bot_stage_seconds", {"stage": "llm"}),
+    "moderation": ("bot_stage_seconds", {"stage": "moderation"}),
+    "chatwoot": ("chatwoot_request_seconds", {}),
+}
+
+_lock = threading.Lock()
+_state = {
+    "started_at": time.time(),
+    "events": 0,
+    "last_event_at": None,
+    "queued": 0,
+    "tasks_done": 0,
+    "tasks_failed": 0,
+}
+_running: Dict[int, float] = {}
+_task_ids = itertools.count()
+
+
+def record_event() -> None:
+    """Count one webhook event received."""
+    with _lock:
+        _state["events"] += 1
+        _state["last_event_at"] = time.time()
+
+
+def task_queued() -> None:
+    """Count a response task handed to the background queue."""
+    with _lock:
+        _state["queued"] += 1
+
+
+@contextmanager
+def track_task():
+    """Mark a queued task as running for the enclosed block and time it in `bot_task_seconds`."""
+    task_id = next(_task_ids)
+    with _lock:
+        _state["queued"] = max(0, _state["queued"] - 1)
+        _running[task_id] = time.time()
+    started = time.perf_counter()
+    failed = False
+    try:
+        yield
+    except Exception:
+        failed = True
+        raise
+    finally:
+        observe("bot_task_seconds", time.perf_counter() - started)
+        with _lock:
+            _running.pop(task_id, None)
+            _state["tasks_failed" if failed else "tasks_done"] += 1
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of `values` (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[max(1, math.ceil(pct / 100 * len(ordered))) - 1]
+
+
+def snapshot() -> Dict:
+    """Summarize uptime, task counts, last-event age and p50/p95 latencies."""
+    now = time.time()
+    with _lock:
+        state = dict(_state)
+        running = list(_running.values())
+    oldest_task_age = now - min(running) if running else None
+    data = {
+        "status": "degraded" if oldest_task_age and oldest_task_age > STUCK_TASK_SECONDS else "ok",
+        "uptime_s": round(now - state["started_at"], 1),
+        "events": state["events"],
+        "last_event_age_s": round(now - state["last_event_at"], 1) if state["last_event_at"] else None,
+        "in_flight": len(running),
+        "queue_depth": state["queued"],
+        "oldest_task_age_s": round(oldest_task_age, 1) if oldest_task_age is not None else None,
+        "tasks_done": state["tasks_done"],
+        "tasks_failed": state["tasks_failed"],
+    }
+    for kind, (histogram, labels) in LATENCY_HISTOGRAMS.items():
+        count, values = histogram_quantiles(histogram, (0.5, 0.95), **labels)
+        for pct, value in zip((50, 95), values):
+            data[f"{kind}_p{pct}_s"] = round(value, 3) if value is not None else None
+        data[f"{kind}_count"] = count
+    return data
+
+
+__all__ = ["LATENCY_HISTOGRAMS", "percentile", "record_event", "snapshot", "task_queued", "track_task"]
@@ -0,0 +1,131 @@
+"""Per-message latency traces of the webhook, stored in `response_traces`.
+
+A trace starts when the webhook receives a message and collects the time
+spent in each span (TRACE_SPANS, in milliseconds): handling the webhook
+request, waiting in the background queue and each stage of
+`responder_cliente`. One row is saved per handled message, keyed to the
+`conversation_logs` row of the bot's reply (`log_id`) when there is one;
+`conversation_id`/`message_id` match the fields of the webhook's log lines.
+"""
+
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional
+
+from src.bot.runtime_metrics import percentile
+from src.utils.database import get_conn
+from src.utils.timezone import TZ
+
+TRACE_SPANS = ("webhook", "queue", "settings", "status_check", "moderation", "llm", "chatwoot_post", "log_write")
+
+
+def start_trace() -> Dict:
+    """New trace starting now (message received)."""
+    now = time.perf_counter()
+    return {
+        "created_at": datetime.now(TZ).isoformat(),
+        "started": now,
+        "mark": now,
+        "spans": {},
+        "outcome": "skipped",
+    }
+
+
+def _add(trace: Dict, name: str, seconds: float) -> None:
+    trace["spans"][name] = trace["spans"].get(name, 0.0) + seconds * 1000
+
+
+def mark(trace: Dict, name: str) -> None:
+    """Record the time since the previous mark (or the start) as span `name`."""
+    now = time.perf_counter()
+    _add(trace, name, now - trace["mark"])
+    trace["mark"] = now
+
+
+@contextmanager
+def span(trace: Dict, name: str):
+    """Add the duration of the enclosed block to span `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        _add(trace, name, time.perf_counter() - started)
+
+
+def save_trace(trace: Dict, conversation_id) -> int:
+    """Persist a finished trace; returns its id."""
+    spans = trace["spans"]
+    total_ms = (time.perf_counter() - trace["started"]) * 1000
+    columns = ["log_id", "conversation_id", "message_id", "created_at", "model", "profile_name", "outcome", "total_ms"]
+    values = [
+        trace.get("log_id"),
+        str(conversation_id) if conversation_id is not None else None,
+        str(trace["message_id"]) if trace.get("message_id") is not None else None,
+        trace["created_at"],
+        trace.get("model"),
+        trace.get("profile_name"),
+        trace.get("outcome"),
+        round(total_ms),
+    ]
+    for name in TRACE_SPANS:
+        columns.append(f"{name}_ms")
+        values.append(round(spans[name]) if name in spans else None)
+    with get_conn("save_trace") as conn:
+        cur = conn.cursor()
+        cur.execute(
+            f"INSERT INTO response_traces ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+            values,
+        )
+        conn.commit()
+        return cur.lastrowid
+
+
+def load_traces(days: int = 7, outcomes: Optional[Iterable[str]] = None) -> List[Dict]:
+    """Traces of the last `days` days, optionally restricted to some outcomes."""
+    since = (datetime.now(TZ) - timedelta(days=days)).isoformat()
+    query = "SELECT * FROM response_traces WHERE created_at >= ?"
+    params: List = [since]
+    outcomes = list(outcomes or [])
+    if outcomes:
+        query += f" AND outcome IN ({', '.join('?' * len(outcomes))})"
+        params += outcomes
+    with get_conn("load_traces") as conn:
+        cur = conn.cursor()
+        cur.execute(query + " ORDER BY created_at", params)
+        names = [col[0] for col in cur.description]
+        return [dict(zip(names, row)) for row in cur.fetchall()]
+
+
+def trace_hour(trace: Dict) -> str:
+    """Local hour of day of a trace, e.g. `"14h"`."""
+    return f"{trace['created_at'][11:13]}h"
+
+
+def latency_percentiles(traces: List[Dict], group_by: str, spans: Iterable[str] = ("total", "llm")) -> List[Dict]:
+    """p50/p95 (ms) of `spans` per value of `group_by` (a trace column or `"hour"`)."""
+    groups: Dict[str, List[Dict]] = {}
+    for trace in traces:
+        key = trace_hour(trace) if group_by == "hour" else trace.get(group_by)
+        groups.setdefault(key if key not in (None, "") else "—", []).append(trace)
+    rows = []
+    for key in sorted(groups):
+        row = {group_by: key, "count": len(groups[key])}
+        for name in spans:
+            values = [t[f"{name}_ms"] for t in groups[key] if t.get(f"{name}_ms") is not None]
+            row[f"{name}_p50_ms"] = percentile(values, 50)
+            row[f"{name}_p95_ms"] = percentile(values, 95)
+        rows.append(row)
+    return rows
+
+
+__all__ = [
+    "TRACE_SPANS",
+    "latency_percentiles",
+    "load_traces",
+    "mark",
+    "save_trace",
+    "span",
+    "start_trace",
+    "trace_hour",
+]
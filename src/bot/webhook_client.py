@@ -0,0 +1,158 @@
+"""Queries to the webhook service's `/healthz` and `/metrics` endpoints.
+
+The Streamlit pages use these instead of looking for the uvicorn process:
+an answer means the service is up and its event loop responsive, and
+`/metrics?format=json` (see `src.bot.runtime_metrics`) tells a busy or stuck
+service from a healthy one; plain `/metrics` is the Prometheus export.
+Timeouts are tiny so a page never waits on the webhook.
+"""
+
+import ipaddress
+import os
+import signal
+import subprocess
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+from src.utils.db_init import DATA_DIR
+
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "http://127.0.0.1:8000").rstrip("/")
+WEBHOOK_TIMEOUT = float(os.getenv("WEBHOOK_HEALTH_TIMEOUT", "0.5"))
+WEBHOOK_PROCESS_PATTERN = "uvicorn app.modules.bot.bot_start:app"
+WEBHOOK_PID_PATH = DATA_DIR / "webhook.pid"
+
+
+def _get_json(path: str, timeout: float, params: Optional[Dict] = None) -> Optional[Dict]:
+    import requests  # sob demanda: a barra lateral importa este módulo em todas as páginas
+
+    try:
+        resp = requests.get(f"{WEBHOOK_URL}{path}", params=params, timeout=timeout)
+        if resp.status_code >= 400:
+            return None
+        data = resp.json()
+    except (requests.RequestException, ValueError):
+        return None
+    return data if isinstance(data, dict) else None
+
+
+def webhook_health(timeout: float = WEBHOOK_TIMEOUT) -> Optional[Dict]:
+    """Return the `/healthz` payload, or None when the webhook does not answer."""
+    return _get_json("/healthz", timeout)
+
+
+def webhook_metrics(timeout: float = WEBHOOK_TIMEOUT) -> Optional[Dict]:
+    """Return the `/metrics` summary (JSON), or None when the webhook does not answer."""
+    return _get_json("/metrics", timeout, params={"format": "json"})
+
+
+def webhook_prometheus(timeout: float = WEBHOOK_TIMEOUT) -> Optional[str]:
+    """Return the `/metrics` export in the Prometheus text format, or None."""
+    import requests
+
+    try:
+        resp = requests.get(f"{WEBHOOK_URL}/metrics", timeout=timeout)
+    except requests.RequestException:
+        return None
+    return resp.text if resp.status_code < 400 else None
+
+
+def is_webhook_running(timeout: float = WEBHOOK_TIMEOUT) -> bool:
+    """Whether the webhook service answers its health check."""
+    return webhook_health(timeout) is not None
+
+
+def record_webhook_pid(pid: int) -> None:
+    """Remember the pid of a webhook process started by this app."""
+    WEBHOOK_PID_PATH.parent.mkdir(parents=True, exist_ok=True)
+    WEBHOOK_PID_PATH.write_text(str(int(pid)), encoding="utf-8")
+
+
+def _is_webhook_process(pid: int) -> bool:
+    """Whether `pid` is alive and runs the uvicorn webhook command."""
+    try:
+        with open(f"/proc/{pid}/cmdline", "rb") as handle:
+            cmdline = handle.read().replace(b"\0", b" ").decode("utf-8", "replace")
+    except OSError:
+        try:
+            cmdline = subprocess.run(
+                ["ps", "-p", str(pid), "-o", "command="],
+                capture_output=True,
+                text=True,
+                check=False,
+            ).stdout
+        except FileNotFoundError:
+            return False
+    return WEBHOOK_PROCESS_PATTERN in cmdline
+
+
+def _owned_pid() -> Optional[int]:
+    """Pid from `record_webhook_pid`, if that process is still the webhook."""
+    try:
+        pid = int(WEBHOOK_PID_PATH.read_text(encoding="utf-8").strip())
+    except (OSError, ValueError):
+        return None
+    if _is_webhook_process(pid):
+        return pid
+    WEBHOOK_PID_PATH.unlink(missing_ok=True)  # processo já encerrado ou pid reaproveitado
+    return None
+
+
+def _is_loopback_url(url: str) -> bool:
+    host = urlsplit(url).hostname or ""
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def _terminate(pid: int) -> bool:
+    try:
+        os.kill(pid, signal.SIGTERM)
+    except OSError:
+        return False
+    return True
+
+
+def stop_webhook(timeout: float = WEBHOOK_TIMEOUT) -> bool:
+    """Stop the webhook service; return True when a process was signalled.
+
+    Only the process started by this app (see `record_webhook_pid`) is
+    signalled, after checking that its command line is still the uvicorn
+    webhook. Without a recorded pid the service is stopped only when
+    `WEBHOOK_URL` is on this machine: by the pid reported by `/healthz`, or
+    by name when it does not answer (hung or started by an older version).
+    A remote `WEBHOOK_URL` is never stopped from here.
+    """
+    pid = _owned_pid()
+    if pid:
+        WEBHOOK_PID_PATH.unlink(missing_ok=True)
+        return _terminate(pid)
+    if not _is_loopback_url(WEBHOOK_URL):
+        return False
+    health = webhook_health(timeout)
+    if health and health.get("pid") and _is_webhook_process(int(health["pid"])):
+        if _terminate(int(health["pid"])):
+            return True
+    try:
+        result = subprocess.run(
+            ["pkill", "-f", WEBHOOK_PROCESS_PATTERN],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            check=False,
+        )
+        return result.returncode == 0
+    except FileNotFoundError:
+        return False
+
+
+__all__ = [
+    "WEBHOOK_URL",
+    "is_webhook_running",
+    "record_webhook_pid",
+    "stop_webhook",
+    "webhook_health",
+    "webhook_metrics",
+    "webhook_prometheus",
+]
@@ -0,0 +1,350 @@
+"""Headless report runner for cron/batch use.
+
+Builds the Atendimentos, Análise de Conversas, Mensagens and Mensagens por
+hora reports for a date range and writes them to files, using the same
+filtering code as the Streamlit tabs. Messages are crawled once, concurrently
+and through the local message store, and shared by every report.
+
+Examples:
+
+    python -m src.reports.batch --period last-month --output-dir data/reports
+    python -m src.reports.batch atendimentos mensagens_por_hora \\
+        --start 2026-01-01 --end 2026-01-31 --format parquet --output-dir /srv/relatorios
+
+Cron (todo dia 1 às 03:00, relatórios do mês anterior):
+
+    0 3 1 * * cd /caminho/do/projeto && python -m src.reports.batch --period last-month --output-dir data/reports
+"""
+
+import argparse
+import json
+import sys
+import time
+from datetime import date, datetime, timedelta
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+from src.analytics.attendance import (
+    REPORT_COLUMNS,
+    attendance_frame,
+    conversation_meta,
+    display_frame,
+    filter_messages,
+    select_conversations,
+)
+from src.analytics.conversation_analysis import (
+    ANALYSIS_MESSAGE_COLUMNS,
+    bot_sender_config,
+    build_conversation_analysis,
+)
+from src.analytics.message_frame import append_messages, frame_from_buffer, new_message_buffer
+from src.analytics.message_rows import collect_message_rows, messages_table
+from src.analytics.message_store import account_key, query_message_rollup
+from src.analytics.message_types import MAX_SYNC_WORKERS, conversation_messages
+from src.analytics.metrics import (
+    build_hourly_df,
+    fetch_chatwoot_conversations,
+    fetch_chatwoot_inboxes,
+    hourly_df_from_rollup,
+)
+from src.bot.engine import load_env_once, load_settings
+from src.reports.export import EXPORT_FORMATS, write_export
+from src.utils.timezone import TZ
+
+REPORTS = ["atendimentos", "analise_conversas", "mensagens", "mensagens_por_hora"]
+PERIODS = ["yesterday", "last-7-days", "last-month", "this-month"]
+
+
+def period_range(name: str, today: Optional[date] = None) -> Tuple[date, date]:
+    """Return (start, end) dates for a named period relative to `today` (local time)."""
+    today = today or datetime.now(TZ).date()
+    if name == "yesterday":
+        day = today - timedelta(days=1)
+        return day, day
+    if name == "last-7-days":
+        return today - timedelta(days=7), today - timedelta(days=1)
+    if name == "this-month":
+        return today.replace(day=1), today
+    if name == "last-month":
+        end = today.replace(day=1) - timedelta(days=1)
+        return end.replace(day=1), end
+    raise ValueError(f"Período desconhecido: {name}")
+
+
+def _credentials() -> Tuple[str, str, str]:
+    load_env_once()
+    settings = load_settings() or {}
+    base_url = (settings.get("chatwoot_url") or "").rstrip("/")
+    token = settings.get("chatwoot_api_token") or ""
+    account_id = settings.get("chatwoot_account_id") or ""
+    if not all([base_url, token, account_id]):
+        raise RuntimeError("Configure CHATWOOT_URL, CHATWOOT_API_TOKEN e CHATWOOT_ACCOUNT_ID antes de gerar relatórios.")
+    return base_url, account_id, token
+
+
+def _message_frame(messages: Dict, conv_ids: Iterable, bot_config: Optional[Dict] = None):
+    """Build one message frame (and the ids present) from already crawled messages."""
+    buffer = new_message_buffer()
+    fetched = []
+    for conv_id in conv_ids:
+        if conv_id in messages:
+            append_messages(buffer, messages[conv_id], conversation_id=conv_id)
+            fetched.append(conv_id)
+    bot_config = bot_config or {}
+    return frame_from_buffer(buffer, bot_names=bot_config.get("names"), bot_ids=bot_config.get("ids")), fetched
+
+
+def attendance_report(conversations, messages, start_day, end_day, options) -> pd.DataFrame:
+    """Atendimentos table, as exported by the report tab."""
+    start_dt = datetime.combine(start_day, dt_time.min, tzinfo=TZ)
+    end_dt = datetime.combine(end_day, dt_time(23, 59, 59), tzinfo=TZ)
+    if options.get("status", "all") != "all":
+        conversations = [conv for conv in conversations if conv.get("status") == options["status"]]
+    conv_meta = conversation_meta(conversations)
+    selected = select_conversations(conversations, conv_meta, agents=options.get("agents"))
+    ids = [conv.get("id") or conv.get("display_id") for conv in selected]
+    frame, _ = _message_frame(messages, ids)
+    msg_df, direction = filter_messages(frame, start_dt, end_dt, options.get("hours"), options.get("msg_type", "Todas"))
+    return attendance_frame(msg_df, direction, conv_meta)
+
+
+def hourly_report(account: str, attendance: pd.DataFrame, start_day, end_day, options) -> pd.DataFrame:
+    """Mensagens por hora, read from the message rollup unless an agent or status filter is set.
+
+    The rollup has no agent/status columns, so those filters count the
+    Atendimentos rows instead.
+    """
+    if options.get("agents") or options.get("status", "all") != "all":
+        return build_hourly_df(attendance)
+    rollup = query_message_rollup(
+        account,
+        datetime.combine(start_day, dt_time.min, tzinfo=TZ).timestamp(),
+        datetime.combine(end_day, dt_time(23, 59, 59), tzinfo=TZ).timestamp(),
+        inbox_ids=options.get("inbox_ids"),
+    )
+    return hourly_df_from_rollup(rollup, options.get("hours"), options.get("msg_type", "Todas"))
+
+
+def analysis_report(conversations, messages, start_day, end_day, options, inbox_id_to_name) -> Tuple[Optional[Dict], pd.DataFrame]:
+    """Análise de Conversas stats plus message table."""
+    start_dt = datetime.combine(start_day, dt_time.min, tzinfo=TZ)
+    end_dt = datetime.combine(end_day, dt_time.max, tzinfo=TZ)
+    status = options.get("status", "all")
+    filters = {
+        "start_date": start_day,
+        "end_date": end_day,
+        "contact_name": "",
+        "contact_number": "",
+        "conversation_id_filter": "",
+        "status_filter": "Todos" if status == "all" else status,
+        "assigned_filter": "Todos",
+        "selected_inbox_ids": set(options.get("inbox_ids") or []),
+        "selected_agent_id": None,
+        "selected_team_id": None,
+        "conversation_type": options.get("conversation_type", "Todos"),
+        "message_statuses": ["Todos"],
+    }
+    bot_config = bot_sender_config()
+    stats, rows = build_conversation_analysis(
+        conversations,
+        filters,
+        inbox_id_to_name,
+        start_dt,
+        end_dt,
+        lambda conv_ids: _message_frame(messages, conv_ids, bot_config),
+    )
+    return stats, pd.DataFrame(rows).reindex(columns=ANALYSIS_MESSAGE_COLUMNS)
+
+
+def messages_report(conversations, messages, start_day, end_day, options, inbox_id_to_name) -> pd.DataFrame:
+    """Mensagens tab table."""
+    start_dt = datetime.combine(start_day, dt_time.min, tzinfo=TZ)
+    end_dt = datetime.combine(end_day, dt_time.max, tzinfo=TZ)
+
+    def messages_for(conv_id):
+        if conv_id not in messages:
+            raise RuntimeError("mensagens não carregadas")
+        return messages[conv_id]
+
+    rows = collect_message_rows(
+        conversations,
+        {"inbox_ids": set(options.get("inbox_ids") or [])},
+        inbox_id_to_name,
+        start_dt,
+        end_dt,
+        messages_for,
+    )
+    return messages_table(rows)
+
+
+def run_reports(
+    reports: List[str],
+    start_day: date,
+    end_day: date,
+    output_dir,
+    fmt: str = "csv",
+    options: Optional[Dict] = None,
+    max_workers: int = MAX_SYNC_WORKERS,
+    log: Callable[[str], None] = print,
+) -> Dict:
+    """Fetch data once, build the requested reports and write them to `output_dir`.
+
+    Returns a manifest with the written files, row counts, stats and failures;
+    it is also saved next to the reports as JSON.
+    """
+    options = options or {}
+    started = time.monotonic()
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    base_url, account_id, token = _credentials()
+
+    start_dt = datetime.combine(start_day, dt_time.min, tzinfo=TZ)
+    log(f"Buscando conversas desde {start_day.isoformat()}...")
+    conversations = fetch_chatwoot_conversations(base_url, account_id, token, start_dt)
+    if options.get("inbox_ids"):
+        wanted = set(options["inbox_ids"])
+        conversations = [conv for conv in conversations if conv.get("inbox_id") in wanted]
+    inbox_id_to_name = {}
+    if {"analise_conversas", "mensagens"} & set(reports):
+        inbox_id_to_name = {inbox["id"]: inbox["name"] for inbox in fetch_chatwoot_inboxes(base_url, account_id, token) if inbox.get("id")}
+
+    messages = {}
+    failed = []
+    total = len(conversations)
+    log(f"Sincronizando mensagens de {total} conversas...")
+    for done, (conv_id, msgs, error) in enumerate(
+        conversation_messages(base_url, account_id, token, conversations, start_dt.timestamp(), max_workers=max_workers),
+        start=1,
+    ):
+        if error is not None:
+            failed.append({"conversation_id": conv_id, "error": str(error)})
+        else:
+            messages[conv_id] = msgs
+        if done == total or done % 200 == 0:
+            log(f"  {done}/{total} conversas ({len(failed)} falhas)")
+
+    tables = {}
+    stats = {}
+    if "atendimentos" in reports or "mensagens_por_hora" in reports:
+        attendance = attendance_report(conversations, messages, start_day, end_day, options)
+        if "atendimentos" in reports:
+            tables["atendimentos"] = display_frame(attendance, REPORT_COLUMNS)
+        if "mensagens_por_hora" in reports:
+            tables["mensagens_por_hora"] = hourly_report(
+                account_key(base_url, account_id), attendance, start_day, end_day, options
+            )
+    if "analise_conversas" in reports:
+        stats["analise_conversas"], tables["analise_conversas"] = analysis_report(
+            conversations, messages, start_day, end_day, options, inbox_id_to_name
+        )
+    if "mensagens" in reports:
+        tables["mensagens"] = messages_report(conversations, messages, start_day, end_day, options, inbox_id_to_name)
+
+    suffix, _ = EXPORT_FORMATS[fmt]
+    period = f"{start_day.isoformat()}_{end_day.isoformat()}"
+    files = {}
+    for name in reports:
+        path = write_export(tables[name], output_dir / f"{name}_{period}{suffix}", fmt=fmt)
+        files[name] = {"path": str(path), "rows": int(len(tables[name]))}
+        log(f"{name}: {len(tables[name])} linhas -> {path}")
+
+    manifest = {
+        "start": start_day.isoformat(),
+        "end": end_day.isoformat(),
+        "generated_at": datetime.now(TZ).isoformat(timespec="seconds"),
+        "elapsed_s": round(time.monotonic() - started, 1),
+        "conversations": total,
+        "failed_conversations": failed,
+        "files": files,
+        "stats": stats,
+    }
+    manifest_path = output_dir / f"relatorios_{period}.json"
+    manifest_path.write_text(json.dumps(manifest, ensure_ascii=False, indent=2, default=str), encoding="utf-8")
+    return manifest
+
+
+def _parse_day(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera relatórios do Chatwoot em arquivos, sem abrir o app.")
+    parser.add_argument("reports", nargs="*", metavar="RELATORIO", help=f"Relatórios: {', '.join(REPORTS)} (padrão: todos).")
+    parser.add_argument("--period", choices=PERIODS, help="Período relativo a hoje (alternativa a --start/--end).")
+    parser.add_argument("--start", type=_parse_day, help="Data inicial (AAAA-MM-DD).")
+    parser.add_argument("--end", type=_parse_day, help="Data final (AAAA-MM-DD).")
+    parser.add_argument("--output-dir", required=True, help="Diretório de saída.")
+    parser.add_argument("--format", dest="fmt", choices=list(EXPORT_FORMATS), default="csv")
+    parser.add_argument("--status", default="all", help="Status das conversas (padrão: all).")
+    parser.add_argument("--inbox", action="append", type=int, default=[], help="Inbox ID (pode repetir).")
+    parser.add_argument("--agent", action="append", default=[], help="Agente do relatório de atendimentos (pode repetir).")
+    parser.add_argument(
+        "--message-type",
+        choices=["Todas", "Apenas clientes", "Apenas bot"],
+        default="Todas",
+        help="Tipo de mensagem do relatório de atendimentos.",
+    )
+    parser.add_argument(
+        "--conversation-type",
+        choices=["Todos", "Agente", "Bot"],
+        default="Todos",
+        help="Tipo de conversa da análise de conversas.",
+    )
+    parser.add_argument("--workers", type=int, default=MAX_SYNC_WORKERS, help="Conversas sincronizadas em paralelo.")
+    args = parser.parse_args(argv)
+
+    unknown = sorted(set(args.reports) - set(REPORTS))
+    if unknown:
+        parser.error(f"relatório desconhecido: {', '.join(unknown)}")
+    if args.period:
+        start_day, end_day = period_range(args.period)
+    elif args.start and args.end:
+        start_day, end_day = args.start, args.end
+    else:
+        parser.error("informe --period ou --start e --end")
+    if start_day > end_day:
+        parser.error("a data inicial é maior que a final")
+
+    options = {
+        "status": args.status,
+        "inbox_ids": args.inbox,
+        "agents": args.agent,
+        "msg_type": args.message_type,
+        "conversation_type": args.conversation_type,
+    }
+
+    def log(message):
+        print(message, file=sys.stderr, flush=True)
+
+    try:
+        manifest = run_reports(
+            args.reports or REPORTS,
+            start_day,
+            end_day,
+            args.output_dir,
+            fmt=args.fmt,
+            options=options,
+            max_workers=args.workers,
+            log=log,
+        )
+    except Exception as exc:
+        log(f"Falha ao gerar relatórios: {exc}")
+        return 1
+    return 2 if manifest["failed_conversations"] else 0
+
+
+__all__ = [
+    "REPORTS",
+    "analysis_report",
+    "attendance_report",
+    "messages_report",
+    "period_range",
+    "run_reports",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""Chunked CSV/Parquet export of analytics tables.
+
+Frames are written to a file chunk by chunk (optionally gzip-compressed)
+instead of being rendered into one in-memory CSV string, so an export costs
+roughly one chunk of extra memory. The same writer backs the Streamlit
+download buttons and the command line:
+
+    python -m src.reports.export messages --start 2026-01-01 --end 2026-01-31 \\
+        --format parquet -o mensagens.parquet
+"""
+
+import argparse
+import gzip
+import io
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+from datetime import time as dt_time
+from pathlib import Path
+from typing import Iterator, Optional
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from src.analytics.message_frame import append_messages, filter_period, frame_from_buffer, new_message_buffer
+from src.analytics.message_types import conversation_messages
+from src.analytics.metrics import fetch_chatwoot_conversations
+from src.bot.engine import load_env_once, load_settings
+from src.utils.timezone import TZ
+
+CHUNK_ROWS = 50_000
+EXPORT_DIR = Path(tempfile.gettempdir()) / "chatwoot_exports"
+EXPORT_MAX_AGE = 3600
+# formato -> (extensão, mime)
+EXPORT_FORMATS = {
+    "csv": (".csv", "text/csv"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+_UNIFORM_KINDS = {"string", "integer", "floating", "boolean", "datetime", "date", "decimal", "bytes", "empty"}
+
+
+def iter_chunks(frame: pd.DataFrame, chunk_rows: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield consecutive row slices of `frame` (views, no copies)."""
+    for start in range(0, len(frame), max(1, chunk_rows)):
+        yield frame.iloc[start:start + chunk_rows]
+
+
+def _write_csv(frame: pd.DataFrame, path: Path, compress: bool, chunk_rows: int) -> None:
+    raw = gzip.open(path, "wb") if compress else open(path, "wb")
+    with raw, io.TextIOWrapper(raw, encoding="utf-8", newline="") as handle:
+        if frame.empty:
+            frame.to_csv(handle, index=False)
+            return
+        for number, chunk in enumerate(iter_chunks(frame, chunk_rows)):
+            chunk.to_csv(handle, index=False, header=number == 0)
+
+
+def _mixed_columns(frame: pd.DataFrame) -> list:
+    """Return object columns holding more than one kind of value (written as text)."""
+    return [
+        col
+        for col in frame.columns
+        if frame[col].dtype == object and pd.api.types.infer_dtype(frame[col], skipna=True) not in _UNIFORM_KINDS
+    ]
+
+
+def _as_text(chunk: pd.DataFrame, columns: list) -> pd.DataFrame:
+    if not columns:
+        return chunk
+    chunk = chunk.copy()
+    for col in columns:
+        chunk[col] = chunk[col].map(lambda value: value if value is None or isinstance(value, str) else str(value))
+    return chunk
+
+
+def _parquet_schema(frame: pd.DataFrame, text_columns: list, chunk_rows: int) -> pa.Schema:
+    """Infer the Arrow schema from the first chunk, typing all-null columns from later rows."""
+    schema = pa.Schema.from_pandas(_as_text(frame.head(chunk_rows), text_columns), preserve_index=False)
+    for index, field in enumerate(schema):
+        if field.name in text_columns:
+            schema = schema.set(index, pa.field(field.name, pa.string()))
+        elif pa.types.is_null(field.type):
+            sample = frame[field.name].dropna().head(1000)
+            kind = pa.Array.from_pandas(sample).type if len(sample) else pa.string()
+            schema = schema.set(index, pa.field(field.name, kind))
+    return schema
+
+
+def _write_parquet(frame: pd.DataFrame, path: Path, compress: bool, chunk_rows: int) -> None:
+    text_columns = _mixed_columns(frame)
+    schema = _parquet_schema(frame, text_columns, chunk_rows)
+    with pq.ParquetWriter(path, schema, compression="gzip" if compress else "snappy") as writer:
+        for chunk in iter_chunks(frame, chunk_rows):
+            writer.write_table(pa.Table.from_pandas(_as_text(chunk, text_columns), schema=schema, preserve_index=False))
+        if frame.empty:
+            writer.write_table(schema.empty_table())
+
+
+def write_export(
+    frame: pd.DataFrame,
+    path,
+    fmt: str = "csv",
+    chunk_rows: int = CHUNK_ROWS,
+    compress: Optional[bool] = None,
+) -> Path:
+    """Write `frame` to `path` as CSV, gzip CSV or Parquet, `chunk_rows` rows at a time.
+
+    `fmt` is one of EXPORT_FORMATS. For Parquet, `compress=True` uses gzip
+    pages instead of snappy.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato de exportação desconhecido: {fmt}")
+    path = Path(path)
+    if fmt == "parquet":
+        _write_parquet(frame, path, bool(compress), chunk_rows)
+    else:
+        _write_csv(frame, path, fmt == "csv.gz" if compress is None else compress, chunk_rows)
+    return path
+
+
+def cleanup_exports(max_age: float = EXPORT_MAX_AGE) -> int:
+    """Delete temporary export files older than `max_age` seconds; returns how many."""
+    if not EXPORT_DIR.exists():
+        return 0
+    removed = 0
+    cutoff = time.time() - max_age
+    for entry in EXPORT_DIR.iterdir():
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                entry.unlink()
+                removed += 1
+        except OSError:
+            continue
+    return removed
+
+
+def export_to_tempfile(frame: pd.DataFrame, fmt: str = "csv", stem: str = "export", chunk_rows: int = CHUNK_ROWS) -> Path:
+    """Write `frame` to a new file under EXPORT_DIR and return its path."""
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    cleanup_exports()
+    suffix, _ = EXPORT_FORMATS[fmt]
+    fd, name = tempfile.mkstemp(prefix=f"{stem}_", suffix=suffix, dir=EXPORT_DIR)
+    os.close(fd)
+    return write_export(frame, name, fmt=fmt, chunk_rows=chunk_rows)
+
+
+def _parse_day(value: str) -> date:
+    return datetime.strptime(value, "%Y-%m-%d").date()
+
+
+def messages_frame(start_day: date, end_day: date, status: str = "all", inbox_ids=None, on_progress=None) -> pd.DataFrame:
+    """Crawl Chatwoot messages of [start_day, end_day] with the saved credentials."""
+    load_env_once()
+    settings = load_settings() or {}
+    base_url = (settings.get("chatwoot_url") or "").rstrip("/")
+    token = settings.get("chatwoot_api_token") or ""
+    account_id = settings.get("chatwoot_account_id") or ""
+    if not all([base_url, token, account_id]):
+        raise RuntimeError("Configure CHATWOOT_URL, CHATWOOT_API_TOKEN e CHATWOOT_ACCOUNT_ID antes de exportar.")
+
+    start_dt = datetime.combine(start_day, dt_time.min, tzinfo=TZ)
+    end_dt = datetime.combine(end_day, dt_time(23, 59, 59), tzinfo=TZ)
+    conversations = fetch_chatwoot_conversations(base_url, account_id, token, start_dt, status=status)
+    if inbox_ids:
+        wanted = {str(inbox_id) for inbox_id in inbox_ids}
+        conversations = [conv for conv in conversations if str(conv.get("inbox_id")) in wanted]
+    buffer = new_message_buffer()
+    failed = 0
+    for done, (conv_id, msgs, error) in enumerate(
+        conversation_messages(base_url, account_id, token, conversations, start_dt.timestamp()), start=1
+    ):
+        if error is not None:
+            failed += 1
+        else:
+            append_messages(buffer, msgs, conversation_id=conv_id)
+        if on_progress:
+            on_progress(done, len(conversations), failed)
+    return filter_period(frame_from_buffer(buffer), start_dt, end_dt)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Exporta dados do Chatwoot para CSV/Parquet sem abrir o app.")
+    parser.add_argument("dataset", choices=["messages"], help="Conjunto de dados a exportar.")
+    parser.add_argument("--start", required=True, type=_parse_day, help="Data inicial (AAAA-MM-DD).")
+    parser.add_argument("--end", required=True, type=_parse_day, help="Data final (AAAA-MM-DD).")
+    parser.add_argument("--status", default="all", help="Status das conversas no Chatwoot (padrão: all).")
+    parser.add_argument("--inbox", action="append", default=[], help="Inbox ID (pode repetir).")
+    parser.add_argument("--format", dest="fmt", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--gzip", action="store_true", help="Compacta o CSV (ou as páginas do Parquet) com gzip.")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS)
+    parser.add_argument("-o", "--output", required=True, help="Arquivo de saída.")
+    args = parser.parse_args(argv)
+
+    if args.start > args.end:
+        parser.error("a data inicial é maior que a final")
+
+    def progress(done, total, failed):
+        if done == total or done % 100 == 0:
+            print(f"\rConversas: {done}/{total} (falhas: {failed})", end="", file=sys.stderr, flush=True)
+
+    frame = messages_frame(args.start, args.end, status=args.status, inbox_ids=args.inbox, on_progress=progress)
+    print(file=sys.stderr)
+    fmt = "csv.gz" if args.fmt == "csv" and args.gzip else args.fmt
+    path = write_export(frame, args.output, fmt=fmt, chunk_rows=args.chunk_rows, compress=args.gzip)
+    print(f"{len(frame)} linhas exportadas para {path}", file=sys.stderr)
+    return 0
+
+
+__all__ = [
+    "EXPORT_FORMATS",
+    "cleanup_exports",
+    "export_to_tempfile",
+    "iter_chunks",
+    "messages_frame",
+    "write_export",
+]
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,17 +4,23 @@ import sqlite3
 from contextlib import contextmanager
 
 from .db_init import DB_PATH, ensure_db
+from .instrumentation import sqlite_operation
 
 
 @contextmanager
-def get_conn():
-    """Context manager to open SQLite connections and ensure schema."""
+def get_conn(operation: str = "other"):
+    """Context manager to open SQLite connections and ensure schema.
+
+    The block is timed and counted as `operation` (see `src.utils.instrumentation`);
+    the schema check before it is not.
+    """
     ensure_db()
-    conn = sqlite3.connect(DB_PATH)
-    try:
-        yield conn
-    finally:
-        conn.close()
+    with sqlite_operation(operation):
+        conn = sqlite3.connect(DB_PATH)
+        try:
+            yield conn
+        finally:
+            conn.close()
 
 
 __all__ = ["get_conn"]
@@ -115,6 +115,32 @@ def ensure_db():
         if "moderation_details" not in cols_logs:
             cur.execute("ALTER TABLE conversation_logs ADD COLUMN moderation_details TEXT")
 
+        # Tempos por etapa de cada resposta do bot (ver src.bot.tracing).
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_traces (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                log_id INTEGER,
+                conversation_id TEXT,
+                message_id TEXT,
+                created_at TEXT,
+                model TEXT,
+                profile_name TEXT,
+                outcome TEXT,
+                total_ms INTEGER,
+                webhook_ms INTEGER,
+                queue_ms INTEGER,
+                settings_ms INTEGER,
+                status_check_ms INTEGER,
+                moderation_ms INTEGER,
+                llm_ms INTEGER,
+                chatwoot_post_ms INTEGER,
+                log_write_ms INTEGER
+            )
+            """
+        )
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_response_traces_created_at ON response_traces (created_at)")
+
         conn.commit()
 
 
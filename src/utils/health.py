@@ -0,0 +1,92 @@
+"""Concurrent health probes with a TTL cache and background refresh.
+
+Status pages call `check_health` with one probe per external dependency.
+Probes run in parallel on a small shared pool; the caller waits at most
+`deadline` seconds and only when there is no usable result yet. Results are
+kept in memory for the whole server process, so later renders return the
+last-known status immediately while stale entries are refreshed in the
+background.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Hashable, Tuple
+
+HEALTH_TTL = float(os.getenv("HEALTH_TTL", "60"))
+HEALTH_DEADLINE = float(os.getenv("HEALTH_DEADLINE", "1.5"))
+PROBE_WORKERS = 6
+
+_lock = threading.Lock()
+_pool = ThreadPoolExecutor(max_workers=PROBE_WORKERS, thread_name_prefix="health")
+_results: Dict[str, Dict] = {}
+_running: Dict[Tuple[str, Hashable], Future] = {}
+_latest_keys: Dict[str, Hashable] = {}
+
+# name -> (chave, probe): a chave identifica a configuração testada (URL, conta...);
+# quando muda, o resultado anterior deixa de valer.
+Probes = Dict[str, Tuple[Hashable, Callable[[], object]]]
+
+
+def _run_probe(name: str, key: Hashable, probe: Callable[[], object]) -> None:
+    try:
+        value = probe()
+    except Exception as exc:
+        value = ("error", f"Falha na verificação: {exc}")
+    with _lock:
+        # Uma verificação de configuração anterior que termine depois não sobrescreve a atual.
+        if _latest_keys.get(name) == key:
+            _results[name] = {"key": key, "value": value, "checked_at": time.time()}
+        _running.pop((name, key), None)
+
+
+def _submit(name: str, key: Hashable, probe: Callable[[], object]) -> Future:
+    with _lock:
+        _latest_keys[name] = key
+        future = _running.get((name, key))
+        if future is None:
+            future = _pool.submit(_run_probe, name, key, probe)
+            _running[(name, key)] = future
+        return future
+
+
+def check_health(probes: Probes, ttl: float = HEALTH_TTL, deadline: float = HEALTH_DEADLINE) -> Dict[str, Dict]:
+    """Return `{name: {"value", "checked_at", "pending"}}` for every probe.
+
+    Probes without a result for their key are started and awaited together
+    for at most `deadline` seconds; results older than `ttl` are returned as
+    they are and refreshed in the background. `value` is None while a probe
+    has never finished; a probe that raises yields `("error", message)`.
+    """
+    now = time.time()
+    waiting = []
+    for name, (key, probe) in probes.items():
+        cached = _results.get(name)
+        if cached is None or cached["key"] != key:
+            waiting.append(_submit(name, key, probe))
+        elif now - cached["checked_at"] > ttl:
+            _submit(name, key, probe)
+    if waiting:
+        wait(waiting, timeout=deadline)
+
+    status = {}
+    with _lock:
+        for name, (key, _) in probes.items():
+            cached = _results.get(name)
+            usable = cached is not None and cached["key"] == key
+            status[name] = {
+                "value": cached["value"] if usable else None,
+                "checked_at": cached["checked_at"] if usable else None,
+                "pending": (name, key) in _running,
+            }
+    return status
+
+
+def clear_health() -> None:
+    """Forget every cached result (running probes still store theirs)."""
+    with _lock:
+        _results.clear()
+
+
+__all__ = ["HEALTH_DEADLINE", "HEALTH_TTL", "check_health", "clear_health"]
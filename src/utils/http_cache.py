@@ -0,0 +1,320 @@
+"""Persistent on-disk cache for Chatwoot GET responses.
+
+Responses are stored in a dedicated SQLite file next to the main database so
+they survive Streamlit restarts and are shared between processes. Each
+endpoint has its own TTL; stale entries are revalidated with ETag /
+Last-Modified when the server provided them, and historical pages (messages
+fetched with a `before` cursor, reports whose period ended long ago) never
+expire. The file is kept under a size limit by evicting least recently used
+entries.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Dict, Optional
+
+from .db_init import DATA_DIR
+from .instrumentation import chatwoot_call, inc
+from .timestamps import parse_ts
+
+if TYPE_CHECKING:
+    import requests
+
+CACHE_PATH = DATA_DIR / "http_cache.db"
+DEFAULT_TTL = 300
+HISTORICAL_TTL = 24 * 3600
+MAX_BYTES = int(os.getenv("CHATWOOT_HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024
+IMMUTABLE_AFTER_DAYS = int(os.getenv("CHATWOOT_HTTP_CACHE_IMMUTABLE_DAYS", "7"))
+EVICT_EVERY_WRITES = 50
+
+# TTL (em segundos) por endpoint; o primeiro padrão que casar vence e 0 desliga o cache.
+ENDPOINT_TTLS = [
+    (re.compile(r"/live_reports/"), 0),
+    (re.compile(r"/conversations/\d+/messages$"), 300),
+    (re.compile(r"/conversations(/\d+)?$"), 120),
+    (re.compile(r"/(inboxes|teams|users|agents)$"), 3600),
+    (re.compile(r"/reports(/|$)"), 600),
+]
+_MESSAGES_PATH = re.compile(r"/conversations/\d+/messages$")
+_REPORTS_PATH = re.compile(r"/reports(/|$)")
+_STORED_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+_writes = 0
+
+
+def cache_enabled() -> bool:
+    """Return False when the cache is disabled via CHATWOOT_HTTP_CACHE=0."""
+    return os.getenv("CHATWOOT_HTTP_CACHE", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def ttl_for(url: str) -> int:
+    """Return the configured TTL for an endpoint URL."""
+    path = url.split("?", 1)[0].rstrip("/")
+    for pattern, ttl in ENDPOINT_TTLS:
+        if pattern.search(path):
+            return ttl
+    return DEFAULT_TTL
+
+
+def cache_key(url: str, params: Optional[Dict] = None, headers: Optional[Dict] = None) -> str:
+    """Build a cache key from URL, params and a hash of the API token."""
+    token = (headers or {}).get("api_access_token") or ""
+    token_hash = hashlib.sha256(str(token).encode("utf-8")).hexdigest()
+    items = sorted((str(k), str(v)) for k, v in (params or {}).items() if v is not None)
+    material = json.dumps([url, items, token_hash], ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to the cache file, creating the schema once per path."""
+    path = CACHE_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    if path not in _initialized_paths:
+        with _init_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS http_responses (
+                    key TEXT PRIMARY KEY,
+                    url TEXT,
+                    status INTEGER,
+                    headers TEXT,
+                    body BLOB,
+                    etag TEXT,
+                    last_modified TEXT,
+                    stored_at REAL,
+                    expires_at REAL,
+                    last_access REAL,
+                    size INTEGER
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_http_responses_access ON http_responses(last_access)")
+            conn.commit()
+            _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _cache_conn():
+    """Context manager that opens and always closes a cache connection."""
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def _payload_dates(body: bytes):
+    """Return parsed message/record dates from a JSON payload body."""
+    try:
+        data = json.loads(body or b"null")
+    except ValueError:
+        return []
+    payload = data
+    if isinstance(data, dict):
+        payload = data.get("payload") or data.get("data") or []
+        if isinstance(payload, dict):
+            payload = payload.get("payload") or []
+    if not isinstance(payload, list):
+        return []
+    dates = []
+    for item in payload:
+        if not isinstance(item, dict):
+            return []
+        dt = parse_ts(item.get("created_at") or item.get("timestamp"))
+        if not dt:
+            return []
+        dates.append(dt)
+    return dates
+
+
+def _expiry(url: str, params: Dict, body: bytes, ttl: int, now: float) -> Optional[float]:
+    """Return when an entry expires, or None for pages that can no longer change."""
+    path = url.split("?", 1)[0].rstrip("/")
+    cutoff = now - IMMUTABLE_AFTER_DAYS * 86400
+    if _MESSAGES_PATH.search(path):
+        dates = _payload_dates(body)
+        if dates and max(dt.timestamp() for dt in dates) < cutoff:
+            # Páginas com cursor `before` só contêm mensagens antigas e não mudam mais;
+            # a página mais recente pode receber mensagens novas, então só ganha TTL longo.
+            return None if params.get("before") else now + max(ttl, HISTORICAL_TTL)
+    if _REPORTS_PATH.search(path):
+        until = params.get("until")
+        try:
+            if until and float(until) < cutoff:
+                return None
+        except (TypeError, ValueError):
+            pass
+    return now + ttl
+
+
+def _build_response(url: str, status: int, headers: Dict, body: bytes) -> "requests.Response":
+    """Rebuild a `requests.Response` from a cached row."""
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    from requests.utils import get_encoding_from_headers
+
+    resp = requests.Response()
+    resp.status_code = status
+    resp.url = url
+    resp.headers = CaseInsensitiveDict(headers)
+    resp.encoding = get_encoding_from_headers(resp.headers) or "utf-8"
+    resp._content = body
+    resp.from_cache = True
+    return resp
+
+
+def _store(conn: sqlite3.Connection, key: str, url: str, resp: "requests.Response", expires_at, now: float):
+    """Persist a 2xx response and periodically enforce the size limit."""
+    global _writes
+    headers = {name: resp.headers[name] for name in _STORED_HEADERS if name in resp.headers}
+    body = resp.content or b""
+    conn.execute(
+        """
+        INSERT OR REPLACE INTO http_responses
+            (key, url, status, headers, body, etag, last_modified, stored_at, expires_at, last_access, size)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            key,
+            url,
+            resp.status_code,
+            json.dumps(headers),
+            body,
+            headers.get("ETag"),
+            headers.get("Last-Modified"),
+            now,
+            expires_at,
+            now,
+            len(body),
+        ),
+    )
+    conn.commit()
+    _writes += 1
+    if _writes % EVICT_EVERY_WRITES == 0:
+        _evict(conn, MAX_BYTES)
+
+
+def _evict(conn: sqlite3.Connection, max_bytes: int) -> int:
+    """Delete least recently used entries until the cache is below 90% of `max_bytes`."""
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_responses").fetchone()[0]
+    if total <= max_bytes:
+        return 0
+    target = total - int(max_bytes * 0.9)
+    freed = 0
+    keys = []
+    for key, size in conn.execute("SELECT key, size FROM http_responses ORDER BY last_access"):
+        keys.append((key,))
+        freed += size or 0
+        if freed >= target:
+            break
+    conn.executemany("DELETE FROM http_responses WHERE key = ?", keys)
+    conn.commit()
+    return len(keys)
+
+
+def cached_get(
+    url: str,
+    params: Optional[Dict] = None,
+    headers: Optional[Dict] = None,
+    timeout: float = 15,
+    ttl: Optional[int] = None,
+) -> "requests.Response":
+    """GET through the persistent cache; a drop-in replacement for `requests.get`.
+
+    Only 2xx responses are stored. Network errors propagate exactly like
+    `requests.get`, so callers keep their retry/backoff handling.
+    """
+    import requests
+
+    ttl = ttl_for(url) if ttl is None else ttl
+    if not cache_enabled() or ttl <= 0:
+        with chatwoot_call("GET", url) as call:
+            resp = requests.get(url, params=params, headers=headers, timeout=timeout)
+            call["status"] = resp.status_code
+        return resp
+
+    params = dict(params or {})
+    key = cache_key(url, params, headers)
+    now = time.time()
+    with _cache_conn() as conn:
+        row = conn.execute(
+            "SELECT status, headers, body, etag, last_modified, expires_at FROM http_responses WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row:
+            status, stored_headers, body, etag, last_modified, expires_at = row
+            if expires_at is None or expires_at > now:
+                conn.execute("UPDATE http_responses SET last_access = ? WHERE key = ?", (now, key))
+                conn.commit()
+                inc("chatwoot_cache_total", result="hit")
+                return _build_response(url, status, json.loads(stored_headers or "{}"), body)
+
+        request_headers = dict(headers or {})
+        if row and row[3]:
+            request_headers["If-None-Match"] = row[3]
+        if row and row[4]:
+            request_headers["If-Modified-Since"] = row[4]
+        with chatwoot_call("GET", url) as call:
+            resp = requests.get(url, params=params, headers=request_headers, timeout=timeout)
+            call["status"] = resp.status_code
+
+        if row and resp.status_code == 304:
+            inc("chatwoot_cache_total", result="revalidated")
+            status, stored_headers, body = row[0], row[1], row[2]
+            conn.execute(
+                "UPDATE http_responses SET expires_at = ?, last_access = ? WHERE key = ?",
+                (_expiry(url, params, body, ttl, now), now, key),
+            )
+            conn.commit()
+            return _build_response(url, status, json.loads(stored_headers or "{}"), body)
+        inc("chatwoot_cache_total", result="miss")
+        if 200 <= resp.status_code < 300:
+            _store(conn, key, url, resp, _expiry(url, params, resp.content, ttl, now), now)
+        resp.from_cache = False
+        return resp
+
+
+def evict(max_bytes: Optional[int] = None) -> int:
+    """Evict least recently used entries above `max_bytes`; returns how many were removed."""
+    with _cache_conn() as conn:
+        return _evict(conn, MAX_BYTES if max_bytes is None else max_bytes)
+
+
+def clear() -> None:
+    """Remove every cached response."""
+    with _cache_conn() as conn:
+        conn.execute("DELETE FROM http_responses")
+        conn.commit()
+
+
+def cache_stats() -> Dict[str, int]:
+    """Return entry count, total size and number of never-expiring entries."""
+    with _cache_conn() as conn:
+        entries, size, immutable = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(expires_at IS NULL), 0) FROM http_responses"
+        ).fetchone()
+    return {"entries": int(entries), "bytes": int(size), "immutable": int(immutable)}
+
+
+__all__ = [
+    "CACHE_PATH",
+    "ENDPOINT_TTLS",
+    "cache_enabled",
+    "cache_key",
+    "cache_stats",
+    "cached_get",
+    "clear",
+    "evict",
+    "ttl_for",
+]
@@ -0,0 +1,287 @@
+"""Prometheus-style counters and histograms kept in process memory.
+
+Each process (the webhook service, the Streamlit app, a batch run) keeps its
+own registry. The webhook exports it in the Prometheus text format at
+`/metrics`; the Streamlit performance tab reads that export and its own
+registry. Metric names and help texts are declared in METRICS. Histograms use
+cumulative buckets like Prometheus, and percentiles shown in the app are
+estimated from them.
+"""
+
+import math
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS = {
+    "webhook_requests_total": ("counter", "Eventos recebidos pelo webhook, por tipo de evento."),
+    "webhook_request_seconds": ("histogram", "Tempo de tratamento de um evento no endpoint /webhook."),
+    "bot_stage_seconds": ("histogram", "Duração de cada etapa de responder_cliente."),
+    "bot_task_seconds": ("histogram", "Duração de cada resposta em segundo plano do webhook."),
+    "chatwoot_requests_total": ("counter", "Chamadas à API do Chatwoot, por endpoint e status HTTP."),
+    "chatwoot_request_seconds": ("histogram", "Latência das chamadas à API do Chatwoot."),
+    "chatwoot_retries_total": ("counter", "Novas tentativas após 429/503 da API do Chatwoot."),
+    "chatwoot_cache_total": ("counter", "Consultas ao cache HTTP do Chatwoot (hit, revalidated, miss)."),
+    "sqlite_operations_total": ("counter", "Operações no banco SQLite principal, por resultado."),
+    "sqlite_operation_seconds": ("histogram", "Duração das operações no banco SQLite principal."),
+}
+
+_ID_SEGMENT = re.compile(r"/\d+(?=/|$)")
+_SAMPLE_LINE = re.compile(r"^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)")
+_LABEL_PAIR = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+_lock = threading.Lock()
+_counters: Dict[Tuple[str, tuple], float] = {}
+_histograms: Dict[Tuple[str, tuple], Dict] = {}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _key(name: str, labels: Dict) -> Tuple[str, Labels]:
+    return name, tuple(sorted((str(k), str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, amount: float = 1.0, **labels) -> None:
+    """Add `amount` to a counter."""
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0.0) + amount
+
+
+def observe(name: str, value: float, **labels) -> None:
+    """Record one observation in a histogram."""
+    key = _key(name, labels)
+    with _lock:
+        hist = _histograms.get(key)
+        if hist is None:
+            hist = _histograms[key] = {"buckets": [0] * len(DEFAULT_BUCKETS), "sum": 0.0, "count": 0}
+        for index, bound in enumerate(DEFAULT_BUCKETS):
+            if value <= bound:
+                hist["buckets"][index] += 1
+                break
+        hist["sum"] += value
+        hist["count"] += 1
+
+
+@contextmanager
+def timer(name: str, **labels):
+    """Observe the duration of the enclosed block in histogram `name`."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def endpoint_label(url: str) -> str:
+    """Path of a Chatwoot URL with numeric ids replaced, e.g. `/api/v1/accounts/:id/agents`."""
+    path = re.sub(r"^[a-z]+://[^/]+", "", (url or "").split("?", 1)[0])
+    return _ID_SEGMENT.sub("/:id", path.rstrip("/")) or "/"
+
+
+@contextmanager
+def chatwoot_call(method: str, url: str):
+    """Time one Chatwoot HTTP request; set `call["status"]` inside the block.
+
+    Counts the request by method, endpoint and status ("error" when the block
+    raised before a status was set).
+    """
+    call: Dict = {}
+    endpoint = endpoint_label(url)
+    started = time.perf_counter()
+    try:
+        yield call
+    except Exception:
+        call.setdefault("status", "error")
+        raise
+    finally:
+        observe("chatwoot_request_seconds", time.perf_counter() - started, method=method, endpoint=endpoint)
+        inc("chatwoot_requests_total", method=method, endpoint=endpoint, status=call.get("status", "unknown"))
+
+
+@contextmanager
+def sqlite_operation(operation: str):
+    """Time and count one operation on the main SQLite database."""
+    started = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except Exception:
+        outcome = "error"
+        raise
+    finally:
+        observe("sqlite_operation_seconds", time.perf_counter() - started, operation=operation)
+        inc("sqlite_operations_total", operation=operation, outcome=outcome)
+
+
+def _format_labels(labels: Iterable[Tuple[str, str]]) -> str:
+    items = []
+    for name, value in labels:
+        escaped = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        items.append(f'{name}="{escaped}"')
+    return "{" + ",".join(items) + "}" if items else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def render_prometheus(gauges: Optional[Dict[str, Tuple[str, float]]] = None) -> str:
+    """Render the registry (plus `gauges`: name -> (help, value)) in the Prometheus text format."""
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]} for key, h in _histograms.items()}
+    lines = []
+    for name, (help_text, value) in (gauges or {}).items():
+        if value is None:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name} {_format_value(value)}"]
+    for name, (kind, help_text) in METRICS.items():
+        series = counters if kind == "counter" else histograms
+        keys = sorted(key for key in series if key[0] == name)
+        if not keys:
+            continue
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for key in keys:
+            labels = key[1]
+            if kind == "counter":
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(series[key])}")
+                continue
+            hist = series[key]
+            cumulative = 0
+            for bound, count in zip(DEFAULT_BUCKETS, hist["buckets"]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', _format_value(bound)),))} {cumulative}")
+            lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {hist['count']}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(hist['sum'])}")
+            lines.append(f"{name}_count{_format_labels(labels)} {hist['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def parse_prometheus(text: str) -> List[Dict]:
+    """Parse Prometheus text into `{"name", "labels", "value"}` samples (comments skipped)."""
+    samples = []
+    for line in (text or "").splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE_LINE.match(line)
+        if not match:
+            continue
+        name, raw_labels, raw_value = match.groups()
+        try:
+            value = float(raw_value)
+        except ValueError:
+            continue
+        samples.append({"name": name, "labels": dict(_LABEL_PAIR.findall(raw_labels or "")), "value": value})
+    return samples
+
+
+def _bucket_quantile(q: float, buckets: List[Tuple[float, float]]) -> Optional[float]:
+    """Estimate a quantile from cumulative (upper bound, count) buckets, like `histogram_quantile`."""
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    rank = q * buckets[-1][1]
+    lower, previous = 0.0, 0.0
+    for bound, cumulative in buckets:
+        if cumulative >= rank:
+            if bound == math.inf:
+                return lower
+            if cumulative == previous:
+                return bound
+            return lower + (bound - lower) * (rank - previous) / (cumulative - previous)
+        lower, previous = bound, cumulative
+    return lower
+
+
+def histogram_quantiles(name: str, quantiles: Iterable[float], **labels) -> Tuple[int, List[Optional[float]]]:
+    """Count and estimated `quantiles` of histogram `name`, merging every series that has `labels`."""
+    wanted = set(_key(name, labels)[1])
+    merged = [0] * len(DEFAULT_BUCKETS)
+    count = 0
+    with _lock:
+        for (series_name, series_labels), hist in _histograms.items():
+            if series_name != name or not wanted <= set(series_labels):
+                continue
+            merged = [total + added for total, added in zip(merged, hist["buckets"])]
+            count += hist["count"]
+    cumulative, buckets = 0, []
+    for bound, bucket_count in zip(DEFAULT_BUCKETS, merged):
+        cumulative += bucket_count
+        buckets.append((bound, cumulative))
+    buckets.append((math.inf, count))
+    return count, [_bucket_quantile(q, buckets) for q in quantiles]
+
+
+def summarize(samples: List[Dict]) -> Tuple[List[Dict], List[Dict]]:
+    """Split parsed samples into (histogram rows, counter/gauge rows) for display.
+
+    Histogram rows carry count, sum, mean and the p50/p95 estimated from the buckets.
+    """
+    histograms: Dict[Tuple[str, tuple], Dict] = {}
+    others = []
+    for sample in samples:
+        name = sample["name"]
+        base = re.sub(r"_(bucket|sum|count)$", "", name)
+        if METRICS.get(base, ("",))[0] != "histogram":
+            others.append(sample)
+            continue
+        labels = {k: v for k, v in sample["labels"].items() if k != "le"}
+        entry = histograms.setdefault((base, tuple(sorted(labels.items()))), {"buckets": [], "sum": 0.0, "count": 0.0})
+        if name.endswith("_bucket"):
+            bound = sample["labels"].get("le", "+Inf")
+            entry["buckets"].append((math.inf if bound == "+Inf" else float(bound), sample["value"]))
+        elif name.endswith("_sum"):
+            entry["sum"] = sample["value"]
+        else:
+            entry["count"] = sample["value"]
+    rows = []
+    for (name, labels), entry in sorted(histograms.items()):
+        buckets = sorted(entry["buckets"])
+        rows.append(
+            {
+                "name": name,
+                "labels": dict(labels),
+                "count": int(entry["count"]),
+                "sum": entry["sum"],
+                "mean": entry["sum"] / entry["count"] if entry["count"] else None,
+                "p50": _bucket_quantile(0.5, buckets),
+                "p95": _bucket_quantile(0.95, buckets),
+            }
+        )
+    return rows, others
+
+
+def local_samples() -> List[Dict]:
+    """Samples of this process's registry."""
+    return parse_prometheus(render_prometheus())
+
+
+def reset() -> None:
+    """Drop every recorded value (tests and benchmarks)."""
+    with _lock:
+        _counters.clear()
+        _histograms.clear()
+
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "METRICS",
+    "chatwoot_call",
+    "endpoint_label",
+    "histogram_quantiles",
+    "inc",
+    "local_samples",
+    "observe",
+    "parse_prometheus",
+    "render_prometheus",
+    "reset",
+    "sqlite_operation",
+    "summarize",
+    "timer",
+]
@@ -0,0 +1,298 @@
+"""Background jobs for long analytics tasks.
+
+Work that used to run inline in a Streamlit script run (message crawls,
+report tables, insights context) is submitted here instead. Jobs run on a
+shared thread pool (or a process pool for CPU-bound work), their state and
+progress live in a dedicated SQLite file and their results are pickled to
+disk, so a rerun, another browser tab or another user asking for the same
+parameters finds the running job or its finished result instead of starting
+over.
+
+A job function receives `(params, progress)` and returns the result;
+`progress(done, total, message="")` records how far it got.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Optional
+
+from .db_init import DATA_DIR
+
+JOBS_PATH = DATA_DIR / "jobs.db"
+RESULTS_DIR = DATA_DIR / "job_results"
+THREAD_WORKERS = int(os.getenv("JOBS_THREAD_WORKERS", "4"))
+PROCESS_WORKERS = int(os.getenv("JOBS_PROCESS_WORKERS", "2"))
+RESULT_MAX_AGE = 600
+RETENTION = 24 * 3600
+PROGRESS_INTERVAL = 0.5
+ACTIVE_STATUSES = ("queued", "running")
+
+_init_lock = threading.Lock()
+_initialized_paths = set()
+_pool_lock = threading.Lock()
+_pools: Dict[str, Executor] = {}
+
+
+def _connect() -> sqlite3.Connection:
+    """Open a connection to the jobs file, creating the schema once per path."""
+    path = JOBS_PATH
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    if path not in _initialized_paths:
+        with _init_lock:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT,
+                    job_key TEXT,
+                    params TEXT,
+                    status TEXT,
+                    done INTEGER DEFAULT 0,
+                    total INTEGER DEFAULT 0,
+                    message TEXT,
+                    error TEXT,
+                    result_path TEXT,
+                    owner_pid INTEGER,
+                    created_at REAL,
+                    started_at REAL,
+                    finished_at REAL,
+                    updated_at REAL
+                )
+                """
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(job_key, created_at)")
+            conn.commit()
+            _initialized_paths.add(path)
+    return conn
+
+
+@contextmanager
+def _jobs_conn():
+    """Context manager that opens and always closes a jobs connection."""
+    conn = _connect()
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def job_key(kind: str, params: Dict) -> str:
+    """Hash a job kind plus its parameters; equal filters give equal keys."""
+    material = json.dumps([kind, params], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def _pid_alive(pid: Optional[int]) -> bool:
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _update(job_id: str, **fields) -> None:
+    fields["updated_at"] = time.time()
+    assignments = ", ".join(f"{name} = ?" for name in fields)
+    with _jobs_conn() as conn:
+        conn.execute(f"UPDATE jobs SET {assignments} WHERE job_id = ?", (*fields.values(), job_id))
+        conn.commit()
+
+
+def _as_job(row: Optional[sqlite3.Row]) -> Optional[Dict]:
+    if row is None:
+        return None
+    job = dict(row)
+    job["params"] = json.loads(job["params"] or "{}")
+    if job["status"] in ACTIVE_STATUSES and job["owner_pid"] != os.getpid() and not _pid_alive(job["owner_pid"]):
+        # O processo que executava o job morreu (ex.: Streamlit reiniciado).
+        job.update(status="failed", error="Job interrompido: o processo que o executava foi encerrado.")
+        _update(job["job_id"], status="failed", error=job["error"], finished_at=time.time())
+    return job
+
+
+def get_job(job_id: Optional[str]) -> Optional[Dict]:
+    """Return the job row as a dict (params decoded), or None."""
+    if not job_id:
+        return None
+    with _jobs_conn() as conn:
+        row = conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+    return _as_job(row)
+
+
+def find_job(kind: str, params: Dict, max_age: float = RESULT_MAX_AGE) -> Optional[Dict]:
+    """Return the newest active job for these parameters, or a finished one younger than `max_age`."""
+    with _jobs_conn() as conn:
+        rows = conn.execute(
+            "SELECT * FROM jobs WHERE job_key = ? ORDER BY created_at DESC LIMIT 5",
+            (job_key(kind, params),),
+        ).fetchall()
+    for row in rows:
+        job = _as_job(row)
+        if job["status"] in ACTIVE_STATUSES:
+            return job
+        if (
+            job["status"] == "done"
+            and time.time() - (job["finished_at"] or 0) <= max_age
+            and job["result_path"]
+            and os.path.exists(job["result_path"])
+        ):
+            return job
+    return None
+
+
+def _progress_writer(job_id: str) -> Callable:
+    last = [0.0]
+
+    def progress(done: int, total: int, message: str = "") -> None:
+        now = time.monotonic()
+        if now - last[0] < PROGRESS_INTERVAL and done < total:
+            return
+        last[0] = now
+        _update(job_id, done=int(done), total=int(total), message=message)
+
+    return progress
+
+
+def _run_job(job_id: str, fn: Callable, params: Dict) -> None:
+    """Execute one job and record its outcome (runs inside the pool)."""
+    _update(job_id, status="running", started_at=time.time())
+    try:
+        result = fn(params, _progress_writer(job_id))
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        path = RESULTS_DIR / f"{job_id}.pkl"
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "wb") as handle:
+            pickle.dump(result, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, path)
+    except Exception as exc:
+        _update(job_id, status="failed", error=f"{type(exc).__name__}: {exc}", finished_at=time.time())
+        return
+    _update(job_id, status="done", result_path=str(path), finished_at=time.time())
+
+
+def _pool(executor: str) -> Executor:
+    with _pool_lock:
+        if executor not in _pools:
+            if executor == "process":
+                _pools[executor] = ProcessPoolExecutor(max_workers=PROCESS_WORKERS)
+            elif executor == "thread":
+                _pools[executor] = ThreadPoolExecutor(max_workers=THREAD_WORKERS, thread_name_prefix="job")
+            else:
+                raise ValueError(f"Executor desconhecido: {executor}")
+        return _pools[executor]
+
+
+def _on_done(job_id: str):
+    def callback(future):
+        exc = future.exception()
+        if exc is not None:
+            # Falhas fora de `_run_job` (ex.: processo do pool encerrado, função não serializável).
+            _update(job_id, status="failed", error=f"{type(exc).__name__}: {exc}", finished_at=time.time())
+
+    return callback
+
+
+def submit_job(
+    kind: str,
+    params: Dict,
+    fn: Callable[[Dict, Callable], object],
+    executor: str = "thread",
+    max_age: float = RESULT_MAX_AGE,
+    force: bool = False,
+) -> str:
+    """Start `fn(params, progress)` in the background and return the job id.
+
+    An active job with the same kind and parameters, or a finished one younger
+    than `max_age` seconds, is reused unless `force` is set. `params` must be
+    JSON-serializable; with `executor="process"`, `fn` must be a module-level
+    function.
+    """
+    if not force:
+        existing = find_job(kind, params, max_age=max_age)
+        if existing:
+            return existing["job_id"]
+    cleanup_jobs()
+    job_id = uuid.uuid4().hex
+    now = time.time()
+    with _jobs_conn() as conn:
+        conn.execute(
+            """
+            INSERT INTO jobs (job_id, kind, job_key, params, status, owner_pid, created_at, updated_at)
+            VALUES (?, ?, ?, ?, 'queued', ?, ?, ?)
+            """,
+            (job_id, kind, job_key(kind, params), json.dumps(params, ensure_ascii=False, default=str), os.getpid(), now, now),
+        )
+        conn.commit()
+    future = _pool(executor).submit(_run_job, job_id, fn, params)
+    future.add_done_callback(_on_done(job_id))
+    return job_id
+
+
+def load_result(job_id: str):
+    """Unpickle the result of a finished job (None when unavailable)."""
+    job = get_job(job_id)
+    if not job or job["status"] != "done" or not job["result_path"]:
+        return None
+    try:
+        with open(job["result_path"], "rb") as handle:
+            return pickle.load(handle)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return None
+
+
+def wait_job(job_id: str, timeout: Optional[float] = None, interval: float = 0.2) -> Optional[Dict]:
+    """Block until the job leaves the active states (or `timeout` expires) and return it."""
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while True:
+        job = get_job(job_id)
+        if job is None or job["status"] not in ACTIVE_STATUSES:
+            return job
+        if deadline is not None and time.monotonic() >= deadline:
+            return job
+        time.sleep(interval)
+
+
+def cleanup_jobs(max_age: float = RETENTION) -> int:
+    """Delete finished jobs older than `max_age` seconds and their result files."""
+    cutoff = time.time() - max_age
+    with _jobs_conn() as conn:
+        rows = conn.execute(
+            "SELECT job_id, result_path FROM jobs WHERE status NOT IN ('queued', 'running') AND created_at < ?",
+            (cutoff,),
+        ).fetchall()
+        for row in rows:
+            if row["result_path"]:
+                try:
+                    os.remove(row["result_path"])
+                except OSError:
+                    pass
+        conn.executemany("DELETE FROM jobs WHERE job_id = ?", [(row["job_id"],) for row in rows])
+        conn.commit()
+    return len(rows)
+
+
+__all__ = [
+    "ACTIVE_STATUSES",
+    "cleanup_jobs",
+    "find_job",
+    "get_job",
+    "job_key",
+    "load_result",
+    "submit_job",
+    "wait_job",
+]
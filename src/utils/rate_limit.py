@@ -0,0 +1,70 @@
+"""Shared backoff for Chatwoot requests that hit the API rate limit.
+
+When any worker receives 429 (or 503), every thread waits until the pause
+announced by `Retry-After` (or an exponential fallback) is over before sending
+its next request, so a concurrent crawl slows down as a whole instead of
+hammering the server with retries.
+"""
+
+import threading
+import time
+from typing import TYPE_CHECKING, Callable, Optional
+
+from .instrumentation import endpoint_label, inc
+
+if TYPE_CHECKING:
+    import requests
+
+RETRY_STATUSES = (429, 503)
+MAX_RETRIES = 5
+BASE_DELAY = 1.0
+MAX_DELAY = 60.0
+
+_lock = threading.Lock()
+_paused_until = 0.0
+
+
+def _retry_after(resp: "requests.Response") -> Optional[float]:
+    value = (resp.headers or {}).get("Retry-After")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _pause(delay: float) -> None:
+    global _paused_until
+    with _lock:
+        _paused_until = max(_paused_until, time.monotonic() + delay)
+
+
+def _wait_for_pause() -> None:
+    while True:
+        with _lock:
+            remaining = _paused_until - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(remaining, 1.0))
+
+
+def call_with_backoff(request: Callable[[], "requests.Response"], max_retries: int = MAX_RETRIES) -> "requests.Response":
+    """Call `request()` and retry on 429/503, pausing every caller in the process.
+
+    Returns the last response when retries run out, so callers keep their own
+    status handling.
+    """
+    attempt = 0
+    while True:
+        _wait_for_pause()
+        resp = request()
+        if resp.status_code not in RETRY_STATUSES or attempt >= max_retries:
+            return resp
+        inc("chatwoot_retries_total", endpoint=endpoint_label(resp.url or ""), status=resp.status_code)
+        delay = _retry_after(resp)
+        if delay is None:
+            delay = BASE_DELAY * (2 ** attempt)
+        _pause(min(delay, MAX_DELAY))
+        attempt += 1
+
+
+__all__ = ["MAX_RETRIES", "RETRY_STATUSES", "call_with_backoff"]
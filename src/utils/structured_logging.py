@@ -0,0 +1,128 @@
+"""JSON logging through a queue, for the webhook service.
+
+`configure_logging` attaches a `QueueHandler` to the `bot` logger: records
+are formatted as one JSON object per line in the calling thread, and a
+`QueueListener` thread does the actual stdout writes, so a slow terminal or
+log collector never blocks a request. Fields set with `log_context`
+(conversation and message ids) are added to every record logged inside the
+block, which is how log lines are matched with `response_traces` rows.
+
+Environment variables:
+- LOG_LEVEL: level of the `bot` logger (default INFO).
+- LOG_LEVELS: per-logger overrides, e.g. `bot.webhook=DEBUG,urllib3=WARNING`.
+- LOG_FORMAT: `json` (default) or `text`.
+- LOG_DEBUG_SAMPLE_RATE: fraction of DEBUG records kept (default 0.1).
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from src.utils.timezone import TZ
+
+LOGGER_NAME = "bot"
+CONTEXT_FIELDS = ("conversation_id", "message_id")
+TEXT_FORMAT = "%(asctime)s %(levelname)s %(name)s [conv=%(conversation_id)s msg=%(message_id)s] %(message)s"
+
+_context: ContextVar[Dict] = ContextVar("log_context", default={})
+_listener: Optional[QueueListener] = None
+_STANDARD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+
+class _JsonFormatter(logging.Formatter):
+    """One JSON object per record; `extra=` fields become top-level keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        data = {
+            "ts": datetime.fromtimestamp(record.created, TZ).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and value is not None:
+                data[key] = value
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+@contextmanager
+def log_context(**fields):
+    """Add `fields` (e.g. conversation_id, message_id) to records logged in the block."""
+    token = _context.set({**_context.get(), **{k: v for k, v in fields.items() if v is not None}})
+    try:
+        yield
+    finally:
+        _context.reset(token)
+
+
+def _add_context(record: logging.LogRecord) -> bool:
+    for key in CONTEXT_FIELDS:
+        setattr(record, key, getattr(record, key, None))
+    for key, value in _context.get().items():
+        setattr(record, key, value)
+    return True
+
+
+def _debug_sampler(rate: float):
+    def keep(record: logging.LogRecord) -> bool:
+        return record.levelno > logging.DEBUG or random.random() < rate
+
+    return keep
+
+
+def _apply_levels(default: str, overrides: str) -> None:
+    logging.getLogger(LOGGER_NAME).setLevel(default.upper())
+    for item in overrides.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            logging.getLogger(name.strip()).setLevel(level.strip().upper())
+
+
+def configure_logging(stream=None) -> logging.Logger:
+    """Set up the `bot` logger (idempotent) and return it."""
+    global _listener
+    logger = logging.getLogger(LOGGER_NAME)
+    _apply_levels(os.getenv("LOG_LEVEL", "INFO"), os.getenv("LOG_LEVELS", ""))
+    if _listener is not None:
+        return logger
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    handler = QueueHandler(log_queue)
+    json_output = os.getenv("LOG_FORMAT", "json").lower() != "text"
+    handler.setFormatter(_JsonFormatter() if json_output else logging.Formatter(TEXT_FORMAT))
+    handler.addFilter(_add_context)
+    handler.addFilter(_debug_sampler(float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "0.1"))))
+
+    # O registro já chega formatado pela QueueHandler; aqui só escrevemos.
+    output = logging.StreamHandler(stream or sys.stdout)
+    output.setFormatter(logging.Formatter("%(message)s"))
+    _listener = QueueListener(log_queue, output)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    logger.handlers = [handler]
+    logger.propagate = False
+    return logger
+
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+        logging.getLogger(LOGGER_NAME).handlers = []
+
+
+__all__ = ["configure_logging", "log_context", "shutdown_logging"]
@@ -0,0 +1,160 @@
+"""Timestamp parsing shared by analytics, reports and dashboards.
+
+Chatwoot returns timestamps either as epoch seconds or as ISO 8601 strings.
+`parse_ts`/`to_local` handle single values; `parse_ts_array`, `to_local_series`
+and `local_field` handle whole columns at once.
+"""
+
+from datetime import datetime, timezone
+from functools import lru_cache
+from typing import Iterable, Optional
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from src.utils.timezone import TZ
+
+_UTC = timezone.utc
+_NS_PER_SECOND = 1_000_000_000
+_NS_PER_HOUR = 3600 * _NS_PER_SECOND
+_NAT = np.datetime64("NaT", "ns")
+_TYPE_OF = np.frompyfunc(type, 1, 1)
+
+
+def _parse_iso(value: str) -> Optional[datetime]:
+    """Parse an ISO string, falling back to epoch seconds stored as text."""
+    try:
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        return datetime.fromisoformat(value)
+    except ValueError:
+        pass
+    try:
+        return datetime.fromtimestamp(float(value), tz=_UTC)
+    except (OverflowError, OSError, ValueError):
+        return None
+
+
+def parse_ts(value) -> Optional[datetime]:
+    """Parse timestamps from numeric or string values into UTC-aware datetimes."""
+    kind = type(value)
+    try:
+        if kind is int or kind is float:
+            return datetime.fromtimestamp(value, tz=_UTC)
+        if kind is str:
+            return _parse_iso(value)
+        if value is None:
+            return None
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=_UTC)
+        if isinstance(value, str):
+            return _parse_iso(value)
+    except (OverflowError, OSError, ValueError):
+        return None
+    return None
+
+
+def to_local(value, tz: ZoneInfo = TZ) -> Optional[datetime]:
+    """Parse a timestamp and convert it to the workspace timezone."""
+    kind = type(value)
+    if kind is int or kind is float:
+        try:
+            return datetime.fromtimestamp(value, tz=tz)
+        except (OverflowError, OSError, ValueError):
+            return None
+    dt = parse_ts(value)
+    return dt.astimezone(tz) if dt else None
+
+
+def parse_ts_array(values: Iterable) -> np.ndarray:
+    """Parse epoch/ISO values into a UTC `datetime64[ns]` array (NaT when invalid)."""
+    if isinstance(values, pd.Series) and isinstance(values.dtype, pd.DatetimeTZDtype):
+        return values.dt.tz_convert("UTC").dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    if isinstance(values, pd.Series):
+        arr = values.to_numpy()
+    elif isinstance(values, np.ndarray):
+        arr = values
+    else:
+        arr = np.array(values if isinstance(values, (list, tuple)) else list(values), dtype=object)
+    if arr.dtype.kind == "M":
+        return arr.astype("datetime64[ns]")
+    if arr.dtype.kind in "iu":
+        return (arr.astype(np.int64) * _NS_PER_SECOND).view("datetime64[ns]")
+    if arr.dtype.kind == "f":
+        return _epoch_to_datetime64(arr)
+    if arr.dtype != object:
+        arr = arr.astype(object)
+    if pd.api.types.infer_dtype(arr, skipna=False) in ("integer", "floating", "mixed-integer-float"):
+        return _epoch_to_datetime64(arr.astype(np.float64))
+    result = np.full(len(arr), _NAT)
+    kinds = _TYPE_OF(arr)
+    is_number = (kinds == int) | (kinds == float)
+    if is_number.any():
+        result[is_number] = _epoch_to_datetime64(arr[is_number].astype(np.float64))
+    is_text = ~is_number & pd.notna(arr)
+    if is_text.any():
+        text = pd.Series(arr[is_text], dtype="object").astype(str).str.replace("Z", "+00:00", regex=False)
+        parsed = pd.to_datetime(text, format="ISO8601", utc=True, errors="coerce")
+        failed = parsed.isna().to_numpy()
+        if failed.any():
+            # Epoch seconds stored as text, or numeric types other than int/float.
+            numeric = pd.to_numeric(pd.Series(arr[is_text][failed], dtype="object"), errors="coerce")
+            parsed[failed] = pd.to_datetime(numeric.to_numpy(), unit="s", utc=True, errors="coerce")
+        result[is_text] = parsed.dt.tz_localize(None).to_numpy(dtype="datetime64[ns]")
+    return result
+
+
+def _epoch_to_datetime64(seconds: np.ndarray) -> np.ndarray:
+    """Convert float epoch seconds to `datetime64[ns]`, NaT for NaN/inf."""
+    result = np.full(len(seconds), _NAT)
+    valid = np.isfinite(seconds)
+    result[valid] = (seconds[valid] * _NS_PER_SECOND).astype(np.int64).view("datetime64[ns]")
+    return result
+
+
+def to_local_series(values: Iterable, tz: ZoneInfo = TZ, index=None) -> pd.Series:
+    """Parse epoch/ISO values into a timezone-aware series in `tz`."""
+    utc = pd.Series(parse_ts_array(values), index=index, dtype="datetime64[ns]")
+    return utc.dt.tz_localize("UTC").dt.tz_convert(tz)
+
+
+@lru_cache(maxsize=65536)
+def _utc_offset_ns(tz: ZoneInfo, hour_bucket: int) -> int:
+    """Return the UTC offset of `tz` (in ns) for the UTC hour starting at `hour_bucket`."""
+    offset = datetime.fromtimestamp(hour_bucket * 3600, tz=tz).utcoffset()
+    return int(offset.total_seconds()) * _NS_PER_SECOND
+
+
+def to_local_wall(values: Iterable, tz: ZoneInfo = TZ) -> np.ndarray:
+    """Return naive local wall-clock `datetime64[ns]` values for epoch/ISO inputs.
+
+    Offsets are looked up once per distinct UTC hour and memoized, which is
+    much cheaper than converting each value through the zone database.
+    """
+    utc = parse_ts_array(values)
+    ints = utc.view(np.int64)
+    valid = ~np.isnat(utc)
+    result = np.full(len(utc), _NAT)
+    if valid.any():
+        buckets, inverse = np.unique(ints[valid] // _NS_PER_HOUR, return_inverse=True)
+        offsets = np.fromiter((_utc_offset_ns(tz, int(b)) for b in buckets), dtype=np.int64, count=len(buckets))
+        result[valid] = (ints[valid] + offsets[inverse]).view("datetime64[ns]")
+    return result
+
+
+def local_field(values: Iterable, field: str, tz: ZoneInfo = TZ) -> np.ndarray:
+    """Return a local calendar field (`hour`, `weekday`, `day`...) per value, -1 for NaT."""
+    wall = pd.DatetimeIndex(to_local_wall(values, tz))
+    result = np.asarray(getattr(wall, field), dtype="float64")
+    return np.where(np.isnan(result), -1, result).astype(np.int64)
+
+
+__all__ = [
+    "local_field",
+    "parse_ts",
+    "parse_ts_array",
+    "to_local",
+    "to_local_series",
+    "to_local_wall",
+]
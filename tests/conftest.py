@@ -0,0 +1,46 @@
+"""Shared fixtures and the opt-in performance budgets.
+
+`isolated_db` points the main SQLite database at a temporary directory.
+Tests marked `perf` (see `tests/test_performance_budgets.py`) are skipped
+unless PERF_BUDGETS=1 or `--perf-record` is given; only `--perf-record`
+appends their measurements to the history of `benchmarks.budgets`.
+"""
+
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from src.utils import database, db_init
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--perf-record",
+        action="store_true",
+        help="Roda os orçamentos de desempenho e anexa as medições ao histórico de benchmarks.budgets.",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: orçamento de tempo/memória; roda só com PERF_BUDGETS=1 ou --perf-record.")
+
+
+def pytest_collection_modifyitems(config, items):
+    if os.getenv("PERF_BUDGETS") == "1" or config.getoption("--perf-record"):
+        return
+    skip = pytest.mark.skip(reason="orçamentos de desempenho desligados (PERF_BUDGETS=1 para rodar)")
+    for item in items:
+        if "perf" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest.fixture()
+def isolated_db(tmp_path, monkeypatch):
+    db_path = tmp_path / "bot_config.db"
+    monkeypatch.setattr(db_init, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(db_init, "DB_PATH", db_path)
+    monkeypatch.setattr(database, "DB_PATH", db_path)
+    db_init.ensure_db()
+    return db_path
@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from src.analytics import conversation_analysis
+from src.utils.timezone import TZ
+
+
+def _filters(**overrides):
+    filters = {
+        "conversation_id_filter": "",
+        "selected_inbox_ids": set(),
+        "contact_name": "",
+        "contact_number": "",
+        "selected_agent_id": None,
+        "selected_team_id": None,
+        "assigned_filter": "Todos",
+        "status_filter": "Todos",
+    }
+    filters.update(overrides)
+    return filters
+
+
+def _conversation(conv_id, created_at, name="Ana Souza", inbox_id=1, assignee=None):
+    return {
+        "id": conv_id,
+        "inbox_id": inbox_id,
+        "status": "open",
+        "created_at": created_at,
+        "meta": {"sender": {"name": name, "phone_number": "+5511999990000"}, "assignee": assignee},
+    }
+
+
+def test_compile_partial_matcher_wildcards():
+    assert conversation_analysis.compile_partial_matcher("  ") is None
+    matcher = conversation_analysis.compile_partial_matcher("an*za")
+    assert matcher("Ana Souza")
+    assert not matcher("Joao")
+    assert conversation_analysis.compile_partial_matcher("SOUZA")("ana souza")
+
+
+def test_filter_conversations_single_pass_matches_both_scopes():
+    start_dt = datetime(2026, 1, 10, tzinfo=TZ)
+    end_dt = datetime(2026, 1, 20, 23, 59, 59, tzinfo=TZ)
+    inside = int(datetime(2026, 1, 15, tzinfo=TZ).timestamp())
+    before = int(datetime(2026, 1, 2, tzinfo=TZ).timestamp())
+    conversations = [
+        _conversation(1, inside),
+        _conversation(2, before),
+        _conversation(3, inside, name="Joao"),
+        _conversation(4, inside, inbox_id=2),
+    ]
+    filters = _filters(contact_name="ana*", selected_inbox_ids={1})
+
+    result = conversation_analysis.filter_conversations(conversations, filters, {1: "Principal"}, start_dt, end_dt)
+
+    assert result["conversation_ids"] == [1]
+    assert result["scope_ids"] == [1, 2]
+    assert result["rows"][0]["inbox_name"] == "Principal"
+    for enforce in (True, False):
+        rows, ids = conversation_analysis.collect_conversation_rows(
+            conversations, filters, {1: "Principal"}, start_dt, end_dt, enforce_created_range=enforce
+        )
+        assert ids == (result["conversation_ids"] if enforce else result["scope_ids"])
+        assert len(rows) == len(ids)
@@ -0,0 +1,46 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.attendance import attendance_frame, conversation_summary, display_frame, format_datetimes
+from src.utils.timestamps import to_local_series
+
+
+def test_summary_and_display_match_row_wise_formatting():
+    created = to_local_series([1_767_225_600, 1_767_229_261, None, 1_767_312_000])
+    msg_df = pd.DataFrame(
+        {
+            "conversation_id": [1, 1, 2, 3],
+            "created_dt": created,
+            "message_type": [0, 1, 0, 1],
+            "sender_type": pd.Categorical(["contact", "user", "contact", "user"]),
+            "content": ["oi", None, "", "tchau"],
+            "content_body": ["", "corpo", "b", ""],
+        }
+    )
+    direction = pd.Series(["cliente", "bot", "cliente", "bot"])
+    conv_meta = {
+        1: {"agent": "Ana", "status": "open", "client_name": "C1", "inbox_id": 7},
+        2: {"agent": None, "status": None, "client_name": None, "inbox_id": None},
+        3: {"agent": "Bia", "status": "resolved", "client_name": "C3", "inbox_id": 8},
+    }
+    df = attendance_frame(msg_df, direction, conv_meta)
+    assert df["message"].tolist() == ["oi", "corpo", "b", "tchau"]
+    assert df["agent"].tolist()[:2] == ["Ana", "Ana"]
+
+    shown = display_frame(df, ["created_at", "created_dt_data", "created_at_time"])
+    expected = created.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    assert shown["created_at"].tolist() == expected.tolist()
+    assert shown["created_dt_data"].tolist() == created.dt.strftime("%d/%m/%Y").fillna("").tolist()
+    assert format_datetimes(created, [("time", "%H:%M")]).tolist()[1] == created[1].strftime("%H:%M")
+
+    summary = conversation_summary(df).set_index("conversation_id")
+    assert summary.loc["1", "primeira_mensagem"] == created[0]
+    assert (summary.loc["2", "agente"], summary.loc["2", "cliente"], summary.loc["2", "status"]) == (
+        "Não atribuído",
+        "N/A",
+        "Sem status",
+    )
+    assert summary.loc["3", "hora"] == created[3].strftime("%H:%M")
+    assert np.all(summary.index == ["1", "2", "3"])
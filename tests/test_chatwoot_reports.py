@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import threading
+
+from src.analytics import chatwoot_reports
+
+
+def test_fetch_reports_dedupes_specs_and_runs_concurrently(monkeypatch):
+    calls = []
+    barrier = threading.Barrier(3, timeout=5)
+
+    def fake_fetch(base_url, account_id, token, spec):
+        calls.append(spec)
+        barrier.wait()
+        return [{"timestamp": 100, "value": spec[2]}]
+
+    monkeypatch.setattr(chatwoot_reports, "fetch_report", fake_fetch)
+    specs = [chatwoot_reports.report_spec(0, 10, -3, "inbox", inbox_id, "day") for inbox_id in (1, 2, 3, 1, 2)]
+
+    results = chatwoot_reports.fetch_reports("http://cw", "1", "t", specs)
+
+    assert len(calls) == 3
+    assert set(results) == set(specs)
+
+
+def test_merge_report_rows_sums_per_timestamp():
+    merged = chatwoot_reports.merge_report_rows(
+        [
+            [{"timestamp": 200, "value": "2"}, {"timestamp": 100, "value": 1}],
+            [{"timestamp": 100, "value": 4}, {"timestamp": None, "value": 9}, "lixo"],
+            [],
+        ]
+    )
+    assert merged == [{"timestamp": 100, "value": 5.0}, {"timestamp": 200, "value": 2.0}]
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import gzip
+
+import pandas as pd
+
+from src.reports import export
+
+
+def _frame(n=25):
+    return pd.DataFrame(
+        {
+            "conversation_id": [str(i % 4) for i in range(n)],
+            "mensagem": ["olá, \"mundo\"" if i % 3 else None for i in range(n)],
+            "misto": [i if i % 2 else f"id-{i}" for i in range(n)],
+            "created_dt": pd.date_range("2026-03-01", periods=n, freq="h", tz="America/Sao_Paulo"),
+        }
+    )
+
+
+def test_chunked_csv_matches_to_csv(tmp_path):
+    frame = _frame()
+    expected = frame.to_csv(index=False)
+
+    plain = export.write_export(frame, tmp_path / "out.csv", chunk_rows=7)
+    assert plain.read_text(encoding="utf-8") == expected
+
+    packed = export.write_export(frame, tmp_path / "out.csv.gz", fmt="csv.gz", chunk_rows=7)
+    with gzip.open(packed, "rt", encoding="utf-8", newline="") as handle:
+        assert handle.read() == expected
+
+
+def test_parquet_roundtrip_with_mixed_column(tmp_path):
+    frame = _frame()
+    path = export.write_export(frame, tmp_path / "out.parquet", fmt="parquet", chunk_rows=4, compress=True)
+    loaded = pd.read_parquet(path)
+    assert loaded["misto"].tolist() == [str(value) for value in frame["misto"]]
+    assert loaded["mensagem"].tolist() == frame["mensagem"].tolist()
+    assert loaded["created_dt"].equals(frame["created_dt"])
+
+
+def test_cli_writes_requested_format(monkeypatch, tmp_path):
+    monkeypatch.setattr(export, "messages_frame", lambda *args, **kwargs: _frame(5))
+    out = tmp_path / "msgs.csv.gz"
+    code = export.main(["messages", "--start", "2026-03-01", "--end", "2026-03-02", "--gzip", "-o", str(out)])
+    assert code == 0
+    with gzip.open(out, "rt", encoding="utf-8") as handle:
+        assert handle.readline().strip() == "conversation_id,mensagem,misto,created_dt"
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+import pytest
+import requests
+
+from benchmarks.bench_chatwoot_fetch import use_temp_stores
+from benchmarks.chatwoot_data import conversation_messages, generate_dataset
+from benchmarks.fake_chatwoot import start_fake_chatwoot
+from benchmarks.stub_servers import stop
+from src.analytics import message_store
+from src.analytics.chatwoot_reports import fetch_reports, report_spec
+from src.analytics.message_types import conversation_messages as fetch_conversation_messages
+from src.analytics.metrics import fetch_chatwoot_conversations
+from src.utils import database, db_init, http_cache, rate_limit
+from src.utils.timezone import TZ
+
+API = "/api/v1/accounts/1"
+
+
+@pytest.fixture
+def fake():
+    dataset = generate_dataset(120, 30, days=10, seed=7)
+    server, url, state = start_fake_chatwoot(dataset)
+    yield dataset, url, state
+    stop(server)
+
+
+def test_dataset_is_deterministic_and_ids_increase():
+    first, second = generate_dataset(50, seed=3, end_ts=1_760_000_000), generate_dataset(50, seed=3, end_ts=1_760_000_000)
+    assert first == second
+    ids = [m["id"] for conv in first["conversations"] for m in conversation_messages(first, conv)]
+    assert ids == sorted(ids) and len(ids) == len(set(ids))
+    assert conversation_messages(first, first["conversations"][0]) == conversation_messages(second, second["conversations"][0])
+
+
+def test_conversation_paging_filters_and_etag(fake):
+    dataset, url, _ = fake
+    resp = requests.get(url + API + "/conversations", params={"status": "all", "page": 2, "per_page": 100})
+    data = resp.json()["data"]
+    assert len(data["payload"]) == 25
+    assert data["meta"]["all_count"] == 120
+    stamps = [conv["last_activity_at"] for conv in data["payload"]]
+    assert stamps == sorted(stamps, reverse=True)
+
+    opened = requests.get(url + API + "/conversations").json()["data"]
+    assert {conv["status"] for conv in opened["payload"]} == {"open"}
+    assert opened["meta"]["all_count"] == sum(conv["status"] == "open" for conv in dataset["conversations"])
+
+    again = requests.get(
+        url + API + "/conversations",
+        params={"status": "all", "page": 2, "per_page": 100},
+        headers={"If-None-Match": resp.headers["ETag"]},
+    )
+    assert again.status_code == 304 and again.content == b""
+
+
+def test_messages_before_pages_backwards(fake):
+    dataset, url, _ = fake
+    conv = max(dataset["conversations"], key=lambda c: c["_messages"])
+    latest = requests.get(f"{url}{API}/conversations/{conv['id']}/messages").json()["payload"]
+    older = requests.get(f"{url}{API}/conversations/{conv['id']}/messages", params={"before": latest[0]["id"]}).json()
+    assert len(latest) == 20
+    assert older["payload"] and older["payload"][-1]["id"] == latest[0]["id"] - 1
+
+
+def test_rate_limit_answers_429_with_retry_after():
+    server, url, state = start_fake_chatwoot(generate_dataset(5, seed=1), rate_limit=1.0, retry_after=3)
+    try:
+        resp = requests.get(url + API + "/inboxes")
+    finally:
+        stop(server)
+    assert resp.status_code == 429
+    assert resp.headers["Retry-After"] == "3"
+    assert state["throttled"] == 1
+
+
+def test_app_fetches_against_fake(fake, monkeypatch, tmp_path):
+    for module, name in (
+        (db_init, "DATA_DIR"),
+        (db_init, "DB_PATH"),
+        (database, "DB_PATH"),
+        (http_cache, "CACHE_PATH"),
+        (message_store, "STORE_PATH"),
+    ):
+        monkeypatch.setattr(module, name, getattr(module, name))
+    use_temp_stores(tmp_path)
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda _: None)
+    dataset, url, state = fake
+    start_dt = datetime.fromtimestamp(dataset["end_ts"], TZ) - timedelta(days=3)
+
+    conversations = fetch_chatwoot_conversations(url, "1", "t", start_dt)
+    assert len({conv["id"] for conv in conversations}) == len(conversations) > 25
+
+    results = list(fetch_conversation_messages(url, "1", "t", conversations[:5], start_ts=start_dt.timestamp()))
+    assert all(error is None for _, _, error in results)
+    for conv_id, rows, _ in results:
+        conv = next(c for c in dataset["conversations"] if c["id"] == conv_id)
+        expected = [m["id"] for m in conversation_messages(dataset, conv) if m["created_at"] >= start_dt.timestamp()]
+        assert [m["id"] for m in rows] == expected
+
+    spec = report_spec(start_dt.timestamp(), dataset["end_ts"], -3.0)
+    rows = fetch_reports(url, "1", "t", [spec])[spec]
+    assert len(rows) >= 3 and all(set(row) == {"value", "timestamp"} for row in rows)
+
+    before = sum(state["requests"].values())
+    fetch_reports(url, "1", "t", [spec])
+    assert sum(state["requests"].values()) == before
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import threading
+import time
+
+from src.utils import health
+
+
+def test_slow_probes_do_not_block_past_deadline_and_refresh_in_background():
+    health.clear_health()
+    release = threading.Event()
+    calls = []
+
+    def slow():
+        calls.append("slow")
+        release.wait(5)
+        return ("ok", f"lento {len(calls)}")
+
+    probes = {"fast": ("cfg", lambda: ("ok", "rápido")), "slow": ("cfg", slow)}
+    started = time.monotonic()
+    first = health.check_health(probes, deadline=0.2)
+    assert time.monotonic() - started < 1
+    assert first["fast"]["value"] == ("ok", "rápido") and not first["fast"]["pending"]
+    assert first["slow"]["value"] is None and first["slow"]["pending"]
+
+    release.set()
+    deadline = time.monotonic() + 5
+    while health.check_health(probes, deadline=0)["slow"]["pending"] and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert health.check_health(probes, deadline=0)["slow"]["value"] == ("ok", "lento 1")
+    assert calls == ["slow"]
+
+    release.clear()
+    stale = health.check_health(probes, ttl=0, deadline=0)
+    assert stale["slow"]["value"] == ("ok", "lento 1") and stale["slow"]["pending"]
+    release.set()
+
+    changed = health.check_health({"slow": ("outra", lambda: 1 / 0)}, deadline=2)
+    assert changed["slow"]["value"][0] == "error"
+    health.clear_health()
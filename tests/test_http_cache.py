@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import json
+import time
+
+import requests
+
+from src.utils import http_cache
+
+
+class _FakeServer:
+    def __init__(self, payload, etag=None):
+        self.payload = payload
+        self.etag = etag
+        self.calls = []
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        self.calls.append(dict(headers or {}))
+        resp = requests.Response()
+        resp.url = url
+        if self.etag and (headers or {}).get("If-None-Match") == self.etag:
+            resp.status_code = 304
+            resp._content = b""
+            return resp
+        resp.status_code = 200
+        resp.headers["Content-Type"] = "application/json"
+        if self.etag:
+            resp.headers["ETag"] = self.etag
+        resp._content = json.dumps(self.payload).encode()
+        return resp
+
+
+def _setup(monkeypatch, tmp_path, server):
+    monkeypatch.setattr(http_cache, "CACHE_PATH", tmp_path / "http_cache.db")
+    monkeypatch.setattr(requests, "get", server.get)
+    monkeypatch.delenv("CHATWOOT_HTTP_CACHE", raising=False)
+
+
+def test_cached_get_serves_from_disk_and_revalidates_with_etag(monkeypatch, tmp_path):
+    server = _FakeServer({"payload": [{"id": 1}]}, etag='"v1"')
+    _setup(monkeypatch, tmp_path, server)
+    url = "http://cw/api/v1/accounts/1/inboxes"
+    headers = {"api_access_token": "segredo"}
+
+    first = http_cache.cached_get(url, params={"page": 1}, headers=headers, ttl=60)
+    second = http_cache.cached_get(url, params={"page": 1}, headers=headers, ttl=60)
+    assert len(server.calls) == 1
+    assert second.from_cache and second.json() == first.json()
+
+    later = time.time() + 120
+    monkeypatch.setattr(http_cache.time, "time", lambda: later)
+    third = http_cache.cached_get(url, params={"page": 1}, headers=headers, ttl=60)
+    assert server.calls[-1]["If-None-Match"] == '"v1"'
+    assert third.status_code == 200 and third.json() == {"payload": [{"id": 1}]}
+    assert b"segredo" not in (tmp_path / "http_cache.db").read_bytes()
+
+
+def test_old_message_pages_never_expire_and_live_reports_bypass(monkeypatch, tmp_path):
+    old = time.time() - 30 * 86400
+    server = _FakeServer({"payload": [{"id": 10, "created_at": old}]})
+    _setup(monkeypatch, tmp_path, server)
+    url = "http://cw/api/v1/accounts/1/conversations/7/messages"
+
+    http_cache.cached_get(url, params={"before": 11}, headers={})
+    http_cache.cached_get(url, headers={})
+    assert http_cache.cache_stats()["immutable"] == 1
+
+    live = "http://cw/api/v2/accounts/1/live_reports/conversation_metrics"
+    http_cache.cached_get(live, headers={})
+    http_cache.cached_get(live, headers={})
+    assert len(server.calls) == 4
+
+
+def test_evict_keeps_cache_under_size_limit(monkeypatch, tmp_path):
+    server = _FakeServer({"payload": ["x" * 1000]})
+    _setup(monkeypatch, tmp_path, server)
+    for page in range(10):
+        http_cache.cached_get("http://cw/api/v1/accounts/1/teams", params={"page": page}, headers={})
+    removed = http_cache.evict(max_bytes=5000)
+    assert removed > 0
+    assert http_cache.cache_stats()["bytes"] <= 5000
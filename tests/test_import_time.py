@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import pytest
+
+from benchmarks import bench_startup
+
+
+@pytest.mark.parametrize("target", ["webhook", "engine", "rules", "sidebar", "config", "metrics", "batch"])
+def test_heavy_dependencies_load_lazily(target):
+    module, _, forbidden = bench_startup.TARGETS[target]
+    profile = bench_startup.import_profile(module)
+    if "error" in profile:
+        pytest.skip(f"{module} não importa neste ambiente: {profile['error']}")
+    assert not set(profile["heavy"]) & set(forbidden)
+    assert module in profile["modules"]
+
+
+def test_parse_importtime_reads_depth_and_times():
+    stderr = "\n".join(
+        [
+            "import time: self [us] | cumulative | imported package",
+            "import time:       120 |        120 |   _json",
+            "import time:      2500 |       2620 | json",
+        ]
+    )
+    modules = bench_startup._parse_importtime(stderr)
+    assert modules["json"] == {"self_ms": 2.5, "cumulative_ms": 2.62, "depth": 0}
+    assert modules["_json"]["depth"] == 1
+    assert bench_startup.heaviest(modules) == [("json", 2.62), ("_json", 0.12)]
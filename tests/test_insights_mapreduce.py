@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+
+from src.analytics import insights_mapreduce as mr
+from src.analytics import insights_store
+
+
+@pytest.fixture(autouse=True)
+def _store(monkeypatch, tmp_path):
+    monkeypatch.setattr(insights_store, "STORE_PATH", tmp_path / "insights.db")
+
+
+def _lines(days, per_day=5, width=60):
+    return [(f"2026-03-{day:02d}", f"- msg {day}/{i} " + "x" * width) for day in days for i in range(per_day)]
+
+
+def test_partition_keeps_one_chunk_per_group_and_splits_large_ones():
+    chunks = mr.partition_messages(_lines([1, 2, 3], per_day=3, width=20), max_chars=250)
+    assert [chunk["label"] for chunk in chunks] == ["2026-03-01", "2026-03-02", "2026-03-03"]
+    assert sum(len(chunk["lines"]) for chunk in chunks) == 9
+
+    big = mr.partition_messages(_lines([1], per_day=10, width=100), max_chars=300)
+    assert [chunk["label"] for chunk in big][:2] == ["2026-03-01", "2026-03-01 (parte 2)"]
+    assert all(sum(len(line) + 1 for line in chunk["lines"]) <= 300 for chunk in big)
+
+
+def _recording_complete(calls):
+    def complete(system_text, user_text, model):
+        kind = "reduce" if "Análises parciais" in user_text else "map"
+        calls.append((kind, user_text))
+        return f"{kind}:{len(user_text)}", 100, 10
+
+    return complete
+
+
+def test_map_reduce_caches_chunks_and_reports_usage():
+    calls = []
+    complete = _recording_complete(calls)
+    chunks = mr.partition_messages(_lines(range(1, 8)), max_chars=800)
+    first = mr.map_reduce("Analise.", "Filtros", chunks, "gpt-4o-mini", complete, summary="Total: 35", max_workers=3)
+    assert first["output"].startswith("reduce:")
+    assert first["calls"] == len(chunks) + 1 and first["cached_calls"] == 0
+    assert (first["input_tokens"], first["output_tokens"]) == (100 * first["calls"], 10 * first["calls"])
+    assert all("Total:" not in text for kind, text in calls if kind == "map")
+    assert "Total: 35" in calls[-1][1]
+
+    # Uma mensagem num dia novo muda os totais, mas só o trecho desse dia volta ao modelo.
+    calls.clear()
+    more = mr.partition_messages(_lines(range(1, 8)) + _lines([8], per_day=1), max_chars=800)
+    second = mr.map_reduce("Analise.", "Filtros", more, "gpt-4o-mini", complete, summary="Total: 36", max_workers=3)
+    assert [kind for kind, _ in calls] == ["map", "reduce"]
+    assert second["cached_calls"] == len(chunks)
+
+
+def test_single_chunk_is_still_reduced():
+    calls = []
+    chunks = mr.partition_messages(_lines([1]), max_chars=800)
+    result = mr.map_reduce("Analise.", "Filtros", chunks, "modelo", _recording_complete(calls), summary="Total: 5")
+    assert [kind for kind, _ in calls] == ["map", "reduce"]
+    assert result["output"].startswith("reduce:")
+
+
+def test_map_reduce_reduces_hierarchically_and_surfaces_failures(monkeypatch):
+    monkeypatch.setattr(mr, "REDUCE_MAX_CHARS", 120)
+    reduces = []
+
+    def complete(system_text, user_text, model):
+        if "Análises parciais" in user_text:
+            reduces.append(user_text.count("### Trecho"))
+        return "r" * 50, None, None
+
+    chunks = mr.partition_messages(_lines(range(1, 9)), max_chars=400)
+    result = mr.map_reduce("Analise.", "", chunks, "modelo", complete)
+    assert len(reduces) > 1 and reduces[-1] < len(chunks)
+    assert result["cost_usd"] is None
+
+    def flaky(system_text, user_text, model):
+        if "2026-03-02" in user_text:
+            raise TimeoutError("lento")
+        return "ok", 1, 1
+
+    with pytest.raises(RuntimeError, match="1 de"):
+        mr.map_reduce("Outro.", "", mr.partition_messages(_lines([1, 2]), max_chars=400), "modelo", flaky)
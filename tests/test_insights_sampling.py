@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+from collections import Counter
+from datetime import datetime
+
+from app.modules.analytics import conversations as conv_module
+from src.analytics import insights_sampling as sampling
+from src.utils.timezone import TZ
+
+
+def test_conversation_order_interleaves_strata():
+    items = [(f"a{i}", "A") for i in range(6)] + [("b0", "B"), ("b1", "B"), ("c0", "C")]
+    order = sampling.conversation_order(items)
+    assert sorted(order) == sorted(conv_id for conv_id, _ in items)
+    assert {conv_id[0] for conv_id in order[:3]} == {"a", "b", "c"}
+    assert order == sampling.conversation_order(items)
+
+
+def test_stratified_sample_covers_strata_within_budget():
+    items = [("big", 10)] * 90 + [("small", 10)] * 10 + [("rare", 10)]
+    picked = sampling.stratified_sample(items, max_tokens=200)
+    assert picked == sorted(picked) and len(picked) == 20
+    counts = Counter(items[index][0] for index in picked)
+    assert counts["rare"] == 1 and counts["small"] >= 1 and counts["big"] > counts["small"]
+
+    limited = sampling.stratified_sample(items, max_tokens=10_000, max_items=5)
+    assert len(limited) == 5
+    assert sampling.stratified_sample([("x", 50)], max_tokens=10) == []
+
+
+def test_count_tokens_falls_back_to_characters(monkeypatch):
+    monkeypatch.setattr(sampling, "tiktoken", None)
+    sampling._encoding.cache_clear()
+    assert sampling.count_tokens("x" * 10) == 3
+    assert sampling.count_tokens("") == 0
+    sampling._encoding.cache_clear()
+
+
+def test_context_stops_crawling_once_sample_is_sufficient(monkeypatch):
+    monkeypatch.setattr(conv_module.time_module, "sleep", lambda seconds: None)
+    monkeypatch.setattr(conv_module, "bot_sender_config", lambda: {"names": set(), "ids": set()})
+    base = int(datetime(2026, 3, 1, 12, tzinfo=TZ).timestamp())
+    conversations = [
+        {"id": cid, "inbox_id": 1 + cid % 2, "status": "open", "created_at": base + (cid % 3) * 86400, "meta": {}}
+        for cid in range(1, 201)
+    ]
+    fetched = []
+
+    def fake_fetch(url, account, token, conv_id, start_dt=None):
+        fetched.append(conv_id)
+        return [
+            {"id": conv_id * 100 + i, "created_at": base + i * 60, "message_type": i % 2, "content": "mensagem " * 8}
+            for i in range(4)
+        ]
+
+    monkeypatch.setattr(conv_module, "_fetch_messages", fake_fetch)
+    filters = {"status_filter": "Todos", "assigned_filter": "Todos", "conversation_type": "Todos"}
+    stats, context, filter_lines = conv_module._build_insights_context(
+        conversations,
+        filters,
+        {1: "Site", 2: "WhatsApp"},
+        datetime(2026, 3, 1, tzinfo=TZ),
+        datetime(2026, 3, 5, tzinfo=TZ),
+        "http://cw",
+        "1",
+        "t",
+        max_messages=40,
+        max_tokens=800,
+    )
+    assert len(fetched) < len(conversations)
+    assert stats["estimado"] and stats["total_mensagens"] == 800
+    assert stats["total_conversas"] == 200
+    assert any(line.startswith("Totais de mensagens estimados") for line in filter_lines)
+    sampled = [line for line in context.splitlines() if line.startswith("- [")]
+    assert 0 < len(sampled) <= 40
+    sampled_ids = {int(line.split("conv ")[1].split(" ")[0]) for line in sampled}
+    assert {cid % 2 for cid in sampled_ids} == {0, 1} and {cid % 3 for cid in sampled_ids} == {0, 1, 2}
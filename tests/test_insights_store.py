@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from app.modules.analytics import conversations as conv_module
+from src.analytics import insights_store
+from src.utils.timezone import TZ
+
+
+def test_context_is_reused_until_scope_has_new_activity(monkeypatch, tmp_path):
+    monkeypatch.setattr(insights_store, "STORE_PATH", tmp_path / "insights.db")
+    conversations = [
+        {"id": 1, "inbox_id": 1, "status": "open", "created_at": 1_772_400_000, "last_activity_at": 1_772_400_100, "meta": {}},
+        {"id": 2, "inbox_id": 1, "status": "open", "created_at": 1_772_400_000, "last_activity_at": 1_772_400_200, "meta": {}},
+    ]
+    filters = {"start_date": datetime(2026, 3, 1).date(), "end_date": datetime(2026, 3, 2).date(), "status_filter": "Todos"}
+    start_dt = datetime(2026, 3, 1, tzinfo=TZ)
+    end_dt = datetime(2026, 3, 2, 23, 59, tzinfo=TZ)
+    monkeypatch.setattr(
+        conv_module,
+        "_job_context",
+        lambda params: (("http://cw", "1", "t"), dict(filters), start_dt, end_dt, {}, conversations),
+    )
+    builds = []
+
+    def fake_build(convs, *args, **kwargs):
+        builds.append(len(convs))
+        return {"total_conversas": len(convs)}, f"contexto {len(builds)}", ["Período: 01/03/2026 a 02/03/2026"]
+
+    monkeypatch.setattr(conv_module, "_build_insights_context", fake_build)
+    params = {"chatwoot_url": "http://cw", "chatwoot_account": "1", "filters": {}, "max_messages": 160, "max_tokens": 3000}
+    progress = lambda *args: None
+
+    first = conv_module._insights_context_job(params, progress)
+    again = conv_module._insights_context_job(params, progress)
+    assert builds == [2]
+    assert again["context"] == first["context"] == "contexto 1"
+    assert again["cached_at"] is not None
+
+    conversations[1] = dict(conversations[1], last_activity_at=1_772_400_900)
+    refreshed = conv_module._insights_context_job(params, progress)
+    assert builds == [2, 2]
+    assert refreshed["context"] == "contexto 2"
+
+    other_filters = dict(params, max_messages=50)
+    conv_module._insights_context_job(other_filters, progress)
+    assert len(builds) == 3
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import pytest
+
+from src.utils import instrumentation
+
+
+@pytest.fixture(autouse=True)
+def _clean_registry():
+    instrumentation.reset()
+    yield
+    instrumentation.reset()
+
+
+def test_endpoint_label_collapses_ids_and_query():
+    url = "https://chat.example.com/api/v1/accounts/3/conversations/812/messages?page=2"
+    assert instrumentation.endpoint_label(url) == "/api/v1/accounts/:id/conversations/:id/messages"
+    assert instrumentation.endpoint_label("") == "/"
+
+
+def test_prometheus_export_round_trips_into_summaries():
+    for _ in range(9):
+        instrumentation.observe("sqlite_operation_seconds", 0.004, operation="load_settings")
+    instrumentation.observe("sqlite_operation_seconds", 3.0, operation="load_settings")
+    with pytest.raises(RuntimeError):
+        with instrumentation.chatwoot_call("GET", "https://chat.example.com/api/v1/accounts/1/agents"):
+            raise RuntimeError("timeout")
+
+    text = instrumentation.render_prometheus({"webhook_queue_depth": ("Tarefas na fila.", 2)})
+    assert "# TYPE sqlite_operation_seconds histogram" in text
+    assert 'sqlite_operation_seconds_bucket{operation="load_settings",le="+Inf"} 10' in text
+    assert "webhook_queue_depth 2" in text
+
+    histograms, others = instrumentation.summarize(instrumentation.parse_prometheus(text))
+    sqlite = next(row for row in histograms if row["name"] == "sqlite_operation_seconds")
+    assert sqlite["count"] == 10 and sqlite["labels"] == {"operation": "load_settings"}
+    assert sqlite["p50"] <= 0.005 and 2.5 <= sqlite["p95"] <= 5.0
+    calls = {s["name"]: s for s in others}
+    assert calls["chatwoot_requests_total"]["labels"] == {
+        "endpoint": "/api/v1/accounts/:id/agents",
+        "method": "GET",
+        "status": "error",
+    }
+    assert calls["webhook_queue_depth"]["value"] == 2
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from src.utils import jobs
+
+
+@pytest.fixture(autouse=True)
+def _jobs_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(jobs, "JOBS_PATH", tmp_path / "jobs.db")
+    monkeypatch.setattr(jobs, "RESULTS_DIR", tmp_path / "results")
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL", 0)
+
+
+def _count(params, progress):
+    for done in range(1, params["n"] + 1):
+        progress(done, params["n"], "contando")
+    return {"total": params["n"]}
+
+
+def test_job_runs_in_background_and_is_shared_by_parameters():
+    job_id = jobs.submit_job("contagem", {"n": 3}, _count)
+    job = jobs.wait_job(job_id, timeout=5)
+    assert job["status"] == "done"
+    assert (job["done"], job["total"], job["message"]) == (3, 3, "contando")
+    assert jobs.load_result(job_id) == {"total": 3}
+
+    # Mesmos parâmetros reaproveitam o resultado; outros parâmetros criam outro job.
+    assert jobs.submit_job("contagem", {"n": 3}, _count) == job_id
+    others = [jobs.submit_job("contagem", {"n": 4}, _count), jobs.submit_job("contagem", {"n": 3}, _count, force=True)]
+    assert job_id not in others
+    assert [jobs.wait_job(other, timeout=5)["status"] for other in others] == ["done", "done"]
+
+
+def test_failed_and_orphaned_jobs_are_reported():
+    def boom(params, progress):
+        raise RuntimeError("sem conexão")
+
+    job = jobs.wait_job(jobs.submit_job("falha", {}, boom), timeout=5)
+    assert job["status"] == "failed"
+    assert "sem conexão" in job["error"]
+    assert jobs.load_result(job["job_id"]) is None
+
+    job_id = jobs.submit_job("orfao", {"n": 1}, _count)
+    assert jobs.wait_job(job_id, timeout=5)["status"] == "done"
+    with jobs._jobs_conn() as conn:
+        conn.execute("UPDATE jobs SET status = 'running', owner_pid = ? WHERE job_id = ?", (2**22 + os.getpid(), job_id))
+        conn.commit()
+    assert jobs.get_job(job_id)["status"] == "failed"
+    assert jobs.find_job("orfao", {"n": 1}) is None
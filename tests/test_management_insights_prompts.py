@@ -7,7 +7,6 @@ import pytest
 from streamlit.testing.v1 import AppTest
 
 import app.components.sidebar as sidebar
-from src.utils import database, db_init
 
 
 def _get_tab(at: AppTest, label: str):
@@ -39,16 +38,6 @@ def _count_prompts(db_path: Path) -> int:
         return int(cur.fetchone()[0])
 
 
-@pytest.fixture()
-def isolated_db(tmp_path, monkeypatch):
-    db_path = tmp_path / "bot_config.db"
-    monkeypatch.setattr(db_init, "DATA_DIR", tmp_path)
-    monkeypatch.setattr(db_init, "DB_PATH", db_path)
-    monkeypatch.setattr(database, "DB_PATH", db_path)
-    db_init.ensure_db()
-    return db_path
-
-
 def test_insights_prompts_crud(isolated_db, monkeypatch):
     monkeypatch.setattr(sidebar, "_bootstrap_bot_state", lambda: None)
 
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import json
+
+import pandas as pd
+import requests
+
+from src.analytics import message_store, message_types
+from src.analytics.message_frame import (
+    append_messages,
+    build_message_frame,
+    concat_message_frames,
+    frame_from_buffer,
+    new_message_buffer,
+)
+from src.utils import rate_limit
+
+
+def _response(status, payload=None, headers=None):
+    resp = requests.Response()
+    resp.status_code = status
+    resp.headers.update(headers or {})
+    resp._content = json.dumps({"payload": payload or []}).encode()
+    return resp
+
+
+def test_crawl_retries_rate_limited_pages_and_serves_fresh_from_store(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    sleeps = []
+    monkeypatch.setattr(rate_limit.time, "sleep", sleeps.append)
+    pages = {str(cid): [{"id": cid * 10 + i, "created_at": 1_700_000_000 + i} for i in range(3)] for cid in range(1, 6)}
+    throttled = {"3"}
+    calls = []
+
+    def fake_get(url, params=None, headers=None, timeout=None, ttl=None):
+        conv_id = url.rstrip("/").split("/")[-2]
+        calls.append(conv_id)
+        if conv_id in throttled:
+            throttled.discard(conv_id)
+            return _response(429, headers={"Retry-After": "0"})
+        return _response(200, [] if params else pages[conv_id])
+
+    monkeypatch.setattr(message_types, "cached_get", fake_get)
+    convs = [{"id": cid, "last_activity_at": 1_700_000_100} for cid in range(1, 6)]
+
+    results = {cid: (msgs, error) for cid, msgs, error in message_types.conversation_messages("http://cw", "1", "t", convs)}
+    assert all(error is None for _, error in results.values())
+    assert [msg["id"] for msg in results[3][0]] == [30, 31, 32]
+    assert calls.count("3") == 2
+
+    calls.clear()
+    again = list(message_types.conversation_messages("http://cw", "1", "t", convs))
+    assert calls == []
+    assert sum(len(msgs) for _, msgs, _ in again) == 15
+
+
+def test_buffer_matches_concatenated_frames():
+    batches = {
+        7: [{"id": 1, "created_at": 1_700_000_000, "message_type": 0, "sender": {"type": "contact", "name": "Ana"}}],
+        8: [
+            {"id": 2, "created_at": "2026-03-01T10:00:00Z", "message_type": 1, "content": "oi", "private": "sim"},
+            {"id": 3, "created_at": 1_700_000_500, "message_type": "outgoing", "attachments": [{"file_type": "audio"}]},
+        ],
+    }
+    buffer = new_message_buffer()
+    for conv_id, msgs in batches.items():
+        append_messages(buffer, msgs, conversation_id=conv_id)
+    expected = concat_message_frames([build_message_frame(msgs, conversation_id=cid) for cid, msgs in batches.items()])
+    pd.testing.assert_frame_equal(frame_from_buffer(buffer), expected, check_categorical=False)
@@ -0,0 +1,161 @@
+"""The columnar message frame must count like the per-message loops it replaced."""
+
+from __future__ import annotations
+
+import random
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from src.analytics.message_frame import (
+    DIRECTIONS,
+    WEEKDAY_NAMES,
+    build_message_frame,
+    counts_by_hour,
+    counts_by_weekday,
+    filter_period,
+    media_counts,
+    message_totals,
+)
+from src.utils.timezone import TZ
+
+BASE = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture(autouse=True)
+def utc_process_timezone(monkeypatch):
+    # O laço antigo convertia horários sem fuso com `astimezone`, que usa o fuso do processo.
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def _legacy_parse_ts(value):
+    """Copy of the per-value parser the loops used before the frame."""
+    if value is None:
+        return None
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value, tz=timezone.utc)
+        if isinstance(value, str):
+            try:
+                return datetime.fromisoformat(value.replace("Z", "+00:00"))
+            except Exception:
+                return datetime.fromtimestamp(float(value), tz=timezone.utc)
+    except Exception:
+        return None
+    return None
+
+
+def _legacy_direction(msg):
+    msg_type = msg.get("message_type")
+    if isinstance(msg_type, int):
+        return {0: "incoming", 1: "outgoing"}.get(msg_type)
+    msg_type = str(msg_type).lower()
+    if msg_type.isdigit():
+        return {0: "incoming", 1: "outgoing"}.get(int(msg_type))
+    return msg_type if msg_type in ("incoming", "outgoing") else None
+
+
+def _legacy_counts(messages, start_dt, end_dt):
+    """The old loops: totals keep messages without a date, hour/weekday/media skip them."""
+    totals = {"received": 0, "sent": 0, "private": 0}
+    per_hour = [[0, 0] for _ in range(24)]
+    per_weekday = [[0, 0] for _ in range(7)]
+    media = {"text": 0, "audio": 0}
+    for msg in messages:
+        dt = _legacy_parse_ts(msg.get("created_at") or msg.get("timestamp"))
+        local = dt.astimezone(TZ) if dt else None
+        if local and (local < start_dt or local > end_dt):
+            continue
+        direction = _legacy_direction(msg)
+        private = msg.get("private")
+        if isinstance(private, str):
+            private = private.strip().lower() in ("true", "1", "yes", "sim")
+        totals["private"] += bool(private)
+        if direction == "incoming":
+            totals["received"] += 1
+        elif direction == "outgoing":
+            totals["sent"] += 1
+        if not local:
+            continue
+        has_audio = any(isinstance(a, dict) and a.get("file_type") == "audio" for a in msg.get("attachments") or [])
+        media["audio" if has_audio else "text"] += 1
+        if direction:
+            column = DIRECTIONS.index(direction)
+            per_hour[local.hour][column] += 1
+            per_weekday[local.weekday()][column] += 1
+    return totals, per_hour, per_weekday, media
+
+
+def _messages(n=600, seed=7):
+    rnd = random.Random(seed)
+    messages = []
+    for idx in range(n):
+        created = BASE + timedelta(seconds=rnd.randint(0, 20 * 86400))
+        style = idx % 6
+        if style == 0:
+            created_at = int(created.timestamp())
+        elif style == 1:
+            created_at = created.strftime("%Y-%m-%dT%H:%M:%SZ")
+        elif style == 2:
+            created_at = created.replace(tzinfo=None).isoformat()  # sem fuso
+        elif style == 3:
+            created_at = created.astimezone(TZ).isoformat()
+        elif style == 4:
+            created_at = str(int(created.timestamp()))
+        else:
+            created_at = None if idx % 12 == 5 else float(created.timestamp())
+        msg = {
+            "id": idx,
+            "conversation_id": idx // 10,
+            "created_at": created_at,
+            "message_type": rnd.choice((0, 1, "0", "1", "incoming", "outgoing", 2)),
+            "private": rnd.choice((False, False, True, "true", "não", 0, 1)),
+        }
+        if rnd.random() < 0.2:
+            msg["attachments"] = [{"file_type": rnd.choice(("audio", "image"))}]
+        messages.append(msg)
+    return messages
+
+
+def test_frame_counts_match_the_legacy_loops():
+    messages = _messages()
+    start_dt = datetime(2026, 3, 4, tzinfo=TZ)
+    end_dt = datetime(2026, 3, 15, 23, 59, 59, tzinfo=TZ)
+    totals, per_hour, per_weekday, media = _legacy_counts(messages, start_dt, end_dt)
+
+    frame = build_message_frame(messages, details=False)
+    in_period = filter_period(frame, start_dt, end_dt, keep_missing=True)
+    assert message_totals(in_period) == totals
+
+    dated = filter_period(frame, start_dt, end_dt)
+    assert counts_by_hour(dated).values.tolist() == per_hour
+    assert counts_by_weekday(dated).values.tolist() == per_weekday
+    assert list(counts_by_weekday(dated).index) == WEEKDAY_NAMES
+    assert media_counts(dated) == media
+
+
+def test_naive_z_and_missing_timestamps():
+    messages = [
+        {"id": 1, "message_type": 0, "created_at": "2026-03-02T15:00:00"},
+        {"id": 2, "message_type": 1, "created_at": "2026-03-02T15:00:00Z"},
+        {"id": 3, "message_type": 1, "created_at": "2026-03-02T12:00:00-03:00"},
+        {"id": 4, "message_type": 0, "timestamp": 1772463600},
+        {"id": 5, "message_type": 1, "created_at": None, "attachments": [{"file_type": "audio"}]},
+    ]
+    frame = build_message_frame(messages, conversation_id=9)
+    hours = frame["created_dt"].dt.hour.tolist()
+    assert hours[:4] == [12, 12, 12, 12]
+    assert frame["created_dt"].isna().tolist() == [False] * 4 + [True]
+    assert frame["conversation_id"].tolist() == [9] * 5
+
+    by_hour = counts_by_hour(frame)
+    assert by_hour.loc[12].tolist() == [2, 2]
+    assert int(by_hour.values.sum()) == 4
+    assert int(counts_by_weekday(frame).loc["Segunda"].sum()) == 4
+    assert message_totals(frame) == {"received": 2, "sent": 3, "private": 0}
+    assert media_counts(frame) == {"text": 4, "audio": 1}
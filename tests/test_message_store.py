@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import json
+
+import requests
+
+from app.modules.analytics import messages as messages_tab
+from src.analytics import message_store
+from src.utils import http_cache
+
+
+class _FakeConversation:
+    """Serve pages like Chatwoot: 20 messages before an id (or newest), 100 after an id."""
+
+    def __init__(self, count, start_ts=1_700_000_000):
+        self.start_ts = start_ts
+        self.messages = []
+        self.requests = []
+        self.add(count)
+
+    def add(self, count):
+        next_id = len(self.messages) + 1
+        for mid in range(next_id, next_id + count):
+            self.messages.append({"id": mid, "created_at": self.start_ts + mid * 60, "content": f"m{mid}"})
+
+    def fetch_page(self, before_id=None, after_id=None):
+        self.requests.append(message_store.page_params(before_id, after_id))
+        if after_id:
+            return [m for m in self.messages if m["id"] > after_id][: message_store.AFTER_PAGE_SIZE]
+        older = [m for m in self.messages if before_id is None or m["id"] < before_id]
+        return older[-message_store.PAGE_SIZE :]
+
+
+def test_refresh_only_downloads_new_pages(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    conv = _FakeConversation(200)
+
+    first = message_store.sync_messages("acc", 7, conv.fetch_page)
+    assert [m["id"] for m in first] == list(range(1, 201))
+    assert len(conv.requests) == 11  # 10 full pages + the empty one that ends the walk
+
+    conv.requests.clear()
+    conv.add(5)
+    second = message_store.sync_messages("acc", 7, conv.fetch_page)
+    assert conv.requests == [{"after": 200}]
+    assert [m["id"] for m in second] == list(range(1, 206))
+
+    conv.requests.clear()
+    conv.add(250)
+    third = message_store.sync_messages("acc", 7, conv.fetch_page)
+    assert conv.requests == [{"after": 205}, {"after": 305}, {"after": 405}]
+    assert [m["id"] for m in third] == list(range(1, 456))
+
+
+def test_backfills_only_when_period_starts_before_stored_range(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    conv = _FakeConversation(100)
+    recent_start = conv.start_ts + 90 * 60
+
+    recent = message_store.sync_messages("acc", 1, conv.fetch_page, start_ts=recent_start)
+    assert [m["id"] for m in recent] == list(range(90, 101))
+    assert len(conv.requests) == 1
+
+    conv.requests.clear()
+    everything = message_store.sync_messages("acc", 1, conv.fetch_page, start_ts=conv.start_ts)
+    assert [m["id"] for m in everything] == list(range(1, 101))
+    assert conv.requests[0] == {"after": 100}
+    assert conv.requests[1:] == [{"before": 81}, {"before": 61}, {"before": 41}, {"before": 21}, {"before": 1}]
+
+
+def test_cached_empty_after_page_does_not_hide_new_messages(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    monkeypatch.setattr(http_cache, "CACHE_PATH", tmp_path / "http_cache.db")
+    monkeypatch.delenv("CHATWOOT_HTTP_CACHE", raising=False)
+    conv = _FakeConversation(3)
+
+    def get(url, params=None, headers=None, timeout=None):
+        params = params or {}
+        payload = conv.fetch_page(params.get("before"), params.get("after"))
+        resp = requests.Response()
+        resp.status_code = 200
+        resp.headers["Content-Type"] = "application/json"
+        resp._content = json.dumps({"payload": payload}).encode()
+        return resp
+
+    monkeypatch.setattr(requests, "get", get)
+    messages_tab._fetch_messages("http://cw", "1", "t", 7)
+    assert messages_tab._fetch_messages("http://cw", "1", "t", 7)[-1]["id"] == 3  # `after=3` vazio
+    conv.add(1)
+    refreshed = messages_tab._fetch_messages("http://cw", "1", "t", 7)
+    assert [m["id"] for m in refreshed] == [1, 2, 3, 4]
+    assert conv.requests[1:] == [{"after": 3}, {"after": 3}]
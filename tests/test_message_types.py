@@ -0,0 +1,49 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+
+import requests
+
+from src.analytics import message_store, message_types
+from src.utils.timezone import TZ
+
+
+def _response(payload):
+    resp = requests.Response()
+    resp.status_code = 200
+    resp._content = json.dumps({"payload": payload}).encode()
+    return resp
+
+
+def test_counts_come_from_store_after_first_crawl(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    start_dt = datetime(2026, 3, 1, tzinfo=TZ)
+    end_dt = start_dt + timedelta(days=30)
+    base_ts = int(start_dt.timestamp())
+    pages = {
+        "1": [{"id": 1, "created_at": base_ts + 60}, {"id": 2, "created_at": base_ts + 120, "attachments": [{"file_type": "audio"}]}],
+        "2": [{"id": 3, "created_at": base_ts - 86400}, {"id": 4, "created_at": base_ts + 180}],
+    }
+    calls = []
+
+    def fake_get(url, params=None, headers=None, timeout=None, ttl=None):
+        conv_id = url.rstrip("/").split("/")[-2]
+        calls.append((conv_id, params))
+        return _response([] if params else pages[conv_id])
+
+    monkeypatch.setattr(message_types, "cached_get", fake_get)
+    activity = base_ts + 200
+    convs = [{"id": 1, "last_activity_at": activity}, {"id": 2, "last_activity_at": activity}]
+
+    first = message_types.count_message_types("http://cw", "1", "t", convs, start_dt, end_dt)
+    assert (first["text"], first["audio"], first["synced"]) == (2, 1, 2)
+
+    calls.clear()
+    second = message_types.count_message_types("http://cw", "1", "t", convs, start_dt, end_dt)
+    assert calls == []
+    assert (second["text"], second["audio"], second["cached"]) == (2, 1, 2)
+
+    convs[0]["last_activity_at"] = activity + 10**9
+    message_types.count_message_types("http://cw", "1", "t", convs, start_dt, end_dt)
+    assert {conv_id for conv_id, _ in calls} == {"1"}
@@ -0,0 +1,177 @@
+"""Time/memory budgets for hot paths, on large synthetic inputs.
+
+Budgets are generous ceilings (scale them with PERF_BUDGET_SCALE on slow
+machines). The `perf` tests run only with PERF_BUDGETS=1 or `--perf-record`
+(see `tests/conftest.py`); with `--perf-record` every measurement is appended
+to the history of `benchmarks.budgets`, otherwise to a throwaway copy. A run
+much slower than the previous ones in that history on the same machine emits
+a warning (a failure with PERF_STRICT=1).
+"""
+
+from __future__ import annotations
+
+import os
+import platform
+import random
+import sqlite3
+import warnings
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.modules.analytics import conversations as conv_module
+from benchmarks import budgets
+from benchmarks.chatwoot_data import conversation_messages, generate_dataset
+from src.analytics.chatwoot_reports import merge_report_rows
+from src.analytics.metrics import build_hourly_df
+from src.bot import engine
+from src.bot.rules import custom_moderation_hit
+from src.utils.timestamps import parse_ts
+from src.utils.timezone import TZ
+
+END_TS = 1_780_000_000
+FILTERS = {
+    "conversation_id_filter": "",
+    "selected_inbox_ids": set(),
+    "contact_name": "",
+    "contact_number": "",
+    "selected_agent_id": None,
+    "selected_team_id": None,
+    "assigned_filter": "Todos",
+    "status_filter": "Todos",
+    "conversation_type": "Todos",
+}
+
+
+@pytest.fixture
+def within_budget(request, tmp_path):
+    history_path = budgets.HISTORY_PATH if request.config.getoption("--perf-record") else tmp_path / "perf_history.jsonl"
+
+    def check(name, fn, seconds, peak_mb, rounds=3):
+        result = budgets.measure(fn, rounds=rounds)
+        history = budgets.load_history(history_path)
+        budgets.record(name, result, history_path)
+        message = budgets.regression(name, result, history)
+        if message:
+            if os.getenv("PERF_STRICT") == "1":
+                pytest.fail(f"Regressão de desempenho: {message}")
+            warnings.warn(f"Regressão de desempenho: {message}")
+        scale = budgets.budget_scale()
+        assert result["seconds"] <= seconds * scale, f"{name}: {result['seconds']:.3f}s (orçamento {seconds * scale}s)"
+        assert result["peak_mb"] <= peak_mb * scale, f"{name}: {result['peak_mb']:.1f} MB (orçamento {peak_mb * scale} MB)"
+        return result
+
+    return check
+
+
+def _account(conversations, seed=1, days=30):
+    dataset = generate_dataset(conversations, days=days, end_ts=END_TS, seed=seed)
+    payloads = [{k: v for k, v in conv.items() if not k.startswith("_")} for conv in dataset["conversations"]]
+    end_dt = datetime.fromtimestamp(END_TS, TZ)
+    inbox_names = {inbox["id"]: inbox["name"] for inbox in dataset["inboxes"]}
+    return dataset, payloads, inbox_names, end_dt - timedelta(days=days), end_dt
+
+
+@pytest.mark.perf
+def test_collect_conversation_rows_budget(within_budget):
+    _, conversations, inbox_names, start_dt, end_dt = _account(5_000)
+    within_budget(
+        "collect_conversation_rows_5k",
+        lambda: conv_module.collect_conversation_rows(conversations, FILTERS, inbox_names, start_dt, end_dt),
+        seconds=1.0,
+        peak_mb=30,
+        rounds=2,
+    )
+
+
+@pytest.mark.perf
+def test_build_insights_context_budget(within_budget, monkeypatch):
+    dataset, conversations, inbox_names, start_dt, end_dt = _account(1_000, seed=2)
+    by_id = {conv["id"]: conv for conv in dataset["conversations"]}
+    monkeypatch.setattr(conv_module.time_module, "sleep", lambda seconds: None)
+    monkeypatch.setattr(conv_module, "bot_sender_config", lambda: {"names": set(), "ids": set()})
+    monkeypatch.setattr(
+        conv_module, "_fetch_messages", lambda url, account, token, conv_id, start_dt=None: conversation_messages(dataset, by_id[conv_id])
+    )
+    within_budget(
+        "build_insights_context_1k",
+        lambda: conv_module._build_insights_context(conversations, FILTERS, inbox_names, start_dt, end_dt, "http://cw", "1", "t"),
+        seconds=2.5,
+        peak_mb=25,
+        rounds=2,
+    )
+
+
+@pytest.mark.perf
+def test_build_hourly_df_budget(within_budget):
+    rng = np.random.default_rng(1)
+    n = 200_000
+    df = pd.DataFrame(
+        {
+            "created_dt": pd.to_datetime(END_TS - rng.integers(0, 30 * 86400, n), unit="s", utc=True).tz_convert(TZ),
+            "direction": rng.choice(["cliente", "bot"], n),
+        }
+    )
+    within_budget("build_hourly_df_200k", lambda: build_hourly_df(df), seconds=0.8, peak_mb=15)
+
+
+@pytest.mark.perf
+def test_custom_moderation_hit_budget(within_budget):
+    rnd = random.Random(1)
+    terms = [f"termo{i} proibido" for i in range(200)]
+    words = ("olá", "pedido", "entrega", "quero", "trocar", "produto", "boleto")
+    texts = [" ".join(rnd.choice(words) for _ in range(40)) for _ in range(2_000)]
+    within_budget(
+        "custom_moderation_hit_2kx200",
+        lambda: [custom_moderation_hit(text, terms) for text in texts],
+        seconds=0.5,
+        peak_mb=5,
+    )
+
+
+@pytest.mark.perf
+def test_load_logs_budget(within_budget, isolated_db):
+    created_at = datetime.now(TZ).isoformat()
+    with sqlite3.connect(isolated_db) as conn:
+        conn.executemany(
+            "INSERT INTO conversation_logs (conversation_id, client_name, direction, message, created_at) VALUES (?, ?, ?, ?, ?)",
+            [(str(i % 500), "Ana", "bot" if i % 2 else "cliente", "mensagem " * 20, created_at) for i in range(100_000)],
+        )
+    within_budget("load_logs_10k_of_100k", lambda: engine.load_logs(10_000), seconds=0.3, peak_mb=30)
+
+
+@pytest.mark.perf
+def test_log_conversation_budget(within_budget, isolated_db):
+    within_budget(
+        "log_conversation_x200",
+        lambda: [engine.log_conversation("1", "Ana", "bot", "resposta " * 30) for _ in range(200)],
+        seconds=1.5,
+        peak_mb=5,
+    )
+
+
+@pytest.mark.perf
+def test_parse_ts_budget(within_budget):
+    rnd = random.Random(1)
+    values = []
+    for offset in range(100_000):
+        ts = END_TS - offset * 17
+        iso = datetime.fromtimestamp(ts, TZ).isoformat()
+        values.append(rnd.choice((ts, float(ts), iso, iso[:19] + "Z", str(ts), None)))
+    within_budget("parse_ts_100k", lambda: [parse_ts(value) for value in values], seconds=0.5, peak_mb=25)
+
+
+@pytest.mark.perf
+def test_merge_report_rows_budget(within_budget):
+    rnd = random.Random(1)
+    series = [[{"timestamp": END_TS + hour * 3600, "value": rnd.randint(0, 9)} for hour in range(8_760)] for _ in range(20)]
+    within_budget("merge_report_rows_20x8760", lambda: merge_report_rows(series), seconds=1.0, peak_mb=40)
+
+
+def test_regression_is_flagged_against_same_host_history():
+    history = [{"name": "x", "host": platform.node(), "seconds": 0.1}] * 5
+    assert budgets.regression("x", {"seconds": 0.12}, history) is None
+    assert "x" in budgets.regression("x", {"seconds": 0.5}, history)
+    assert budgets.regression("y", {"seconds": 0.5}, history) is None
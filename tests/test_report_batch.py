@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import json
+from datetime import date
+
+import pandas as pd
+
+from src.analytics import message_store
+from src.reports import batch
+
+START_TS = 1_772_413_200  # 2026-03-01 22:00 (São Paulo)
+
+
+def _conversation(cid, inbox_id, agent):
+    return {
+        "id": cid,
+        "inbox_id": inbox_id,
+        "status": "resolved",
+        "created_at": START_TS,
+        "last_activity_at": START_TS + 600,
+        "meta": {"assignee": {"name": agent}, "sender": {"name": f"Cliente {cid}", "phone_number": "+5511999"}},
+    }
+
+
+def _messages(cid):
+    return [
+        {"id": cid * 10, "content": "oi", "message_type": 0, "created_at": START_TS + 60, "sender_type": "contact"},
+        {"id": cid * 10 + 1, "content": "olá", "message_type": 1, "created_at": START_TS + 120, "sender_type": "agentbot"},
+    ]
+
+
+def _synced_messages(base_url, account_id, token, convs, start_ts, max_workers):
+    # Passa pelo message store, como o crawl de verdade, para alimentar o rollup.
+    for conv in convs:
+        newest = [dict(msg, inbox_id=conv["inbox_id"]) for msg in _messages(conv["id"])]
+        msgs = message_store.sync_messages(
+            message_store.account_key(base_url, account_id),
+            conv["id"],
+            lambda before_id=None, after_id=None: [] if before_id or after_id else newest,
+            start_ts,
+        )
+        yield conv["id"], msgs, None
+
+
+def test_period_range():
+    today = date(2026, 3, 15)
+    assert batch.period_range("yesterday", today) == (date(2026, 3, 14), date(2026, 3, 14))
+    assert batch.period_range("last-month", today) == (date(2026, 2, 1), date(2026, 2, 28))
+    assert batch.period_range("last-7-days", today) == (date(2026, 3, 8), date(2026, 3, 14))
+
+
+def test_cli_writes_reports_and_manifest(monkeypatch, tmp_path):
+    conversations = [_conversation(1, 7, "Ana"), _conversation(2, 8, "Bia")]
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "message_store.db")
+    monkeypatch.setattr(batch, "_credentials", lambda: ("http://cw", "1", "token"))
+    monkeypatch.setattr(batch, "fetch_chatwoot_conversations", lambda *args, **kwargs: list(conversations))
+    monkeypatch.setattr(batch, "fetch_chatwoot_inboxes", lambda *args: [{"id": 7, "name": "WhatsApp"}, {"id": 8, "name": "Site"}])
+    monkeypatch.setattr(batch, "conversation_messages", _synced_messages)
+
+    code = batch.main(["--start", "2026-03-01", "--end", "2026-03-02", "--inbox", "7", "--output-dir", str(tmp_path)])
+    assert code == 0
+
+    period = "2026-03-01_2026-03-02"
+    attendance = pd.read_csv(tmp_path / f"atendimentos_{period}.csv")
+    assert attendance["conversation_id"].tolist() == [1, 1]
+    assert attendance["direction"].tolist() == ["cliente", "bot"]
+    hourly = pd.read_csv(tmp_path / f"mensagens_por_hora_{period}.csv")
+    assert hourly.iloc[22, 1:].tolist() == [1, 1]
+    assert hourly.iloc[-1, 1:].tolist() == [1, 1]
+    assert (tmp_path / f"mensagens_{period}.csv").exists()
+    assert (tmp_path / f"analise_conversas_{period}.csv").exists()
+
+    manifest = json.loads((tmp_path / f"relatorios_{period}.json").read_text(encoding="utf-8"))
+    assert manifest["conversations"] == 1
+    assert manifest["files"]["atendimentos"]["rows"] == 2
+    assert manifest["failed_conversations"] == []
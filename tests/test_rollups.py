@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime
+
+from src.analytics import message_store
+from src.analytics.metrics import hourly_df_from_rollup
+from src.analytics.rollups import rollup_by
+from src.utils.timezone import TZ
+
+
+def _pages(messages):
+    def fetch_page(before_id=None, after_id=None):
+        if after_id:
+            return [msg for msg in messages if msg["id"] > after_id][:100]
+        older = [msg for msg in messages if before_id is None or msg["id"] < before_id]
+        return older[-20:]
+
+    return fetch_page
+
+
+def test_resync_does_not_double_count(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    monday_9h = int(datetime(2026, 3, 2, 9, 15, tzinfo=TZ).timestamp())
+    messages = [
+        {"id": 1, "created_at": monday_9h, "inbox_id": 7, "message_type": 0, "sender": {"type": "contact"}},
+        {"id": 2, "created_at": monday_9h + 60, "inbox_id": 7, "message_type": 1, "sender": {"type": "user"}},
+        {"id": 3, "created_at": monday_9h + 120, "inbox_id": 7, "message_type": 0, "attachments": [{"file_type": "audio"}]},
+    ]
+    message_store.sync_messages("acc", 10, _pages(messages))
+    message_store.sync_messages("acc", 10, _pages(messages))
+    messages.append({"id": 4, "created_at": monday_9h + 86400, "inbox_id": 7, "message_type": 1})
+    message_store.sync_messages("acc", 10, _pages(messages))
+
+    start, end = monday_9h - 86400, monday_9h + 7 * 86400
+    rollup = message_store.query_message_rollup("acc", start, end)
+    assert int(rollup["messages"].sum()) == 4
+    assert int(rollup["audio"].sum()) == 1
+    assert set(rollup["sender_type"]) == {"contact", "user", ""}
+    assert rollup.groupby("direction")["messages"].sum().to_dict() == {"incoming": 2, "outgoing": 2}
+    assert int(message_store.query_message_rollup("acc", start, monday_9h + 3600)["messages"].sum()) == 3
+    assert message_store.query_message_rollup("acc", start, end, inbox_ids=[8]).empty
+
+    assert rollup_by(rollup, "hour").loc[9].tolist() == [2, 2]
+    assert rollup_by(rollup, "weekday").loc["Segunda"].tolist() == [2, 1]
+    mondays = message_store.query_message_rollup("acc", start, end, weekdays=[0])
+    assert int(mondays["messages"].sum()) == 3
+    # Remetente "contact" conta como cliente, como em filter_messages.
+    assert hourly_df_from_rollup(rollup).iloc[-1].tolist() == ["TOTAL", 2, 2]
+    only_clients = hourly_df_from_rollup(rollup, hours=[9], msg_type="Apenas clientes")
+    assert only_clients.iloc[-1].tolist() == ["TOTAL", 2, 0]
+
+
+def test_concurrent_syncs_count_each_message_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    created = int(datetime(2026, 3, 2, 9, tzinfo=TZ).timestamp())
+    messages = [{"id": mid, "created_at": created + mid, "message_type": 0} for mid in range(1, 16)]
+    both_fetched = threading.Barrier(2)
+    pages = _pages(messages)
+
+    def fetch_page(before_id=None, after_id=None):
+        page = pages(before_id, after_id)
+        if before_id is None and after_id is None:
+            both_fetched.wait(timeout=5)  # as duas sessões baixam antes de qualquer uma salvar
+        return page
+
+    message_store.stored_messages("acc", 1)  # cria o esquema antes das threads
+    threads = [threading.Thread(target=message_store.sync_messages, args=("acc", 1, fetch_page)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    rollup = message_store.query_message_rollup("acc", created - 3600, created + 3600)
+    assert int(rollup["messages"].sum()) == 15
+
+
+def test_conversation_rollup_counts_each_conversation_once(monkeypatch, tmp_path):
+    monkeypatch.setattr(message_store, "STORE_PATH", tmp_path / "store.db")
+    tuesday_14h = int(datetime(2026, 3, 3, 14, 5, tzinfo=TZ).timestamp())
+    convs = [
+        {"id": 1, "created_at": tuesday_14h, "inbox_id": 1},
+        {"id": 2, "created_at": tuesday_14h + 60, "inbox_id": 2},
+    ]
+    assert message_store.record_conversations("acc", convs) == 2
+    convs.append({"id": 3, "created_at": tuesday_14h + 86400, "inbox_id": 1})
+    assert message_store.record_conversations("acc", convs) == 1
+
+    start, end = tuesday_14h - 86400, tuesday_14h + 7 * 86400
+    frame = message_store.query_conversation_rollup("acc", start, end)
+    assert int(frame["conversations"].sum()) == 3
+    assert rollup_by(frame, "hour", value="conversations").loc[14, "conversations"] == 3
+    by_weekday = rollup_by(frame, "weekday", value="conversations")["conversations"]
+    assert by_weekday[["Terça", "Quarta"]].tolist() == [2, 1]
+    by_day = rollup_by(frame, "day", value="conversations")["conversations"]
+    assert by_day.to_dict() == {datetime(2026, 3, 3).date(): 2, datetime(2026, 3, 4).date(): 1}
+    inbox_2 = message_store.query_conversation_rollup("acc", start, end, inbox_ids=[2])
+    assert int(inbox_2["conversations"].sum()) == 1
+    assert message_store.query_conversation_rollup("acc", start, end, weekdays=[5, 6]).empty
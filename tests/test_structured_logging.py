@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import io
+import json
+import logging
+
+from src.utils import structured_logging
+
+
+def test_records_are_json_lines_with_context_and_sampled_debug(monkeypatch):
+    monkeypatch.setenv("LOG_LEVEL", "DEBUG")
+    monkeypatch.setenv("LOG_DEBUG_SAMPLE_RATE", "0")
+    structured_logging.shutdown_logging()
+    stream = io.StringIO()
+    structured_logging.configure_logging(stream=stream)
+    logger = logging.getLogger("bot.test")
+    try:
+        with structured_logging.log_context(conversation_id=42, message_id="m-1"):
+            logger.info("Resposta enviada.", extra={"http_status": 200})
+            logger.debug("Corpo da resposta.")
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            logger.exception("Falhou.")
+    finally:
+        structured_logging.shutdown_logging()
+
+    lines = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert [line["message"] for line in lines] == ["Resposta enviada.", "Falhou."]
+    assert lines[0]["conversation_id"] == 42 and lines[0]["message_id"] == "m-1"
+    assert lines[0]["http_status"] == 200 and lines[0]["level"] == "INFO"
+    assert "conversation_id" not in lines[1] and "ValueError: boom" in lines[1]["exc"]
@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from src.utils.timestamps import local_field, parse_ts, parse_ts_array, to_local, to_local_series
+from src.utils.timezone import TZ
+
+
+def test_scalar_parsing_matches_epoch_iso_and_text_epoch():
+    expected = datetime(2026, 1, 1, 12, tzinfo=timezone.utc)
+    assert parse_ts(1767268800) == expected
+    assert parse_ts("2026-01-01T12:00:00Z") == expected
+    assert parse_ts("1767268800") == expected
+    assert parse_ts(None) is None
+    assert parse_ts("invalido") is None
+    local = to_local(1767268800)
+    assert local.tzinfo is TZ and local.hour == 9
+    assert to_local("2026-01-01T12:00:00Z") == local
+
+
+def test_batch_parsing_handles_mixed_values():
+    values = [1767268800, "2026-01-01T12:00:00Z", None, "invalido", "1767268800", 1767268800.5]
+    parsed = parse_ts_array(values)
+    assert pd.isna(parsed[2]) and pd.isna(parsed[3])
+    assert parsed[0] == parsed[1] == parsed[4]
+    series = to_local_series(values)
+    assert str(series.dt.tz) == "America/Sao_Paulo"
+    assert local_field(values, "hour").tolist() == [9, 9, -1, -1, 9, 9]
+
+
+def test_local_field_follows_historical_dst_offsets():
+    stamps = pd.Series(pd.date_range("2018-10-01", "2019-03-01", freq="37min", tz="UTC"))
+    expected = stamps.dt.tz_convert(TZ).dt.hour.to_numpy()
+    assert (local_field(stamps, "hour") == expected).all()
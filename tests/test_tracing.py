@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from src.bot import tracing
+
+
+def _trace(model, hour, llm_ms, outcome="answered"):
+    trace = tracing.start_trace()
+    trace["created_at"] = trace["created_at"][:11] + f"{hour:02d}" + trace["created_at"][13:]
+    trace.update(model=model, profile_name="Suporte", outcome=outcome)
+    trace["spans"].update(queue=5.0, llm=llm_ms)
+    return trace
+
+
+def test_spans_accumulate_and_mark_measures_since_previous_mark():
+    trace = tracing.start_trace()
+    tracing.mark(trace, "webhook")
+    with tracing.span(trace, "log_write"):
+        pass
+    with tracing.span(trace, "log_write"):
+        pass
+    assert set(trace["spans"]) == {"webhook", "log_write"}
+    assert all(value >= 0 for value in trace["spans"].values())
+
+
+def test_saved_traces_group_into_percentiles(isolated_db):
+    for llm_ms in (100, 200, 300, 400):
+        tracing.save_trace(_trace("gpt-4.1-mini", 9, llm_ms), conversation_id=7)
+    tracing.save_trace(_trace("gpt-5", 14, 900), conversation_id=8)
+    tracing.save_trace(_trace("gpt-5", 14, 50, outcome="error"), conversation_id=8)
+
+    answered = tracing.load_traces(days=1, outcomes=["answered"])
+    assert len(answered) == 5 and answered[0]["moderation_ms"] is None
+
+    by_model = {row["model"]: row for row in tracing.latency_percentiles(answered, "model")}
+    assert by_model["gpt-4.1-mini"]["count"] == 4
+    assert by_model["gpt-4.1-mini"]["llm_p50_ms"] == 200
+    assert by_model["gpt-4.1-mini"]["llm_p95_ms"] == 400
+    assert by_model["gpt-5"]["llm_p95_ms"] == 900
+
+    by_hour = tracing.latency_percentiles(tracing.load_traces(days=1), "hour", spans=("queue",))
+    assert [(row["hour"], row["count"], row["queue_p50_ms"]) for row in by_hour] == [("09h", 4, 5), ("14h", 2, 5)]
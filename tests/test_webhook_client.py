@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+from src.bot import webhook_client
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="lê /proc")
+
+
+def _sleeper(*args):
+    # Processo que dorme; os argumentos extras só aparecem na linha de comando.
+    return subprocess.Popen([sys.executable, "-c", "import time; time.sleep(30)", *args])
+
+
+@pytest.fixture
+def remote(monkeypatch, tmp_path):
+    monkeypatch.setattr(webhook_client, "WEBHOOK_PID_PATH", tmp_path / "webhook.pid")
+    monkeypatch.setattr(webhook_client, "WEBHOOK_URL", "http://10.0.0.5:8000")
+
+
+def test_stops_only_the_recorded_webhook_process(remote, monkeypatch):
+    webhook = _sleeper("uvicorn", "app.modules.bot.bot_start:app")
+    other = _sleeper()
+    try:
+        monkeypatch.setattr(webhook_client, "webhook_health", lambda timeout=None: {"pid": other.pid})
+        webhook_client.record_webhook_pid(webhook.pid)
+        assert webhook_client.stop_webhook() is True
+        assert webhook.wait(timeout=5) is not None
+        assert other.poll() is None
+        assert not webhook_client.WEBHOOK_PID_PATH.exists()
+    finally:
+        for process in (webhook, other):
+            process.kill()
+            process.wait()
+
+
+def test_refuses_foreign_pids_for_a_remote_webhook(remote, monkeypatch):
+    other = _sleeper()
+    try:
+        monkeypatch.setattr(webhook_client, "webhook_health", lambda timeout=None: {"pid": other.pid})
+        webhook_client.record_webhook_pid(other.pid)  # pid reaproveitado por outro programa
+        assert webhook_client.stop_webhook() is False
+        assert other.poll() is None
+        assert not webhook_client.WEBHOOK_PID_PATH.exists()
+    finally:
+        other.kill()
+        other.wait()
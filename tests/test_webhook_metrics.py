@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import pytest
+from fastapi.testclient import TestClient
+
+from src.bot import runtime_metrics, tracing
+from src.utils import database, db_init, instrumentation
+
+
+def test_percentile_uses_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert runtime_metrics.percentile(values, 50) == 50.0
+    assert runtime_metrics.percentile(values, 95) == 95.0
+    assert runtime_metrics.percentile([], 95) is None
+
+
+def test_healthz_and_metrics_report_tasks_and_latencies(monkeypatch, tmp_path):
+    bot_start = pytest.importorskip("app.modules.bot.bot_start")
+    monkeypatch.setattr(db_init, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(db_init, "DB_PATH", tmp_path / "bot_config.db")
+    monkeypatch.setattr(database, "DB_PATH", tmp_path / "bot_config.db")
+    monkeypatch.setattr(bot_start, "responder_cliente", lambda *args, **kwargs: instrumentation.observe("bot_stage_seconds", 0.25, stage="llm"))
+    before = runtime_metrics.snapshot()
+    client = TestClient(bot_start.app)
+
+    health = client.get("/healthz").json()
+    assert health["status"] == "ok" and health["pid"] and health["uptime_s"] >= 0
+
+    runtime_metrics.task_queued()
+    bot_start._responder_monitorado(1, "Ana", "oi")
+    client.post("/webhook", json={"event": "conversation_updated"})
+
+    metrics = client.get("/metrics", params={"format": "json"}).json()
+    assert metrics["events"] == before["events"] + 1
+    assert metrics["tasks_done"] == before["tasks_done"] + 1
+    assert metrics["in_flight"] == 0 and metrics["queue_depth"] == before["queue_depth"]
+    assert metrics["last_event_age_s"] is not None and metrics["llm_p95_s"] is not None
+    assert metrics["handle_count"] == before["handle_count"] + 1
+    assert [trace["queue_ms"] is not None for trace in tracing.load_traces()] == [True]
+
+    exported = client.get("/metrics").text
+    assert "# TYPE webhook_request_seconds histogram" in exported
+    assert 'webhook_requests_total{event="conversation_updated"}' in exported
+
+
+def test_latency_summary_reads_the_histograms():
+    instrumentation.reset()
+    for _ in range(19):
+        instrumentation.observe("bot_stage_seconds", 0.04, stage="llm")
+    instrumentation.observe("bot_stage_seconds", 3.0, stage="llm")
+    instrumentation.observe("bot_stage_seconds", 2.0, stage="moderation")
+    instrumentation.observe("chatwoot_request_seconds", 0.2, method="GET", endpoint="/a")
+    instrumentation.observe("chatwoot_request_seconds", 0.2, method="POST", endpoint="/b")
+
+    data = runtime_metrics.snapshot()
+    assert (data["llm_count"], data["moderation_count"], data["chatwoot_count"]) == (20, 1, 2)
+    assert 0.025 < data["llm_p50_s"] <= 0.05
+    assert 1.0 < data["moderation_p95_s"] <= 2.5
+    assert data["handle_p95_s"] is None
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import pytest
+
+from benchmarks import bench_webhook_replay
+from src.utils import database, db_init
+
+
+def test_synthetic_events_cover_both_payload_shapes():
+    events = bench_webhook_replay.synthetic_events(200, duplicate_ratio=0.1, seed=7)
+    fields = [bench_webhook_replay.event_fields(event) for event in events]
+    assert any("data" in event for event in events) and any("conversation" in event for event in events)
+    assert all(f["message_id"] and f["conversation_id"] for f in fields)
+    assert len({f["message_id"] for f in fields}) < len(events)
+
+
+def test_replay_answers_each_message_once(monkeypatch):
+    pytest.importorskip("app.modules.bot.bot_start")
+    # replay() aponta o banco e o ambiente para os stubs; o monkeypatch desfaz no fim.
+    monkeypatch.setattr(db_init, "DATA_DIR", db_init.DATA_DIR)
+    monkeypatch.setattr(db_init, "DB_PATH", db_init.DB_PATH)
+    monkeypatch.setattr(database, "DB_PATH", database.DB_PATH)
+    for key in ("OPENAI_API_KEY", "OPENAI_BASE_URL", "ALLOWED_INBOX_ID"):
+        monkeypatch.setenv(key, "")
+    monkeypatch.setenv("LOG_LEVEL", "WARNING")
+
+    events = bench_webhook_replay.synthetic_events(40, conversations=10, seed=3)
+    # Cliente mínimo no lugar do SDK: o openai fixado não tem a Responses API.
+    result = bench_webhook_replay.replay(
+        events, rate=0, workers=4, chatwoot_latency=0, openai_latency=0, moderation=True, settle_timeout=10, stub_client=True
+    )
+
+    assert result["errors"] == {}
+    assert result["replies"] == result["expected_replies"] > 0
+    assert result["duplicate_replies"] == 0 and result["missing_replies"] == 0